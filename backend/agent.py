@@ -1,10 +1,12 @@
 """
 Incident Management Agent using OpenAI Agents SDK.
 """
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 from agents import Agent, Tool
 from models import IncidentUserContext, Role
 from tools import get_tools_for_role
+from stub_model import resolve_model
+from routing import model_router
 
 
 def get_instructions_for_role(role: Role) -> str:
@@ -40,9 +42,30 @@ def get_instructions_for_role(role: Role) -> str:
 
 
 
-def create_incident_agent(role: Role) -> Agent[IncidentUserContext]:
+_agent_registry: Dict[Tuple[Role, str], Agent[IncidentUserContext]] = {}
+
+
+def get_incident_agent(role: Role, tier: str = "large") -> Agent[IncidentUserContext]:
+    """
+    Get the incident agent for a role and model tier, creating it on first use.
+
+    Agents hold no per-request state, so one instance per role and model is
+    shared; tiers configured with the same model share an agent.
+    """
+    model = model_router.models[tier]
+    agent = _agent_registry.get((role, model))
+    if agent is None:
+        agent = _agent_registry[(role, model)] = create_incident_agent(role, model)
+    return agent
+
+
+def create_incident_agent(role: Role, model: Optional[str] = None) -> Agent[IncidentUserContext]:
     """
     Create an incident agent for a role.
+
+    Args:
+        role: Role whose tools and instructions the agent gets
+        model: Model name (see routing.py); defaults to the large tier's
     """
     tools = get_tools_for_role(role)
 
@@ -50,5 +73,5 @@ def create_incident_agent(role: Role) -> Agent[IncidentUserContext]:
         name=f"Incident Management Agent - {role.value}",
         instructions=get_instructions_for_role(role),
         tools=tools,
-        model="gpt-5",
+        model=resolve_model(model or model_router.models["large"]),
     )
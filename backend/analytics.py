@@ -0,0 +1,186 @@
+"""
+Columnar incident analytics.
+
+Mirrors IncidentStore into NumPy columns (priority, status, cost, penalty,
+customers, timestamps) kept in sync incrementally as a secondary index, so
+roll-ups like total cost by priority or MTTR by status are vectorized
+group-bys instead of loops over Incident objects.
+"""
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from models import Incident, IncidentPriority, IncidentStatus, Role, ROLE_INCIDENT_FIELDS
+from store import IncidentIndex, incident_store
+
+PRIORITIES = list(IncidentPriority)
+STATUSES = list(IncidentStatus)
+_PRIORITY_CODES = {p: i for i, p in enumerate(PRIORITIES)}
+_STATUS_CODES = {s: i for i, s in enumerate(STATUSES)}
+_OPEN_STATUSES = [IncidentStatus.OPEN, IncidentStatus.INVESTIGATING]
+
+GROUP_BY = {"priority": PRIORITIES, "status": STATUSES}
+
+# Summed metrics and the incident field a role must be able to see to get them
+METRICS = {
+    "estimated_cost": "estimated_cost",
+    "sla_penalty": "sla_penalty",
+    "affected_customers": "affected_customers",
+    "hours_open": None,
+}
+
+
+def _status_mask(codes: np.ndarray, statuses: List[IncidentStatus]) -> np.ndarray:
+    """Boolean mask of rows whose status code is in `statuses` (table lookup)."""
+    lookup = np.zeros(len(STATUSES), dtype=bool)
+    lookup[[_STATUS_CODES[s] for s in statuses]] = True
+    return lookup[codes]
+
+
+def metrics_for_role(role: Role) -> List[str]:
+    """Metrics whose underlying field is visible to the role."""
+    visible = ROLE_INCIDENT_FIELDS[role]
+    return [name for name, field in METRICS.items() if field is None or field in visible]
+
+
+class IncidentColumns(IncidentIndex):
+    """Column-oriented mirror of the incident store."""
+
+    _COLUMNS = ("priority", "status", "estimated_cost", "sla_penalty",
+                "affected_customers", "created_at", "updated_at")
+
+    def __init__(self, capacity: int = 1024):
+        self.rows: Dict[str, int] = {}
+        self.size = 0
+        self.priority = np.zeros(capacity, dtype=np.int8)
+        self.status = np.zeros(capacity, dtype=np.int8)
+        self.estimated_cost = np.zeros(capacity, dtype=np.float64)
+        self.sla_penalty = np.zeros(capacity, dtype=np.float64)
+        self.affected_customers = np.zeros(capacity, dtype=np.int64)
+        self.created_at = np.zeros(capacity, dtype=np.float64)
+        self.updated_at = np.zeros(capacity, dtype=np.float64)
+
+    def _reserve(self, count: int) -> None:
+        capacity = len(self.priority)
+        if self.size + count <= capacity:
+            return
+        while capacity < self.size + count:
+            capacity *= 2
+        for name in self._COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def _write(self, row: int, incident: Incident) -> None:
+        self.priority[row] = _PRIORITY_CODES[incident.priority]
+        self.status[row] = _STATUS_CODES[incident.status]
+        self.estimated_cost[row] = incident.estimated_cost
+        self.sla_penalty[row] = incident.sla_penalty
+        self.affected_customers[row] = incident.affected_customers
+        self.created_at[row] = incident.created_at.timestamp()
+        self.updated_at[row] = incident.updated_at.timestamp()
+
+    def add(self, incident: Incident) -> None:
+        """Append a new incident."""
+        self.add_many([incident])
+
+    def update(self, old: Incident, new: Incident) -> None:
+        """Overwrite an incident's row."""
+        row = self.rows.get(new.incident_id)
+        if row is None:
+            self.add(new)
+        else:
+            self._write(row, new)
+
+    def add_many(self, incidents: List[Incident]) -> None:
+        """Append a batch of incidents with one vectorized write per column."""
+        incidents = [i for i in incidents if i.incident_id not in self.rows]
+        if not incidents:
+            return
+        self._reserve(len(incidents))
+        start, end = self.size, self.size + len(incidents)
+        self.priority[start:end] = [_PRIORITY_CODES[i.priority] for i in incidents]
+        self.status[start:end] = [_STATUS_CODES[i.status] for i in incidents]
+        self.estimated_cost[start:end] = [i.estimated_cost for i in incidents]
+        self.sla_penalty[start:end] = [i.sla_penalty for i in incidents]
+        self.affected_customers[start:end] = [i.affected_customers for i in incidents]
+        self.created_at[start:end] = [i.created_at.timestamp() for i in incidents]
+        self.updated_at[start:end] = [i.updated_at.timestamp() for i in incidents]
+        for offset, incident in enumerate(incidents):
+            self.rows[incident.incident_id] = start + offset
+        self.size = end
+
+    def _hours_open(self, now: float) -> np.ndarray:
+        """
+        Hours each incident has been (or was) open: up to now while open or
+        investigating, up to the last update once resolved or closed.
+        """
+        n = self.size
+        is_open = _status_mask(self.status[:n], _OPEN_STATUSES)
+        end = np.where(is_open, now, self.updated_at[:n])
+        return (end - self.created_at[:n]) / 3600
+
+    def aggregate(self, group_by: Optional[str] = None, metrics: Optional[List[str]] = None,
+                  status: Optional[List[IncidentStatus]] = None) -> dict:
+        """
+        Vectorized group-by over the incident columns.
+
+        Args:
+            group_by: "priority", "status" or None for a single total
+            metrics: Metrics to sum and average (defaults to all)
+            status: Only include incidents in these statuses
+
+        Returns:
+            {"groups": {key: {"count": n, metric: {"sum", "mean"}}}, "total": {...}}
+        """
+        if group_by is not None and group_by not in GROUP_BY:
+            raise ValueError(f"Invalid group_by: {group_by}. Must be one of: {', '.join(GROUP_BY)}")
+        metrics = metrics or list(METRICS)
+        n = self.size
+        mask = _status_mask(self.status[:n], status) if status else slice(None)
+
+        columns = {
+            "estimated_cost": self.estimated_cost[:n],
+            "sla_penalty": self.sla_penalty[:n],
+            "affected_customers": self.affected_customers[:n],
+        }
+        if "hours_open" in metrics:
+            columns["hours_open"] = self._hours_open(time.time())
+
+        if group_by is None:
+            keys = ["total"]
+            codes = np.zeros(n, dtype=np.int64)[mask]
+        else:
+            keys = [k.value for k in GROUP_BY[group_by]]
+            codes = getattr(self, group_by)[:n][mask].astype(np.int64)
+
+        counts = np.bincount(codes, minlength=len(keys))
+        groups = {key: {"count": int(counts[i])} for i, key in enumerate(keys)}
+        for metric in metrics:
+            sums = np.bincount(codes, weights=columns[metric][mask], minlength=len(keys))
+            for i, key in enumerate(keys):
+                groups[key][metric] = {
+                    "sum": round(float(sums[i]), 2),
+                    "mean": round(float(sums[i] / counts[i]), 2) if counts[i] else None,
+                }
+
+        total = {"count": int(counts.sum())}
+        for metric in metrics:
+            values = columns[metric][mask]
+            total[metric] = {
+                "sum": round(float(values.sum()), 2),
+                "mean": round(float(values.mean()), 2) if len(values) else None,
+            }
+        return {"group_by": group_by, "groups": groups, "total": total}
+
+    def stats_for_role(self, role: Role, group_by: Optional[str] = None,
+                       status: Optional[List[IncidentStatus]] = None) -> dict:
+        """Aggregate only the metrics the role is allowed to see."""
+        return self.aggregate(group_by=group_by, metrics=metrics_for_role(role), status=status)
+
+
+# Global columnar mirror, kept in sync by incident_store
+incident_columns = IncidentColumns()
+incident_store.register_index(incident_columns)
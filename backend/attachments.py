@@ -0,0 +1,281 @@
+"""
+Content-addressed attachment storage.
+
+Chat stores keep only attachment metadata; the bytes live on disk under
+their SHA-256 (blobs/ab/cdef...), so the same screenshot or log bundle
+uploaded twice is stored once. Uploads are streamed to a temporary file
+while hashing and renamed into place; downloads are served from the blob
+file (FileResponse, which uses the server's zero-copy path send where
+available) or read in windows through mmap, so memory stays bounded
+whatever the file size.
+
+Blobs are not reference-counted on disk. When a chat store drops an
+attachment (delete_attachment, delete_thread) it releases the digest, and a
+background sweep removes released blobs that no remaining attachment
+refers to. Blobs written within the last `grace` seconds are kept, so an
+upload that has not saved its metadata yet is never collected.
+
+Set ATTACHMENT_DIR to keep attachments across restarts; without it they go
+to a temporary directory, mirroring the in-memory chat store.
+"""
+import asyncio
+import atexit
+import hashlib
+import mmap
+import os
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import AsyncIterator, Callable, Iterator, Optional, Set, Tuple
+
+from chatkit.store import AttachmentStore
+from chatkit.types import Attachment, AttachmentCreateParams, AttachmentUploadDescriptor, FileAttachment, ImageAttachment
+
+CHUNK_SIZE = 1 << 20
+MMAP_WINDOW = 16 << 20
+MAX_ATTACHMENT_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(512 << 20)))
+
+
+class BlobStore:
+    """
+    SHA-256 addressed blobs in a directory.
+
+    Args:
+        directory: Root directory (blobs/ and tmp/ are created inside)
+        grace: Seconds a newly written blob is protected from collection
+        collect_delay: Seconds to wait after a release before sweeping, so
+            a burst of deletes is swept once
+    """
+
+    def __init__(self, directory: str, grace: float = 60.0, collect_delay: float = 1.0):
+        self.directory = Path(directory)
+        self.blobs = self.directory / "blobs"
+        self.tmp = self.directory / "tmp"
+        self.blobs.mkdir(parents=True, exist_ok=True)
+        self.tmp.mkdir(parents=True, exist_ok=True)
+        self.grace = grace
+        self.collect_delay = collect_delay
+        self._referenced: Callable[[], Set[str]] = set
+        self._released: Set[str] = set()
+        self._lock = threading.Lock()
+        self._collector: Optional[asyncio.Task] = None
+
+    def track(self, referenced: Callable[[], Set[str]]) -> None:
+        """Register the function listing digests that attachments still refer to."""
+        self._referenced = referenced
+
+    def path(self, digest: str) -> Path:
+        return self.blobs / digest[:2] / digest[2:]
+
+    def exists(self, digest: str) -> bool:
+        return self.path(digest).is_file()
+
+    async def write(self, chunks: AsyncIterator[bytes], max_bytes: Optional[int] = None) -> Tuple[str, int]:
+        """
+        Store a stream of bytes.
+
+        Chunks are gathered into CHUNK_SIZE writes, hashed and written in a
+        worker thread, so the event loop never waits on the disk.
+
+        Args:
+            chunks: Async iterator of byte chunks
+            max_bytes: Reject streams larger than this
+
+        Returns:
+            (sha256 hex digest, size in bytes)
+
+        Raises:
+            ValueError: If the stream exceeds max_bytes
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp)
+        hasher = hashlib.sha256()
+        size = 0
+        pending, buffered = [], 0
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise ValueError(f"Attachment exceeds {max_bytes} bytes")
+                pending.append(chunk)
+                buffered += len(chunk)
+                if buffered >= CHUNK_SIZE:
+                    await asyncio.to_thread(self._write_chunk, fd, hasher, b"".join(pending))
+                    pending, buffered = [], 0
+            if pending:
+                await asyncio.to_thread(self._write_chunk, fd, hasher, b"".join(pending))
+            os.close(fd)
+            fd = None
+            digest = hasher.hexdigest()
+            await asyncio.to_thread(self._commit, tmp_path, digest)
+            return digest, size
+        except BaseException:
+            if fd is not None:
+                os.close(fd)
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def _write_chunk(fd: int, hasher, data: bytes) -> None:
+        hasher.update(data)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+
+    def _commit(self, tmp_path: str, digest: str) -> None:
+        target = self.path(digest)
+        if target.exists():
+            # Duplicate content: keep the existing blob, restart its grace period
+            os.unlink(tmp_path)
+            os.utime(target)
+            return
+        target.parent.mkdir(exist_ok=True)
+        os.replace(tmp_path, target)
+
+    def iter_chunks(self, digest: str, start: int = 0, end: Optional[int] = None,
+                    chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Read bytes [start, end) of a blob in chunks.
+
+        The file is mapped one MMAP_WINDOW at a time, so only a window's worth
+        of pages is ever resident.
+
+        Raises:
+            FileNotFoundError: If the blob does not exist
+        """
+        with open(self.path(digest), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            end = size if end is None else min(end, size)
+            offset = start
+            while offset < end:
+                base = offset - offset % mmap.ALLOCATIONGRANULARITY
+                length = min(MMAP_WINDOW, end - base)
+                with mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ, offset=base) as window:
+                    while offset < base + length:
+                        stop = min(offset + chunk_size, base + length)
+                        yield window[offset - base:stop - base]
+                        offset = stop
+
+    def release(self, digest: Optional[str]) -> None:
+        """Mark a digest as possibly unreferenced and schedule a background sweep."""
+        if not digest:
+            return
+        with self._lock:
+            self._released.add(digest)
+        if self._collector is None or self._collector.done():
+            try:
+                self._collector = asyncio.get_running_loop().create_task(self._collect_later())
+            except RuntimeError:
+                pass  # no event loop: swept by the next release or collect()
+
+    async def _collect_later(self) -> None:
+        while self._released:
+            await asyncio.sleep(self.collect_delay)
+            await asyncio.to_thread(self.collect_released)
+            if self._released:
+                await asyncio.sleep(self.grace)
+
+    def collect_released(self) -> int:
+        """Sweep released digests; returns the number of blobs removed."""
+        with self._lock:
+            candidates, self._released = self._released, set()
+        return self.collect(candidates)
+
+    def collect(self, candidates: Optional[Set[str]] = None) -> int:
+        """
+        Remove blobs no attachment refers to.
+
+        Args:
+            candidates: Digests to check, or None to sweep every blob
+
+        Returns:
+            Number of blobs removed. Candidates still within their grace
+            period are kept and released again.
+        """
+        if candidates is None:
+            candidates = {p.parent.name + p.name for p in self.blobs.glob("??/*")}
+        if not candidates:
+            return 0
+        referenced = self._referenced()
+        cutoff = time.time() - self.grace
+        removed = 0
+        for digest in candidates - referenced:
+            path = self.path(digest)
+            try:
+                if path.stat().st_mtime > cutoff:
+                    with self._lock:
+                        self._released.add(digest)
+                    continue
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+        if removed:
+            print(f"[DEBUG] Collected {removed} orphaned attachment blobs")
+        return removed
+
+    def stats(self) -> dict:
+        blobs = [p.stat().st_size for p in self.blobs.glob("??/*")]
+        return {"blobs": len(blobs), "bytes": sum(blobs), "released": len(self._released)}
+
+
+class DiskAttachmentStore(AttachmentStore):
+    """
+    ChatKit attachment store with two-phase upload to /api/attachments/{id}.
+
+    create_attachment returns metadata with an upload URL; the client sends
+    the bytes there and main.py streams them into the blob store. The blob
+    is released when the chat store drops the attachment's metadata.
+
+    Args:
+        base_url: Public base URL of this server, for upload and preview URLs
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+
+    def generate_attachment_id(self, mime_type: str, context: dict) -> str:
+        """Unguessable IDs, since the download URL needs no identity headers."""
+        return f"atc_{secrets.token_hex(16)}"
+
+    def url(self, attachment_id: str) -> str:
+        return f"{self.base_url}/api/attachments/{attachment_id}"
+
+    async def create_attachment(self, input: AttachmentCreateParams, context: dict) -> Attachment:
+        """Create attachment metadata with upload instructions."""
+        attachment_id = self.generate_attachment_id(input.mime_type, context)
+        fields = {
+            "id": attachment_id,
+            "name": input.name,
+            "mime_type": input.mime_type,
+            "upload_descriptor": AttachmentUploadDescriptor(url=self.url(attachment_id) + "/upload", method="POST"),
+            "metadata": {"declared_size": input.size},
+        }
+        if input.mime_type.startswith("image/"):
+            return ImageAttachment(**fields, preview_url=self.url(attachment_id))
+        return FileAttachment(**fields)
+
+    async def delete_attachment(self, attachment_id: str, context: dict) -> None:
+        """Nothing to do here: the chat store releases the blob with the metadata."""
+
+
+def attachment_digest(attachment: Attachment) -> Optional[str]:
+    """SHA-256 of an uploaded attachment's content, or None before upload."""
+    return (attachment.metadata or {}).get("sha256")
+
+
+def create_blob_store() -> BlobStore:
+    """Blob store in ATTACHMENT_DIR, or a temporary directory."""
+    directory = os.getenv("ATTACHMENT_DIR")
+    if not directory:
+        directory = tempfile.mkdtemp(prefix="incident-attachments-")
+        atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    return BlobStore(directory)
+
+
+# Global attachment store instances
+attachment_blobs = create_blob_store()
+attachment_store = DiskAttachmentStore(os.getenv("ATTACHMENT_BASE_URL", "http://localhost:8000"))
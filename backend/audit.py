@@ -0,0 +1,88 @@
+"""
+Audit trail of mutating tool calls.
+
+`requires_permission` records every call of a tool guarded by one of
+AUDITED_PERMISSIONS (who, which tool, arguments, outcome), including denied
+attempts. Entries go to an append-only journal (see journal.py) with group
+commit, so auditing adds no disk wait to the tool call, and are indexed by
+incident for `view_audit_log`.
+
+Set AUDIT_LOG_DIR to keep the trail across restarts; without it entries go
+to a temporary directory, mirroring the in-memory incident store.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from journal import Journal
+from models import UserContext
+
+AUDITED_PERMISSIONS = {
+    "restart_service",
+    "set_incident_priority",
+    "allocate_resources",
+    "approve_emergency_spending",
+    "notify_customers",
+    "create_incident",
+}
+
+MAX_AUDIT_RESULTS = 500
+
+
+class AuditLog:
+    """Audit entries in a journal keyed by incident ID."""
+
+    def __init__(self, journal: Journal):
+        self.journal = journal
+
+    def record(self, user_context: UserContext, tool: str, permission: str, arguments: Dict[str, Any],
+               outcome: str, incident_id: Optional[str] = None, error: Optional[str] = None) -> int:
+        """
+        Append an entry; returns its sequence number without waiting for disk.
+
+        Args:
+            user_context: Caller identity
+            tool: Tool name
+            permission: Permission the tool requires
+            arguments: Tool arguments
+            outcome: "ok", "replayed", "error" or "denied"
+            incident_id: Incident the call concerned, if any
+            error: Error message for failed or denied calls
+        """
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "incident_id": incident_id,
+            "tool": tool,
+            "permission": permission,
+            "user_id": user_context.user_id,
+            "role": user_context.role.value,
+            "arguments": arguments,
+            "outcome": outcome,
+        }
+        if error:
+            entry["error"] = error
+        return self.journal.append(entry)
+
+    def history(self, incident_id: Optional[str] = None, limit: int = 50) -> List[dict]:
+        """Newest entries first, for one incident or across all."""
+        self.journal.flush(timeout=1.0)
+        return self.journal.records(incident_id, max(0, min(limit, MAX_AUDIT_RESULTS)))
+
+    def close(self) -> None:
+        self.journal.close()
+
+
+def create_audit_log() -> AuditLog:
+    """Audit log in AUDIT_LOG_DIR, or a temporary directory."""
+    directory = os.getenv("AUDIT_LOG_DIR")
+    if not directory:
+        directory = tempfile.mkdtemp(prefix="incident-audit-")
+        atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    return AuditLog(Journal(directory, key_field="incident_id"))
+
+
+# Global audit log instance
+audit_log = create_audit_log()
@@ -4,7 +4,9 @@ Identity management and authentication utilities.
 from typing import Optional
 from fastapi import Header, HTTPException
 from models import UserContext, Role, PERMISSIONS, IncidentUserContext
+from audit import AUDITED_PERMISSIONS, audit_log
 import functools
+import inspect
 
 
 class AuthenticationError(Exception):
@@ -58,6 +60,9 @@ def requires_permission(permission: str):
     """
     Decorator to enforce permission checks on tool functions.
 
+    Calls of tools guarded by an audited permission (see audit.py) are
+    recorded in the audit log, including denied attempts.
+
     Usage:
         @requires_permission("restart_service")
         def restart_service_tool(context: IncidentUserContext, service_name: str):
@@ -65,6 +70,21 @@ def requires_permission(permission: str):
             pass
     """
     def decorator(func):
+        audited = permission in AUDITED_PERMISSIONS
+        signature = inspect.signature(func)
+
+        def audit(user_context: UserContext, args, kwargs, outcome, result=None, error=None):
+            arguments = dict(signature.bind_partial(*args, **kwargs).arguments)
+            arguments.pop(next(iter(signature.parameters)), None)  # the context
+            incident_id = arguments.get("incident_id")
+            if incident_id is None and isinstance(result, dict):
+                incident_id = result.get("incident_id")
+            if outcome == "ok" and isinstance(result, dict) and "error" in result:
+                outcome, error = "error", result["error"]
+            elif outcome == "ok" and isinstance(result, dict) and result.get("idempotent_replay"):
+                outcome = "replayed"
+            audit_log.record(user_context, func.__name__, permission, arguments, outcome, incident_id, error)
+
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
             # First argument should be UserContext
@@ -77,12 +97,22 @@ def requires_permission(permission: str):
             else:
                 raise AuthenticationError("UserContext not provided to tool function")
 
-            if permission not in incident_context.user_context.permissions:
-                raise AuthenticationError(
-                    f"Permission denied: {incident_context.user_context.display_name} lacks '{permission}' permission"
-                )
-
-            return await func(*args, **kwargs)
+            user_context = incident_context.user_context
+            if permission not in user_context.permissions:
+                message = f"Permission denied: {user_context.display_name} lacks '{permission}' permission"
+                if audited:
+                    audit(user_context, args, kwargs, "denied", error=message)
+                raise AuthenticationError(message)
+
+            if not audited:
+                return await func(*args, **kwargs)
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                audit(user_context, args, kwargs, "error", error=str(e))
+                raise
+            audit(user_context, args, kwargs, "ok", result)
+            return result
 
         # # Preserve function metadata
         # wrapper.__name__ = func.__name__
@@ -0,0 +1,286 @@
+"""
+Shared state backends for IncidentStore.
+
+The in-memory IncidentStore is the default and keeps state per process. When
+the server runs with several workers, every worker points its IncidentStore at
+a shared backend instead: writes go through the backend, and each worker
+follows the backend's change log to keep its local cache (and change feed)
+coherent with the others. The change log is bounded; a worker that falls
+further behind reloads every incident instead.
+"""
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import replace
+from typing import Callable, List, Optional, Tuple
+
+from models import Incident, IncidentVersionConflict, incident_number
+
+
+class IncidentBackend(ABC):
+    """
+    Interface for a shared incident backend.
+
+    Implementations must assign change sequence numbers in a single global
+    order so that every worker replays changes identically.
+    """
+
+    @abstractmethod
+    def insert_if_missing(self, incident: Incident) -> None:
+        """Insert an incident unless one with the same ID already exists."""
+
+    @abstractmethod
+    def create_incident(self, build: Callable[[str], Incident]) -> Incident:
+        """Allocate the next incident ID, build the incident and store it."""
+
+    @abstractmethod
+    def update_incident(self, incident_id: str, changes: dict,
+                        expected_version: Optional[int] = None) -> bool:
+        """
+        Apply serialized field changes to an incident and bump its version,
+        atomically. False if not found; raises IncidentVersionConflict if
+        expected_version is given and the incident is at another version.
+        """
+
+    @abstractmethod
+    def insert_incidents(self, incidents: List[Incident]) -> List[str]:
+        """
+        Insert a batch of incidents in one transaction, allocating IDs for
+        incidents without one and skipping IDs that already exist. Records a
+        single "bulk" change. Returns the inserted IDs.
+        """
+
+    @abstractmethod
+    def load_incidents(self) -> List[Incident]:
+        """Load every incident."""
+
+    @abstractmethod
+    def get_incidents(self, incident_ids: List[str]) -> List[Incident]:
+        """Load the given incidents."""
+
+    @abstractmethod
+    def latest_seq(self) -> int:
+        """Sequence number of the most recent change."""
+
+    @abstractmethod
+    def changes_since(self, seq: int) -> Optional[List[Tuple[int, str, str, dict, Optional[Incident]]]]:
+        """
+        Get changes after `seq` in order, as
+        (seq, incident_id, op, changes, current incident) tuples.
+        The incident is None for "bulk" changes. Returns None if some of
+        those changes were compacted away; the caller must reload.
+        """
+
+    @abstractmethod
+    def has_external_changes(self) -> bool:
+        """Cheap check for whether another process committed since last asked."""
+
+
+class SQLiteIncidentBackend(IncidentBackend):
+    """
+    SQLite backend in WAL mode.
+
+    WAL lets every worker read concurrently while one writes, and
+    `PRAGMA data_version` gives a cheap cross-process change notification.
+    Only the newest `max_changes` changes are kept, like IncidentChangeFeed.
+    """
+
+    def __init__(self, path: str, max_changes: int = 10000):
+        self.path = path
+        self.max_changes = max(1, max_changes)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS incidents (
+                incident_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS incident_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                incident_id TEXT NOT NULL,
+                op TEXT NOT NULL,
+                changes TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO counters (name, value) VALUES ('incident_id', 0);
+        """)
+        self._data_version = self._read_data_version()
+
+    def _read_data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _write(self, fn):
+        """Run `fn(conn)` inside an immediate (write-locked) transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def _append_change(self, conn: sqlite3.Connection, incident_id: str, op: str, changes: dict) -> None:
+        cursor = conn.execute(
+            "INSERT INTO incident_changes (incident_id, op, changes) VALUES (?, ?, ?)",
+            (incident_id, op, json.dumps(changes)),
+        )
+        # AUTOINCREMENT never reuses a seq, so compacting cannot confuse a cursor
+        conn.execute("DELETE FROM incident_changes WHERE seq <= ?",
+                     (cursor.lastrowid - self.max_changes,))
+
+    def insert_if_missing(self, incident: Incident) -> None:
+        def insert(conn):
+            data = incident.to_dict()
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO incidents (incident_id, data) VALUES (?, ?)",
+                (incident.incident_id, json.dumps(data)),
+            )
+            if cursor.rowcount:
+                conn.execute(
+                    "UPDATE counters SET value = MAX(value, 1) WHERE name = 'incident_id'"
+                )
+                self._append_change(conn, incident.incident_id, "created", data)
+        self._write(insert)
+
+    def create_incident(self, build: Callable[[str], Incident]) -> Incident:
+        def create(conn):
+            conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'incident_id'")
+            number = conn.execute(
+                "SELECT value FROM counters WHERE name = 'incident_id'"
+            ).fetchone()[0]
+            incident = build(f"INC-{number:03d}")
+            data = incident.to_dict()
+            conn.execute(
+                "INSERT INTO incidents (incident_id, data) VALUES (?, ?)",
+                (incident.incident_id, json.dumps(data)),
+            )
+            self._append_change(conn, incident.incident_id, "created", data)
+            return incident
+        return self._write(create)
+
+    def update_incident(self, incident_id: str, changes: dict,
+                        expected_version: Optional[int] = None) -> bool:
+        def update(conn):
+            row = conn.execute(
+                "SELECT data FROM incidents WHERE incident_id = ?", (incident_id,)
+            ).fetchone()
+            if not row:
+                return False
+            data = json.loads(row[0])
+            version = data.get("version", 1)
+            if expected_version is not None and version != expected_version:
+                raise IncidentVersionConflict(incident_id, expected_version, version)
+            applied = {**changes, "version": version + 1}
+            data.update(applied)
+            conn.execute(
+                "UPDATE incidents SET data = ? WHERE incident_id = ?",
+                (json.dumps(data), incident_id),
+            )
+            self._append_change(conn, incident_id, "updated", applied)
+            return True
+        return self._write(update)
+
+    def insert_incidents(self, incidents: List[Incident]) -> List[str]:
+        def insert(conn):
+            number = conn.execute(
+                "SELECT value FROM counters WHERE name = 'incident_id'"
+            ).fetchone()[0]
+            rows = []
+            for incident in incidents:
+                if not incident.incident_id:
+                    number += 1
+                    incident = replace(incident, incident_id=f"INC-{number:03d}")
+                else:
+                    number = max(number, incident_number(incident.incident_id))
+                rows.append((incident.incident_id, json.dumps(incident.to_dict())))
+            inserted = []
+            for incident_id, data in rows:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO incidents (incident_id, data) VALUES (?, ?)",
+                    (incident_id, data),
+                )
+                if cursor.rowcount:
+                    inserted.append(incident_id)
+            conn.execute("UPDATE counters SET value = ? WHERE name = 'incident_id'", (number,))
+            if inserted:
+                self._append_change(conn, "*", "bulk", {
+                    "count": len(inserted),
+                    "incident_ids": inserted,
+                })
+            return inserted
+        return self._write(insert)
+
+    def get_incidents(self, incident_ids: List[str]) -> List[Incident]:
+        rows = []
+        with self._lock:
+            for start in range(0, len(incident_ids), 500):
+                chunk = incident_ids[start:start + 500]
+                rows.extend(self._conn.execute(
+                    f"SELECT data FROM incidents WHERE incident_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall())
+        return [Incident.from_dict(json.loads(data)) for (data,) in rows]
+
+    def load_incidents(self) -> List[Incident]:
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM incidents").fetchall()
+        return [Incident.from_dict(json.loads(data)) for (data,) in rows]
+
+    def latest_seq(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(seq) FROM incident_changes").fetchone()
+        return row[0] or 0
+
+    def changes_since(self, seq: int) -> Optional[List[Tuple[int, str, str, dict, Optional[Incident]]]]:
+        with self._lock:
+            # One read transaction, so no compaction lands between the two queries
+            self._conn.execute("BEGIN")
+            try:
+                oldest = self._conn.execute("SELECT MIN(seq) FROM incident_changes").fetchone()[0]
+                if oldest is not None and seq + 1 < oldest:
+                    return None
+                rows = self._conn.execute(
+                    "SELECT c.seq, c.incident_id, c.op, c.changes, i.data "
+                    "FROM incident_changes c LEFT JOIN incidents i ON i.incident_id = c.incident_id "
+                    "WHERE c.seq > ? ORDER BY c.seq",
+                    (seq,),
+                ).fetchall()
+            finally:
+                self._conn.execute("COMMIT")
+        return [
+            (row_seq, incident_id, op, json.loads(changes),
+             Incident.from_dict(json.loads(data)) if data else None)
+            for row_seq, incident_id, op, changes, data in rows
+        ]
+
+    def has_external_changes(self) -> bool:
+        with self._lock:
+            version = self._read_data_version()
+        changed = version != self._data_version
+        self._data_version = version
+        return changed
+
+
+def create_incident_backend() -> Optional[IncidentBackend]:
+    """
+    Create the incident backend configured by STORE_BACKEND.
+
+    Returns None for the default per-process in-memory store.
+    """
+    backend = os.getenv("STORE_BACKEND", "memory").lower()
+    if backend == "memory":
+        return None
+    if backend == "sqlite":
+        return SQLiteIncidentBackend(os.getenv("STORE_DB_PATH", "incident_management.db"),
+                                     max_changes=int(os.getenv("STORE_MAX_CHANGES", "10000")))
+    raise ValueError(f"Unknown STORE_BACKEND: {backend}. Must be one of: memory, sqlite")
@@ -0,0 +1,145 @@
+"""
+Versioned change feed for incidents.
+
+Every mutation in IncidentStore is published here with a monotonic sequence
+number and the fields that changed. Subscribers (the SSE endpoint) receive
+deltas in-process instead of polling /api/incidents.
+"""
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from models import Role, ROLE_INCIDENT_FIELDS
+
+
+@dataclass
+class IncidentChange:
+    """A single change to an incident."""
+    seq: int
+    incident_id: str
+    op: str  # "created", "updated" or "bulk"
+    changes: Dict[str, Any]
+    timestamp: datetime = field(default_factory=datetime.now)
+
+    def to_dict(self) -> dict:
+        """Convert to dictionary."""
+        return {
+            "seq": self.seq,
+            "incident_id": self.incident_id,
+            "op": self.op,
+            "changes": self.changes,
+            "timestamp": self.timestamp.isoformat(),
+        }
+
+    def get_filtered_view(self, role: Role) -> Optional[dict]:
+        """
+        Get role-filtered view of the change.
+
+        Returns None when none of the changed fields are visible to the role,
+        so the subscriber is not woken up for changes it cannot see.
+        """
+        if self.op == "bulk":
+            # Only carries incident IDs; clients reload a snapshot
+            return self.to_dict()
+        visible = ROLE_INCIDENT_FIELDS[role]
+        changes = {k: v for k, v in self.changes.items() if k in visible}
+        if not changes and self.op != "created":
+            return None
+        data = self.to_dict()
+        data["changes"] = changes
+        return data
+
+
+class Subscription:
+    """
+    A subscriber's queue of changes.
+
+    The queue is bounded; a subscriber that falls too far behind is marked
+    as lagged and should reconnect from a snapshot.
+    """
+
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.lagged = False
+
+    def push(self, change: IncidentChange) -> None:
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(change)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+    async def get(self) -> IncidentChange:
+        return await self.queue.get()
+
+
+class IncidentChangeFeed:
+    """
+    In-process pub/sub over a bounded, versioned change log.
+
+    The log keeps the most recent `max_log_size` changes so clients can resume
+    from a sequence number; older history is compacted away and clients that
+    ask for it must start again from a snapshot.
+    """
+
+    def __init__(self, max_log_size: int = 10000, subscriber_queue_size: int = 1000):
+        self.seq = 0
+        self.log: Deque[IncidentChange] = deque(maxlen=max_log_size)
+        self.subscribers: Set[Subscription] = set()
+        self.subscriber_queue_size = subscriber_queue_size
+
+    def publish(self, incident_id: str, op: str, changes: Dict[str, Any],
+                seq: Optional[int] = None) -> IncidentChange:
+        """Append a change to the log and fan it out to subscribers."""
+        self.seq = seq if seq is not None else self.seq + 1
+        change = IncidentChange(seq=self.seq, incident_id=incident_id, op=op, changes=changes)
+        self.log.append(change)
+        for subscription in list(self.subscribers):
+            subscription.push(change)
+        return change
+
+    @property
+    def oldest_seq(self) -> int:
+        """Oldest sequence number still held in the log."""
+        return self.log[0].seq if self.log else self.seq + 1
+
+    def changes_since(self, since: int) -> Optional[List[IncidentChange]]:
+        """
+        Get logged changes after `since`.
+
+        Returns None if the log no longer reaches back that far, or if
+        `since` is ahead of the feed (e.g. a client resuming after the
+        in-memory store restarted and its sequence began again at 0).
+        """
+        if since == self.seq:
+            return []
+        if since > self.seq:
+            return None
+        if since + 1 < self.oldest_seq:
+            return None
+        return [change for change in self.log if change.seq > since]
+
+    def reset(self, seq: int) -> None:
+        """
+        Jump to `seq` without the changes in between.
+
+        Clients resuming from before it reload a snapshot, and current
+        subscribers are marked as lagged so they do the same.
+        """
+        self.seq = seq
+        self.log.clear()
+        for subscription in list(self.subscribers):
+            subscription.lagged = True
+
+    def subscribe(self) -> Subscription:
+        """Register a new subscriber."""
+        subscription = Subscription(self.subscriber_queue_size)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscriber."""
+        self.subscribers.discard(subscription)
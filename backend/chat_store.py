@@ -0,0 +1,631 @@
+"""
+Data storage for ChatKit threads, messages and attachments.
+"""
+import atexit
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+from urllib.parse import quote
+from chatkit.server import Store, Thread, ThreadItem
+from chatkit.store import Attachment, NotFoundError
+from chatkit.types import Page, ThreadMetadata
+from pydantic import TypeAdapter
+from attachments import attachment_blobs, attachment_digest
+from codec import (
+    LazyItem, decode_item, decode_items, decode_thread, encode_item, encode_items, encode_thread, from_envelope,
+    thread_with_items,
+)
+from persistence import Persistence, create_persistence
+
+_attachment_adapter = TypeAdapter(Attachment)
+
+
+class ThreadItemCache:
+    """
+    Thread items in a bounded in-memory LRU, with cold threads on disk.
+
+    Recently used threads stay in memory until the cache holds more than
+    `max_items` items or `max_bytes` of serialized items; the least recently
+    used threads are then written to `directory` as zlib-compressed item
+    envelopes (see codec.py) and dropped from memory. get() faults a cold
+    thread back in without validating its items; only the items a caller
+    actually reads are validated. Threads that were not modified since they
+    were last read from disk are dropped without rewriting.
+
+    Args:
+        directory: Directory for cold threads
+        max_items: Item budget of the in-memory tier
+        max_bytes: Serialized-size budget of the in-memory tier
+    """
+
+    def __init__(self, directory: str, max_items: int = 20_000, max_bytes: int = 64 << 20):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._hot: "OrderedDict[str, List[LazyItem]]" = OrderedDict()
+        self._bytes: Dict[str, int] = {}
+        self._dirty: set = set()
+        self._cold: Dict[str, int] = {}
+        self.hot_items = 0
+        self.hot_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.cold_writes = 0
+
+    def _path(self, thread_id: str) -> Path:
+        return self.directory / (quote(thread_id, safe="") + ".items.z")
+
+    def __contains__(self, thread_id: str) -> bool:
+        return thread_id in self._hot or thread_id in self._cold
+
+    def get(self, thread_id: str, create: bool = False) -> Optional[List[LazyItem]]:
+        """
+        Item records of a thread, most recently used now.
+
+        The returned list is the cached one; after changing it call
+        changed() so the cache can account for the new size.
+        """
+        items = self._hot.get(thread_id)
+        if items is not None:
+            self.hits += 1
+            self._hot.move_to_end(thread_id)
+            return items
+        if thread_id in self._cold:
+            self.misses += 1
+            with open(self._path(thread_id), "rb") as f:
+                items = decode_items(zlib.decompress(f.read()))
+            size = sum(item.size for item in items)
+        elif create:
+            items, size = [], 0
+            self._dirty.add(thread_id)
+        else:
+            return None
+        self._hot[thread_id] = items
+        self._bytes[thread_id] = size
+        self.hot_items += len(items)
+        self.hot_bytes += size
+        self._evict()
+        return items
+
+    def changed(self, thread_id: str, items_delta: int, bytes_delta: int) -> None:
+        """Record a change to a cached thread's items."""
+        self._dirty.add(thread_id)
+        self._bytes[thread_id] += bytes_delta
+        self.hot_items += items_delta
+        self.hot_bytes += bytes_delta
+        self._evict()
+
+    def _evict(self) -> None:
+        # The most recently used thread stays even if it alone is over budget
+        while len(self._hot) > 1 and (self.hot_items > self.max_items or self.hot_bytes > self.max_bytes):
+            thread_id, items = self._hot.popitem(last=False)
+            if thread_id in self._dirty:
+                self._write(thread_id, items)
+            size = self._bytes.pop(thread_id)
+            self.hot_items -= len(items)
+            self.hot_bytes -= size
+            self.evictions += 1
+
+    def _write(self, thread_id: str, items: List[LazyItem]) -> None:
+        self._write_cold(thread_id, zlib.compress(encode_items(items), 1))
+        self._dirty.discard(thread_id)
+        self.cold_writes += 1
+
+    def _write_cold(self, thread_id: str, data: bytes) -> None:
+        path = self._path(thread_id)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._cold[thread_id] = len(data)
+
+    def capture(self) -> tuple:
+        """
+        For a snapshot: copies of the hot threads' item lists (records are
+        never modified, only replaced) and the files of cold-only threads.
+        """
+        hot = {thread_id: list(items) for thread_id, items in self._hot.items()}
+        cold = {thread_id: self._path(thread_id) for thread_id in self._cold if thread_id not in self._hot}
+        return hot, cold
+
+    def restore(self, thread_id: str, items: List[LazyItem]) -> None:
+        """Replace a thread's items (used when recovering from a snapshot)."""
+        self.delete(thread_id)
+        self.get(thread_id, create=True).extend(items)
+        self.changed(thread_id, len(items), sum(item.size for item in items))
+
+    def restore_cold(self, thread_id: str, data: bytes) -> None:
+        """Store a cold thread file's content as it was captured."""
+        self.delete(thread_id)
+        self._write_cold(thread_id, data)
+
+    def delete(self, thread_id: str) -> None:
+        items = self._hot.pop(thread_id, None)
+        if items is not None:
+            self.hot_items -= len(items)
+            self.hot_bytes -= self._bytes.pop(thread_id)
+        self._dirty.discard(thread_id)
+        if self._cold.pop(thread_id, None) is not None:
+            self._path(thread_id).unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hot_threads": len(self._hot),
+            "hot_items": self.hot_items,
+            "hot_bytes": self.hot_bytes,
+            "cold_threads": len(self._cold),
+            "cold_bytes": sum(self._cold.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "cold_writes": self.cold_writes,
+        }
+
+
+def create_thread_item_cache() -> ThreadItemCache:
+    """Thread item cache sized by CHAT_CACHE_MAX_ITEMS/BYTES, cold threads in CHAT_COLD_DIR."""
+    directory = os.getenv("CHAT_COLD_DIR")
+    if not directory:
+        directory = tempfile.mkdtemp(prefix="incident-threads-")
+        atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    return ThreadItemCache(
+        directory,
+        max_items=int(os.getenv("CHAT_CACHE_MAX_ITEMS", "20000")),
+        max_bytes=int(os.getenv("CHAT_CACHE_MAX_BYTES", str(64 << 20))),
+    )
+
+
+class SimpleStore(Store):
+    """
+    Simple in-memory implementation of ChatKit Store interface.
+
+    Thread items are kept in a bounded LRU that spills cold threads to disk
+    (see ThreadItemCache). Only attachment metadata is kept here; content is
+    in the blob store (see attachments.py). With a Persistence (see
+    persistence.py) every change is logged and the store is restored on
+    startup.
+    """
+
+    def __init__(self, thread_items: Optional[ThreadItemCache] = None,
+                 persistence: Optional[Persistence] = None):
+        self.threads: Dict[str, ThreadMetadata] = {}
+        self.thread_items = thread_items or create_thread_item_cache()
+        self.attachments: Dict[str, Attachment] = {}
+        self.persistence = persistence
+        attachment_blobs.track(self.referenced_digests)
+        if persistence:
+            persistence.recover(self._restore, self._replay)
+            persistence.attach(self._capture)
+
+    def _log(self, *record: Any) -> None:
+        if self.persistence:
+            self.persistence.log(list(record))
+
+    def _restore(self, snapshot: dict) -> None:
+        for data in snapshot["threads"]:
+            thread = decode_thread(data)
+            self.threads[thread.id] = thread
+        for thread_id, data in snapshot["cold"].items():
+            self.thread_items.restore_cold(thread_id, data)
+        for thread_id, envelopes in snapshot["items"].items():
+            self.thread_items.restore(thread_id, [from_envelope(envelope) for envelope in envelopes])
+        for data in snapshot["attachments"]:
+            attachment = _attachment_adapter.validate_json(data)
+            self.attachments[attachment.id] = attachment
+
+    def _replay(self, record: list) -> None:
+        op, *args = record
+        if op == "thread":
+            thread = decode_thread(args[0])
+            self.threads[thread.id] = thread
+        elif op == "delete_thread":
+            self.threads.pop(args[0], None)
+            self.thread_items.delete(args[0])
+        elif op == "item":
+            self._upsert_item(args[0], from_envelope(args[1]))
+        elif op == "delete_item":
+            self._remove_item(args[0], args[1])
+        elif op == "attachment":
+            attachment = _attachment_adapter.validate_json(args[0])
+            self.attachments[attachment.id] = attachment
+        elif op == "delete_attachment":
+            self.attachments.pop(args[0], None)
+
+    def _capture(self):
+        # Thread metadata and attachments are replaced rather than modified,
+        # and item lists are copied, so the snapshot sees this moment
+        threads = list(self.threads.values())
+        attachments = list(self.attachments.values())
+        hot, cold = self.thread_items.capture()
+
+        def dump() -> dict:
+            cold_files = {}
+            for thread_id, path in cold.items():
+                try:
+                    cold_files[thread_id] = path.read_bytes()
+                except FileNotFoundError:
+                    pass  # deleted since; the WAL has the delete
+            return {
+                "threads": [encode_thread(thread) for thread in threads],
+                "items": {thread_id: [record.saved_envelope() for record in records]
+                          for thread_id, records in hot.items()},
+                "cold": cold_files,
+                "attachments": [attachment.model_dump_json() for attachment in attachments],
+            }
+        return dump
+
+    async def create_thread(self) -> Thread:
+        """Create a new thread."""
+        thread_id = f"thread_{len(self.threads) + 1}"
+        thread_metadata = ThreadMetadata(
+            id=thread_id,
+            created_at=datetime.now(),
+            metadata={}
+        )
+        self.threads[thread_id] = thread_metadata
+        self.thread_items.get(thread_id, create=True)
+        self._log("thread", encode_thread(thread_metadata))
+        # Return Thread with empty items for API compatibility
+        return thread_with_items(thread_metadata)
+
+    async def get_thread(self, thread_id: str) -> Optional[ThreadMetadata]:
+        """Get thread by ID."""
+        return self.threads.get(thread_id)
+
+    async def update_thread(self, thread_id: str, metadata: dict) -> Thread:
+        """Update thread metadata."""
+        thread = self.threads.get(thread_id)
+        if not thread:
+            raise ValueError(f"Thread {thread_id} not found")
+        thread = self.threads[thread_id] = thread.model_copy(update={"metadata": {**thread.metadata, **metadata}})
+        self._log("thread", encode_thread(thread))
+        # Return Thread with empty items for API compatibility
+        return thread_with_items(thread)
+
+    async def delete_thread(self, thread_id: str, context: Any) -> None:
+        """Delete a thread and its attachments."""
+        if thread_id in self.threads:
+            del self.threads[thread_id]
+        self.thread_items.delete(thread_id)
+        self._log("delete_thread", thread_id)
+        for attachment in [a for a in self.attachments.values() if a.thread_id == thread_id]:
+            await self.delete_attachment(attachment.id, context)
+
+    async def add_thread_item(self, thread_id: str, item: ThreadItem, context: Any) -> None:
+        """Add an item to a thread."""
+        record = LazyItem.from_item(item)
+        self.thread_items.get(thread_id, create=True).append(record)
+        self.thread_items.changed(thread_id, 1, record.size)
+        self._log("item", thread_id, record.saved_envelope())
+
+    async def get_thread_items(self, thread_id: str) -> List[ThreadItem]:
+        """Get all items in a thread, reading it back from disk if it is cold."""
+        return [record.item for record in self.thread_items.get(thread_id) or []]
+
+    async def create_attachment(self, attachment: Attachment) -> Attachment:
+        """Create an attachment."""
+        self.attachments[attachment.id] = attachment
+        self._log("attachment", attachment.model_dump_json())
+        return attachment
+
+    async def get_attachment(self, attachment_id: str) -> Optional[Attachment]:
+        """Get attachment by ID."""
+        return self.attachments.get(attachment_id)
+
+    # Required abstract methods from Store interface
+    async def save_thread(self, thread: ThreadMetadata, context: Any) -> None:
+        """Save a thread (create or update)."""
+        # Store ThreadMetadata directly
+        self.threads[thread.id] = thread
+        if thread.id not in self.thread_items:
+            self.thread_items.get(thread.id, create=True)
+        self._log("thread", encode_thread(thread))
+
+    async def load_thread(self, thread_id: str, context: Any) -> ThreadMetadata:
+        """Load a thread by ID."""
+        thread = self.threads.get(thread_id)
+        if not thread:
+            raise NotFoundError(f"Thread {thread_id} not found")
+        return thread
+
+    async def load_threads(self, limit: int, after: str | None, order: str, context: Any) -> Page[ThreadMetadata]:
+        """Load all threads with cursor-based pagination."""
+        # Get all threads (already ThreadMetadata)
+        threads = list(self.threads.values())
+
+        # Sort by thread ID (most recent threads have higher IDs)
+        threads.sort(key=lambda t: t.id, reverse=(order == "desc"))
+
+        # Apply cursor filter if 'after' is provided
+        if after:
+            if order == "desc":
+                threads = [t for t in threads if t.id < after]
+            else:
+                threads = [t for t in threads if t.id > after]
+
+        # Take limit + 1 to check if there are more pages
+        result_threads = threads[:limit]
+        has_more = len(threads) > limit
+
+        # Determine next cursor
+        next_cursor = result_threads[-1].id if has_more and result_threads else None
+
+        return Page(data=result_threads, has_more=has_more, after=next_cursor)
+
+    async def save_item(self, thread_id: str, item: ThreadItem, context: Any) -> None:
+        """Save a thread item (create or update)."""
+        record = LazyItem.from_item(item)
+        self._upsert_item(thread_id, record)
+        self._log("item", thread_id, record.saved_envelope())
+
+    def _upsert_item(self, thread_id: str, record: LazyItem) -> None:
+        records = self.thread_items.get(thread_id, create=True)
+        for i, existing in enumerate(records):
+            if existing.id == record.id:
+                records[i] = record
+                self.thread_items.changed(thread_id, 0, record.size - existing.size)
+                return
+        records.append(record)
+        self.thread_items.changed(thread_id, 1, record.size)
+
+    async def load_item(self, thread_id: str, item_id: str, context: Any) -> ThreadItem:
+        """Load a specific thread item by ID."""
+        for record in self.thread_items.get(thread_id) or []:
+            if record.id == item_id:
+                return record.item
+        raise NotFoundError(f"Thread item {item_id} not found in thread {thread_id}")
+
+    async def load_thread_items(self, thread_id: str, after: str | None, limit: int, order: str, context: Any) -> Page[ThreadItem]:
+        """Load thread items with cursor-based pagination."""
+        # Get all item records for the thread; only the page is validated
+        items = self.thread_items.get(thread_id) or []
+
+        # Sort by item ID
+        items_sorted = sorted(items, key=lambda item: item.id, reverse=(order == "desc"))
+
+        # Apply cursor filter if 'after' is provided
+        if after:
+            if order == "desc":
+                items_sorted = [item for item in items_sorted if item.id < after]
+            else:
+                items_sorted = [item for item in items_sorted if item.id > after]
+
+        # Take limit + 1 to check if there are more pages
+        result_items = items_sorted[:limit]
+        has_more = len(items_sorted) > limit
+
+        # Determine next cursor
+        next_cursor = result_items[-1].id if has_more and result_items else None
+
+        return Page(data=[record.item for record in result_items], has_more=has_more, after=next_cursor)
+
+    async def delete_thread_item(self, thread_id: str, item_id: str, context: Any) -> None:
+        """Delete a thread item."""
+        if self._remove_item(thread_id, item_id):
+            self._log("delete_item", thread_id, item_id)
+
+    def _remove_item(self, thread_id: str, item_id: str) -> bool:
+        records = self.thread_items.get(thread_id)
+        if records is None:
+            return False
+        for i, record in enumerate(records):
+            if record.id == item_id:
+                del records[i]
+                self.thread_items.changed(thread_id, -1, -record.size)
+                return True
+        return False
+
+    async def save_attachment(self, attachment: Attachment, context: Any) -> None:
+        """Save an attachment."""
+        await self.create_attachment(attachment)
+
+    async def load_attachment(self, attachment_id: str, context: Any) -> Attachment:
+        """Load an attachment by ID."""
+        attachment = await self.get_attachment(attachment_id)
+        if not attachment:
+            raise NotFoundError(f"Attachment {attachment_id} not found")
+        return attachment
+
+    async def delete_attachment(self, attachment_id: str, context: Any) -> None:
+        """Delete an attachment; its blob is collected if nothing else refers to it."""
+        attachment = self.attachments.pop(attachment_id, None)
+        if attachment:
+            self._log("delete_attachment", attachment_id)
+            attachment_blobs.release(attachment_digest(attachment))
+
+    def referenced_digests(self) -> set:
+        """Digests of uploaded attachment content."""
+        return {digest for digest in map(attachment_digest, list(self.attachments.values())) if digest}
+
+
+class SQLiteChatStore(Store):
+    """
+    ChatKit Store backed by SQLite in WAL mode.
+
+    Used instead of SimpleStore when several workers serve /api/chat, so a
+    thread created on one worker can be continued on another. Threads and
+    items are stored with codec.py; rows from before are JSON text and are
+    still read.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS threads (
+                id TEXT PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                data BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS thread_items (
+                id TEXT NOT NULL,
+                thread_id TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (thread_id, id)
+            );
+            CREATE INDEX IF NOT EXISTS thread_items_by_time
+                ON thread_items (thread_id, created_at, id);
+            CREATE TABLE IF NOT EXISTS attachments (
+                id TEXT PRIMARY KEY,
+                data TEXT NOT NULL
+            );
+        """)
+        self._attachment_adapter = _attachment_adapter
+        attachment_blobs.track(self.referenced_digests)
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _page(rows: list, limit: int, decode) -> Page:
+        data = [decode(row[1]) for row in rows[:limit]]
+        has_more = len(rows) > limit
+        next_cursor = rows[limit - 1][0] if has_more and limit else None
+        return Page(data=data, has_more=has_more, after=next_cursor)
+
+    async def save_thread(self, thread: ThreadMetadata, context: Any) -> None:
+        """Save a thread (create or update)."""
+        self._execute(
+            "INSERT INTO threads (id, created_at, data) VALUES (?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET data = excluded.data",
+            (thread.id, thread.created_at.isoformat(),
+             encode_thread(thread)),
+        )
+
+    async def load_thread(self, thread_id: str, context: Any) -> ThreadMetadata:
+        """Load a thread by ID."""
+        rows = self._execute("SELECT data FROM threads WHERE id = ?", (thread_id,))
+        if not rows:
+            raise NotFoundError(f"Thread {thread_id} not found")
+        return decode_thread(rows[0][0])
+
+    async def load_threads(self, limit: int, after: str | None, order: str, context: Any) -> Page[ThreadMetadata]:
+        """Load threads with cursor-based pagination, ordered by creation time."""
+        direction, compare = ("DESC", "<") if order == "desc" else ("ASC", ">")
+        if after:
+            rows = self._execute(
+                f"SELECT id, data FROM threads WHERE (created_at, id) {compare} "
+                f"(SELECT created_at, id FROM threads WHERE id = ?) "
+                f"ORDER BY created_at {direction}, id {direction} LIMIT ?",
+                (after, limit + 1),
+            )
+        else:
+            rows = self._execute(
+                f"SELECT id, data FROM threads ORDER BY created_at {direction}, id {direction} LIMIT ?",
+                (limit + 1,),
+            )
+        return self._page(rows, limit, decode_thread)
+
+    async def delete_thread(self, thread_id: str, context: Any) -> None:
+        """Delete a thread, its items and its attachments."""
+        self._execute("DELETE FROM thread_items WHERE thread_id = ?", (thread_id,))
+        self._execute("DELETE FROM threads WHERE id = ?", (thread_id,))
+        rows = self._execute(
+            "DELETE FROM attachments WHERE json_extract(data, '$.thread_id') = ? "
+            "RETURNING json_extract(data, '$.metadata.sha256')",
+            (thread_id,),
+        )
+        for (digest,) in rows:
+            attachment_blobs.release(digest)
+
+    async def add_thread_item(self, thread_id: str, item: ThreadItem, context: Any) -> None:
+        """Add an item to a thread."""
+        await self.save_item(thread_id, item, context)
+
+    async def save_item(self, thread_id: str, item: ThreadItem, context: Any) -> None:
+        """Save a thread item (create or update)."""
+        self._execute(
+            "INSERT INTO thread_items (id, thread_id, created_at, data) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (thread_id, id) DO UPDATE SET data = excluded.data",
+            (item.id, thread_id, item.created_at.isoformat(), encode_item(item)),
+        )
+
+    async def load_item(self, thread_id: str, item_id: str, context: Any) -> ThreadItem:
+        """Load a specific thread item by ID."""
+        rows = self._execute(
+            "SELECT data FROM thread_items WHERE thread_id = ? AND id = ?", (thread_id, item_id)
+        )
+        if not rows:
+            raise NotFoundError(f"Thread item {item_id} not found in thread {thread_id}")
+        return decode_item(rows[0][0])
+
+    async def load_thread_items(self, thread_id: str, after: str | None, limit: int, order: str, context: Any) -> Page[ThreadItem]:
+        """Load thread items with cursor-based pagination, ordered by creation time."""
+        direction, compare = ("DESC", "<") if order == "desc" else ("ASC", ">")
+        if after:
+            rows = self._execute(
+                f"SELECT id, data FROM thread_items WHERE thread_id = ? AND (created_at, id) {compare} "
+                f"(SELECT created_at, id FROM thread_items WHERE thread_id = ? AND id = ?) "
+                f"ORDER BY created_at {direction}, id {direction} LIMIT ?",
+                (thread_id, thread_id, after, limit + 1),
+            )
+        else:
+            rows = self._execute(
+                f"SELECT id, data FROM thread_items WHERE thread_id = ? "
+                f"ORDER BY created_at {direction}, id {direction} LIMIT ?",
+                (thread_id, limit + 1),
+            )
+        return self._page(rows, limit, decode_item)
+
+    async def delete_thread_item(self, thread_id: str, item_id: str, context: Any) -> None:
+        """Delete a thread item."""
+        self._execute("DELETE FROM thread_items WHERE thread_id = ? AND id = ?", (thread_id, item_id))
+
+    async def save_attachment(self, attachment: Attachment, context: Any) -> None:
+        """Save an attachment."""
+        self._execute(
+            "INSERT INTO attachments (id, data) VALUES (?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET data = excluded.data",
+            (attachment.id, attachment.model_dump_json()),
+        )
+
+    async def load_attachment(self, attachment_id: str, context: Any) -> Attachment:
+        """Load an attachment by ID."""
+        rows = self._execute("SELECT data FROM attachments WHERE id = ?", (attachment_id,))
+        if not rows:
+            raise NotFoundError(f"Attachment {attachment_id} not found")
+        return self._attachment_adapter.validate_json(rows[0][0])
+
+    async def delete_attachment(self, attachment_id: str, context: Any) -> None:
+        """Delete an attachment; its blob is collected if nothing else refers to it."""
+        rows = self._execute(
+            "DELETE FROM attachments WHERE id = ? RETURNING json_extract(data, '$.metadata.sha256')",
+            (attachment_id,),
+        )
+        for (digest,) in rows:
+            attachment_blobs.release(digest)
+
+    def referenced_digests(self) -> set:
+        """Digests of uploaded attachment content."""
+        rows = self._execute(
+            "SELECT DISTINCT json_extract(data, '$.metadata.sha256') FROM attachments "
+            "WHERE json_extract(data, '$.metadata.sha256') IS NOT NULL"
+        )
+        return {digest for (digest,) in rows}
+
+
+def create_chat_store() -> Store:
+    """Create the chat store configured by STORE_BACKEND."""
+    if os.getenv("STORE_BACKEND", "memory").lower() == "sqlite":
+        return SQLiteChatStore(os.getenv("STORE_DB_PATH", "incident_management.db"))
+    return SimpleStore(persistence=create_persistence("chat"))
+
+
+# Global store instance
+chat_store = create_chat_store()
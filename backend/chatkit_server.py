@@ -2,6 +2,7 @@
 ChatKit Server implementation with identity propagation.
 """
 import json
+from dataclasses import replace
 from typing import AsyncIterator, Dict, Any
 from datetime import datetime
 from chatkit.server import ChatKitServer, ThreadStreamEvent
@@ -16,10 +17,12 @@ from chatkit.types import (
     ErrorEvent,
 )
 from chatkit.store import default_generate_id
-from agent import create_incident_agent
+from agent import get_incident_agent
+from routing import model_router, recent_turns
 from models import IncidentUserContext
 from agents import Runner, ItemHelpers
-from store import chat_store
+from chat_store import chat_store
+from attachments import attachment_store
 
 
 class IncidentChatKitServer(ChatKitServer):
@@ -35,7 +38,7 @@ class IncidentChatKitServer(ChatKitServer):
         Args:
             api_key: OpenAI API key
         """
-        super().__init__(store=chat_store)
+        super().__init__(store=chat_store, attachment_store=attachment_store)
         self.accumulated_text = ""  # Track accumulated text for final message
 
     async def respond(
@@ -83,8 +86,14 @@ class IncidentChatKitServer(ChatKitServer):
             user_message = str(input)
 
         try:
-            # Create agent
-            agent = create_incident_agent(incident_user_context.user_context.role)
+            # Pick the agent for the message's model tier
+            role = incident_user_context.user_context.role
+            previous, acted = recent_turns.last(thread.id)
+            if previous is None:
+                previous = await self._previous_reply(thread.id, context)
+            route = model_router.route(role, user_message, previous, acted)
+            print(f"[DEBUG] Routed {role.value} message to {route.tier} ({route.intent}, {route.model})")
+            agent = get_incident_agent(role, route.tier)
 
             # Create assistant message item
             item_id = default_generate_id("message")
@@ -101,11 +110,19 @@ class IncidentChatKitServer(ChatKitServer):
             yield ThreadItemAddedEvent(item=assistant_item)
 
             # Stream agent responses and transform to ChatKit events
-            result = Runner.run_streamed(agent, input=user_message, context=incident_user_context)
+            result = Runner.run_streamed(
+                agent,
+                input=user_message,
+                context=replace(incident_user_context, thread_id=thread.id),
+            )
+            tools_run = []
             async for event in result.stream_events():
+                if event.type == "run_item_stream_event" and event.item.type == "tool_call_item":
+                    tools_run.append(getattr(event.item.raw_item, "name", ""))
                 chatkit_event = self._transform_event(event, item_id)
                 if chatkit_event:
                     yield chatkit_event
+            recent_turns.remember(thread.id, self.accumulated_text, tools_run)
 
             # Yield ThreadItemDoneEvent with complete message
             final_item = AssistantMessageItem(
@@ -126,6 +143,14 @@ class IncidentChatKitServer(ChatKitServer):
                 allow_retry=True
             )
 
+    async def _previous_reply(self, thread_id: str, context: Dict[str, Any]) -> str | None:
+        """Text of the thread's latest assistant message in the store, if any."""
+        page = await self.store.load_thread_items(thread_id, None, 5, "desc", context)
+        for item in page.data:
+            if isinstance(item, AssistantMessageItem):
+                return "".join(part.text for part in item.content)
+        return None
+
     def _transform_event(self, agent_event: Dict[str, Any], item_id: str) -> ThreadStreamEvent | None:
         """Transform Agents SDK events to ChatKit ThreadStreamEvent objects."""
 
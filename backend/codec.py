@@ -0,0 +1,134 @@
+"""
+Encoding of ChatKit threads and thread items for the chat stores.
+
+A thread item is stored as a msgpack envelope [version, id, body], where the
+body is the item's JSON from pydantic-core's serializer. Stores read
+envelopes into LazyItem records: the ID is available straight away for
+sorting, paging and lookups, and the body is only validated into a
+ThreadItem when the item itself is needed. A record that was never
+materialized is written back with its original bytes, without dumping the
+model again.
+
+Rows written before envelopes existed are plain JSON text; decode_item and
+lazy_item accept those too.
+"""
+from typing import Iterable, List, Optional, Union
+
+import msgpack
+from chatkit.server import Thread, ThreadItem
+from chatkit.types import Page, ThreadMetadata
+from pydantic import TypeAdapter
+
+ENVELOPE_VERSION = 1
+
+_item_adapter = TypeAdapter(ThreadItem)
+
+
+def _dump(item: ThreadItem) -> bytes:
+    # The model's own serializer: the same JSON as model_dump_json(), as
+    # bytes and without its per-call argument handling
+    return item.__pydantic_serializer__.to_json(item)
+
+
+class LazyItem:
+    """
+    A thread item whose body is validated on first access.
+
+    Args:
+        id: Item ID
+        body: Item JSON, or None when built from a model
+        item: Already validated item, if any
+    """
+
+    __slots__ = ("id", "_body", "_item")
+
+    def __init__(self, id: str, body: Optional[bytes] = None, item: Optional[ThreadItem] = None):
+        self.id = id
+        self._body = body
+        self._item = item
+
+    @classmethod
+    def from_item(cls, item: ThreadItem) -> "LazyItem":
+        return cls(item.id, _dump(item), item)
+
+    @property
+    def item(self) -> ThreadItem:
+        """The validated item (validated now if it has not been yet)."""
+        if self._item is None:
+            self._item = _item_adapter.validate_json(self._body)
+        return self._item
+
+    @property
+    def materialized(self) -> bool:
+        return self._item is not None
+
+    @property
+    def size(self) -> int:
+        """Encoded size in bytes, used for cache accounting."""
+        return len(self._body) + len(self.id) if self._body is not None else len(self.encode())
+
+    def envelope(self) -> list:
+        # A materialized item may have been modified in place since it was read
+        body = _dump(self._item) if self._item is not None else self._body
+        return [ENVELOPE_VERSION, self.id, body]
+
+    def saved_envelope(self) -> list:
+        """Envelope with the body as it was stored, ignoring in-place changes to the item since."""
+        return [ENVELOPE_VERSION, self.id, self._body] if self._body is not None else self.envelope()
+
+    def encode(self) -> bytes:
+        return msgpack.packb(self.envelope())
+
+    def __repr__(self) -> str:
+        return f"LazyItem({self.id!r}, materialized={self.materialized})"
+
+
+def from_envelope(envelope: list) -> LazyItem:
+    version, item_id, body = envelope
+    if version != ENVELOPE_VERSION:
+        raise ValueError(f"Unsupported thread item envelope version {version}")
+    return LazyItem(item_id, body)
+
+
+def lazy_item(data: Union[bytes, str]) -> LazyItem:
+    """Read an encoded item without validating it."""
+    if isinstance(data, str):  # legacy JSON row
+        item = _item_adapter.validate_json(data)
+        return LazyItem(item.id, data.encode(), item)
+    return from_envelope(msgpack.unpackb(data))
+
+
+def encode_item(item: ThreadItem) -> bytes:
+    return LazyItem(item.id, item=item).encode()
+
+
+def decode_item(data: Union[bytes, str]) -> ThreadItem:
+    return lazy_item(data).item
+
+
+def encode_items(items: Iterable[LazyItem]) -> bytes:
+    """Pack several records into one buffer (e.g. a whole thread)."""
+    return msgpack.packb([item.envelope() for item in items])
+
+
+def decode_items(data: bytes) -> List[LazyItem]:
+    return [from_envelope(envelope) for envelope in msgpack.unpackb(data)]
+
+
+def encode_thread(thread: ThreadMetadata) -> bytes:
+    """Thread metadata as JSON; the items of a Thread are not included."""
+    return thread.model_dump_json(exclude={"items"}).encode()
+
+
+def decode_thread(data: Union[bytes, str]) -> ThreadMetadata:
+    return ThreadMetadata.model_validate_json(data)
+
+
+def thread_with_items(thread: ThreadMetadata, items: Optional[Page] = None) -> Thread:
+    """
+    Build a Thread from its metadata without dumping it first.
+
+    The metadata's fields are already validated, so they are passed as they
+    are rather than through model_dump() and back.
+    """
+    return Thread.model_validate({**thread.__dict__, "items": items if items is not None else Page()})
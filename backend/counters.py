@@ -0,0 +1,84 @@
+"""
+Incident dashboard counters.
+
+Counts by priority and status, plus cost exposure and affected customers
+of open incidents, maintained incrementally as a secondary index: every
+create, update, bulk insert or backend sync moves one incident's
+contribution from its old version to its new one, so reading the summary
+never walks the store.
+"""
+from typing import Dict, List, Tuple
+
+from models import Incident, IncidentPriority, IncidentStatus, Role, ROLE_INCIDENT_FIELDS
+from store import IncidentIndex, incident_store
+
+OPEN_STATUSES = frozenset({IncidentStatus.OPEN, IncidentStatus.INVESTIGATING})
+
+# Summed over open incidents; each is shown to roles that can see the field
+SUMMED_FIELDS = ("estimated_cost", "sla_penalty", "affected_customers")
+
+
+class IncidentCounters(IncidentIndex):
+    """O(1) aggregate counters over all incidents."""
+
+    def __init__(self):
+        self.counts: Dict[Tuple[IncidentPriority, IncidentStatus], int] = {
+            (priority, status): 0 for priority in IncidentPriority for status in IncidentStatus
+        }
+        self.open_sums: Dict[str, float] = {name: 0 for name in SUMMED_FIELDS}
+
+    def _apply(self, incident: Incident, sign: int) -> None:
+        self.counts[(incident.priority, incident.status)] += sign
+        if incident.status in OPEN_STATUSES:
+            for name in SUMMED_FIELDS:
+                self.open_sums[name] += sign * getattr(incident, name)
+
+    def add(self, incident: Incident) -> None:
+        self._apply(incident, 1)
+
+    def update(self, old: Incident, new: Incident) -> None:
+        self._apply(old, -1)
+        self._apply(new, 1)
+
+    def add_many(self, incidents: List[Incident]) -> None:
+        for incident in incidents:
+            self._apply(incident, 1)
+
+    def summary(self, role: Role) -> dict:
+        """
+        Dashboard counters for a role.
+
+        Counts are visible to every role; each open-incident sum only to
+        roles that can see the underlying field (e.g. costs to FINANCE).
+
+        Returns:
+            Total, per-status and per-priority counts, and the open
+            incidents' count, per-priority count and sums
+        """
+        by_status = {status.value: 0 for status in IncidentStatus}
+        by_priority = {priority.value: 0 for priority in IncidentPriority}
+        open_by_priority = {priority.value: 0 for priority in IncidentPriority}
+        for (priority, status), count in self.counts.items():
+            by_status[status.value] += count
+            by_priority[priority.value] += count
+            if status in OPEN_STATUSES:
+                open_by_priority[priority.value] += count
+
+        visible = ROLE_INCIDENT_FIELDS[role]
+        open_incidents = {"count": sum(open_by_priority.values()), "by_priority": open_by_priority}
+        for name in SUMMED_FIELDS:
+            if name in visible:
+                value = round(self.open_sums[name], 2)
+                # Float rounding can leave -0.0 once the last open incident is gone
+                open_incidents[name] = abs(value) if value == 0 else value
+        return {
+            "total": sum(by_status.values()),
+            "by_status": by_status,
+            "by_priority": by_priority,
+            "open": open_incidents,
+        }
+
+
+# Global dashboard counters, kept in sync by incident_store
+incident_counters = IncidentCounters()
+incident_store.register_index(incident_counters)
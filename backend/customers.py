@@ -0,0 +1,435 @@
+"""
+Customer directory and per-incident customer impact bitmaps.
+
+Customers are rows 0..N-1 in NumPy columns (segment, SLA tier). Each
+segment and SLA tier has a bitmap of its rows, and each incident has a
+bitmap of the customers it affects, so questions like "enterprise customers
+on a 99.9% SLA affected by INC-x" are bitmap intersections, and counts and
+paged listings come from popcounts rather than scans over customers.
+
+Bitmaps are adaptive: a sorted array of row numbers while sparse, packed
+64-bit words once dense. A typical incident touches a few hundred rows
+(a few KB) while a segment covers a large share of the directory.
+
+Until affected customers are recorded for an incident with
+`set_affected`, they are sampled deterministically from the incident's
+`affected_customers` count, weighted towards paying segments.
+
+The global directory is generated on first use (or by the app's warm-up
+task), not at import, so it does not slow down startup.
+"""
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from models import Incident
+
+SEGMENTS = ["enterprise", "smb", "free"]
+SLA_TIERS = ["99.99%", "99.9%", "99.5%", "none"]
+_SEGMENT_CODES = {name: i for i, name in enumerate(SEGMENTS)}
+_SLA_CODES = {name: i for i, name in enumerate(SLA_TIERS)}
+
+# Share of the directory per segment, and SLA tier mix within each segment
+SEGMENT_SHARES = {"enterprise": 0.02, "smb": 0.18, "free": 0.80}
+SLA_MIX = {
+    "enterprise": {"99.99%": 0.4, "99.9%": 0.6},
+    "smb": {"99.9%": 0.3, "99.5%": 0.7},
+    "free": {"none": 1.0},
+}
+# Share of an incident's affected customers per segment when sampling
+IMPACT_SHARES = {"enterprise": 0.1, "smb": 0.4, "free": 0.5}
+IMPACT_LEVELS = {"enterprise": "High", "smb": "Medium", "free": "Low"}
+# Median monthly contract value per segment (log-normally distributed)
+CONTRACT_VALUES = {"enterprise": 25000.0, "smb": 1000.0, "free": 0.0}
+
+NAMED_CUSTOMERS = {0: "Acme Corp", 1: "TechStart Inc"}
+
+MAX_PAGE_SIZE = 1000
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(words)
+else:  # NumPy < 2.0
+    _BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        return _BYTE_COUNTS[words.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+class Bitmap:
+    """
+    Immutable set of row numbers in [0, size).
+
+    Stored as a sorted uint32 array while it holds fewer than size/32 rows
+    (smaller than the packed form), otherwise as packed uint64 words.
+    """
+
+    __slots__ = ("size", "rows", "words", "_count")
+
+    def __init__(self, size: int, rows: Optional[np.ndarray] = None, words: Optional[np.ndarray] = None):
+        self.size = size
+        self.rows = rows
+        self.words = words
+        self._count: Optional[int] = None
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[int], size: int) -> "Bitmap":
+        """Bitmap of the given rows (any order, duplicates allowed)."""
+        rows = np.unique(np.asarray(rows, dtype=np.uint32))
+        return cls._adapt(size, rows=rows)
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> "Bitmap":
+        """Bitmap of the True positions of a boolean mask."""
+        return cls._adapt(len(mask), words=cls._pack(mask))
+
+    @staticmethod
+    def _word_count(size: int) -> int:
+        return (size + 63) // 64
+
+    @classmethod
+    def _adapt(cls, size: int, rows: Optional[np.ndarray] = None,
+               words: Optional[np.ndarray] = None) -> "Bitmap":
+        """Pick the smaller representation for the content."""
+        bitmap = cls(size, rows, words)
+        sparse = len(bitmap) * 32 < size
+        if sparse and words is not None:
+            bitmap.rows, bitmap.words = bitmap._to_rows(), None
+        elif not sparse and rows is not None:
+            bitmap.rows, bitmap.words = None, bitmap._to_words()
+        return bitmap
+
+    def _to_words(self) -> np.ndarray:
+        if self.words is not None:
+            return self.words
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.rows] = True
+        return self._pack(mask)
+
+    @classmethod
+    def _pack(cls, mask: np.ndarray) -> np.ndarray:
+        packed = np.packbits(mask, bitorder="little")
+        words = np.zeros(cls._word_count(len(mask)), dtype=np.uint64)
+        words.view(np.uint8)[:len(packed)] = packed
+        return words
+
+    def _to_rows(self) -> np.ndarray:
+        if self.rows is not None:
+            return self.rows
+        bits = np.unpackbits(self.words.view(np.uint8), bitorder="little")
+        return np.flatnonzero(bits).astype(np.uint32)
+
+    def _test(self, rows: np.ndarray) -> np.ndarray:
+        """Membership of each row in this (packed) bitmap."""
+        rows = rows.astype(np.int64)
+        return ((self.words[rows >> 6] >> (rows & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+    def __len__(self) -> int:
+        if self._count is None:
+            self._count = len(self.rows) if self.rows is not None else int(_popcount(self.words).sum())
+        return self._count
+
+    def __contains__(self, row: int) -> bool:
+        if not 0 <= row < self.size:
+            return False
+        if self.rows is not None:
+            i = np.searchsorted(self.rows, row)
+            return bool(i < len(self.rows) and self.rows[i] == row)
+        return bool(self._test(np.array([row]))[0])
+
+    def _member_sorted(self, rows: np.ndarray) -> np.ndarray:
+        """Membership of each row in this (array) bitmap, by binary search."""
+        positions = np.searchsorted(self.rows, rows)
+        positions[positions == len(self.rows)] = 0
+        return self.rows[positions] == rows if len(self.rows) else np.zeros(len(rows), dtype=bool)
+
+    def _member(self, rows: np.ndarray) -> np.ndarray:
+        return self._member_sorted(rows) if self.rows is not None else self._test(rows)
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        if self.rows is not None and other.rows is not None:
+            small, large = (self, other) if len(self.rows) <= len(other.rows) else (other, self)
+            if len(small.rows) * 16 < len(large.rows):
+                # Binary search the few rows of the small side in the large one
+                return Bitmap(self.size, rows=small.rows[large._member_sorted(small.rows)])
+            return Bitmap(self.size, rows=np.intersect1d(self.rows, other.rows, assume_unique=True))
+        if self.rows is not None:
+            return Bitmap(self.size, rows=self.rows[other._test(self.rows)])
+        if other.rows is not None:
+            return Bitmap(self.size, rows=other.rows[self._test(other.rows)])
+        return Bitmap._adapt(self.size, words=self.words & other.words)
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        if self.rows is not None and other.rows is not None:
+            return Bitmap._adapt(self.size, rows=np.union1d(self.rows, other.rows))
+        return Bitmap(self.size, words=self._to_words() | other._to_words())
+
+    def __sub__(self, other: "Bitmap") -> "Bitmap":
+        if self.rows is not None:
+            if other.rows is not None and len(self.rows) * 16 >= len(other.rows):
+                return Bitmap(self.size, rows=np.setdiff1d(self.rows, other.rows, assume_unique=True))
+            return Bitmap(self.size, rows=self.rows[~other._member(self.rows)])
+        return Bitmap._adapt(self.size, words=self.words & ~other._to_words())
+
+    def page(self, offset: int = 0, limit: int = 100) -> np.ndarray:
+        """Rows `offset` to `offset + limit` in ascending order."""
+        if self.rows is not None:
+            return self.rows[offset:offset + limit]
+        # Find the word holding the offset-th row from cumulative popcounts,
+        # then unpack only the words needed for the page
+        cumulative = np.cumsum(_popcount(self.words), dtype=np.int64)
+        word = int(np.searchsorted(cumulative, offset, side="right"))
+        skip = offset - (int(cumulative[word - 1]) if word else 0)
+        rows: List[np.ndarray] = []
+        found = 0
+        while found < skip + limit and word < len(self.words):
+            chunk = self.words[word:word + 1024]
+            bits = np.unpackbits(chunk.view(np.uint8), bitorder="little")
+            hits = np.flatnonzero(bits) + word * 64
+            rows.append(hits)
+            found += len(hits)
+            word += len(chunk)
+        if not rows:
+            return np.empty(0, dtype=np.uint32)
+        return np.concatenate(rows)[skip:skip + limit].astype(np.uint32)
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes if self.rows is not None else self.words.nbytes
+
+
+class CustomerDirectory:
+    """Customers as NumPy columns with a bitmap per segment and SLA tier."""
+
+    def __init__(self, segment: np.ndarray, sla: np.ndarray, names: Optional[Dict[int, str]] = None,
+                 contract_value: Optional[np.ndarray] = None):
+        self.size = len(segment)
+        self.segment = segment
+        self.sla = sla
+        # Monthly contract value in dollars
+        self.contract_value = contract_value if contract_value is not None else np.zeros(self.size, np.float32)
+        self.names = names or {}
+        # Sorted rows per segment, for sampling by position
+        self.segment_rows = {name: np.flatnonzero(segment == code).astype(np.uint32)
+                             for name, code in _SEGMENT_CODES.items()}
+        self.segments = {name: Bitmap.from_mask(segment == code) for name, code in _SEGMENT_CODES.items()}
+        self.sla_tiers = {name: Bitmap.from_mask(sla == code) for name, code in _SLA_CODES.items()}
+        self._filters: Dict[tuple, Optional[Bitmap]] = {}
+
+    @classmethod
+    def generate(cls, size: int, seed: int = 7) -> "CustomerDirectory":
+        """Synthetic directory with the configured segment and SLA mix."""
+        rng = np.random.default_rng(seed)
+        segment = rng.choice(len(SEGMENTS), size, p=[SEGMENT_SHARES[s] for s in SEGMENTS]).astype(np.uint8)
+        sla = np.full(size, _SLA_CODES["none"], dtype=np.uint8)
+        for name, mix in SLA_MIX.items():
+            rows = np.flatnonzero(segment == _SEGMENT_CODES[name])
+            tiers = [_SLA_CODES[t] for t in mix]
+            sla[rows] = rng.choice(tiers, len(rows), p=list(mix.values()))
+        named = {row: name for row, name in NAMED_CUSTOMERS.items() if row < size}
+        # Keep the demo accounts' well-known profiles
+        if 0 in named:
+            segment[0], sla[0] = _SEGMENT_CODES["enterprise"], _SLA_CODES["99.9%"]
+        if 1 in named:
+            segment[1], sla[1] = _SEGMENT_CODES["smb"], _SLA_CODES["99.5%"]
+        medians = np.array([CONTRACT_VALUES[s] for s in SEGMENTS])
+        contract_value = (medians[segment] * rng.lognormal(0, 0.5, size)).astype(np.float32)
+        return cls(segment, sla, named, contract_value)
+
+    def filter(self, segment: Optional[str] = None, sla: Optional[str] = None) -> Optional[Bitmap]:
+        """
+        Bitmap of customers in a segment and/or SLA tier (None if unfiltered).
+
+        Combinations are computed once; the directory is immutable.
+
+        Raises:
+            ValueError: If the segment or SLA tier is unknown
+        """
+        key = (segment or None, sla or None)
+        if key in self._filters:
+            return self._filters[key]
+        result = None
+        if segment:
+            if segment not in self.segments:
+                raise ValueError(f"Invalid segment: {segment}. Must be one of: {', '.join(SEGMENTS)}")
+            result = self.segments[segment]
+        if sla:
+            if sla not in self.sla_tiers:
+                raise ValueError(f"Invalid SLA tier: {sla}. Must be one of: {', '.join(SLA_TIERS)}")
+            result = self.sla_tiers[sla] if result is None else result & self.sla_tiers[sla]
+        self._filters[key] = result
+        return result
+
+    def customer_id(self, row: int) -> str:
+        return f"CUST-{row:07d}"
+
+    def row_for(self, customer_id: str) -> Optional[int]:
+        """Row number of a customer ID, or None if unknown."""
+        try:
+            row = int(customer_id.rsplit("-", 1)[-1])
+        except ValueError:
+            return None
+        return row if 0 <= row < self.size else None
+
+    def records(self, rows: np.ndarray) -> List[dict]:
+        """Customer records for rows."""
+        segments = self.segment[rows]
+        tiers = self.sla[rows]
+        records = []
+        for row, segment_code, sla_code in zip(rows.tolist(), segments.tolist(), tiers.tolist()):
+            segment = SEGMENTS[segment_code]
+            customer_id = self.customer_id(row)
+            records.append({
+                "customer_id": customer_id,
+                "name": self.names.get(row, f"Customer {row:07d}"),
+                "segment": segment,
+                "sla": SLA_TIERS[sla_code],
+                "impact": IMPACT_LEVELS[segment],
+                "email": f"{customer_id.lower()}@customers.example.com",
+            })
+        return records
+
+
+class CustomerImpactIndex:
+    """
+    Affected-customer bitmap per incident.
+
+    Recorded sets (`set_affected`) are kept; sampled ones are derived on
+    demand and cached, and re-derived if the incident's affected count
+    changes.
+    """
+
+    def __init__(self, directory: CustomerDirectory, max_cached: int = 10_000):
+        self.directory = directory
+        self.max_cached = max_cached
+        self._recorded: Dict[str, Bitmap] = {}
+        self._sampled: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set_affected(self, incident_id: str, customer_ids: Iterable[str]) -> int:
+        """
+        Record the customers affected by an incident.
+
+        Returns:
+            Number of known customers recorded
+        """
+        rows = [row for row in map(self.directory.row_for, customer_ids) if row is not None]
+        with self._lock:
+            self._recorded[incident_id] = Bitmap.from_rows(rows, self.directory.size)
+            self._sampled.pop(incident_id, None)
+        return len(self._recorded[incident_id])
+
+    def affected(self, incident: Incident) -> Bitmap:
+        """Bitmap of the customers an incident affects."""
+        with self._lock:
+            recorded = self._recorded.get(incident.incident_id)
+            if recorded is not None:
+                return recorded
+            entry = self._sampled.get(incident.incident_id)
+            if entry is not None and entry[0] == incident.affected_customers:
+                self._sampled.move_to_end(incident.incident_id)
+                return entry[1]
+        bitmap = self._sample(incident)
+        with self._lock:
+            self._sampled[incident.incident_id] = (incident.affected_customers, bitmap)
+            while len(self._sampled) > self.max_cached:
+                self._sampled.popitem(last=False)
+        return bitmap
+
+    def _sample(self, incident: Incident) -> Bitmap:
+        """Deterministic sample of `affected_customers` rows, split by IMPACT_SHARES."""
+        rng = np.random.default_rng(zlib.crc32(incident.incident_id.encode()))
+        picked = []
+        remaining = max(0, incident.affected_customers)
+        for i, name in enumerate(SEGMENTS):
+            pool = self.directory.segment_rows[name]
+            share = remaining if i == len(SEGMENTS) - 1 else round(incident.affected_customers * IMPACT_SHARES[name])
+            count = min(share, len(pool), remaining)
+            remaining -= count
+            if not count:
+                continue
+            # Positions within the segment's rows
+            positions = np.unique(rng.integers(0, len(pool), int(count * 1.1) + 16))
+            while len(positions) < count:
+                positions = np.union1d(positions, rng.integers(0, len(pool), count))
+            positions = rng.choice(positions, count, replace=False)
+            picked.append(pool[positions])
+        if not picked:
+            return Bitmap(self.directory.size, rows=np.empty(0, dtype=np.uint32))
+        return Bitmap.from_rows(np.concatenate(picked), self.directory.size)
+
+    def query(self, incident: Incident, segment: Optional[str] = None, sla: Optional[str] = None) -> Bitmap:
+        """
+        Affected customers of an incident, optionally within a segment/SLA tier.
+
+        Raises:
+            ValueError: If the segment or SLA tier is unknown
+        """
+        affected = self.affected(incident)
+        selection = self.directory.filter(segment, sla)
+        return affected if selection is None else affected & selection
+
+    def breakdown(self, incident: Incident) -> dict:
+        """Affected customer counts per segment and per SLA tier."""
+        affected = self.affected(incident)
+        return {
+            "total": len(affected),
+            "by_segment": {name: len(affected & bitmap) for name, bitmap in self.directory.segments.items()},
+            "by_sla": {name: len(affected & bitmap) for name, bitmap in self.directory.sla_tiers.items()},
+        }
+
+    def list(self, incident: Incident, segment: Optional[str] = None, sla: Optional[str] = None,
+             offset: int = 0, limit: int = 100) -> dict:
+        """
+        A page of affected customer records.
+
+        Returns:
+            {"total": n, "offset": n, "limit": n, "customers": [...]}
+
+        Raises:
+            ValueError: If the segment or SLA tier is unknown
+        """
+        limit = max(0, min(limit, MAX_PAGE_SIZE))
+        offset = max(0, offset)
+        matches = self.query(incident, segment, sla)
+        return {
+            "total": len(matches),
+            "offset": offset,
+            "limit": limit,
+            "customers": self.directory.records(matches.page(offset, limit)),
+        }
+
+
+class LazyCustomerDirectory:
+    """
+    Stands in for a CustomerDirectory that is generated on first use.
+
+    Attribute access is forwarded to the directory, generating it first if
+    needed, so it can be passed wherever a CustomerDirectory is expected.
+    """
+
+    def __init__(self, size: int, seed: int = 7):
+        self._size = size
+        self._seed = seed
+        self._directory: Optional[CustomerDirectory] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> CustomerDirectory:
+        """The directory, generated on the first call."""
+        if self._directory is None:
+            with self._lock:
+                if self._directory is None:
+                    self._directory = CustomerDirectory.generate(self._size, self._seed)
+        return self._directory
+
+    def __getattr__(self, name: str):
+        return getattr(self.load(), name)
+
+
+# Global customer directory and impact index instances
+customer_directory = LazyCustomerDirectory(int(os.getenv("CUSTOMER_DIRECTORY_SIZE", "2000000")))
+customer_impact = CustomerImpactIndex(customer_directory)
@@ -0,0 +1,297 @@
+"""
+Concurrent, cached incident diagnostics.
+
+Each diagnostic is a pluggable Probe (network, database, cache, ...) that
+does slow I/O against the incident's systems. DiagnosticsRunner runs probes
+concurrently, each under its own timeout, and caches successful results per
+(incident, probe) for a short TTL so the agent repeating a call costs
+nothing. Concurrent requests for the same (incident, probe) share a single
+run. `run_all` yields each probe's outcome as soon as it finishes.
+
+The built-in probes summarize the affected systems' recent readings from
+the metrics store. Setting DIAGNOSTICS_PROBE_LATENCY_MS swaps them for local
+fakes that return canned results after that latency, for load tests. Other
+probes subclass Probe and are added with `register_probe`.
+"""
+import asyncio
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from metrics import MetricsStore, metrics_store
+from models import Incident
+
+_SEVERITY = ["healthy", "degraded", "critical"]
+
+
+class Probe(ABC):
+    """A diagnostic check against an incident's systems."""
+
+    name: str = ""
+    timeout: float = 5.0  # seconds
+
+    @abstractmethod
+    async def run(self, incident: Incident) -> Dict[str, Any]:
+        """Run the check and return its measurements."""
+
+
+class FakeProbe(Probe):
+    """
+    Probe returning canned results after a simulated latency.
+
+    Args:
+        name: Probe name
+        results: Measurements to return
+        latency: Seconds to wait before returning
+        jitter: Extra random latency, up to this many seconds
+        timeout: Per-probe timeout in seconds
+        error: If set, raise RuntimeError with this message instead
+    """
+
+    def __init__(self, name: str, results: Dict[str, Any], latency: float = 0.0, jitter: float = 0.0,
+                 timeout: float = 5.0, error: Optional[str] = None):
+        self.name = name
+        self.results = results
+        self.latency = latency
+        self.jitter = jitter
+        self.timeout = timeout
+        self.error = error
+        self.calls = 0
+
+    async def run(self, incident: Incident) -> Dict[str, Any]:
+        self.calls += 1
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        if self.error:
+            raise RuntimeError(self.error)
+        return dict(self.results)
+
+
+@dataclass
+class MetricCheck:
+    """A statistic of one metric, with optional warning and critical thresholds."""
+    metric: str
+    stat: str  # a summary key: mean, min, max, last, p50, p95, p99 or rate_per_sec
+    warn: Optional[float] = None
+    critical: Optional[float] = None
+    lower_is_worse: bool = False
+
+    def severity(self, value: float) -> int:
+        """0 (healthy), 1 (degraded) or 2 (critical)."""
+        breached = (lambda limit: value <= limit) if self.lower_is_worse else (lambda limit: value >= limit)
+        if self.critical is not None and breached(self.critical):
+            return 2
+        if self.warn is not None and breached(self.warn):
+            return 1
+        return 0
+
+
+class MetricsProbe(Probe):
+    """
+    Probe reading the incident's affected systems from the metrics store.
+
+    Reports each check's statistic over the last `window` seconds per system
+    that has data, with a status per system and overall.
+    """
+
+    def __init__(self, name: str, checks: List[MetricCheck], store: MetricsStore,
+                 window: float = 300, timeout: float = 5.0):
+        self.name = name
+        self.checks = checks
+        self.store = store
+        self.window = window
+        self.timeout = timeout
+
+    async def run(self, incident: Incident) -> Dict[str, Any]:
+        systems = {}
+        worst = 0
+        for system in incident.affected_systems:
+            readings: Dict[str, Any] = {}
+            severity = 0
+            for check in self.checks:
+                summary = self.store.summary(system, check.metric, self.window)
+                if summary is None:
+                    continue
+                value = summary[check.stat]
+                readings[f"{check.metric}_{check.stat}"] = value
+                severity = max(severity, check.severity(value))
+            if readings:
+                readings["status"] = _SEVERITY[severity]
+                systems[system] = readings
+                worst = max(worst, severity)
+        if not systems:
+            return {"status": "unknown", "systems": {},
+                    "note": f"No {self.name} metrics for the affected systems in the last {self.window:g}s"}
+        return {"status": _SEVERITY[worst], "window_sec": self.window, "systems": systems}
+
+
+class DiagnosticsRunner:
+    """
+    Runs probes concurrently with per-probe timeouts, a TTL cache and
+    single-flight deduplication.
+
+    Outcomes are dicts:
+        {"probe", "status": "ok" | "timeout" | "error", "results" or "error",
+         "duration_ms", "cached", "completed_at"}
+    Only "ok" outcomes are cached.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_cache_entries: int = 4096):
+        self.probes: Dict[str, Probe] = {}
+        self.ttl = ttl
+        self.max_cache_entries = max_cache_entries
+        self._cache: Dict[Tuple[str, str], Tuple[float, dict]] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    def register_probe(self, probe: Probe) -> None:
+        """Add or replace a probe."""
+        self.probes[probe.name] = probe
+
+    def invalidate(self, incident_id: Optional[str] = None) -> None:
+        """Drop cached outcomes (for one incident, or all)."""
+        if incident_id is None:
+            self._cache.clear()
+            return
+        for key in [key for key in self._cache if key[0] == incident_id]:
+            del self._cache[key]
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[dict]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires, outcome = entry
+        if expires < time.monotonic():
+            del self._cache[key]
+            return None
+        return {**outcome, "cached": True}
+
+    def _store(self, key: Tuple[str, str], outcome: dict) -> None:
+        now = time.monotonic()
+        if len(self._cache) >= self.max_cache_entries:
+            for stale in [k for k, (expires, _) in self._cache.items() if expires < now]:
+                del self._cache[stale]
+            while len(self._cache) >= self.max_cache_entries:
+                # Dicts keep insertion order, so this drops the oldest entry
+                del self._cache[next(iter(self._cache))]
+        self._cache[key] = (now + self.ttl, outcome)
+
+    async def _execute(self, key: Tuple[str, str], probe: Probe, incident: Incident) -> dict:
+        started = time.perf_counter()
+        outcome: Dict[str, Any] = {"probe": probe.name}
+        try:
+            outcome["results"] = await asyncio.wait_for(probe.run(incident), timeout=probe.timeout)
+            outcome["status"] = "ok"
+        except asyncio.TimeoutError:
+            outcome["status"] = "timeout"
+            outcome["error"] = f"Probe timed out after {probe.timeout:g}s"
+        except Exception as e:
+            outcome["status"] = "error"
+            outcome["error"] = str(e)
+        outcome["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        outcome["completed_at"] = datetime.now().isoformat()
+        outcome["cached"] = False
+        if outcome["status"] == "ok":
+            self._store(key, outcome)
+        return outcome
+
+    async def run(self, incident: Incident, probe_name: str) -> dict:
+        """
+        Run one probe for an incident, or return its cached outcome.
+
+        Raises:
+            KeyError: If no probe has that name
+        """
+        probe = self.probes[probe_name]
+        key = (incident.incident_id, probe_name)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._execute(key, probe, incident))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one caller giving up does not cancel the shared run
+        return await asyncio.shield(task)
+
+    async def run_all(self, incident: Incident,
+                      probe_names: Optional[Iterable[str]] = None) -> AsyncIterator[dict]:
+        """
+        Run several probes concurrently, yielding each outcome as it finishes.
+
+        Raises:
+            KeyError: If a probe name is unknown
+        """
+        names = list(probe_names) if probe_names is not None else list(self.probes)
+        for name in names:
+            if name not in self.probes:
+                raise KeyError(name)
+        for next_done in asyncio.as_completed([self.run(incident, name) for name in names]):
+            yield await next_done
+
+
+def _metrics_probes(store: MetricsStore) -> Iterable[Probe]:
+    """Network, database and cache probes over the metrics store."""
+    return [
+        MetricsProbe("network", [
+            MetricCheck("latency_ms", "p50"),
+            MetricCheck("latency_ms", "p95", warn=500, critical=2000),
+            MetricCheck("packet_loss_pct", "mean", warn=1, critical=5),
+        ], store),
+        MetricsProbe("database", [
+            MetricCheck("query_time_ms", "p50"),
+            MetricCheck("query_time_ms", "p95", warn=500, critical=2000),
+            MetricCheck("connections_active", "max", warn=80, critical=95),
+            MetricCheck("connection_pool_size", "last"),
+        ], store),
+        MetricsProbe("cache", [
+            MetricCheck("hit_rate_pct", "mean", warn=80, critical=50, lower_is_worse=True),
+            MetricCheck("memory_usage_pct", "max", warn=85, critical=95),
+            MetricCheck("evictions", "rate_per_sec", warn=100, critical=1000),
+        ], store),
+    ]
+
+
+def _fake_probes(latency: float) -> Iterable[Probe]:
+    """Fake network, database and cache probes with canned readings."""
+    return [
+        FakeProbe("network", {
+            "latency_p50": "45ms",
+            "latency_p95": "120ms",
+            "packet_loss": "0.01%",
+            "status": "healthy"
+        }, latency=latency),
+        FakeProbe("database", {
+            "connection_pool": "95/100 (95% utilization)",
+            "query_time_p95": "3000ms",
+            "active_connections": "95",
+            "status": "degraded"
+        }, latency=latency),
+        FakeProbe("cache", {
+            "hit_rate": "45%",
+            "memory_usage": "98%",
+            "evictions_per_sec": "1500",
+            "status": "critical"
+        }, latency=latency),
+    ]
+
+
+def create_diagnostics_runner() -> DiagnosticsRunner:
+    """Runner with the default probes, configured from the environment."""
+    runner = DiagnosticsRunner(ttl=float(os.getenv("DIAGNOSTICS_CACHE_TTL", "30")))
+    latency_ms = os.getenv("DIAGNOSTICS_PROBE_LATENCY_MS")
+    if latency_ms is not None:
+        probes = _fake_probes(float(latency_ms) / 1000)
+    else:
+        probes = _metrics_probes(metrics_store)
+    for probe in probes:
+        runner.register_probe(probe)
+    return runner
+
+
+# Global diagnostics runner instance
+diagnostics = create_diagnostics_runner()
@@ -0,0 +1,176 @@
+"""
+Idempotent tool calls and collision-free IDs.
+
+The model sometimes repeats a mutating call within a run or when retrying.
+`@idempotent` keys each call on (thread, tool, canonical arguments): the
+first call runs, and repeats within `ttl` seconds get its result back
+(marked `"idempotent_replay": True`) without running the side effect
+again. Concurrent repeats wait for the first call instead of running in
+parallel. Results carrying an "error" key, and exceptions, are not cached,
+so a failed call can be retried. Calls without a thread ID are not
+deduplicated.
+
+IdGenerator issues IDs that stay unique within a second, across threads
+and across worker processes.
+"""
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+def canonical_arguments(arguments: Dict[str, Any]) -> str:
+    """
+    Stable encoding of tool arguments: sorted keys, trimmed strings and
+    numbers as floats, so 5000 and 5000.0 or " api " and "api" match.
+    """
+    def normalize(value):
+        if isinstance(value, bool) or value is None:
+            return value
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            return value.strip()
+        if isinstance(value, dict):
+            return {str(k): normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        return str(value)
+
+    return json.dumps(normalize(arguments), sort_keys=True, separators=(",", ":"))
+
+
+class IdempotencyCache:
+    """
+    TTL-bounded cache of tool results with single-flight execution.
+
+    Args:
+        ttl: Seconds a result is replayed for
+        max_entries: Oldest results are evicted beyond this
+    """
+
+    def __init__(self, ttl: float = 600.0, max_entries: int = 10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._results: "OrderedDict[Tuple[str, str, str], Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+
+    def _cached(self, key: Tuple[str, str, str]) -> Optional[Any]:
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires, result = entry
+        if expires < time.monotonic():
+            del self._results[key]
+            return None
+        return result
+
+    def _store(self, key: Tuple[str, str, str], result: Any) -> None:
+        self._results[key] = (time.monotonic() + self.ttl, result)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    @staticmethod
+    def _replay(result: Any) -> Any:
+        return {**result, "idempotent_replay": True} if isinstance(result, dict) else result
+
+    async def run(self, key: Tuple[str, str, str], call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `call` once per key within the TTL; repeats get its result."""
+        cached = self._cached(key)
+        if cached is not None:
+            self.hits += 1
+            return self._replay(cached)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.hits += 1
+            return self._replay(await asyncio.shield(inflight))
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved: a failure nobody waited on is not an error
+            raise
+        else:
+            if not (isinstance(result, dict) and "error" in result):
+                self._store(key, result)
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    def clear(self) -> None:
+        self._results.clear()
+
+
+def idempotent(func):
+    """
+    Decorator making a tool idempotent per (thread, tool, canonical arguments).
+
+    Goes under @requires_permission, so permissions are still checked on
+    every call.
+    """
+    signature = inspect.signature(func)
+    context_param = next(iter(signature.parameters))
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        first_arg = args[0] if args else kwargs.get(context_param)
+        incident_context = getattr(first_arg, "context", first_arg)
+        thread_id = getattr(incident_context, "thread_id", None)
+        if thread_id is None:
+            return await func(*args, **kwargs)
+        arguments = dict(signature.bind_partial(*args, **kwargs).arguments)
+        arguments.pop(context_param, None)
+        key = (thread_id, func.__name__, canonical_arguments(arguments))
+        return await idempotency_cache.run(key, lambda: func(*args, **kwargs))
+
+    return wrapper
+
+
+class IdGenerator:
+    """
+    IDs of the form PREFIX-YYYYmmddHHMMSS-NODE-SEQ.
+
+    SEQ increases monotonically per process, so IDs never repeat within a
+    process however many are issued per second; NODE is random per process
+    (re-drawn after fork) so worker processes do not collide.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._pid = None
+        self._node = ""
+        self._seq = 0
+
+    def new_id(self) -> str:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._node = os.urandom(3).hex().upper()
+                self._seq = 0
+            self._seq += 1
+            node, seq = self._node, self._seq
+        return f"{self.prefix}-{datetime.now().strftime('%Y%m%d%H%M%S')}-{node}-{seq:04d}"
+
+
+# Global idempotency cache and ID generator instances
+idempotency_cache = IdempotencyCache(ttl=float(os.getenv("IDEMPOTENCY_TTL", "600")))
+approval_ids = IdGenerator("APR")
+notification_ids = IdGenerator("NOTIF")
@@ -0,0 +1,383 @@
+"""
+Bulk incident ingestion.
+
+Streams NDJSON or CSV through an incremental parser, validates rows into
+Incident objects and writes them through IncidentStore.bulk_insert in
+fixed-size batches. Only one batch is held in memory at a time, so memory
+stays bounded regardless of input size. Uploads are parsed and validated in
+a worker thread; only the finished batches are written on the event loop.
+
+CLI:
+    python ingest.py history.ndjson
+    python ingest.py history.csv --format csv --batch-size 5000
+    python ingest.py history.ndjson --url http://localhost:8000 --user-id it-admin-001
+"""
+import asyncio
+import codecs
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from typing import AsyncIterator, Iterable, List, Optional
+
+from models import Incident, IncidentPriority, IncidentStatus
+
+MAX_REPORTED_ERRORS = 100
+# Longest NDJSON line or CSV record accepted; longer ones are rejected and
+# the parser skips to the next newline, so a missing newline or an
+# unbalanced quote cannot make it buffer the rest of the upload
+MAX_RECORD_CHARS = 1 << 20
+
+
+def _skip_to_newline(text: str) -> Optional[str]:
+    """The text after the first newline, or None if there is none yet."""
+    newline = text.find("\n")
+    return text[newline + 1:] if newline >= 0 else None
+
+
+class NDJSONParser:
+    """Incremental parser for newline-delimited JSON."""
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._skipping = False  # inside a line that was too long
+
+    def feed(self, chunk: bytes) -> List[dict]:
+        """Parse as many complete lines as `chunk` completes."""
+        text = self._decoder.decode(chunk)
+        if self._skipping:
+            text = _skip_to_newline(text)
+            if text is None:
+                return []
+            self._skipping = False
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        rows = [self._parse(line) for line in lines if line.strip()]
+        if len(self._buffer) > MAX_RECORD_CHARS:
+            self._buffer = ""
+            self._skipping = True
+            rows.append({"__error__": f"Line longer than {MAX_RECORD_CHARS} characters"})
+        return rows
+
+    def close(self) -> List[dict]:
+        """Parse whatever is left after the last chunk."""
+        rest = self._buffer + self._decoder.decode(b"", final=True)
+        self._buffer = ""
+        if self._skipping:
+            return []
+        return [self._parse(rest)] if rest.strip() else []
+
+    @staticmethod
+    def _parse(line: str) -> dict:
+        if len(line) > MAX_RECORD_CHARS:
+            return {"__error__": f"Line longer than {MAX_RECORD_CHARS} characters"}
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            return {"__error__": f"Invalid JSON: {e}"}
+        if not isinstance(row, dict):
+            return {"__error__": "Each line must be a JSON object"}
+        return row
+
+
+class CSVParser:
+    """
+    Incremental parser for CSV with a header row.
+
+    Records may span lines inside quoted fields; a record is complete once
+    its quotes are balanced. A record that grows past MAX_RECORD_CHARS
+    (usually an unbalanced quote) is rejected and parsing starts again at
+    the next line.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buffer = ""
+        self._record = ""
+        self._header: Optional[List[str]] = None
+        self._skipping = False  # inside a line that was too long
+
+    def feed(self, chunk: bytes) -> List[dict]:
+        """Parse as many complete records as `chunk` completes."""
+        text = self._decoder.decode(chunk)
+        if self._skipping:
+            text = _skip_to_newline(text)
+            if text is None:
+                return []
+            self._skipping = False
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        rows = []
+        for line in lines:
+            self._record += line + "\n"
+            if self._record.count('"') % 2 == 0:
+                row = self._parse(self._record)
+                self._record = ""
+                if row is not None:
+                    rows.append(row)
+            elif len(self._record) > MAX_RECORD_CHARS:
+                self._record = ""
+                rows.append(self._too_long())
+        if len(self._record) + len(self._buffer) > MAX_RECORD_CHARS:
+            self._record = self._buffer = ""
+            self._skipping = True
+            rows.append(self._too_long())
+        return rows
+
+    def close(self) -> List[dict]:
+        """Parse whatever is left after the last chunk."""
+        self._record += self._buffer + self._decoder.decode(b"", final=True)
+        self._buffer = ""
+        record, self._record = self._record, ""
+        if self._skipping:
+            return []
+        row = self._parse(record) if record.strip() else None
+        return [row] if row is not None else []
+
+    @staticmethod
+    def _too_long() -> dict:
+        return {"__error__": f"Record longer than {MAX_RECORD_CHARS} characters (unbalanced quote?)"}
+
+    def _parse(self, record: str) -> Optional[dict]:
+        if not record.strip():
+            return None
+        values = next(csv.reader(io.StringIO(record)))
+        if self._header is None:
+            self._header = [name.strip() for name in values]
+            return None
+        if len(values) != len(self._header):
+            return {"__error__": f"Expected {len(self._header)} columns, got {len(values)}"}
+        return dict(zip(self._header, values))
+
+
+PARSERS = {"ndjson": NDJSONParser, "csv": CSVParser}
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """
+    Parse an ISO 8601 timestamp as naive local time, like the datetime.now()
+    timestamps the store uses; values with a UTC offset are converted.
+    """
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def row_to_incident(row: dict, created_by: str) -> Incident:
+    """
+    Validate a parsed row into an Incident.
+
+    Required: title, description. Optional: incident_id (assigned when empty),
+    priority, status, affected_systems (list, or ';'-separated string),
+    affected_customers, estimated_cost, sla_penalty, created_at, updated_at
+    (ISO 8601; converted to local time if they carry an offset) and
+    created_by.
+
+    Raises:
+        ValueError: If the row is invalid
+    """
+    if "__error__" in row:
+        raise ValueError(row["__error__"])
+    for required in ("title", "description"):
+        if not row.get(required):
+            raise ValueError(f"Missing required field: {required}")
+
+    systems = row.get("affected_systems") or []
+    if isinstance(systems, str):
+        systems = [s.strip() for s in systems.split(";") if s.strip()]
+
+    now = datetime.now()
+    try:
+        created_at = _parse_timestamp(row["created_at"]) if row.get("created_at") else now
+        updated_at = _parse_timestamp(row["updated_at"]) if row.get("updated_at") else created_at
+        return Incident(
+            incident_id=str(row.get("incident_id") or ""),
+            title=str(row["title"]),
+            description=str(row["description"]),
+            priority=IncidentPriority(str(row.get("priority") or "P3").upper()),
+            status=IncidentStatus(str(row.get("status") or "OPEN").upper()),
+            affected_systems=[str(s) for s in systems],
+            affected_customers=int(row.get("affected_customers") or 0),
+            estimated_cost=float(row.get("estimated_cost") or 0.0),
+            sla_penalty=float(row.get("sla_penalty") or 0.0),
+            created_at=created_at,
+            created_by=str(row.get("created_by") or created_by),
+            updated_at=updated_at,
+        )
+    except (TypeError, ValueError) as e:
+        raise ValueError(str(e))
+
+
+class IncidentIngestor:
+    """
+    Validates rows into Incidents and writes them in batches.
+
+    Usage:
+        ingestor = IncidentIngestor(incident_store, created_by="migration")
+        for chunk in chunks:
+            ingestor.feed(chunk)
+        report = ingestor.finish()
+
+    `feed` is `apply` over the batches `parse` returns. `parse` and
+    `parse_rest` do not touch the store, so they can run in a thread while
+    `apply` runs where the store is used.
+    """
+
+    def __init__(self, store, fmt: str = "ndjson", created_by: str = "bulk-ingest",
+                 batch_size: int = 1000):
+        if fmt not in PARSERS:
+            raise ValueError(f"Unknown format: {fmt}. Must be one of: {', '.join(PARSERS)}")
+        self.store = store
+        self.parser = PARSERS[fmt]()
+        self.created_by = created_by
+        self.batch_size = batch_size
+        self.batch: List[Incident] = []
+        self.rows = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.rejected = 0
+        self.errors: List[dict] = []
+        self.started = time.perf_counter()
+
+    def feed(self, chunk: bytes) -> None:
+        """Parse a chunk of input and write any full batches."""
+        for batch in self.parse(chunk):
+            self.apply(batch)
+
+    def finish(self) -> dict:
+        """Write the remaining rows and return the ingestion report."""
+        for batch in self.parse_rest():
+            self.apply(batch)
+        return self.report()
+
+    def parse(self, chunk: bytes) -> List[List[Incident]]:
+        """Parse and validate a chunk of input; returns the batches it filled."""
+        return self._add_rows(self.parser.feed(chunk))
+
+    def parse_rest(self) -> List[List[Incident]]:
+        """Parse the end of the input; returns the remaining batches, the last one partial."""
+        batches = self._add_rows(self.parser.close())
+        if self.batch:
+            batches.append(self.batch)
+            self.batch = []
+        return batches
+
+    def apply(self, batch: List[Incident]) -> None:
+        """Write a batch to the store."""
+        inserted = self.store.bulk_insert(batch)
+        self.inserted += len(inserted)
+        self.skipped += len(batch) - len(inserted)
+
+    def _add_rows(self, rows: Iterable[dict]) -> List[List[Incident]]:
+        full = []
+        for row in rows:
+            self.rows += 1
+            try:
+                self.batch.append(row_to_incident(row, self.created_by))
+            except ValueError as e:
+                self.rejected += 1
+                if len(self.errors) < MAX_REPORTED_ERRORS:
+                    self.errors.append({"row": self.rows, "error": str(e)})
+                continue
+            if len(self.batch) >= self.batch_size:
+                full.append(self.batch)
+                self.batch = []
+        return full
+
+    def report(self) -> dict:
+        """Progress so far."""
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "skipped_existing": self.skipped,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(self.rows / elapsed, 1) if elapsed else None,
+        }
+
+
+async def ingest_stream(chunks: AsyncIterator[bytes], store, fmt: str = "ndjson",
+                        created_by: str = "bulk-ingest", batch_size: int = 1000) -> dict:
+    """
+    Ingest an async stream of byte chunks (e.g. a request body).
+
+    Chunks are parsed and validated in a thread. Each batch is written on
+    the event loop, which is yielded between batches so other requests
+    keep being served during a large import.
+    """
+    ingestor = IncidentIngestor(store, fmt=fmt, created_by=created_by, batch_size=batch_size)
+    async for chunk in chunks:
+        for batch in await asyncio.to_thread(ingestor.parse, chunk):
+            ingestor.apply(batch)
+            await asyncio.sleep(0)
+    for batch in await asyncio.to_thread(ingestor.parse_rest):
+        ingestor.apply(batch)
+        await asyncio.sleep(0)
+    return ingestor.report()
+
+
+def ingest_file(path: str, store, fmt: str = "ndjson", created_by: str = "bulk-ingest",
+                batch_size: int = 1000, chunk_size: int = 1 << 20) -> dict:
+    """Ingest a file from disk, reading it in chunks."""
+    ingestor = IncidentIngestor(store, fmt=fmt, created_by=created_by, batch_size=batch_size)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            ingestor.feed(chunk)
+    return ingestor.finish()
+
+
+def _upload(path: str, url: str, fmt: str, user_id: str, chunk_size: int = 1 << 20) -> dict:
+    """Stream a file to a running server's /api/incidents/bulk endpoint."""
+    import http.client
+    from urllib.parse import urlsplit
+
+    target = urlsplit(url)
+    conn_class = http.client.HTTPSConnection if target.scheme == "https" else http.client.HTTPConnection
+    conn = conn_class(target.netloc)
+
+    def body():
+        with open(path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    conn.request(
+        "POST", f"/api/incidents/bulk?format={fmt}", body=body(), encode_chunked=True,
+        headers={"X-User-Role": "IT", "X-User-Id": user_id},
+    )
+    response = conn.getresponse()
+    return json.loads(response.read())
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Bulk-ingest incident history")
+    parser.add_argument("path", help="NDJSON or CSV file")
+    parser.add_argument("--format", choices=sorted(PARSERS), help="Defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--created-by", default="bulk-ingest")
+    parser.add_argument("--url", help="Upload to a running server instead of the local STORE_BACKEND")
+    parser.add_argument("--user-id", default="bulk-ingest", help="X-User-Id for --url uploads")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    if (not args.url and os.getenv("STORE_BACKEND", "memory").lower() == "memory"
+            and not os.getenv("PERSISTENCE_DIR")):
+        # The in-memory store would be thrown away when this process exits
+        parser.error("nowhere to keep the incidents: pass --url, or set STORE_BACKEND=sqlite "
+                     "or PERSISTENCE_DIR")
+    if args.url:
+        result = _upload(args.path, args.url, fmt, args.user_id)
+    else:
+        from store import incident_store
+        result = ingest_file(args.path, incident_store, fmt=fmt, created_by=args.created_by,
+                             batch_size=args.batch_size)
+        if incident_store.persistence:
+            incident_store.persistence.close()  # commit the logged batches before exiting
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,309 @@
+"""
+Append-only NDJSON journal with group commit.
+
+`append` assigns a sequence number and puts the record on a bounded queue
+without touching the disk. A background writer thread drains whatever has
+queued up, writes it as one O_APPEND write and fsyncs once for the whole
+batch, so callers never wait for the disk and fsync cost is shared by every
+record in the batch. `flush` waits until everything appended so far is
+durable. If a write or fsync fails the batch is not counted as committed:
+the writer logs the error and retries it, and `flush` returns False while
+the journal is failing.
+
+Records go to numbered segment files that rotate at `max_segment_bytes`.
+Each segment has an offset index by key (e.g. incident ID), built by
+reading the segment's new lines on the next query; a segment's index is
+written next to it as JSON once it is no longer the newest, so restarts only
+re-read the newest segment. Several processes may append to the same
+directory: lines are whole single writes and every query first catches up
+on bytes written since the last one. Sequence numbers are per process.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+_STOP = object()
+
+
+class JournalSegment:
+    """One segment file and its key -> line offsets index."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offsets: Dict[str, List[int]] = {}
+        self.indexed_to = 0  # bytes of the file covered by the index
+        self.count = 0
+        self.sealed = False
+
+    @property
+    def index_path(self) -> str:
+        return self.path[:-len(".ndjson")] + ".idx"
+
+    def catch_up(self, key_field: str) -> None:
+        """Index lines appended since the last call."""
+        size = os.path.getsize(self.path)
+        if size <= self.indexed_to:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.indexed_to)
+            data = f.read(size - self.indexed_to)
+        end = data.rfind(b"\n") + 1  # a concurrent writer's line may be in flight
+        offset = self.indexed_to
+        for line in data[:end].splitlines(keepends=True):
+            try:
+                key = json.loads(line).get(key_field)
+            except ValueError:
+                key = None
+            if key is not None:
+                self.offsets.setdefault(str(key), []).append(offset)
+            offset += len(line)
+            self.count += 1
+        self.indexed_to += end
+
+    def seal(self) -> None:
+        """Persist the index of a segment that will not grow any more."""
+        self.sealed = True
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"size": self.indexed_to, "count": self.count, "offsets": self.offsets}, f)
+        os.replace(tmp, self.index_path)
+
+    def load_index(self) -> bool:
+        """Load a persisted index if it still matches the file."""
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if index.get("size") != os.path.getsize(self.path):
+            return False
+        self.offsets = index["offsets"]
+        self.count = index["count"]
+        self.indexed_to = index["size"]
+        self.sealed = True
+        return True
+
+    def read(self, offsets: List[int]) -> Iterator[dict]:
+        """Records at the given line offsets."""
+        with open(self.path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+
+class Journal:
+    """
+    Segmented append-only journal.
+
+    Args:
+        directory: Directory holding the segment files
+        key_field: Record field indexed for `records(key)`
+        max_segment_bytes: Size at which a new segment is started
+        queue_size: Records that may wait for the writer before `append` blocks
+        max_batch: Most records written (and fsynced) at once
+        fsync: Whether commits are fsynced
+        retry_seconds: Wait before retrying a failed write
+    """
+
+    def __init__(self, directory: str, key_field: str = "key", max_segment_bytes: int = 64 << 20,
+                 queue_size: int = 65536, max_batch: int = 4096, fsync: bool = True,
+                 retry_seconds: float = 1.0):
+        self.directory = directory
+        self.key_field = key_field
+        self.max_segment_bytes = max_segment_bytes
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self.retry_seconds = retry_seconds
+        self.segments: List[JournalSegment] = []
+        self.appended = 0
+        self.committed = 0
+        self.commits = 0
+        self.error: Optional[str] = None  # last write error while the writer is retrying
+        self._stopping = False
+        os.makedirs(directory, exist_ok=True)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._append_lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._committed = threading.Condition()
+        self._refresh()
+        self._fd = self._open_segment(self._segment_number(self.segments[-1].path) if self.segments else 0)
+        self._writer = threading.Thread(target=self._write_loop, name="journal-writer", daemon=True)
+        self._writer.start()
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"journal-{number:08d}.ndjson")
+
+    @staticmethod
+    def _segment_number(path: str) -> int:
+        return int(os.path.basename(path)[len("journal-"):-len(".ndjson")])
+
+    def _open_segment(self, number: int) -> int:
+        fd = os.open(self._segment_path(number), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._segment_no = number
+        return fd
+
+    def append(self, record: dict) -> int:
+        """
+        Queue a record for the writer and return its sequence number.
+
+        Blocks only if `queue_size` records are already waiting.
+        """
+        with self._append_lock:
+            self.appended += 1
+            seq = self.appended
+            self._queue.put((seq, record))
+        return seq
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every record appended so far is committed.
+
+        Returns False on timeout, or as soon as a write fails.
+        """
+        target = self.appended
+        with self._committed:
+            self._committed.wait_for(lambda: self.committed >= target or self.error is not None, timeout)
+            return self.committed >= target
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            # Group commit: take everything that queued up behind the first record
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.put(_STOP)
+                    break
+                batch.append(item)
+            data = b"".join(
+                json.dumps({"seq": seq, **record}, default=str, separators=(",", ":")).encode() + b"\n"
+                for seq, record in batch
+            )
+            if not self._commit(data):
+                return  # stopped while the disk was failing; the batch is not committed
+            with self._committed:
+                self.committed = batch[-1][0]
+                self.commits += 1
+                self._committed.notify_all()
+
+    def _commit(self, data: bytes) -> bool:
+        """Write and fsync a batch, retrying until it succeeds or the journal is closed."""
+        size = len(data)
+        while True:
+            try:
+                # Rotate only between batches so a line never spans two segments
+                if len(data) == size and os.fstat(self._fd).st_size >= self.max_segment_bytes:
+                    fd = self._open_segment(self._segment_no + 1)
+                    os.close(self._fd)
+                    self._fd = fd
+                while data:
+                    data = data[os.write(self._fd, data):]
+                if self.fsync:
+                    os.fsync(self._fd)
+            except OSError as e:
+                print(f"[ERROR] Journal write failed, retrying in {self.retry_seconds:g}s: {e}")
+                with self._committed:
+                    self.error = str(e)
+                    self._committed.notify_all()
+                if self._stopping:
+                    return False
+                time.sleep(self.retry_seconds)
+                continue
+            if self.error is not None:
+                print("[INFO] Journal writes recovered")
+                with self._committed:
+                    self.error = None
+            return True
+
+    def _refresh(self) -> None:
+        """Pick up new segments and index new lines."""
+        known = {segment.path for segment in self.segments}
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if name.startswith("journal-") and name.endswith(".ndjson") and path not in known:
+                segment = JournalSegment(path)
+                segment.load_index()
+                self.segments.append(segment)
+        for i, segment in enumerate(self.segments):
+            # Another process may still be finishing a batch on an older segment
+            segment.catch_up(self.key_field)
+            if not segment.sealed and i < len(self.segments) - 1:
+                segment.seal()
+
+    def records(self, key: Optional[str] = None, limit: int = 100) -> List[dict]:
+        """
+        Newest records first, for one key (via the offset index) or overall.
+
+        Reads see every record committed before the call.
+        """
+        with self._index_lock:
+            self._refresh()
+            located: List[Tuple[JournalSegment, List[int]]] = []
+            remaining = limit
+            for segment in reversed(self.segments):
+                if remaining <= 0:
+                    break
+                if key is not None:
+                    offsets = segment.offsets.get(key, [])[-remaining:]
+                else:
+                    offsets = self._tail_offsets(segment, remaining)
+                located.append((segment, offsets))
+                remaining -= len(offsets)
+        results = []
+        for segment, offsets in located:
+            results.extend(reversed(list(segment.read(offsets))))
+        return results
+
+    @staticmethod
+    def _tail_offsets(segment: JournalSegment, count: int) -> List[int]:
+        """Offsets of the last `count` indexed lines of a segment."""
+        end = segment.indexed_to
+        if not count or not end:
+            return []
+        chunk = 64 << 10
+        with open(segment.path, "rb") as f:
+            while True:
+                start = max(0, end - chunk)
+                f.seek(start)
+                data = f.read(end - start)
+                if start == 0 or data.count(b"\n") > count:
+                    break
+                chunk *= 2
+        offsets = []
+        position = start
+        for line in data.split(b"\n")[:-1]:
+            offsets.append(position)
+            position += len(line) + 1
+        if start > 0:
+            offsets = offsets[1:]  # the first line is cut off
+        return offsets[-count:]
+
+    def stats(self) -> dict:
+        """Segment, record and commit counts."""
+        with self._index_lock:
+            self._refresh()
+            return {
+                "segments": len(self.segments),
+                "records": sum(segment.count for segment in self.segments),
+                "bytes": sum(segment.indexed_to for segment in self.segments),
+                "appended": self.appended,
+                "committed": self.committed,
+                "commits": self.commits,
+                "error": self.error,
+            }
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Commit queued records and stop the writer."""
+        self._stopping = True
+        self._queue.put(_STOP)
+        self._writer.join(timeout)
+        os.close(self._fd)
@@ -0,0 +1,287 @@
+"""
+Parallel regex search over the technical log store.
+
+A search is split into byte ranges of the segments its time, service and
+level filters cannot rule out, and the ranges are scanned in a
+ProcessPoolExecutor. Workers mmap the segment files and run the regex
+directly over the mapping, so only matching lines are ever copied. Results
+are merged in time order and streamed back as soon as no range still being
+scanned could produce an earlier match, so the first matches arrive long
+before a large scan finishes; once `limit` matches are out the remaining
+ranges are cancelled.
+"""
+import asyncio
+import heapq
+import mmap
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+from logstore import LEVELS, MAX_QUERY_RESULTS, _ESCAPES, LogRecord, LogStore, log_store, normalize_level
+
+# Scan at most this many bytes per task
+DEFAULT_CHUNK_BYTES = 8 << 20
+
+
+@lru_cache(maxsize=64)
+def _compile(pattern: bytes, flags: int) -> "re.Pattern":
+    return re.compile(pattern, flags)
+
+
+def _strip_anchors(pattern: bytes) -> bytes:
+    """
+    The pattern without ^, $, \\A and \\Z outside character classes.
+
+    The prefilter searches whole segment files, where ^ and $ would anchor
+    to the file or range rather than to a message. Dropping a zero-width
+    assertion only widens what matches, and every hit is re-checked against
+    the message with the original pattern.
+    """
+    out = bytearray()
+    class_start = None  # index of the first member of the open character class
+    i = 0
+    while i < len(pattern):
+        char = pattern[i:i + 1]
+        if char == b"\\":
+            escape = pattern[i:i + 2]
+            if class_start is not None or escape not in (b"\\A", b"\\Z"):
+                out += escape
+            i += 2
+            continue
+        if class_start is not None:
+            # "]" right after "[" or "[^" is a member, not the end of the class
+            if char == b"]" and i > class_start:
+                class_start = None
+        elif char == b"[":
+            class_start = i + 2 if pattern[i + 1:i + 2] == b"^" else i + 1
+        elif char in (b"^", b"$"):
+            i += 1
+            continue
+        out += char
+        i += 1
+    return bytes(out)
+
+
+def scan_range(path: str, start: int, end: int, pattern: bytes, flags: int, start_ms: int, end_ms: int,
+               services: Optional[frozenset], levels: frozenset, limit: int) -> Tuple[List[tuple], int, int]:
+    """
+    Scan bytes [start, end) of a segment file for lines whose message matches.
+
+    Runs in a worker process. The regex, without anchors, is searched over
+    the mmap itself; each hit is widened to its line, which is then checked
+    against the time, level and service filters and the regex is re-applied
+    to the message field alone.
+
+    Returns:
+        (earliest `limit` matches as (ts_ms, offset, line), total matches, bytes scanned)
+    """
+    regex = _compile(pattern, flags)
+    prefilter = _compile(_strip_anchors(pattern), flags)
+    matches: List[tuple] = []
+    matched = 0
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        end = min(end, len(view))
+        position = start
+        while position < end:
+            hit = prefilter.search(view, position, end)
+            if hit is None:
+                break
+            line_start = max(view.rfind(b"\n", start, hit.start()) + 1, start)
+            line_end = view.find(b"\n", hit.start(), end)
+            if line_end < 0:
+                line_end = end
+            position = line_end + 1
+            line = view[line_start:line_end]
+            try:
+                ts, level, service, message = line.split(b"\t", 3)
+                ts = int(ts)
+            except ValueError:
+                continue
+            if ts < start_ms or ts > end_ms or level not in levels:
+                continue
+            if services is not None and service.lower() not in services:
+                continue
+            if not regex.search(message):
+                continue
+            matched += 1
+            # Max-heap (negated) of the earliest `limit` matches
+            if len(matches) < limit:
+                heapq.heappush(matches, (-ts, -line_start, line))
+            elif (ts, line_start) < (-matches[0][0], -matches[0][1]):
+                heapq.heapreplace(matches, (-ts, -line_start, line))
+    return sorted((-ts, -offset, line) for ts, offset, line in matches), matched, end - start
+
+
+class LogSearch:
+    """
+    One running search. Iterate it for matching LogRecords in time order;
+    once iteration finishes `stats()` describes the scan.
+    """
+
+    def __init__(self, engine: "LogSearchEngine", ranges: List[tuple], scan_args: tuple,
+                 limit: int, timeout: float):
+        self.engine = engine
+        self.ranges = ranges  # (min_ts, path, start, end), sorted by min_ts
+        self.scan_args = scan_args
+        self.limit = limit
+        self.timeout = timeout
+        self.matches = 0
+        self.total_matched = 0
+        self.bytes_scanned = 0
+        self.ranges_scanned = 0
+        self.truncated = False
+        self.timed_out = False
+        self.started = time.perf_counter()
+        self.first_match_seconds: Optional[float] = None
+
+    async def __aiter__(self) -> AsyncIterator[LogRecord]:
+        loop = asyncio.get_running_loop()
+        pool = self.engine.pool()
+        deadline = self.started + self.timeout
+        # Keep a bounded number of ranges in flight so an early stop wastes little work
+        window = self.engine.max_workers * 2
+        pending = {}
+        next_range = 0
+        heap: List[tuple] = []
+        try:
+            while next_range < len(self.ranges) or pending:
+                while next_range < len(self.ranges) and len(pending) < window:
+                    min_ts, path, start, end = self.ranges[next_range]
+                    future = loop.run_in_executor(pool, scan_range, path, start, end, *self.scan_args)
+                    pending[future] = min_ts
+                    next_range += 1
+
+                remaining = deadline - time.perf_counter()
+                done, _ = await asyncio.wait(pending, timeout=max(remaining, 0),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.timed_out = self.truncated = True
+                    return
+                for future in done:
+                    del pending[future]
+                    found, matched, scanned = future.result()
+                    self.total_matched += matched
+                    self.bytes_scanned += scanned
+                    self.ranges_scanned += 1
+                    for entry in found:
+                        heapq.heappush(heap, entry)
+
+                # Nothing still to be scanned can produce a match older than this
+                watermark = min(pending.values(), default=None)
+                if next_range < len(self.ranges):
+                    upcoming = self.ranges[next_range][0]
+                    watermark = upcoming if watermark is None else min(watermark, upcoming)
+                while heap and (watermark is None or heap[0][0] < watermark):
+                    ts, _, line = heapq.heappop(heap)
+                    if self.matches == self.limit:
+                        self.truncated = True
+                        return
+                    yield self._emit(line)
+            while heap and self.matches < self.limit:
+                yield self._emit(heapq.heappop(heap)[2])
+            self.truncated = self.total_matched > self.matches
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _emit(self, line: bytes) -> LogRecord:
+        self.matches += 1
+        if self.first_match_seconds is None:
+            self.first_match_seconds = time.perf_counter() - self.started
+        return LogRecord.decode(line)
+
+    def stats(self) -> dict:
+        """Counters for the scan so far."""
+        elapsed = time.perf_counter() - self.started
+        return {
+            "matches": self.matches,
+            "truncated": self.truncated,
+            "timed_out": self.timed_out,
+            "ranges": len(self.ranges),
+            "ranges_scanned": self.ranges_scanned,
+            "bytes_scanned": self.bytes_scanned,
+            "seconds": round(elapsed, 3),
+            "first_match_seconds": round(self.first_match_seconds, 3) if self.first_match_seconds is not None else None,
+            "mb_per_sec": round(self.bytes_scanned / 2**20 / elapsed, 1) if elapsed else None,
+        }
+
+
+class LogSearchEngine:
+    """
+    Plans log searches and runs them on a shared process pool.
+
+    Usage:
+        search = log_search.search("timeout after \\d+ms", regex=True, services=["Redis Cache"])
+        async for record in search:
+            ...
+        search.stats()
+    """
+
+    def __init__(self, store: LogStore, max_workers: Optional[int] = None,
+                 chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+        self.store = store
+        self.max_workers = max_workers or int(os.getenv("LOG_SEARCH_WORKERS", "0")) or os.cpu_count() or 1
+        self.chunk_bytes = chunk_bytes
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def pool(self) -> ProcessPoolExecutor:
+        """The worker pool, started on first use."""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def search(self, pattern: str, regex: bool = False, ignore_case: bool = True,
+               services: Optional[Iterable[str]] = None, start: Optional[float] = None,
+               end: Optional[float] = None, min_level: str = "DEBUG", limit: int = 100,
+               timeout: float = 30.0) -> LogSearch:
+        """
+        Start a search for log lines whose message matches `pattern`.
+
+        Args:
+            pattern: Substring, or regular expression if `regex` is set
+            regex: Treat `pattern` as a regular expression
+            ignore_case: Case-insensitive match (ASCII)
+            services: Service names to include (case-insensitive; all if None)
+            start: Window start, epoch seconds (unbounded if None)
+            end: Window end, epoch seconds (unbounded if None)
+            min_level: Lowest level to include (DEBUG, INFO, WARN, ERROR)
+            limit: Maximum matches (capped at MAX_QUERY_RESULTS)
+            timeout: Give up after this many seconds
+
+        Raises:
+            ValueError: If the pattern or level is invalid
+        """
+        if not pattern:
+            raise ValueError("Pattern must not be empty")
+        raw = pattern.encode("utf-8")
+        if not regex:
+            raw = re.escape(raw)
+        flags = re.IGNORECASE if ignore_case else 0
+        try:
+            _compile(raw, flags)
+        except re.error as e:
+            raise ValueError(f"Invalid regex: {e}")
+        min_rank = LEVELS.index(normalize_level(min_level))
+        limit = max(1, min(limit, MAX_QUERY_RESULTS))
+        start_ms = int(start * 1000) if start is not None else 0
+        end_ms = int(end * 1000) if end is not None else 2 ** 62
+        service_set = None
+        if services is not None:
+            service_set = frozenset(s.lower().translate(_ESCAPES).encode("utf-8") for s in services)
+
+        ranges = self.store.candidate_ranges(services, start_ms, end_ms, min_rank, self.chunk_bytes)
+        levels = frozenset(level.encode() for level in LEVELS[min_rank:])
+        scan_args = (raw, flags, start_ms, end_ms, service_set, levels, limit)
+        return LogSearch(self, ranges, scan_args, limit, timeout)
+
+
+# Global log search engine over log_store
+log_search = LogSearchEngine(log_store)
@@ -0,0 +1,658 @@
+"""
+Segmented technical log store.
+
+Logs are appended to fixed-size segment files as one tab-separated line per
+record (epoch milliseconds, level, service, message). Each segment keeps a
+sparse index over fixed-size blocks: the time range, levels and services seen
+in each block. Queries use the index to skip segments and blocks that cannot
+match and read only the remaining blocks through mmap, so a lookup for a few
+services over a short window stays cheap no matter how much log volume sits
+around it.
+
+Segments are sealed once they reach `max_segment_bytes`; a sealed segment's
+index is written next to it as JSON so it does not have to be rebuilt on
+startup. Appends are single O_APPEND writes of whole lines, so several
+processes can share a directory; each picks up the others' writes on its
+next query.
+
+CLI:
+    python logstore.py --dir /var/lib/incident-logs ingest app-logs.ndjson
+    python logstore.py --dir /var/lib/incident-logs query --service "Redis Cache" --since 3600 --level ERROR
+"""
+import atexit
+import heapq
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from ingest import MAX_REPORTED_ERRORS, NDJSONParser
+from models import Incident, IncidentStatus
+
+LEVELS = ["DEBUG", "INFO", "WARN", "ERROR"]
+_LEVEL_RANKS = {level: rank for rank, level in enumerate(LEVELS)}
+_LEVEL_ALIASES = {"WARNING": "WARN", "CRITICAL": "ERROR", "FATAL": "ERROR"}
+
+# Hard cap on records returned by a single query
+MAX_QUERY_RESULTS = 1000
+
+# How far either side of an incident its logs are looked up
+LOG_WINDOW_PADDING = timedelta(minutes=15)
+
+_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+_UNESCAPES = {"\\\\": "\\", "\\t": "\t", "\\n": "\n", "\\r": "\r"}
+
+
+def _unescape(text: str) -> str:
+    if "\\" not in text:
+        return text
+    out, i = [], 0
+    while i < len(text):
+        pair = text[i:i + 2]
+        if pair in _UNESCAPES:
+            out.append(_UNESCAPES[pair])
+            i += 2
+        else:
+            out.append(text[i])
+            i += 1
+    return "".join(out)
+
+
+def normalize_level(level: str) -> str:
+    """
+    Canonical level name.
+
+    Raises:
+        ValueError: If the level is unknown
+    """
+    level = level.strip().upper()
+    level = _LEVEL_ALIASES.get(level, level)
+    if level not in _LEVEL_RANKS:
+        raise ValueError(f"Invalid level: {level}. Must be one of: {', '.join(LEVELS)}")
+    return level
+
+
+@dataclass
+class LogRecord:
+    """A single technical log line."""
+    timestamp: float  # epoch seconds
+    level: str
+    service: str
+    message: str
+
+    def to_dict(self) -> dict:
+        """Convert to dictionary."""
+        return {
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat(timespec="milliseconds"),
+            "level": self.level,
+            "service": self.service,
+            "message": self.message,
+        }
+
+    def encode(self) -> bytes:
+        """Encode as one segment line."""
+        return (f"{int(self.timestamp * 1000)}\t{self.level}\t{self.service.translate(_ESCAPES)}"
+                f"\t{self.message.translate(_ESCAPES)}\n").encode("utf-8")
+
+    @classmethod
+    def decode(cls, line: bytes) -> "LogRecord":
+        """Decode one segment line (without the trailing newline)."""
+        ts, level, service, message = line.decode("utf-8", "replace").split("\t", 3)
+        return cls(int(ts) / 1000, level, _unescape(service), _unescape(message))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LogRecord":
+        """
+        Build a record from an ingested row.
+
+        `timestamp` may be epoch seconds or ISO 8601; it defaults to now.
+
+        Raises:
+            ValueError: If the row is invalid
+        """
+        if "__error__" in data:
+            raise ValueError(data["__error__"])
+        for required in ("service", "message"):
+            if not data.get(required):
+                raise ValueError(f"Missing required field: {required}")
+        ts = data.get("timestamp")
+        try:
+            if ts is None or ts == "":
+                ts = time.time()
+            elif isinstance(ts, (int, float)):
+                ts = float(ts)
+            else:
+                ts = datetime.fromisoformat(str(ts)).timestamp()
+        except ValueError as e:
+            raise ValueError(f"Invalid timestamp: {e}")
+        return cls(ts, normalize_level(str(data.get("level") or "INFO")),
+                   str(data["service"]), str(data["message"]))
+
+
+def _scan_block(data: bytes, services: Optional[Set[str]]) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yield (offset, line) for lines in a block that may belong to `services`.
+
+    With a service filter, candidate lines are located by searching the
+    lower-cased block for each "\t<service>\t" needle, which runs in C and
+    touches only the matching lines in Python.
+    """
+    if services is None:
+        position = 0
+        for line in data.split(b"\n"):
+            if line:
+                yield position, line
+            position += len(line) + 1
+        return
+    lowered = data.lower()
+    starts = set()
+    for service in services:
+        needle = b"\t" + service.translate(_ESCAPES).encode("utf-8") + b"\t"
+        position = lowered.find(needle)
+        while position >= 0:
+            starts.add(lowered.rfind(b"\n", 0, position) + 1)
+            position = lowered.find(needle, position + len(needle))
+    for start in sorted(starts):
+        end = data.find(b"\n", start)
+        yield start, data[start:end if end >= 0 else len(data)]
+
+
+class Segment:
+    """
+    One append-only segment file and its sparse block index.
+
+    Blocks are consecutive runs of whole lines of roughly `block_size` bytes.
+    For each block the index keeps its start offset, min/max timestamp and a
+    bitmask of levels; `services` maps each lower-cased service name to the
+    blocks it appears in.
+    """
+
+    def __init__(self, path: str, block_size: int):
+        self.path = path
+        self.block_size = block_size
+        self.size = 0  # bytes indexed, always at a line boundary
+        self.block_offsets: List[int] = []
+        self.block_min_ts: List[int] = []
+        self.block_max_ts: List[int] = []
+        self.block_levels: List[int] = []
+        self.services: Dict[str, Set[int]] = {}
+        self.min_ts = 2 ** 62
+        self.max_ts = 0
+        self.sealed = False
+        self._mmap: Optional[mmap.mmap] = None
+        self._mmap_size = 0
+
+    @property
+    def index_path(self) -> str:
+        return self.path[:-len(".log")] + ".idx"
+
+    def index_bytes(self, data: bytes, offset: int) -> None:
+        """Index whole lines in `data`, which starts at file `offset`."""
+        if offset != self.size:
+            raise ValueError(f"Index gap in {self.path}: at {self.size}, got {offset}")
+        position = 0
+        end = len(data)
+        while position < end:
+            newline = data.find(b"\n", position)
+            if newline < 0:
+                break
+            line_offset = offset + position
+            if not self.block_offsets or line_offset - self.block_offsets[-1] >= self.block_size:
+                self.block_offsets.append(line_offset)
+                self.block_min_ts.append(2 ** 62)
+                self.block_max_ts.append(0)
+                self.block_levels.append(0)
+            block = len(self.block_offsets) - 1
+            try:
+                ts, level, service, _ = data[position:newline].split(b"\t", 3)
+                ts = int(ts)
+            except ValueError:
+                # Torn line left by a crashed writer; queries skip it too
+                position = newline + 1
+                continue
+            if ts < self.block_min_ts[block]:
+                self.block_min_ts[block] = ts
+            if ts > self.block_max_ts[block]:
+                self.block_max_ts[block] = ts
+            self.block_levels[block] |= 1 << _LEVEL_RANKS.get(level.decode("utf-8", "replace"), 0)
+            blocks = self.services.setdefault(_unescape(service.decode("utf-8", "replace")).lower(), set())
+            blocks.add(block)
+            position = newline + 1
+        self.size = offset + position
+        if self.block_offsets:
+            self.min_ts = min(self.block_min_ts)
+            self.max_ts = max(self.block_max_ts)
+
+    def catch_up(self) -> None:
+        """Index bytes appended to the file since the last call."""
+        file_size = os.path.getsize(self.path)
+        if file_size <= self.size:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.size)
+            self.index_bytes(f.read(file_size - self.size), self.size)
+
+    def seal(self) -> None:
+        """Mark the segment read-only and persist its index."""
+        self.catch_up()
+        self.sealed = True
+        index = {
+            "size": self.size,
+            "block_size": self.block_size,
+            "blocks": list(zip(self.block_offsets, self.block_min_ts, self.block_max_ts, self.block_levels)),
+            "services": {service: sorted(blocks) for service, blocks in self.services.items()},
+        }
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def load_index(self) -> bool:
+        """Load a persisted index if it still matches the file."""
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if index.get("size") != os.path.getsize(self.path) or index.get("block_size") != self.block_size:
+            return False
+        self.size = index["size"]
+        for offset, min_ts, max_ts, levels in index["blocks"]:
+            self.block_offsets.append(offset)
+            self.block_min_ts.append(min_ts)
+            self.block_max_ts.append(max_ts)
+            self.block_levels.append(levels)
+        self.services = {service: set(blocks) for service, blocks in index["services"].items()}
+        if self.block_offsets:
+            self.min_ts = min(self.block_min_ts)
+            self.max_ts = max(self.block_max_ts)
+        self.sealed = True
+        return True
+
+    def view(self) -> Optional[mmap.mmap]:
+        """Read-only mmap of the indexed part of the file."""
+        if self.size == 0:
+            return None
+        if self._mmap is None or self._mmap_size < self.size:
+            if self._mmap is not None:
+                self._mmap.close()
+            with open(self.path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mmap_size = len(self._mmap)
+        return self._mmap
+
+    def block_range(self, block: int) -> tuple:
+        """Byte range [start, end) of a block."""
+        end = self.block_offsets[block + 1] if block + 1 < len(self.block_offsets) else self.size
+        return self.block_offsets[block], end
+
+    def candidate_blocks(self, services: Optional[Set[str]], start_ms: int, end_ms: int,
+                         min_rank: int) -> List[int]:
+        """Blocks that may hold matching records, according to the index."""
+        if services is None:
+            blocks = range(len(self.block_offsets))
+        else:
+            found = set()
+            for service in services:
+                found |= self.services.get(service, set())
+            blocks = found
+        return [
+            b for b in blocks
+            if self.block_max_ts[b] >= start_ms and self.block_min_ts[b] <= end_ms
+            and self.block_levels[b] >> min_rank
+        ]
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+class LogStore:
+    """
+    Append-only store of technical logs split into indexed segments.
+
+    Usage:
+        store = LogStore("/var/lib/incident-logs")
+        store.append([LogRecord(time.time(), "ERROR", "Redis Cache", "Timeout")])
+        store.query(services=["Redis Cache"], start=time.time() - 3600, min_level="WARN")
+    """
+
+    def __init__(self, directory: str, max_segment_bytes: int = 64 << 20, block_size: int = 64 << 10):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.block_size = block_size
+        self.segments: List[Segment] = []
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.refresh()
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"segment-{number:08d}.log")
+
+    def refresh(self) -> None:
+        """Pick up segments and appends written by other processes."""
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self) -> None:
+        names = sorted(n for n in os.listdir(self.directory)
+                       if n.startswith("segment-") and n.endswith(".log"))
+        known = {os.path.basename(s.path) for s in self.segments}
+        for name in names:
+            if name in known:
+                continue
+            segment = Segment(os.path.join(self.directory, name), self.block_size)
+            if not segment.load_index():
+                segment.catch_up()
+            self.segments.append(segment)
+        for position, segment in enumerate(self.segments):
+            if not segment.sealed:
+                segment.catch_up()
+                # Another process rolled over to a newer segment
+                segment.sealed = position < len(self.segments) - 1
+
+    def append(self, records: Iterable[LogRecord]) -> int:
+        """
+        Append records to the active segment.
+
+        The batch is written with a single O_APPEND write so concurrent
+        writers never interleave partial lines.
+
+        Returns:
+            Number of records appended
+        """
+        lines = [record.encode() for record in records]
+        if not lines:
+            return 0
+        data = b"".join(lines)
+        with self._lock:
+            self._refresh()
+            active = self.segments[-1] if self.segments else None
+            if active is None or active.size >= self.max_segment_bytes:
+                number = int(os.path.basename(active.path)[8:16]) + 1 if active else 1
+                if active is not None:
+                    active.seal()
+                active = Segment(self._segment_path(number), self.block_size)
+                self.segments.append(active)
+            fd = os.open(active.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+            active.catch_up()
+        return len(lines)
+
+    def query(self, services: Optional[Iterable[str]] = None, start: Optional[float] = None,
+              end: Optional[float] = None, min_level: str = "DEBUG", limit: int = 100) -> dict:
+        """
+        Find log records for services in a time window.
+
+        The newest `limit` matches (capped at MAX_QUERY_RESULTS) are returned
+        in time order.
+
+        Args:
+            services: Service names to include (case-insensitive; all if None)
+            start: Window start, epoch seconds (inclusive; unbounded if None)
+            end: Window end, epoch seconds (inclusive; unbounded if None)
+            min_level: Lowest level to include (DEBUG, INFO, WARN, ERROR)
+            limit: Maximum records to return
+
+        Returns:
+            {"records": [...], "truncated": bool, "segments_scanned": n, "blocks_scanned": n}
+        """
+        min_rank = _LEVEL_RANKS[normalize_level(min_level)]
+        limit = max(1, min(limit, MAX_QUERY_RESULTS))
+        wanted = {s.lower() for s in services} if services is not None else None
+        start_ms = int(start * 1000) if start is not None else 0
+        end_ms = int(end * 1000) if end is not None else 2 ** 62
+        allowed = {level.encode() for level in LEVELS[min_rank:]}
+
+        with self._lock:
+            self._refresh()
+            # (max_ts, segment, block) for every block the index cannot rule out
+            candidates = []
+            for segment in self.segments:
+                if segment.max_ts < start_ms or segment.min_ts > end_ms:
+                    continue
+                for block in segment.candidate_blocks(wanted, start_ms, end_ms, min_rank):
+                    candidates.append((segment.block_max_ts[block], segment, block))
+            candidates.sort(key=lambda c: c[0], reverse=True)
+
+            # Newest-first scan with a bounded min-heap of the newest matches;
+            # stop once no remaining block can beat the oldest one kept
+            heap: List[tuple] = []
+            matched = 0
+            segments_scanned: Set[str] = set()
+            blocks_scanned = 0
+            for max_ts, segment, block in candidates:
+                if len(heap) == limit and max_ts < heap[0][0]:
+                    break
+                blocks_scanned += 1
+                segments_scanned.add(segment.path)
+                block_start, block_end = segment.block_range(block)
+                data = segment.view()[block_start:block_end]
+                for position, line in _scan_block(data, wanted):
+                    try:
+                        ts, level, service, _ = line.split(b"\t", 3)
+                        ts = int(ts)
+                    except ValueError:
+                        continue
+                    if ts < start_ms or ts > end_ms or level not in allowed:
+                        continue
+                    if wanted is not None and _unescape(service.decode("utf-8", "replace")).lower() not in wanted:
+                        continue
+                    matched += 1
+                    entry = (ts, block_start + position, line)
+                    if len(heap) < limit:
+                        heapq.heappush(heap, entry)
+                    elif entry > heap[0]:
+                        heapq.heapreplace(heap, entry)
+
+        records = [LogRecord.decode(line) for _, _, line in sorted(heap)]
+        return {
+            "records": records,
+            "truncated": matched > len(records),
+            "segments_scanned": len(segments_scanned),
+            "blocks_scanned": blocks_scanned,
+        }
+
+    def candidate_ranges(self, services: Optional[Iterable[str]], start_ms: int, end_ms: int,
+                         min_rank: int, max_bytes: int) -> List[Tuple[int, str, int, int]]:
+        """
+        Byte ranges the index cannot rule out for a query: runs of adjacent
+        candidate blocks per segment, split at `max_bytes`.
+
+        Returns:
+            (min_ts, segment path, start, end) tuples sorted by min_ts
+        """
+        wanted = {s.lower() for s in services} if services is not None else None
+        ranges = []
+        with self._lock:
+            self._refresh()
+            for segment in self.segments:
+                if segment.max_ts < start_ms or segment.min_ts > end_ms:
+                    continue
+                run = None  # [min_ts, start, end]
+                for block in sorted(segment.candidate_blocks(wanted, start_ms, end_ms, min_rank)):
+                    block_start, block_end = segment.block_range(block)
+                    if run and run[2] == block_start and block_end - run[1] <= max_bytes:
+                        run[0] = min(run[0], segment.block_min_ts[block])
+                        run[2] = block_end
+                        continue
+                    if run:
+                        ranges.append((run[0], segment.path, run[1], run[2]))
+                    run = [segment.block_min_ts[block], block_start, block_end]
+                if run:
+                    ranges.append((run[0], segment.path, run[1], run[2]))
+        ranges.sort(key=lambda r: r[0])
+        return ranges
+
+    def stats(self) -> dict:
+        """Segment count and total size."""
+        with self._lock:
+            self._refresh()
+            return {
+                "directory": self.directory,
+                "segments": len(self.segments),
+                "bytes": sum(s.size for s in self.segments),
+                "blocks": sum(len(s.block_offsets) for s in self.segments),
+            }
+
+    def close(self) -> None:
+        for segment in self.segments:
+            segment.close()
+
+
+def incident_log_window(incident: Incident) -> Tuple[datetime, datetime]:
+    """
+    Time window of logs relevant to an incident: from shortly before it was
+    opened until now, or until shortly after it was resolved.
+    """
+    start = incident.created_at - LOG_WINDOW_PADDING
+    end = datetime.now()
+    if incident.status in (IncidentStatus.RESOLVED, IncidentStatus.CLOSED):
+        end = incident.updated_at + LOG_WINDOW_PADDING
+    return start, end
+
+
+class LogIngestor:
+    """
+    Parses NDJSON log rows and appends them in batches.
+
+    Usage:
+        ingestor = LogIngestor(log_store)
+        for chunk in chunks:
+            ingestor.feed(chunk)
+        report = ingestor.finish()
+    """
+
+    def __init__(self, store: LogStore, batch_size: int = 10_000):
+        self.store = store
+        self.parser = NDJSONParser()
+        self.batch_size = batch_size
+        self.batch: List[LogRecord] = []
+        self.rows = 0
+        self.appended = 0
+        self.rejected = 0
+        self.errors: List[dict] = []
+        self.started = time.perf_counter()
+
+    def feed(self, chunk: bytes) -> None:
+        """Parse a chunk of input and flush any full batches."""
+        self._add_rows(self.parser.feed(chunk))
+
+    def finish(self) -> dict:
+        """Flush the remaining rows and return the ingestion report."""
+        self._add_rows(self.parser.close())
+        self._flush()
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "appended": self.appended,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(self.rows / elapsed, 1) if elapsed else None,
+        }
+
+    def _add_rows(self, rows: Iterable[dict]) -> None:
+        for row in rows:
+            self.rows += 1
+            try:
+                self.batch.append(LogRecord.from_dict(row))
+            except ValueError as e:
+                self.rejected += 1
+                if len(self.errors) < MAX_REPORTED_ERRORS:
+                    self.errors.append({"row": self.rows, "error": str(e)})
+                continue
+            if len(self.batch) >= self.batch_size:
+                self._flush()
+
+    def _flush(self) -> None:
+        self.appended += self.store.append(self.batch)
+        self.batch = []
+
+
+async def ingest_log_stream(chunks: AsyncIterator[bytes], store: LogStore, batch_size: int = 10_000) -> dict:
+    """Ingest an async stream of NDJSON byte chunks (e.g. a request body)."""
+    ingestor = LogIngestor(store, batch_size=batch_size)
+    async for chunk in chunks:
+        ingestor.feed(chunk)
+    return ingestor.finish()
+
+
+def _seed_sample_logs(store: LogStore) -> None:
+    """Sample logs around the demo incident (INC-001) for its affected systems."""
+    now = datetime.now()
+    samples = [
+        (-120, "INFO", "PostgreSQL Primary", "Checkpoint complete: wrote 1843 buffers"),
+        (-45, "ERROR", "PostgreSQL Primary", "Connection pool exhausted. Max connections: 100, Active: 100"),
+        (-40, "ERROR", "Redis Cache", "Cache service unresponsive. Timeout after 5000ms"),
+        (-30, "WARN", "API Gateway", "High latency detected. P95: 3000ms (threshold: 500ms)"),
+        (-10, "ERROR", "PostgreSQL Primary", "Query exceeded statement_timeout (3000ms)"),
+    ]
+    store.append(
+        LogRecord((now + timedelta(seconds=offset)).timestamp(), level, service, message)
+        for offset, level, service, message in samples
+    )
+
+
+def create_log_store() -> LogStore:
+    """
+    Open the log store in LOG_STORE_DIR.
+
+    Without LOG_STORE_DIR, logs go to a fresh temporary directory seeded with
+    sample logs, mirroring the in-memory incident store.
+    """
+    directory = os.getenv("LOG_STORE_DIR")
+    if directory:
+        return LogStore(directory)
+    directory = tempfile.mkdtemp(prefix="incident-logs-")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    store = LogStore(directory)
+    _seed_sample_logs(store)
+    return store
+
+
+# Global log store instance
+log_store = create_log_store()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Technical log store")
+    parser.add_argument("--dir", default=os.getenv("LOG_STORE_DIR"), required=not os.getenv("LOG_STORE_DIR"),
+                        help="Log store directory (defaults to LOG_STORE_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="Append NDJSON log records")
+    ingest.add_argument("path")
+    ingest.add_argument("--batch-size", type=int, default=10_000)
+    query = commands.add_parser("query", help="Query records")
+    query.add_argument("--service", action="append", help="Repeat for several services")
+    query.add_argument("--since", type=float, default=3600, help="Seconds back from now")
+    query.add_argument("--level", default="DEBUG")
+    query.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    cli_store = LogStore(args.dir)
+    if args.command == "ingest":
+        ingestor = LogIngestor(cli_store, batch_size=args.batch_size)
+        with open(args.path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                ingestor.feed(chunk)
+        print(json.dumps({**ingestor.finish(), **cli_store.stats()}, indent=2))
+    else:
+        result = cli_store.query(services=args.service, start=time.time() - args.since,
+                                 min_level=args.level, limit=args.limit)
+        for record in result["records"]:
+            print("\t".join(record.to_dict().values()))
+        print(f"-- {len(result['records'])} records, truncated={result['truncated']}, "
+              f"blocks scanned={result['blocks_scanned']}")
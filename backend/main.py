@@ -1,32 +1,54 @@
 """
 FastAPI application for ChatKit Incident Management Server.
+
+Startup is kept cheap: the Agents SDK, ChatKit and the tool modules are only
+imported on the first chat request, or by the background warm-up task that
+flips /ready once they are loaded.
 """
 import os
 import json
-from typing import Dict, Any
-from dotenv import load_dotenv, find_dotenv
+import asyncio
+from dataclasses import replace
+from datetime import datetime
+from uuid import uuid4
+from typing import Dict, Any, List, Optional
+from dotenv import load_dotenv
 from pathlib import Path
-from fastapi import FastAPI, Request, HTTPException, Depends
+from fastapi import FastAPI, Request, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, JSONResponse, Response
-from chatkit_server import IncidentChatKitServer
-from auth import extract_user_context, AuthenticationError
-from models import IncidentUserContext, Role
-from agents import Runner, ItemHelpers
-from agent import create_incident_agent
+from fastapi.responses import StreamingResponse, JSONResponse, Response, FileResponse
+from auth import extract_user_context, check_permission, AuthenticationError
+from models import IncidentUserContext, IncidentStatus, Role, PERMISSIONS
+from store import incident_store
+from ingest import PARSERS, ingest_stream
+from search import incident_search
+from analytics import incident_columns
+from counters import incident_counters
+from logstore import log_store, ingest_log_stream, incident_log_window
+from logsearch import log_search
+from diagnostics import diagnostics
+from metrics import metrics_store
+from customers import customer_directory, customer_impact
+from penalties import penalty_engine
+from audit import audit_log
+from notifications import notification_service
+from responses import ORJSONResponse, conditional_response, dumps, incident_views
+from persistence import persisted_stores, run_snapshots, shutdown_persistence
+from timeline import incident_timelines
 import traceback
 
-# Load environment variables
+# Load environment variables (a missing .env is fine when the environment
+# is configured directly, e.g. in containers and tests)
 env_path = Path(__file__).parent.parent / ".env"
-load_dotenv(dotenv_path=env_path)
-if not find_dotenv():
-    raise FileNotFoundError("Could not find .env file")
+if not load_dotenv(dotenv_path=env_path):
+    print(f"[INFO] No .env file at {env_path}; using process environment")
 
 # Initialize FastAPI app
 app = FastAPI(
     title="ChatKit Incident Management API",
     description="Enterprise incident management with role-based access control",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -36,14 +58,94 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
-# Initialize ChatKit server
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY environment variable is required")
+    print("[WARN] OPENAI_API_KEY is not set; chat endpoints will return 503")
+
+# ChatKit server, created on first use (see get_chatkit_server)
+_chatkit_server = None
+
+# Set once warm-up has loaded the chat stack and pre-encoded responses
+_ready = False
+_permissions_payloads: Dict[Role, bytes] = {}
+
+
+def get_chatkit_server():
+    """Get the ChatKit server, importing the chat stack on first use."""
+    global _chatkit_server
+    if _chatkit_server is None:
+        from chatkit_server import IncidentChatKitServer
+        _chatkit_server = IncidentChatKitServer()
+    return _chatkit_server
+
+
+def require_model_access() -> None:
+    """Reject chat requests that cannot reach a model."""
+    if not OPENAI_API_KEY and not os.getenv("AGENT_MODEL", "").startswith("stub"):
+        raise HTTPException(
+            status_code=503,
+            detail="OPENAI_API_KEY environment variable is required for chat"
+        )
+
+
+def _encode_permissions(role: Role) -> bytes:
+    """Build the /api/permissions/{role} response body."""
+    from tools import get_tools_for_role
+
+    return dumps({
+        "role": role.value,
+        "permissions": PERMISSIONS[role],
+        "available_tools": [tool.name for tool in get_tools_for_role(role)]
+    })
+
+
+def warm_up() -> None:
+    """
+    Load the chat stack, generate the customer directory, build the agent
+    registry (per role and model tier) and pre-encode static responses.
+    Runs in a worker thread after startup.
+    """
+    global _ready
+    from agent import get_incident_agent
+    from routing import TIERS
+
+    get_chatkit_server()
+    customer_directory.load()
+    from attachments import attachment_blobs
+    attachment_blobs.collect()  # blobs orphaned while the server was down
+    for role in Role:
+        for tier in TIERS:
+            get_incident_agent(role, tier)
+        _permissions_payloads[role] = _encode_permissions(role)
+    _ready = True
 
-chatkit_server = IncidentChatKitServer()
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """
+    Start warm-up, penalty accrual and store snapshots and, with a shared
+    store, follow the other workers.
+    """
+    asyncio.create_task(asyncio.to_thread(warm_up))
+    asyncio.create_task(penalty_engine.run())
+    asyncio.create_task(run_snapshots())
+    if incident_store.backend:
+        asyncio.create_task(incident_store.follow_backend())
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    """
+    Stop the log search worker processes and notification workers, flush
+    the audit log and snapshot the persisted stores.
+    """
+    log_search.shutdown()
+    await notification_service.shutdown()
+    audit_log.close()
+    await shutdown_persistence()
 
 
 @app.get("/")
@@ -56,19 +158,40 @@ async def root():
         "endpoints": {
             "chat": "/api/chat",
             "health": "/health",
-            "permissions": "/api/permissions/{role}"
+            "ready": "/ready",
+            "permissions": "/api/permissions/{role}",
+            "incidents": "/api/incidents",
+            "incident_stream": "/api/incidents/stream"
         }
     }
 
 
 @app.get("/health")
 async def health():
-    """Health check endpoint."""
-    return {
+    """Health check endpoint (liveness: the process is up and serving)."""
+    status = {
         "status": "healthy",
-        "chatkit_server": "initialized",
+        "chatkit_server": "initialized" if _chatkit_server is not None else "deferred",
         "openai_configured": bool(OPENAI_API_KEY)
     }
+    if _chatkit_server is not None and hasattr(_chatkit_server.store, "thread_items"):
+        status["thread_cache"] = _chatkit_server.store.thread_items.stats()
+    if persisted_stores:
+        status["persistence"] = {
+            os.path.basename(persistence.directory): persistence.stats() for persistence in persisted_stores
+        }
+    return status
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness endpoint. Returns 503 until warm-up has loaded the chat stack,
+    so load balancers only route traffic to warm replicas.
+    """
+    if not _ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready"}
 
 
 @app.get("/api/permissions/{role}")
@@ -90,14 +213,10 @@ async def get_permissions(role: str):
             detail=f"Invalid role: {role}. Must be one of: IT, OPS, FINANCE, CSM"
         )
 
-    from models import PERMISSIONS
-    from tools import get_tools_for_role
-
-    return {
-        "role": role_enum.value,
-        "permissions": PERMISSIONS[role_enum],
-        "available_tools": get_tools_for_role(role_enum)
-    }
+    payload = _permissions_payloads.get(role_enum)
+    if payload is None:
+        payload = _permissions_payloads[role_enum] = _encode_permissions(role_enum)
+    return Response(content=payload, media_type="application/json")
 
 
 # Note: /api/chatkit/session endpoint removed - not needed for CustomApiConfig
@@ -124,6 +243,7 @@ async def chat_endpoint(
     Returns:
         StreamingResponse (SSE) or JSONResponse
     """
+    require_model_access()
     try:
         print("[DEBUG] /api/chat endpoint called")
 
@@ -142,7 +262,7 @@ async def chat_endpoint(
         print("[DEBUG] Calling chatkit_server.process()...")
 
         # Process through ChatKit server
-        result = await chatkit_server.process(body, request_context)
+        result = await get_chatkit_server().process(body, request_context)
 
         print(f"[DEBUG] chatkit_server.process() succeeded, result type: {type(result)}")
 
@@ -169,13 +289,11 @@ async def chat_endpoint(
 
     except AuthenticationError as e:
         print(f"[ERROR] AuthenticationError: {str(e)}")
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=403, detail=str(e))
     except Exception as e:
         print(f"[ERROR] Exception in /api/chat: {str(e)}")
         print(f"[ERROR] Exception type: {type(e)}")
-        import traceback
         traceback.print_exc()
         raise HTTPException(
             status_code=500,
@@ -192,16 +310,23 @@ async def simple_chat_endpoint(
     Simplified chat endpoint for testing without full ChatKit protocol.
     Body:
         {
-            "message": "user message here"
+            "message": "user message here",
+            "thread_id": "optional; repeated mutating tool calls within a thread are deduplicated"
         }
 
     Returns:
         {
             "response": "assistant response",
             "tool_calls": [...],
+            "route": {"intent": ..., "tier": ..., "model": ...},
             "context": {...}
         }
     """
+    require_model_access()
+    from agents import Runner, ItemHelpers
+    from agent import get_incident_agent
+    from routing import model_router, recent_turns
+
     try:
         body = await request.json()
         message = body.get("message", "")
@@ -211,16 +336,21 @@ async def simple_chat_endpoint(
         if not message:
             raise HTTPException(status_code=400, detail="Message is required")
 
-        agent = create_incident_agent(user_context.user_context.role)
-        print(f"[DEBUG] Agent created")  # ← Add logging
+        thread_id = body.get("thread_id")
+        previous, acted = recent_turns.last(thread_id)
+        route = model_router.route(user_context.user_context.role, message, previous, acted)
+        agent = get_incident_agent(user_context.user_context.role, route.tier)
+        print(f"[DEBUG] Agent created for {route.tier} tier ({route.intent}, {route.model})")  # ← Add logging
         
         # runner = Runner(agent=agent, ctx=user_context)
         # print(f"[DEBUG] Runner created")  # ← Add logging
 
         response_text = ""
         tool_calls = []
+        tools_run = []
 
-        result = Runner.run_streamed(agent, input=message, context=user_context)
+        run_context = replace(user_context, thread_id=thread_id or f"run-{uuid4().hex}")
+        result = Runner.run_streamed(agent, input=message, context=run_context)
 
         async for event in result.stream_events():
             print(f"[DEBUG] Event: {event.type}")
@@ -238,6 +368,9 @@ async def simple_chat_endpoint(
                     response_text += text
                 
                 
+                elif event.item.type == "tool_call_item":
+                    tools_run.append(getattr(event.item.raw_item, "name", ""))
+
                 elif event.item.type == "tool_call_output_item":
                     print(f"[DEBUG] Tool call output item: {event.item.output}")
                     tool_calls.append({
@@ -259,10 +392,13 @@ async def simple_chat_endpoint(
         print(f"[DEBUG] Response text: repr({response_text})")
         print(f"[DEBUG] Tool calls: {tool_calls}")
         print(f"[DEBUG] Returning response") 
+        if thread_id:
+            recent_turns.remember(thread_id, response_text, tools_run)
 
-        return {
+        return ORJSONResponse({
             "response": response_text,
             "tool_calls": tool_calls,
+            "route": route.to_dict(),
             "context": {
                 "user_id": user_context.user_context.user_id,
                 "role": user_context.user_context.role.value,
@@ -273,7 +409,7 @@ async def simple_chat_endpoint(
                 "display_name": user_context.user_context.display_name,
                 "user_id": user_context.user_context.user_id
             }
-        }
+        })
     except Exception as e:
         print(f"[ERROR] Exception: {str(e)}") 
         print(f"[ERROR] Traceback: {traceback.format_exc()}")
@@ -283,66 +419,725 @@ async def simple_chat_endpoint(
         )
 
 
+@app.post("/api/logs")
+async def ingest_logs(
+    request: Request,
+    batch_size: int = 10_000,
+    user_context: IncidentUserContext = Depends(extract_user_context)
+):
+    """
+    Append technical logs from an NDJSON request body.
+
+    Each line is {"timestamp", "level", "service", "message"}; timestamp may be
+    epoch seconds or ISO 8601. Requires ingest_technical_logs permission.
+
+    Args:
+        batch_size: Records per segment write
+
+    Returns:
+        Ingestion report with row counts, sample errors and rows/sec
+    """
+    if not check_permission(user_context, "ingest_technical_logs"):
+        raise HTTPException(
+            status_code=403,
+            detail=f"Permission denied: {user_context.user_context.display_name} lacks 'ingest_technical_logs' permission"
+        )
+    if not 1 <= batch_size <= 100_000:
+        raise HTTPException(status_code=400, detail="batch_size must be between 1 and 100000")
+
+    return await ingest_log_stream(request.stream(), log_store, batch_size=batch_size)
+
+
+@app.get("/api/logs/search")
+async def search_logs(
+    pattern: str,
+    regex: bool = False,
+    ignore_case: bool = True,
+    incident_id: Optional[str] = None,
+    service: Optional[List[str]] = Query(None),
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    level: str = "DEBUG",
+    limit: int = 100,
+    user_context: IncidentUserContext = Depends(extract_user_context)
+):
+    """
+    Search technical log messages for a substring or regex.
+
+    Segments are scanned in parallel worker processes and matches are
+    streamed back as NDJSON in time order as soon as they are final, followed
+    by a `summary` line. Requires search_technical_logs permission.
+
+    Args:
+        pattern: Text to find, or a regular expression if `regex` is set
+        incident_id: Default `service` and the time window to this incident's
+        service: Services to search (repeatable; all if omitted)
+        start: Window start, ISO 8601
+        end: Window end, ISO 8601
+        level: Lowest level to include (DEBUG, INFO, WARN, ERROR)
+        limit: Maximum matches (up to 1000)
+
+    Returns:
+        StreamingResponse of `match` lines and a final `summary` line
+    """
+    if not check_permission(user_context, "search_technical_logs"):
+        raise HTTPException(
+            status_code=403,
+            detail=f"Permission denied: {user_context.user_context.display_name} lacks 'search_technical_logs' permission"
+        )
+
+    window_start = window_end = None
+    if incident_id:
+        incident = incident_store.get_incident(incident_id)
+        if not incident:
+            raise HTTPException(status_code=404, detail=f"Incident {incident_id} not found")
+        window_start, window_end = incident_log_window(incident)
+        service = service or incident.affected_systems
+    try:
+        window_start = datetime.fromisoformat(start) if start else window_start
+        window_end = datetime.fromisoformat(end) if end else window_end
+        search = log_search.search(
+            pattern,
+            regex=regex,
+            ignore_case=ignore_case,
+            services=service,
+            start=window_start.timestamp() if window_start else None,
+            end=window_end.timestamp() if window_end else None,
+            min_level=level,
+            limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def matches():
+        async for record in search:
+            yield json.dumps({"type": "match", **record.to_dict()}) + "\n"
+        yield json.dumps({"type": "summary", **search.stats()}) + "\n"
+
+    return StreamingResponse(matches(), media_type="application/x-ndjson")
+
+
+@app.post("/api/metrics")
+async def ingest_metrics(
+    request: Request,
+    user_context: IncidentUserContext = Depends(extract_user_context)
+):
+    """
+    Record a batch of metric samples.
+
+    Body:
+        {
+            "samples": [
+                {"system": "Redis Cache", "metric": "hit_rate_pct", "value": 45.0, "timestamp": 1736432591.0}
+            ]
+        }
+
+    `timestamp` is epoch seconds and defaults to now. Requires ingest_metrics
+    permission.
+
+    Returns:
+        Accepted and rejected counts with sample errors
+    """
+    if not check_permission(user_context, "ingest_metrics"):
+        raise HTTPException(
+            status_code=403,
+            detail=f"Permission denied: {user_context.user_context.display_name} lacks 'ingest_metrics' permission"
+        )
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    samples = body.get("samples") if isinstance(body, dict) else None
+    if not isinstance(samples, list):
+        raise HTTPException(status_code=400, detail="Body must be an object with a 'samples' list")
+
+    return metrics_store.ingest(samples)
+
+
+@app.get("/api/notifications/{notification_id}")
+async def get_notification(
+    notification_id: str,
+    user_context: IncidentUserContext = Depends(extract_user_context)
+):
+    """
+    Delivery progress of a customer notification.
+
+    Requires notify_customers permission.
+
+    Args:
+        notification_id: ID returned by notify_customers
+
+    Returns:
+        Status with delivered, failed and pending counts
+    """
+    if not check_permission(user_context, "notify_customers"):
+        raise HTTPException(
+            status_code=403,
+            detail=f"Permission denied: {user_context.user_context.display_name} lacks 'notify_customers' permission"
+        )
+    notification = notification_service.get(notification_id)
+    if not notification:
+        raise HTTPException(status_code=404, detail=f"Notification {notification_id} not found")
+
+    return notification.to_dict()
+
+
+@app.get("/api/audit")
+async def get_audit_log(
+    incident_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    user_context: IncidentUserContext = Depends(extract_user_context)
+):
+    """
+    Audit trail of mutating tool calls, newest first.
+
+    Requires view_audit_log permission.
+
+    Args:
+        incident_id: Only entries for this incident
+        limit: Maximum entries to return
+
+    Returns:
+        Audit entries
+    """
+    if not check_permission(user_context, "view_audit_log"):
+        raise HTTPException(
+            status_code=403,
+            detail=f"Permission denied: {user_context.user_context.display_name} lacks 'view_audit_log' permission"
+        )
+    entries = await asyncio.to_thread(audit_log.history, incident_id, limit)
+    return {"incident_id": incident_id, "entries": entries, "count": len(entries)}
+
+
+async def _form_file_chunks(upload) -> Any:
+    """Read an uploaded form file in chunks."""
+    while chunk := await upload.read(1 << 20):
+        yield chunk
+
+
+async def _load_attachment(attachment_id: str):
+    from chatkit.store import NotFoundError
+    from chat_store import chat_store
+
+    try:
+        return await chat_store.load_attachment(attachment_id, None)
+    except NotFoundError:
+        raise HTTPException(status_code=404, detail=f"Attachment {attachment_id} not found")
+
+
+@app.api_route("/api/attachments/{attachment_id}/upload", methods=["POST", "PUT"])
+async def upload_attachment(
+    attachment_id: str,
+    request: Request,
+    user_context: IncidentUserContext = Depends(extract_user_context)
+):
+    """
+    Receive the content of an attachment created through ChatKit.
+
+    This is the upload URL of ChatKit's two-phase upload. The body is either
+    the raw file or a multipart form with a `file` field, and is streamed
+    into the content-addressed blob store.
+
+    Args:
+        attachment_id: Attachment created by ChatKit
+
+    Returns:
+        Attachment with its content digest and size
+    """
+    from chat_store import chat_store
+    from attachments import attachment_blobs, attachment_digest, MAX_ATTACHMENT_BYTES
+
+    attachment = await _load_attachment(attachment_id)
+    if attachment_digest(attachment):
+        raise HTTPException(status_code=409, detail=f"Attachment {attachment_id} is already uploaded")
+
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form(max_files=1)
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Multipart upload needs a 'file' field")
+        chunks = _form_file_chunks(upload)
+    else:
+        chunks = request.stream()
+
+    try:
+        digest, size = await attachment_blobs.write(chunks, MAX_ATTACHMENT_BYTES)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    attachment = attachment.model_copy(update={
+        "upload_descriptor": None,
+        "metadata": {**(attachment.metadata or {}), "sha256": digest, "size": size,
+                     "uploaded_by": user_context.user_context.user_id},
+    })
+    await chat_store.save_attachment(attachment, None)
+    print(f"[DEBUG] Stored attachment {attachment_id}: {size} bytes, sha256 {digest[:12]}")
+    return attachment.model_dump(mode="json")
+
+
+@app.get("/api/attachments/{attachment_id}")
+async def download_attachment(attachment_id: str):
+    """
+    Serve an attachment's content (also the preview URL of image attachments).
+
+    No identity headers are required, since browsers load previews from
+    <img> tags; the random attachment ID acts as the credential. Range
+    requests are supported.
+
+    Args:
+        attachment_id: Attachment ID
+
+    Returns:
+        The file, streamed from the blob store
+    """
+    from attachments import attachment_blobs, attachment_digest
+
+    attachment = await _load_attachment(attachment_id)
+    digest = attachment_digest(attachment)
+    if not digest or not attachment_blobs.exists(digest):
+        raise HTTPException(status_code=404, detail=f"Attachment {attachment_id} has no content yet")
+    return FileResponse(
+        attachment_blobs.path(digest),
+        media_type=attachment.mime_type,
+        filename=attachment.name,
+        content_disposition_type="inline",
+        headers={"Cache-Control": "private, max-age=31536000, immutable"},
+    )
+
+
 @app.get("/api/incidents")
 async def list_incidents(
+    request: Request,
     user_context: IncidentUserContext = Depends(extract_user_context)
 ):
     """
     List all incidents (filtered by role).
 
+    Supports If-None-Match: returns 304 while no incident has changed since
+    the ETag the client sends. Bodies are gzip/brotli compressed on request.
+
     Returns:
         List of incidents with role-appropriate data
     """
-    from store import incident_store
+    return await conditional_response(request, incident_views.list_body(user_context.user_context.role))
+
+
+@app.post("/api/incidents/bulk")
+async def bulk_ingest_incidents(
+    request: Request,
+    format: str = "ndjson",
+    batch_size: int = 1000,
+    user_context: IncidentUserContext = Depends(extract_user_context)
+):
+    """
+    Bulk-ingest incidents from an NDJSON or CSV request body.
+
+    The body is parsed incrementally as it streams in and written in batches,
+    so uploads of any size use bounded memory. Requires create_incident
+    permission.
+
+    Args:
+        format: Body format (ndjson, csv)
+        batch_size: Incidents per store transaction
+
+    Returns:
+        Ingestion report with row counts, sample errors and rows/sec
+    """
+    if not check_permission(user_context, "create_incident"):
+        raise HTTPException(
+            status_code=403,
+            detail=f"Permission denied: {user_context.user_context.display_name} lacks 'create_incident' permission"
+        )
+    if format not in PARSERS:
+        raise HTTPException(status_code=400, detail=f"Invalid format: {format}. Must be one of: ndjson, csv")
+    if not 1 <= batch_size <= 100_000:
+        raise HTTPException(status_code=400, detail="batch_size must be between 1 and 100000")
+
+    return await ingest_stream(
+        request.stream(),
+        incident_store,
+        fmt=format,
+        created_by=user_context.user_context.user_id,
+        batch_size=batch_size
+    )
+
+
+@app.get("/api/incidents/search")
+async def search_incidents(
+    q: str,
+    limit: int = 10,
+    user_context: IncidentUserContext = Depends(extract_user_context)
+):
+    """
+    Full-text search over incidents (filtered by role).
 
-    incidents = incident_store.list_incidents(role=user_context.user_context.role)
+    Only fields visible to the caller's role are matched and returned.
+
+    Args:
+        q: Search text (title, description, affected systems)
+        limit: Maximum number of results (1-100)
+
+    Returns:
+        Ranked incidents with role-appropriate data and BM25 scores
+    """
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+
+    role = user_context.user_context.role
+    results = []
+    for incident_id, score in incident_search.search(q, role=role, limit=limit):
+        incident = incident_store.get_incident_for_role(incident_id, role)
+        if incident:
+            results.append({**incident, "score": score})
 
     return {
-        "incidents": incidents,
+        "query": q,
+        "incidents": results,
         "user": {
-            "role": user_context.user_context.role.value,
+            "role": role.value,
             "display_name": user_context.user_context.display_name
         },
-        "count": len(incidents)
+        "count": len(results)
+    }
+
+
+@app.get("/api/incidents/stats")
+async def incident_stats(
+    group_by: Optional[str] = None,
+    status: Optional[str] = None,
+    user_context: IncidentUserContext = Depends(extract_user_context)
+):
+    """
+    Aggregate incident metrics (filtered by role).
+
+    Sums and means of cost, SLA penalty, affected customers and hours open,
+    restricted to the metrics whose fields the caller's role can see.
+    Requires view_incident_analytics permission.
+
+    Args:
+        group_by: Group by "priority" or "status" (single total if omitted)
+        status: Comma-separated statuses to include (e.g. OPEN,INVESTIGATING)
+
+    Returns:
+        Per-group and total counts, sums and means
+    """
+    if not check_permission(user_context, "view_incident_analytics"):
+        raise HTTPException(
+            status_code=403,
+            detail=f"Permission denied: {user_context.user_context.display_name} lacks 'view_incident_analytics' permission"
+        )
+
+    role = user_context.user_context.role
+    try:
+        statuses = [IncidentStatus(s.strip().upper()) for s in status.split(",")] if status else None
+        stats = incident_columns.stats_for_role(role, group_by=group_by, status=statuses)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        **stats,
+        "user": {
+            "role": role.value,
+            "display_name": user_context.user_context.display_name
+        }
     }
 
 
+@app.get("/api/incidents/summary")
+async def incident_summary(
+    user_context: IncidentUserContext = Depends(extract_user_context)
+):
+    """
+    Dashboard counters (filtered by role).
+
+    Counts by status and priority, and the count, cost exposure and
+    affected customers of open incidents. Counters are maintained on every
+    change, so this does not walk the incidents.
+
+    Returns:
+        Counters, with only the sums whose fields the role can see
+    """
+    return {
+        **incident_counters.summary(user_context.user_context.role),
+        "user": {
+            "role": user_context.user_context.role.value,
+            "display_name": user_context.user_context.display_name
+        }
+    }
+
+
+@app.get("/api/incidents/snapshot")
+async def incidents_snapshot(
+    user_context: IncidentUserContext = Depends(extract_user_context)
+):
+    """
+    Get a compacted snapshot of all incidents (filtered by role).
+
+    Late joiners load this, then call /api/incidents/stream?since=<seq>.
+
+    Returns:
+        Role-filtered incidents and the change sequence number they reflect
+    """
+    return ORJSONResponse({
+        "seq": incident_store.changes.seq,
+        "incidents": incident_views.list(user_context.user_context.role),
+    })
+
+
+@app.get("/api/incidents/stream")
+async def stream_incident_changes(
+    request: Request,
+    since: Optional[int] = None,
+    user_context: IncidentUserContext = Depends(extract_user_context)
+):
+    """
+    Stream incident changes as Server-Sent Events (filtered by role).
+
+    Args:
+        since: Sequence number to resume after. The Last-Event-ID header is
+            used when omitted. If neither is given, or the change log no longer
+            reaches back that far, a snapshot event is sent first.
+
+    Returns:
+        StreamingResponse (SSE) of `snapshot` and `change` events
+    """
+    role = user_context.user_context.role
+    last_event_id = request.headers.get("last-event-id")
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    feed = incident_store.changes
+
+    def format_event(event: str, seq: int, data: dict) -> bytes:
+        return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+    async def event_stream():
+        # Subscribed here rather than in the handler, so a response that is
+        # never iterated does not leave a subscription behind. Subscribe
+        # before reading the backlog so nothing published in between is lost
+        subscription = feed.subscribe()
+        try:
+            backlog = feed.changes_since(since) if since is not None else None
+            if backlog is None:
+                snapshot = incident_store.snapshot(role=role)
+                last_seq = snapshot["seq"]
+                yield format_event("snapshot", last_seq, snapshot)
+                backlog = []
+            else:
+                last_seq = since
+
+            while True:
+                for change in backlog:
+                    if change.seq <= last_seq:
+                        continue
+                    last_seq = change.seq
+                    view = change.get_filtered_view(role)
+                    if view is not None:
+                        yield format_event("change", change.seq, view)
+
+                if subscription.lagged:
+                    # Too far behind to catch up from the queue; start over
+                    yield format_event("reset", last_seq, {"seq": last_seq})
+                    return
+
+                try:
+                    change = await asyncio.wait_for(subscription.get(), timeout=15)
+                    backlog = [change]
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    backlog = []
+                    yield b": keep-alive\n\n"
+        finally:
+            feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "Connection": "keep-alive"
+        }
+    )
+
+
 @app.get("/api/incidents/{incident_id}")
 async def get_incident(
     incident_id: str,
+    request: Request,
     user_context: IncidentUserContext = Depends(extract_user_context)
 ):
     """
     Get incident details (filtered by role).
 
+    Supports If-None-Match like /api/incidents; the ETag changes with the
+    incident's updated_at.
+
     Args:
         incident_id: Incident ID
 
     Returns:
         Incident details appropriate for user's role
     """
-    from store import incident_store
+    cached = incident_views.detail_body(incident_id, user_context.user_context.role)
+
+    if not cached:
+        raise HTTPException(status_code=404, detail=f"Incident {incident_id} not found")
+
+    return await conditional_response(request, cached)
+
+
+@app.get("/api/incidents/{incident_id}/timeline")
+async def incident_timeline(
+    incident_id: str,
+    after: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    as_of: Optional[datetime] = None,
+    user_context: IncidentUserContext = Depends(extract_user_context)
+):
+    """
+    Incident history, oldest first (filtered by role).
+
+    Each event is one version of the incident with the fields that changed.
+    With as_of, only events up to that time are listed and the incident is
+    returned as it was then.
+
+    Args:
+        incident_id: Incident ID
+        after: Cursor from the previous page; events after this seq
+        limit: Maximum events to return
+        as_of: Point in time (ISO 8601)
+
+    Returns:
+        The incident (as of as_of), a page of events and the next cursor
+    """
+    page = incident_timelines.page(incident_id, user_context.user_context.role, after, limit, as_of)
+    if page is None:
+        raise HTTPException(status_code=404, detail=f"Incident {incident_id} not found")
+    return page
+
+
+@app.get("/api/incidents/{incident_id}/customers")
+async def incident_customers(
+    incident_id: str,
+    segment: Optional[str] = None,
+    sla: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    user_context: IncidentUserContext = Depends(extract_user_context)
+):
+    """
+    Customers affected by an incident.
 
-    incident = incident_store.get_incident_for_role(incident_id, user_context.user_context.role)
+    Counts per segment and SLA tier for every role with
+    view_affected_customers permission; CSM also gets a page of customer
+    records matching the segment/SLA filters.
 
+    Args:
+        incident_id: Incident ID
+        segment: Only customers in this segment
+        sla: Only customers on this SLA tier
+        offset: Customers to skip
+        limit: Maximum customers to return
+
+    Returns:
+        Breakdown, matching count and (CSM) customer records
+    """
+    if not check_permission(user_context, "view_affected_customers"):
+        raise HTTPException(
+            status_code=403,
+            detail=f"Permission denied: {user_context.user_context.display_name} lacks 'view_affected_customers' permission"
+        )
+    incident = incident_store.get_incident(incident_id)
     if not incident:
         raise HTTPException(status_code=404, detail=f"Incident {incident_id} not found")
+    try:
+        page = customer_impact.list(incident, segment, sla, offset, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return {
-        "incident": incident,
-        "user": {
-            "role": user_context.user_context.role.value,
-            "display_name": user_context.user_context.display_name
-        }
-    }
+    result = {"incident_id": incident_id, **customer_impact.breakdown(incident), "matching": page["total"]}
+    if user_context.user_context.role == Role.CSM:
+        result.update(offset=page["offset"], limit=page["limit"], customers=page["customers"])
+    return result
+
+
+@app.get("/api/incidents/{incident_id}/diagnostics")
+async def incident_diagnostics(
+    incident_id: str,
+    probe: Optional[List[str]] = Query(None),
+    user_context: IncidentUserContext = Depends(extract_user_context)
+):
+    """
+    Run diagnostics for an incident.
+
+    Probes run concurrently and each outcome is streamed as an NDJSON line
+    as soon as it finishes; recently cached outcomes return immediately.
+    Requires run_diagnostics permission.
+
+    Args:
+        incident_id: Incident ID
+        probe: Probes to run (repeatable; all if omitted)
+
+    Returns:
+        StreamingResponse of one outcome line per probe
+    """
+    if not check_permission(user_context, "run_diagnostics"):
+        raise HTTPException(
+            status_code=403,
+            detail=f"Permission denied: {user_context.user_context.display_name} lacks 'run_diagnostics' permission"
+        )
+    incident = incident_store.get_incident(incident_id)
+    if not incident:
+        raise HTTPException(status_code=404, detail=f"Incident {incident_id} not found")
+    names = probe or list(diagnostics.probes)
+    unknown = [name for name in names if name not in diagnostics.probes]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown probe: {', '.join(unknown)}. Must be one of: {', '.join(diagnostics.probes)}"
+        )
+
+    async def outcomes():
+        async for outcome in diagnostics.run_all(incident, names):
+            yield json.dumps(outcome) + "\n"
+
+    return StreamingResponse(outcomes(), media_type="application/x-ndjson")
 
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
 
-    # Get host and port from environment
-    host = os.getenv("HOST", "127.0.0.1")
-    port = int(os.getenv("PORT", "8000"))
+    parser = argparse.ArgumentParser(description="ChatKit Incident Management Server")
+    parser.add_argument("--production", action="store_true",
+                        help="Run without auto-reload, with --workers processes")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", "1")),
+                        help="Number of worker processes (production mode only)")
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    args = parser.parse_args()
+
+    host = args.host
+    port = args.port
+    production = args.production or os.getenv("APP_ENV") == "production"
+    workers = args.workers if production else 1
+
+    if workers > 1 and os.getenv("STORE_BACKEND", "memory").lower() == "memory":
+        # In-memory stores would give every worker its own copy of the state
+        print("[INFO] Multiple workers: switching STORE_BACKEND to sqlite for shared state")
+        os.environ["STORE_BACKEND"] = "sqlite"
+    if workers > 1 and not os.getenv("LOG_STORE_DIR"):
+        # Workers must append to and query the same segments
+        print("[INFO] Multiple workers: using ./logs as LOG_STORE_DIR")
+        os.environ["LOG_STORE_DIR"] = "logs"
+    if workers > 1 and not os.getenv("AUDIT_LOG_DIR"):
+        print("[INFO] Multiple workers: using ./audit as AUDIT_LOG_DIR")
+        os.environ["AUDIT_LOG_DIR"] = "audit"
+    if workers > 1 and not os.getenv("ATTACHMENT_DIR"):
+        print("[INFO] Multiple workers: using ./attachments as ATTACHMENT_DIR")
+        os.environ["ATTACHMENT_DIR"] = "attachments"
 
     print(f"""
 ╔══════════════════════════════════════════════════════════════╗
@@ -350,12 +1145,22 @@ if __name__ == "__main__":
 ╠══════════════════════════════════════════════════════════════╣
 ║  Status: Starting...                                         ║
 ║  URL: http://{host}:{port}                            ║
+║  Mode: {"production" if production else "development"}, {workers} worker(s)
 ║                                                              ║
 ║  Endpoints:                                                  ║
 ║    • POST /api/chat          - ChatKit endpoint             ║
 ║    • POST /api/simple-chat   - Simple testing endpoint      ║
 ║    • GET  /api/incidents     - List incidents               ║
+║    • GET  /api/incidents/stream - Incident change feed (SSE)║
+║    • POST /api/incidents/bulk - Bulk NDJSON/CSV ingest      ║
+║    • POST /api/logs          - Technical log ingest         ║
+║    • GET  /api/logs/search   - Parallel log grep (NDJSON)   ║
+║    • POST /api/metrics       - Batched metric samples       ║
+║    • GET  /api/notifications/{{id}} - Notification progress   ║
+║    • GET  /api/audit         - Audit trail of tool actions  ║
+║    • GET  /api/attachments/{{id}} - Attachment content        ║
 ║    • GET  /health            - Health check                 ║
+║    • GET  /ready             - Readiness (warm-up done)     ║
 ║                                                              ║
 ║  Authentication:                                             ║
 ║    Headers: X-User-Role (IT|OPS|FINANCE|CSM)                ║
@@ -367,6 +1172,7 @@ if __name__ == "__main__":
         "main:app",
         host=host,
         port=port,
-        reload=True,
-        log_level="info"
+        reload=not production,
+        workers=workers,
+        log_level="info" if not production else "warning"
     )
@@ -0,0 +1,275 @@
+"""
+In-process time-series metrics.
+
+Samples are kept per (system, metric) in fixed-size NumPy ring buffers at
+three resolutions: 1 second (last hour), 1 minute (last day) and 1 hour
+(last 30 days). Each slot holds the count, sum, min and max of the samples
+that fell into it, so memory per series is fixed and older data is
+downsampled rather than dropped. Queries read only the slots covering the
+requested window, at the finest resolution that covers it, and compute
+summaries, percentiles and rates with NumPy.
+
+Percentiles are taken over per-slot means, which is exact when a series is
+sampled at most once per slot (e.g. a gauge scraped every second).
+"""
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# (seconds per slot, number of slots)
+RESOLUTIONS: Tuple[Tuple[int, int], ...] = ((1, 3600), (60, 1440), (3600, 720))
+
+DEFAULT_PERCENTILES = (50, 95, 99)
+
+# How far ahead of the server clock an ingested timestamp may be. A sample
+# further ahead would move every ring forward and drop current samples.
+MAX_CLOCK_SKEW = 300
+
+
+class Ring:
+    """Fixed-size ring of aggregated slots at one resolution."""
+
+    def __init__(self, resolution: int, slots: int):
+        self.resolution = resolution
+        self.slots = slots
+        self.slot_ids = np.full(slots, -1, dtype=np.int64)
+        self.count = np.zeros(slots, dtype=np.int64)
+        self.sum = np.zeros(slots, dtype=np.float64)
+        self.min = np.full(slots, np.inf)
+        self.max = np.full(slots, -np.inf)
+        self.latest = -1  # newest slot id written
+
+    @property
+    def span(self) -> int:
+        """Seconds of history the ring holds."""
+        return self.resolution * self.slots
+
+    def record(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        """Fold a batch of samples into their slots."""
+        ids = (timestamps // self.resolution).astype(np.int64)
+        newest = max(self.latest, int(ids.max()))
+        # Samples older than the ring's window are gone already
+        keep = ids > newest - self.slots
+        ids, values = ids[keep], values[keep]
+        if not len(ids):
+            return
+        unique_ids, inverse = np.unique(ids, return_inverse=True)
+        positions = unique_ids % self.slots
+        current = self.slot_ids[positions]
+        # A slot now owned by a newer id means the sample's slot was recycled
+        live = unique_ids >= current
+        stale = live & (unique_ids > current)
+        reset = positions[stale]
+        self.slot_ids[reset] = unique_ids[stale]
+        self.count[reset] = 0
+        self.sum[reset] = 0.0
+        self.min[reset] = np.inf
+        self.max[reset] = -np.inf
+
+        sample_live = live[inverse]
+        sample_positions = positions[inverse][sample_live]
+        values = values[sample_live]
+        np.add.at(self.count, sample_positions, 1)
+        np.add.at(self.sum, sample_positions, values)
+        np.minimum.at(self.min, sample_positions, values)
+        np.maximum.at(self.max, sample_positions, values)
+        self.latest = newest
+
+    def window(self, seconds: float, now: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Positions and slot ids of non-empty slots in the last `seconds`
+        up to `now`, oldest first.
+
+        Cost is proportional to the number of slots in the window.
+        """
+        last = int(now // self.resolution)
+        count = min(max(1, math.ceil(seconds / self.resolution)), self.slots)
+        ids = np.arange(last - count + 1, last + 1, dtype=np.int64)
+        positions = ids % self.slots
+        present = (self.slot_ids[positions] == ids) & (self.count[positions] > 0)
+        return positions[present], ids[present]
+
+
+class MetricSeries:
+    """One (system, metric) series at every resolution."""
+
+    def __init__(self, resolutions: Sequence[Tuple[int, int]] = RESOLUTIONS):
+        self.rings = [Ring(resolution, slots) for resolution, slots in resolutions]
+        self.last_value: Optional[float] = None
+        self.last_timestamp = 0.0
+
+    def record(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        for ring in self.rings:
+            ring.record(timestamps, values)
+        newest = int(np.argmax(timestamps))
+        if timestamps[newest] >= self.last_timestamp:
+            self.last_timestamp = float(timestamps[newest])
+            self.last_value = float(values[newest])
+
+    def ring_for(self, window: float) -> Ring:
+        """Finest ring whose history covers the window."""
+        for ring in self.rings:
+            if window <= ring.span:
+                return ring
+        return self.rings[-1]
+
+    def summary(self, window: float, now: float,
+                percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Optional[dict]:
+        """Count, mean, min, max, percentiles and rate over the last `window` seconds."""
+        ring = self.ring_for(window)
+        positions, _ = ring.window(window, now)
+        if not len(positions):
+            return None
+        count = ring.count[positions]
+        sums = ring.sum[positions]
+        total = int(count.sum())
+        means = sums / count
+        result = {
+            "count": total,
+            "mean": round(float(sums.sum() / total), 3),
+            "min": round(float(ring.min[positions].min()), 3),
+            "max": round(float(ring.max[positions].max()), 3),
+            "last": self.last_value,
+            "rate_per_sec": round(float(sums.sum()) / window, 3),
+            "resolution_sec": ring.resolution,
+        }
+        for q, value in zip(percentiles, np.percentile(means, percentiles)):
+            result[f"p{q:g}"] = round(float(value), 3)
+        return result
+
+
+class MetricsStore:
+    """
+    Time series keyed by (system, metric).
+
+    Usage:
+        metrics_store.ingest([{"system": "Redis Cache", "metric": "hit_rate_pct", "value": 45.0}])
+        metrics_store.summary("Redis Cache", "hit_rate_pct", window=300)
+    """
+
+    def __init__(self, resolutions: Sequence[Tuple[int, int]] = RESOLUTIONS):
+        self.resolutions = resolutions
+        self.series: Dict[Tuple[str, str], MetricSeries] = {}
+        self._lock = threading.Lock()
+
+    def record(self, system: str, metric: str, values: Iterable[float],
+               timestamps: Optional[Iterable[float]] = None) -> None:
+        """Record a batch of samples for one series (timestamps default to now)."""
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        if timestamps is None:
+            timestamps = np.full(len(values), time.time())
+        else:
+            timestamps = np.asarray(timestamps, dtype=np.float64)
+        key = (system.lower(), metric)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = MetricSeries(self.resolutions)
+            series.record(timestamps, values)
+
+    def ingest(self, samples: List[dict]) -> dict:
+        """
+        Record a batch of {"system", "metric", "value", "timestamp"?} samples.
+
+        Samples are grouped per series so each series is updated with one
+        vectorized write. `timestamp` is epoch seconds and defaults to now.
+        Timestamps more than MAX_CLOCK_SKEW seconds ahead of now, or older
+        than the coarsest ring's history, are rejected.
+
+        Returns:
+            {"accepted": n, "rejected": n, "errors": [...]}
+        """
+        now = time.time()
+        oldest = now - max(resolution * slots for resolution, slots in self.resolutions)
+        grouped: Dict[Tuple[str, str], Tuple[List[float], List[float]]] = {}
+        errors = []
+        for i, sample in enumerate(samples):
+            try:
+                system, metric = str(sample["system"]), str(sample["metric"])
+                value = float(sample["value"])
+                timestamp = float(sample.get("timestamp") or now)
+                if not system or not metric or not np.isfinite(value):
+                    raise ValueError("system, metric and a finite value are required")
+                if not oldest <= timestamp <= now + MAX_CLOCK_SKEW:
+                    raise ValueError(f"timestamp {timestamp} is outside the retained window "
+                                     f"({oldest:.0f} to {now + MAX_CLOCK_SKEW:.0f})")
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                if len(errors) < 100:
+                    errors.append({"sample": i, "error": f"Invalid sample: {e}"})
+                continue
+            values, timestamps = grouped.setdefault((system, metric), ([], []))
+            values.append(value)
+            timestamps.append(timestamp)
+        for (system, metric), (values, timestamps) in grouped.items():
+            self.record(system, metric, values, timestamps)
+        accepted = sum(len(values) for values, _ in grouped.values())
+        return {"accepted": accepted, "rejected": len(samples) - accepted, "errors": errors}
+
+    def summary(self, system: str, metric: str, window: float = 300, now: Optional[float] = None,
+                percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Optional[dict]:
+        """
+        Summarize a series over the last `window` seconds.
+
+        Returns:
+            {"count", "mean", "min", "max", "last", "rate_per_sec", "p50", ...},
+            or None if the series has no samples in the window
+        """
+        series = self.series.get((system.lower(), metric))
+        if series is None:
+            return None
+        with self._lock:
+            return series.summary(window, now if now is not None else time.time(), percentiles)
+
+    def rate(self, system: str, metric: str, window: float = 60, now: Optional[float] = None) -> float:
+        """Sum of sample values per second over the window (for event counts)."""
+        summary = self.summary(system, metric, window, now, percentiles=())
+        return summary["rate_per_sec"] if summary else 0.0
+
+    def metrics_for(self, system: str) -> List[str]:
+        """Metric names recorded for a system."""
+        system = system.lower()
+        return sorted(metric for s, metric in self.series if s == system)
+
+
+def _seed_sample_metrics(store: MetricsStore, seconds: int = 900) -> None:
+    """Fifteen minutes of per-second readings for the demo incident's systems."""
+    rng = np.random.default_rng(1)
+    now = time.time()
+    timestamps = now - np.arange(seconds)[::-1]
+    readings = {
+        "PostgreSQL Primary": {
+            "query_time_ms": rng.lognormal(np.log(1200), 0.6, seconds),
+            "connections_active": np.clip(rng.normal(95, 3, seconds), 0, 100).round(),
+            "connection_pool_size": np.full(seconds, 100.0),
+        },
+        "Redis Cache": {
+            "hit_rate_pct": np.clip(rng.normal(45, 4, seconds), 0, 100),
+            "memory_usage_pct": np.clip(rng.normal(98, 0.5, seconds), 0, 100),
+            "evictions": rng.poisson(1500, seconds).astype(np.float64),
+        },
+        "API Gateway": {
+            "latency_ms": rng.lognormal(np.log(600), 0.8, seconds),
+            "packet_loss_pct": np.abs(rng.normal(0.01, 0.005, seconds)),
+            "requests": rng.poisson(2000, seconds).astype(np.float64),
+            "errors": rng.poisson(160, seconds).astype(np.float64),
+        },
+    }
+    for system, metrics in readings.items():
+        for metric, values in metrics.items():
+            store.record(system, metric, values, timestamps)
+
+
+def create_metrics_store() -> MetricsStore:
+    """Metrics store seeded with sample readings for the demo incident."""
+    store = MetricsStore()
+    _seed_sample_metrics(store)
+    return store
+
+
+# Global metrics store instance
+metrics_store = create_metrics_store()
@@ -1,6 +1,7 @@
 """
 Data models for incident management system.
 """
+import re
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
@@ -65,6 +66,8 @@ class Incident:
     created_at: datetime
     created_by: str
     updated_at: datetime
+    # Bumped by every update; see IncidentStore.update_incident
+    version: int = 1
 
     def to_dict(self) -> dict:
         """Convert to dictionary."""
@@ -80,59 +83,94 @@ class Incident:
             "sla_penalty": self.sla_penalty,
             "created_at": self.created_at.isoformat(),
             "created_by": self.created_by,
-            "updated_at": self.updated_at.isoformat()
+            "updated_at": self.updated_at.isoformat(),
+            "version": self.version
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "Incident":
+        """Create from a dictionary produced by to_dict()."""
+        return cls(
+            incident_id=data["incident_id"],
+            title=data["title"],
+            description=data["description"],
+            priority=IncidentPriority(data["priority"]),
+            status=IncidentStatus(data["status"]),
+            affected_systems=list(data["affected_systems"]),
+            affected_customers=int(data["affected_customers"]),
+            estimated_cost=float(data["estimated_cost"]),
+            sla_penalty=float(data["sla_penalty"]),
+            created_at=datetime.fromisoformat(data["created_at"]),
+            created_by=data["created_by"],
+            updated_at=datetime.fromisoformat(data["updated_at"]),
+            version=int(data.get("version", 1))
+        )
+
     def get_filtered_view(self, role: Role) -> dict:
         """Get role-filtered view of incident data."""
-        base_data = {
-            "incident_id": self.incident_id,
-            "title": self.title,
-            "priority": self.priority.value,
-            "status": self.status.value,
-        }
+        data = self.to_dict()
+        return {field: data[field] for field in ROLE_INCIDENT_FIELDS[role]}
+
+
+_INCIDENT_NUMBER = re.compile(r"^INC-(\d+)$")
+
+
+class IncidentVersionConflict(Exception):
+    """A compare-and-set update expected a version the incident has moved past."""
 
-        # IT sees technical details
-        if role == Role.IT:
-            base_data.update({
-                "description": self.description,
-                "affected_systems": self.affected_systems,
-            })
-
-        # Ops sees business impact
-        if role == Role.OPS:
-            base_data.update({
-                "description": self.description,
-                "affected_systems": self.affected_systems,
-                "affected_customers": self.affected_customers,
-            })
-
-        # Finance sees cost implications
-        if role == Role.FINANCE:
-            base_data.update({
-                "affected_customers": self.affected_customers,
-                "estimated_cost": self.estimated_cost,
-                "sla_penalty": self.sla_penalty,
-            })
-
-        # CSM sees customer impact
-        if role == Role.CSM:
-            base_data.update({
-                "affected_customers": self.affected_customers,
-                "description": self.description,
-            })
-
-        return base_data
+    def __init__(self, incident_id: str, expected: int, actual: int):
+        super().__init__(f"Incident {incident_id} is at version {actual}, expected {expected}")
+        self.incident_id = incident_id
+        self.expected = expected
+        self.actual = actual
+
+
+def incident_number(incident_id: str) -> int:
+    """Numeric part of an INC-nnn incident ID, or 0 for other ID formats."""
+    match = _INCIDENT_NUMBER.match(incident_id)
+    return int(match.group(1)) if match else 0
+
+
+# Incident fields visible to each role. The first five are shared by everyone;
+# the rest mirror what each department needs:
+#   IT sees technical details, Ops sees business impact,
+#   Finance sees cost implications, CSM sees customer impact.
+_BASE_INCIDENT_FIELDS = ["incident_id", "title", "priority", "status", "version"]
+
+ROLE_INCIDENT_FIELDS = {
+    Role.IT: _BASE_INCIDENT_FIELDS + [
+        "description",
+        "affected_systems",
+    ],
+    Role.OPS: _BASE_INCIDENT_FIELDS + [
+        "description",
+        "affected_systems",
+        "affected_customers",
+    ],
+    Role.FINANCE: _BASE_INCIDENT_FIELDS + [
+        "affected_customers",
+        "estimated_cost",
+        "sla_penalty",
+    ],
+    Role.CSM: _BASE_INCIDENT_FIELDS + [
+        "affected_customers",
+        "description",
+    ],
+}
 
 
 # Permission constants
 PERMISSIONS = {
     Role.IT: [
         "view_technical_logs",
+        "search_technical_logs",
+        "ingest_technical_logs",
+        "ingest_metrics",
         "restart_service",
         "run_diagnostics",
         "view_incident_details",
         "create_incident",
+        "view_audit_log",
     ],
     Role.OPS: [
         "view_incident_details",
@@ -140,6 +178,8 @@ PERMISSIONS = {
         "allocate_resources",
         "view_business_impact",
         "view_affected_customers",
+        "view_incident_analytics",
+        "view_audit_log",
     ],
     Role.FINANCE: [
         "view_incident_details",
@@ -147,6 +187,7 @@ PERMISSIONS = {
         "approve_emergency_spending",
         "view_sla_penalties",
         "view_affected_customers",
+        "view_incident_analytics",
     ],
     Role.CSM: [
         "view_incident_details",
@@ -159,4 +200,5 @@ PERMISSIONS = {
 @dataclass
 class IncidentUserContext:
     user_context: UserContext
+    thread_id: Optional[str] = None  # chat thread or run, for idempotent tool calls
 
@@ -0,0 +1,588 @@
+"""
+Asynchronous customer notification pipeline.
+
+`notify_customers` submits a Notification and returns immediately. A
+background worker resolves the recipients, splits them into batches per
+channel and queues them; workers deliver each batch through its channel
+(log, webhook, SMTP) under the channel's token-bucket rate limit, retrying
+failed recipients with exponential backoff. A customer is never sent the
+same message about the same incident twice: (incident, customer, message
+hash) keys are deduplicated when the recipients are resolved. Progress is
+tracked per notification_id.
+
+Dedup keys and job status live in a NotificationLedger. The default one is
+per process; with STORE_BACKEND=sqlite they are kept in the shared database
+(STORE_DB_PATH), so repeats are skipped and a job's status can be read on
+every worker.
+
+Channels are configured from the environment:
+    NOTIFY_CHANNELS      Comma-separated channels (default: log)
+    NOTIFY_WEBHOOK_URL   Target for the webhook channel
+    NOTIFY_SMTP_HOST     host:port for the smtp channel
+    NOTIFY_<CHANNEL>_RATE  Messages per second for a channel
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from email.message import EmailMessage
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from customers import SEGMENTS, customer_directory, customer_impact
+from idempotency import notification_ids
+from models import Incident
+
+
+@dataclass
+class Recipient:
+    """A customer to notify."""
+    customer_id: str
+    segment: str
+    email: str
+
+
+def resolve_recipients(incident: Incident, segment: str = "all") -> List[Recipient]:
+    """Affected customers of an incident, optionally limited to one segment."""
+    affected = customer_impact.query(incident, None if segment == "all" else segment)
+    return [
+        Recipient(record["customer_id"], record["segment"], record["email"])
+        for record in customer_directory.records(affected.page(0, len(affected)))
+    ]
+
+
+class TokenBucket:
+    """Token-bucket rate limiter: `rate` tokens per second, up to `burst` at once."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait until `tokens` are available and take them."""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= min(tokens, self.burst):
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((min(tokens, self.burst) - self.tokens) / self.rate)
+
+
+class Channel(ABC):
+    """
+    A delivery channel.
+
+    Args:
+        rate: Messages per second (0 for unlimited)
+        batch_size: Recipients per delivery batch
+    """
+
+    name: str = ""
+
+    def __init__(self, rate: float = 0, batch_size: int = 100):
+        self.limiter = TokenBucket(rate, burst=max(rate, batch_size)) if rate else None
+        self.batch_size = batch_size
+
+    @abstractmethod
+    async def send(self, notification: "Notification", recipients: List[Recipient]) -> List[Recipient]:
+        """
+        Deliver a batch.
+
+        Returns:
+            Recipients that failed and may be retried
+
+        Raises:
+            Exception: If the whole batch failed (all recipients are retried)
+        """
+
+
+class LogChannel(Channel):
+    """Writes a line per batch to stdout; always succeeds."""
+
+    name = "log"
+
+    async def send(self, notification: "Notification", recipients: List[Recipient]) -> List[Recipient]:
+        print(f"[DEBUG] {notification.notification_id}: notified {len(recipients)} customers "
+              f"about {notification.incident_id}")
+        return []
+
+
+class WebhookChannel(Channel):
+    """POSTs each batch as JSON to a webhook; a non-2xx response fails the batch."""
+
+    name = "webhook"
+
+    def __init__(self, url: str, rate: float = 0, batch_size: int = 100, timeout: float = 10.0):
+        super().__init__(rate, batch_size)
+        self.url = url
+        self.timeout = timeout
+        self._client = None
+
+    async def send(self, notification: "Notification", recipients: List[Recipient]) -> List[Recipient]:
+        import httpx
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        response = await self._client.post(self.url, json={
+            "notification_id": notification.notification_id,
+            "incident_id": notification.incident_id,
+            "message": notification.message,
+            "recipients": [{"customer_id": r.customer_id, "email": r.email} for r in recipients],
+        })
+        response.raise_for_status()
+        return []
+
+
+class SMTPChannel(Channel):
+    """
+    Sends one email per recipient over a single SMTP connection per batch.
+
+    smtplib is blocking, so batches are sent from a worker thread.
+    Recipients the server refuses are returned for retry. If the connection
+    fails partway through, only the recipients not yet sent are retried.
+    """
+
+    name = "smtp"
+
+    def __init__(self, host: str, port: int = 25, sender: str = "incidents@example.com",
+                 rate: float = 0, batch_size: int = 50, timeout: float = 10.0):
+        super().__init__(rate, batch_size)
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.timeout = timeout
+
+    async def send(self, notification: "Notification", recipients: List[Recipient]) -> List[Recipient]:
+        return await asyncio.to_thread(self._send_batch, notification, recipients)
+
+    def _send_batch(self, notification: "Notification", recipients: List[Recipient]) -> List[Recipient]:
+        failed = []
+        sent = 0
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+                for recipient in recipients:
+                    email = EmailMessage()
+                    email["From"] = self.sender
+                    email["To"] = recipient.email
+                    email["Subject"] = f"[{notification.incident_id}] Service incident update"
+                    email.set_content(notification.message)
+                    try:
+                        smtp.send_message(email)
+                    except smtplib.SMTPRecipientsRefused:
+                        failed.append(recipient)
+                    sent += 1
+        except (smtplib.SMTPException, OSError) as e:
+            if not sent:
+                raise
+            # Those already sent were delivered; resending the batch would duplicate them
+            print(f"[WARN] SMTP batch of {notification.notification_id} stopped after "
+                  f"{sent} of {len(recipients)}: {e}")
+            failed.extend(recipients[sent:])
+        return failed
+
+
+@dataclass
+class Notification:
+    """A notification job and its delivery progress."""
+    notification_id: str
+    incident_id: str
+    message: str
+    customer_segment: str
+    channels: List[str]
+    sent_by: str
+    recipients: int = 0
+    deduplicated: int = 0
+    pending: int = 0  # deliveries (recipient x channel) not yet finished
+    delivered: int = 0
+    failed: int = 0
+    retries: int = 0
+    resolved: bool = False  # recipients resolved and delivery batches queued
+    created_at: datetime = field(default_factory=datetime.now)
+    completed_at: Optional[datetime] = None
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def message_hash(self) -> str:
+        return hashlib.sha256(self.message.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def status(self) -> str:
+        if not self.resolved:
+            return "queued"
+        if self.pending:
+            return "sending" if self.delivered or self.failed else "queued"
+        return "completed_with_errors" if self.failed else "completed"
+
+    def to_dict(self) -> dict:
+        """Convert to dictionary."""
+        total = self.delivered + self.failed + self.pending
+        return {
+            "notification_id": self.notification_id,
+            "incident_id": self.incident_id,
+            "status": self.status,
+            "customer_segment": self.customer_segment,
+            "channels": self.channels,
+            "recipients": self.recipients,
+            "deduplicated": self.deduplicated,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "pending": self.pending,
+            "retries": self.retries,
+            "progress": round((self.delivered + self.failed) / total, 4) if total else float(self.resolved),
+            "sent_by": self.sent_by,
+            "created_at": self.created_at.isoformat(),
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "errors": self.errors,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Notification":
+        """Create from a dictionary produced by to_dict() plus "message" and "resolved"."""
+        names = {f.name for f in fields(cls)}
+        values = {key: value for key, value in data.items() if key in names}
+        values["created_at"] = datetime.fromisoformat(data["created_at"])
+        if data.get("completed_at"):
+            values["completed_at"] = datetime.fromisoformat(data["completed_at"])
+        return cls(**values)
+
+
+# (incident_id, customer_id, message hash)
+DedupKey = Tuple[str, str, str]
+
+
+class NotificationLedger:
+    """
+    Dedup keys and job status of notifications, kept in this process.
+
+    Jobs are tracked by the service that runs them, so this ledger only
+    keeps the keys. Both may be called from worker threads.
+    """
+
+    def __init__(self, max_dedup_keys: int = 1_000_000):
+        self.max_dedup_keys = max_dedup_keys
+        self._sent: "OrderedDict[DedupKey, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, keys: List[DedupKey]) -> List[bool]:
+        """Record keys not seen before; True for each key that was new."""
+        fresh = []
+        with self._lock:
+            for key in keys:
+                fresh.append(key not in self._sent)
+                self._sent[key] = None
+            while len(self._sent) > self.max_dedup_keys:
+                self._sent.popitem(last=False)
+        return fresh
+
+    def release(self, keys: Iterable[DedupKey]) -> None:
+        """Forget keys, so a later notification can reach those customers."""
+        with self._lock:
+            for key in keys:
+                self._sent.pop(key, None)
+
+    def save(self, notification: Notification) -> None:
+        """Record a job's progress for other processes."""
+
+    def load(self, notification_id: str) -> Optional[Notification]:
+        """Latest recorded progress of a job run by another process."""
+        return None
+
+
+class SQLiteNotificationLedger(NotificationLedger):
+    """
+    Ledger in a SQLite (WAL) database shared by every worker.
+
+    Keys are claimed in one write transaction, so two workers resolving the
+    same message never both send it. Beyond the caps, the oldest keys and
+    jobs are dropped.
+    """
+
+    def __init__(self, path: str, max_dedup_keys: int = 1_000_000, max_jobs: int = 10_000):
+        self.max_dedup_keys = max_dedup_keys
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS notification_sent (
+                incident_id TEXT NOT NULL,
+                customer_id TEXT NOT NULL,
+                message_hash TEXT NOT NULL,
+                PRIMARY KEY (incident_id, customer_id, message_hash)
+            );
+            CREATE TABLE IF NOT EXISTS notification_jobs (
+                notification_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL
+            );
+        """)
+
+    def _write(self, fn):
+        """Run `fn(conn)` inside an immediate (write-locked) transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    @staticmethod
+    def _trim(conn: sqlite3.Connection, table: str, keep: int) -> None:
+        """Delete all but the `keep` most recently inserted rows."""
+        conn.execute(f"DELETE FROM {table} WHERE rowid <= (SELECT MAX(rowid) FROM {table}) - ?", (keep,))
+
+    def claim(self, keys: List[DedupKey]) -> List[bool]:
+        def claim(conn):
+            fresh = [
+                bool(conn.execute("INSERT OR IGNORE INTO notification_sent VALUES (?, ?, ?)", key).rowcount)
+                for key in keys
+            ]
+            self._trim(conn, "notification_sent", self.max_dedup_keys)
+            return fresh
+        return self._write(claim)
+
+    def release(self, keys: Iterable[DedupKey]) -> None:
+        self._write(lambda conn: conn.executemany(
+            "DELETE FROM notification_sent WHERE incident_id = ? AND customer_id = ? AND message_hash = ?",
+            list(keys),
+        ))
+
+    def save(self, notification: Notification) -> None:
+        data = {**notification.to_dict(), "message": notification.message, "resolved": notification.resolved}
+
+        def save(conn):
+            conn.execute(
+                "INSERT INTO notification_jobs (notification_id, data) VALUES (?, ?) "
+                "ON CONFLICT (notification_id) DO UPDATE SET data = excluded.data",
+                (notification.notification_id, json.dumps(data)),
+            )
+            self._trim(conn, "notification_jobs", self.max_jobs)
+        self._write(save)
+
+    def load(self, notification_id: str) -> Optional[Notification]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM notification_jobs WHERE notification_id = ?", (notification_id,)
+            ).fetchone()
+        return Notification.from_dict(json.loads(row[0])) if row else None
+
+
+class NotificationService:
+    """
+    Queue and worker pool delivering notifications through channels.
+
+    Workers start on the first submit, on the running event loop. Jobs
+    submitted here are tracked in `notifications`; `ledger` holds the dedup
+    keys and makes job status visible to other processes.
+    """
+
+    def __init__(self, channels: List[Channel], workers: int = 8, max_attempts: int = 4,
+                 backoff: float = 0.5, max_dedup_keys: int = 1_000_000, max_jobs: int = 10_000,
+                 ledger: Optional[NotificationLedger] = None):
+        self.channels: Dict[str, Channel] = {channel.name: channel for channel in channels}
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_jobs = max_jobs
+        self.ledger = ledger or NotificationLedger(max_dedup_keys)
+        self.notifications: "OrderedDict[str, Notification]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _ensure_workers(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, incident: Incident, message: str, customer_segment: str = "all",
+               sent_by: str = "", channels: Optional[List[str]] = None) -> Notification:
+        """
+        Queue a notification to an incident's affected customers.
+
+        Must be called from the event loop. Only validates and queues: a
+        worker resolves the recipients, which for a large incident means
+        building many thousands of records, and queues the delivery batches.
+        Customers who were already sent this message about this incident are
+        skipped.
+
+        Raises:
+            ValueError: If the segment or a channel is unknown
+        """
+        if customer_segment != "all" and customer_segment not in SEGMENTS:
+            raise ValueError(f"Invalid customer_segment: {customer_segment}. "
+                             f"Must be one of: {', '.join(SEGMENTS)}, all")
+        channels = channels or list(self.channels)
+        unknown = [name for name in channels if name not in self.channels]
+        if unknown:
+            raise ValueError(f"Unknown channel: {', '.join(unknown)}. Must be one of: {', '.join(self.channels)}")
+        self._ensure_workers()
+
+        notification = Notification(
+            notification_id=notification_ids.new_id(),
+            incident_id=incident.incident_id,
+            message=message,
+            customer_segment=customer_segment,
+            channels=channels,
+            sent_by=sent_by,
+        )
+        # No channel: the worker resolves the recipients and queues their batches
+        self._queue.put_nowait((notification, None, incident, 0))
+
+        self.notifications[notification.notification_id] = notification
+        while len(self.notifications) > self.max_jobs:
+            self.notifications.popitem(last=False)
+        self._save(notification)
+        return notification
+
+    def get(self, notification_id: str) -> Optional[Notification]:
+        """Look up a notification by ID, including ones submitted on other workers."""
+        return self.notifications.get(notification_id) or self.ledger.load(notification_id)
+
+    def _save(self, notification: Notification) -> None:
+        try:
+            self.ledger.save(notification)
+        except sqlite3.Error as e:
+            print(f"[WARN] Could not record progress of {notification.notification_id}: {e}")
+
+    async def wait(self, notification: Notification, poll: float = 0.01) -> Notification:
+        """Wait until a notification has no pending deliveries."""
+        while notification.pending or not notification.resolved:
+            await asyncio.sleep(poll)
+        return notification
+
+    async def _worker(self) -> None:
+        while True:
+            notification, channel, work, attempt = await self._queue.get()
+            try:
+                if channel is None:
+                    await self._expand(notification, work)
+                else:
+                    await self._deliver(notification, channel, work, attempt)
+            except Exception as e:
+                print(f"[DEBUG] Notification worker error: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _key(self, notification: Notification, recipient: Recipient) -> DedupKey:
+        return notification.incident_id, recipient.customer_id, notification.message_hash
+
+    def _resolve(self, notification: Notification, incident: Incident) -> Tuple[int, List[Recipient]]:
+        """(all recipients, those not yet sent this message); runs in a thread."""
+        recipients = resolve_recipients(incident, notification.customer_segment)
+        claimed = self.ledger.claim([self._key(notification, recipient) for recipient in recipients])
+        return len(recipients), [recipient for recipient, new in zip(recipients, claimed) if new]
+
+    async def _expand(self, notification: Notification, incident: Incident) -> None:
+        """Resolve a notification's recipients, drop already notified ones and queue the batches."""
+        try:
+            total, fresh = await asyncio.to_thread(self._resolve, notification, incident)
+        except Exception as e:
+            notification.errors.append(f"Resolving recipients failed: {e}")
+            total, fresh = 0, []
+        notification.recipients = total
+        notification.deduplicated = total - len(fresh)
+
+        for name in notification.channels:
+            channel = self.channels[name]
+            for start in range(0, len(fresh), channel.batch_size):
+                batch = fresh[start:start + channel.batch_size]
+                notification.pending += len(batch)
+                self._queue.put_nowait((notification, channel, batch, 1))
+        notification.resolved = True
+        if not notification.pending:
+            notification.completed_at = datetime.now()
+        self._save(notification)
+
+    async def _deliver(self, notification: Notification, channel: Channel,
+                       batch: List[Recipient], attempt: int) -> None:
+        if channel.limiter:
+            await channel.limiter.acquire(len(batch))
+        try:
+            failed = await channel.send(notification, batch)
+        except Exception as e:
+            failed = batch
+            if len(notification.errors) < 10:
+                notification.errors.append(f"{channel.name}: {e}")
+        notification.delivered += len(batch) - len(failed)
+        notification.pending -= len(batch) - len(failed)
+
+        if failed and attempt < self.max_attempts:
+            notification.retries += len(failed)
+            delay = self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            asyncio.get_running_loop().call_later(
+                delay, self._queue.put_nowait, (notification, channel, failed, attempt + 1)
+            )
+            self._save(notification)
+            return
+        if failed:
+            notification.failed += len(failed)
+            notification.pending -= len(failed)
+            # Allow a later notification to reach these customers
+            try:
+                self.ledger.release(self._key(notification, recipient) for recipient in failed)
+            except sqlite3.Error as e:
+                print(f"[WARN] Could not release failed recipients of {notification.notification_id}: {e}")
+        if not notification.pending and notification.completed_at is None:
+            notification.completed_at = datetime.now()
+        self._save(notification)
+
+    async def shutdown(self) -> None:
+        """Stop the workers, abandoning queued deliveries."""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._loop = None
+        for channel in self.channels.values():
+            client = getattr(channel, "_client", None)
+            if client is not None:
+                await client.aclose()
+                channel._client = None
+
+
+def create_notification_service() -> NotificationService:
+    """Notification service with channels from NOTIFY_* settings."""
+    channels: List[Channel] = []
+    for name in os.getenv("NOTIFY_CHANNELS", "log").split(","):
+        name = name.strip().lower()
+        rate = float(os.getenv(f"NOTIFY_{name.upper()}_RATE", "0"))
+        if name == "log":
+            channels.append(LogChannel(rate))
+        elif name == "webhook":
+            channels.append(WebhookChannel(os.getenv("NOTIFY_WEBHOOK_URL", "http://127.0.0.1:8025/notify"), rate))
+        elif name == "smtp":
+            host, _, port = os.getenv("NOTIFY_SMTP_HOST", "127.0.0.1:1025").partition(":")
+            channels.append(SMTPChannel(host, int(port or 25), rate=rate))
+        elif name:
+            raise ValueError(f"Unknown notification channel: {name}")
+    ledger = None
+    if os.getenv("STORE_BACKEND", "memory").lower() == "sqlite":
+        ledger = SQLiteNotificationLedger(os.getenv("STORE_DB_PATH", "incident_management.db"))
+    return NotificationService(channels, workers=int(os.getenv("NOTIFY_WORKERS", "8")), ledger=ledger)
+
+
+# Global notification service instance
+notification_service = create_notification_service()
@@ -0,0 +1,227 @@
+"""
+SLA penalty accrual and incident cost projection.
+
+Each affected customer accrues a service credit: a share of their monthly
+contract value that steps up as the incident's downtime crosses their SLA
+tier's thresholds (e.g. 10% once a 99.9% customer has been down 43 minutes,
+25% past 7.2 hours). Per-customer state lives in NumPy arrays per incident:
+the current credit step, the amount accrued and when the customer's next
+threshold falls due. A tick only recomputes customers whose next threshold
+has passed, so an incident with 100k affected customers costs nothing
+between thresholds. A background task ticks every incident being tracked,
+and reads tick the incident they touch, so figures are never staler than
+the last threshold crossing.
+
+Incidents are tracked from their first read. Downtime runs from
+created_at until the incident is resolved or closed (its updated_at).
+"""
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from customers import SLA_TIERS, Bitmap, CustomerDirectory, CustomerImpactIndex, customer_directory, customer_impact
+from models import Incident, IncidentPriority, IncidentStatus
+from store import incident_store
+
+# (downtime minutes, share of monthly contract value credited) per SLA tier.
+# Thresholds are the downtime per 30-day month that takes availability
+# below 99.99%, 99.9%, 99.5%, 99% and 95%.
+SLA_CREDITS = {
+    "99.99%": [(4.32, 0.10), (43.2, 0.25), (432.0, 0.50)],
+    "99.9%": [(43.2, 0.10), (432.0, 0.25), (2160.0, 0.50)],
+    "99.5%": [(216.0, 0.10), (432.0, 0.25), (2160.0, 0.50)],
+    "none": [],
+}
+# Responder cost per hour open, by priority
+LABOR_COST_PER_HOUR = {
+    IncidentPriority.P1: 1200.0,
+    IncidentPriority.P2: 600.0,
+    IncidentPriority.P3: 300.0,
+    IncidentPriority.P4: 150.0,
+}
+PROJECTION_HOURS = (1, 4, 24)
+_ENDED = (IncidentStatus.RESOLVED, IncidentStatus.CLOSED)
+
+_STEPS = max(len(steps) for steps in SLA_CREDITS.values())
+# THRESHOLDS[tier, step]: minutes of downtime to reach step + 1 (inf past the last)
+THRESHOLDS = np.full((len(SLA_TIERS), _STEPS + 1), np.inf)
+# CREDITS[tier, step]: credited share after `step` thresholds
+CREDITS = np.zeros((len(SLA_TIERS), _STEPS + 1))
+for _code, _tier in enumerate(SLA_TIERS):
+    for _step, (_minutes, _credit) in enumerate(SLA_CREDITS[_tier]):
+        THRESHOLDS[_code, _step] = _minutes
+        CREDITS[_code, _step + 1] = _credit
+
+
+def _steps_reached(tiers: np.ndarray, minutes: np.ndarray) -> np.ndarray:
+    """Number of thresholds each customer's downtime has crossed."""
+    return (minutes[:, None] >= THRESHOLDS[tiers]).sum(axis=1).astype(np.int8)
+
+
+@dataclass
+class PenaltyState:
+    """Per-customer accrual arrays for one incident."""
+    affected: Bitmap
+    tier: np.ndarray  # SLA tier code per customer
+    contract: np.ndarray  # monthly contract value per customer
+    since: np.ndarray  # epoch seconds the customer's downtime started
+    step: np.ndarray  # thresholds crossed so far
+    accrued: np.ndarray  # credit accrued so far
+    next_at: np.ndarray  # epoch seconds of the next threshold (inf if none)
+    total: float = 0.0
+    next_event: float = 0.0  # earliest next_at
+    as_of: float = 0.0
+    recomputed: int = 0  # customers updated by the last tick
+
+
+class PenaltyEngine:
+    """
+    Incremental SLA penalty accrual over incidents' affected customers.
+
+    Usage:
+        exposure = penalty_engine.exposure(incident)
+    """
+
+    def __init__(self, directory: CustomerDirectory, impact: CustomerImpactIndex, interval: float = 15.0):
+        self.directory = directory
+        self.impact = impact
+        self.interval = interval
+        self.states: Dict[str, PenaltyState] = {}
+        self._lock = threading.Lock()
+
+    def _build(self, incident: Incident, affected: Bitmap) -> PenaltyState:
+        rows = affected.page(0, len(affected))
+        count = len(rows)
+        return PenaltyState(
+            affected=affected,
+            tier=self.directory.sla[rows],
+            contract=self.directory.contract_value[rows].astype(np.float64),
+            since=np.full(count, incident.created_at.timestamp()),
+            step=np.zeros(count, dtype=np.int8),
+            accrued=np.zeros(count),
+            next_at=np.zeros(count),
+        )
+
+    def _state(self, incident: Incident) -> PenaltyState:
+        """Accrual state for an incident, rebuilt if its affected customers changed."""
+        affected = self.impact.affected(incident)
+        state = self.states.get(incident.incident_id)
+        if state is None or state.affected is not affected:
+            state = self.states[incident.incident_id] = self._build(incident, affected)
+        return state
+
+    @staticmethod
+    def _end(incident: Incident, now: float) -> float:
+        """Epoch seconds downtime has run to."""
+        return min(now, incident.updated_at.timestamp()) if incident.status in _ENDED else now
+
+    def _tick(self, incident: Incident, state: PenaltyState, now: float) -> None:
+        """Advance customers whose next threshold has passed."""
+        end = self._end(incident, now)
+        state.as_of = now
+        state.recomputed = 0
+        if end < state.next_event:
+            return
+        due = np.flatnonzero(state.next_at <= end)
+        tiers = state.tier[due]
+        steps = _steps_reached(tiers, (end - state.since[due]) / 60)
+        accrued = state.contract[due] * CREDITS[tiers, steps]
+        state.total += float((accrued - state.accrued[due]).sum())
+        state.accrued[due] = accrued
+        state.step[due] = steps
+        state.next_at[due] = state.since[due] + THRESHOLDS[tiers, steps] * 60
+        state.next_event = float(state.next_at.min()) if len(state.next_at) else np.inf
+        state.recomputed = len(due)
+
+    def tick(self, now: Optional[float] = None) -> int:
+        """
+        Advance every tracked incident.
+
+        Returns:
+            Number of customers recomputed
+        """
+        now = now if now is not None else time.time()
+        recomputed = 0
+        with self._lock:
+            for incident_id in list(self.states):
+                incident = incident_store.get_incident(incident_id)
+                if incident is None:
+                    del self.states[incident_id]
+                    continue
+                state = self._state(incident)
+                self._tick(incident, state, now)
+                recomputed += state.recomputed
+        return recomputed
+
+    async def run(self) -> None:
+        """Tick every `interval` seconds (started with the app)."""
+        while True:
+            await asyncio.sleep(self.interval)
+            await asyncio.to_thread(self.tick)
+
+    def project(self, incident: Incident, state: PenaltyState, hours: float, now: float) -> float:
+        """Total credit if the incident stays unresolved for `hours` more."""
+        end = self._end(incident, now)
+        if incident.status not in _ENDED:
+            end += hours * 3600
+        steps = _steps_reached(state.tier, (end - state.since) / 60)
+        return float((state.contract * CREDITS[state.tier, steps]).sum())
+
+    def exposure(self, incident: Incident, now: Optional[float] = None,
+                 projection_hours: Sequence[float] = PROJECTION_HOURS) -> dict:
+        """
+        Accrued SLA credits for an incident, by tier, with projections.
+
+        Returns:
+            {"accrued", "customers", "customers_in_breach", "downtime_minutes",
+             "by_sla": {tier: {"customers", "in_breach", "accrued"}},
+             "projected": {"+1h": ..., ...}, "next_threshold_at", "as_of"}
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            state = self._state(incident)
+            self._tick(incident, state, now)
+            counts = np.bincount(state.tier, minlength=len(SLA_TIERS))
+            breached = np.bincount(state.tier, weights=state.step > 0, minlength=len(SLA_TIERS))
+            accrued = np.bincount(state.tier, weights=state.accrued, minlength=len(SLA_TIERS))
+            projected = {f"+{hours:g}h": round(self.project(incident, state, hours, now), 2)
+                         for hours in projection_hours}
+            next_event = state.next_event
+        return {
+            "accrued": round(state.total, 2),
+            "customers": len(state.tier),
+            "customers_in_breach": int(breached.sum()),
+            "downtime_minutes": round((self._end(incident, now) - incident.created_at.timestamp()) / 60, 1),
+            "by_sla": {
+                tier: {"customers": int(counts[i]), "in_breach": int(breached[i]), "accrued": round(float(accrued[i]), 2)}
+                for i, tier in enumerate(SLA_TIERS)
+            },
+            "projected": projected,
+            "next_threshold_at": datetime.fromtimestamp(next_event).isoformat() if np.isfinite(next_event) else None,
+            "as_of": datetime.fromtimestamp(now).isoformat(),
+        }
+
+    def cost(self, incident: Incident, now: Optional[float] = None) -> dict:
+        """
+        Incident cost: the estimated direct (infrastructure) cost, responder
+        labor for the hours open, and accrued customer credits.
+        """
+        now = now if now is not None else time.time()
+        exposure = self.exposure(incident, now)
+        hours_open = (self._end(incident, now) - incident.created_at.timestamp()) / 3600
+        labor = LABOR_COST_PER_HOUR[incident.priority] * max(0.0, hours_open)
+        breakdown = {
+            "infrastructure": incident.estimated_cost,
+            "labor": round(labor, 2),
+            "customer_credits": exposure["accrued"],
+        }
+        return {"total": round(sum(breakdown.values()), 2), "breakdown": breakdown, "penalties": exposure}
+
+
+# Global penalty engine instance
+penalty_engine = PenaltyEngine(customer_directory, customer_impact)
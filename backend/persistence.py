@@ -0,0 +1,505 @@
+"""
+Snapshot plus write-ahead log persistence for the in-memory stores.
+
+The in-memory structures stay the source of truth; this module only makes
+them survive restarts. A store logs every mutation as a msgpack record.
+WriteAheadLog hands records to a writer thread, which appends everything
+that has queued up as one write with one fsync (group commit), so a
+mutation never waits for the disk. A crash loses at most the records that
+were still queued, typically a few milliseconds' worth; flush() waits for
+them when that matters. A failed write or fsync is never counted as
+committed: the writer cuts the segment back to where the batch started and
+retries it, and no snapshot is taken or WAL truncated until it succeeds.
+
+Every few minutes (or after enough records) a snapshot is taken. On the
+event loop, the WAL is rotated and the store captures a copy-on-write view
+of its state: shallow copies of its dicts, whose values are never modified
+in place. A worker thread then serializes that view into a snapshot file.
+WAL segments the snapshot covers are deleted. Recovery loads the newest
+valid snapshot and replays the WAL after it. Records are framed with a
+length and CRC, so a torn write at the tail is detected and cut off.
+
+Persistence is off unless PERSISTENCE_DIR is set, and it only applies to
+the in-memory stores (STORE_BACKEND=memory).
+"""
+import asyncio
+import gc
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+import msgpack
+
+_FRAME = struct.Struct("<II")  # payload length, CRC-32 of payload
+_STOP = object()
+_ROTATE = object()
+
+
+def _frame(payload: bytes) -> bytes:
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _unframe(data: bytes, offset: int) -> Tuple[Optional[bytes], int]:
+    """The payload at `offset` and the next offset, or (None, offset) if torn or corrupt."""
+    if offset + _FRAME.size > len(data):
+        return None, offset
+    length, crc = _FRAME.unpack_from(data, offset)
+    start = offset + _FRAME.size
+    payload = data[start:start + length]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        return None, offset
+    return payload, start + length
+
+
+def _fsync_directory(directory: str) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    """
+    Segmented log of msgpack records with group commit.
+
+    Records get consecutive log sequence numbers (LSNs). Segment files are
+    named after the first LSN they hold. Call replay() once to read the
+    existing log; appending starts a new segment after it.
+
+    Args:
+        directory: Directory holding the segment files
+        fsync: Whether commits are fsynced
+        default: msgpack `default` hook, run in the writer thread
+        queue_size: Records that may wait for the writer before `append` blocks
+        max_batch: Most records written (and fsynced) at once
+        retry_seconds: Wait before retrying a failed write
+    """
+
+    def __init__(self, directory: str, fsync: bool = True, default: Optional[Callable[[Any], Any]] = None,
+                 queue_size: int = 65536, max_batch: int = 4096, retry_seconds: float = 1.0):
+        self.directory = directory
+        self.fsync = fsync
+        self.default = default
+        self.max_batch = max_batch
+        self.retry_seconds = retry_seconds
+        self.lsn = 0
+        self.committed = 0
+        self.commits = 0
+        self.bytes_written = 0
+        self.error: Optional[str] = None  # last write error while the writer is retrying
+        self._stopping = False
+        os.makedirs(directory, exist_ok=True)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._append_lock = threading.Lock()
+        self._committed = threading.Condition()
+        self._fd: Optional[int] = None
+        self._segment_start = 0
+        self._writer: Optional[threading.Thread] = None
+
+    def _segment_path(self, first_lsn: int) -> str:
+        return os.path.join(self.directory, f"wal-{first_lsn:016d}.log")
+
+    def segments(self) -> List[Tuple[int, str]]:
+        """(first LSN, path) of every segment, oldest first."""
+        found = []
+        for name in os.listdir(self.directory):
+            if name.startswith("wal-") and name.endswith(".log"):
+                found.append((int(name[len("wal-"):-len(".log")]), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def replay(self, after: int = 0) -> Iterator[Tuple[int, Any]]:
+        """
+        Yield (lsn, record) for every record after `after`, then start the writer.
+
+        A torn or corrupt record ends the log: the segment is truncated there
+        and any later segments are renamed to *.corrupt and not replayed.
+        """
+        self.lsn = after
+        segments = self.segments()
+        for i, (_, path) in enumerate(segments):
+            with open(path, "rb") as f:
+                data = f.read()
+            offset = 0
+            while offset < len(data):
+                payload, end = _unframe(data, offset)
+                if payload is None:
+                    break
+                lsn, record = msgpack.unpackb(payload, raw=False, strict_map_key=False)
+                offset = end
+                if lsn > self.lsn:
+                    self.lsn = lsn
+                    yield lsn, record
+            if offset < len(data):
+                print(f"[WARN] Truncating torn WAL tail: {path} at byte {offset} of {len(data)}")
+                with open(path, "r+b") as f:
+                    f.truncate(offset)
+                # Keep later segments out of the way of the LSNs about to be reused
+                for _, later in segments[i + 1:]:
+                    print(f"[WARN] Setting aside WAL segment after the torn record: {later}")
+                    os.replace(later, later + ".corrupt")
+                break
+        self.committed = self.lsn
+        self._start()
+
+    def _start(self) -> None:
+        self._open_segment(self.lsn + 1)
+        self._writer = threading.Thread(target=self._write_loop, name="wal-writer", daemon=True)
+        self._writer.start()
+
+    def _open_segment(self, first_lsn: int) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+        self._segment_start = first_lsn
+        self._fd = os.open(self._segment_path(first_lsn), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def append(self, record: Any) -> int:
+        """
+        Queue a record for the writer and return its LSN.
+
+        Blocks only if `queue_size` records are already waiting.
+        """
+        with self._append_lock:
+            self.lsn += 1
+            lsn = self.lsn
+            self._queue.put((lsn, record))
+        return lsn
+
+    def rotate(self) -> int:
+        """
+        Start a new segment for records after the current LSN.
+
+        Returns:
+            The last LSN in the older segments
+        """
+        with self._append_lock:
+            self._queue.put((_ROTATE, self.lsn + 1))
+            return self.lsn
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every record appended so far is committed.
+
+        Returns False on timeout, or as soon as a write fails.
+        """
+        target = self.lsn
+        with self._committed:
+            self._committed.wait_for(lambda: self.committed >= target or self.error is not None, timeout)
+            return self.committed >= target
+
+    def truncate(self, upto: int) -> int:
+        """
+        Delete segments holding only records up to `upto` (e.g. covered by a
+        snapshot). The segment being written is kept.
+
+        Returns:
+            Number of segments deleted
+        """
+        segments = self.segments()
+        deleted = 0
+        for (first, path), (next_first, _) in zip(segments, segments[1:]):
+            if next_first - 1 <= upto and first != self._segment_start:
+                os.unlink(path)
+                deleted += 1
+        return deleted
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            # Group commit: take everything that queued up behind the first record
+            while len(batch) < self.max_batch and batch[-1][0] is not _ROTATE:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.put(_STOP)
+                    break
+                batch.append(item)
+            rotate = batch.pop()[1] if batch[-1][0] is _ROTATE else None
+            if batch and not self._commit(batch):
+                return  # stopped while the disk was failing; the batch is not committed
+            if rotate is not None and rotate != self._segment_start:
+                self._open_segment(rotate)
+
+    def _commit(self, batch: list) -> bool:
+        """Write and fsync a batch, retrying until it succeeds or the log is closed."""
+        data = b"".join(_frame(msgpack.packb(item, default=self.default)) for item in batch)
+        start = None
+        while True:
+            try:
+                if start is None:
+                    start = os.fstat(self._fd).st_size
+                else:
+                    # Drop whatever part of the batch made it, so no torn record is left behind it
+                    os.ftruncate(self._fd, start)
+                pending = data
+                while pending:
+                    pending = pending[os.write(self._fd, pending):]
+                if self.fsync:
+                    os.fsync(self._fd)
+            except OSError as e:
+                print(f"[ERROR] WAL write failed, retrying in {self.retry_seconds:g}s: {e}")
+                with self._committed:
+                    self.error = str(e)
+                    self._committed.notify_all()
+                if self._stopping:
+                    return False
+                time.sleep(self.retry_seconds)
+                continue
+            if self.error is not None:
+                print(f"[INFO] WAL writes recovered in {self.directory}")
+            self.bytes_written += len(data)
+            with self._committed:
+                self.error = None
+                self.committed = batch[-1][0]
+                self.commits += 1
+                self._committed.notify_all()
+            return True
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Commit queued records and stop the writer."""
+        if self._writer is None:
+            return
+        self._stopping = True
+        self._queue.put(_STOP)
+        self._writer.join(timeout)
+        self._writer = None
+        os.close(self._fd)
+        self._fd = None
+
+
+class Persistence:
+    """
+    WAL and snapshots for one in-memory store.
+
+    The store calls recover() once at startup with two callbacks: `restore`
+    loads a snapshot payload and `apply` replays one WAL record. It then
+    calls attach() with its `capture` callback and log() for every
+    mutation. `capture` runs on the thread that mutates the store (the
+    event loop), so nothing changes while it runs. It returns a function
+    that builds the snapshot payload from the captured view, and that
+    function runs in a worker thread.
+
+    Args:
+        directory: Directory for the WAL segments and snapshots
+        snapshot_interval: Seconds between snapshots while records are logged
+        snapshot_records: Records after which a snapshot is taken early
+        fsync: Whether WAL commits and snapshots are fsynced
+        default: msgpack `default` hook for objects in logged records
+    """
+
+    def __init__(self, directory: str, snapshot_interval: float = 300.0, snapshot_records: int = 100_000,
+                 fsync: bool = True, default: Optional[Callable[[Any], Any]] = None):
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_records = snapshot_records
+        self.fsync = fsync
+        self.wal = WriteAheadLog(os.path.join(directory, "wal"), fsync=fsync, default=default)
+        self.capture: Optional[Callable[[], Callable[[], Any]]] = None
+        self.snapshot_lsn = 0
+        self.snapshot_at = time.monotonic()
+        self.snapshots = 0
+        self.last_snapshot: dict = {}
+        self.recovery: dict = {}
+        self._snapshot_lock = threading.Lock()
+
+    def _snapshot_path(self, lsn: int) -> str:
+        return os.path.join(self.directory, f"snapshot-{lsn:016d}.bin")
+
+    def _snapshots(self) -> List[Tuple[int, str]]:
+        found = []
+        for name in os.listdir(self.directory):
+            if name.startswith("snapshot-") and name.endswith(".bin"):
+                found.append((int(name[len("snapshot-"):-len(".bin")]), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def recover(self, restore: Callable[[Any], None], apply: Callable[[Any], None]) -> dict:
+        """
+        Load the newest valid snapshot and replay the WAL after it.
+
+        Returns:
+            Recovery statistics (also kept in `recovery`)
+        """
+        started = time.perf_counter()
+        # Recovery only allocates; collecting the growing heap over and over
+        # would take longer than the load itself
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._recover(restore, apply)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        self.recovery["seconds"] = round(time.perf_counter() - started, 3)
+        return self.recovery
+
+    def _recover(self, restore: Callable[[Any], None], apply: Callable[[Any], None]) -> None:
+        started = time.perf_counter()
+        snapshot_bytes = 0
+        for lsn, path in reversed(self._snapshots()):
+            with open(path, "rb") as f:
+                data = f.read()
+            payload, _ = _unframe(data, 0)
+            if payload is None:
+                print(f"[WARN] Ignoring corrupt snapshot {path}")
+                continue
+            restore(msgpack.unpackb(payload, raw=False, strict_map_key=False))
+            self.snapshot_lsn = lsn
+            snapshot_bytes = len(data)
+            break
+        loaded = time.perf_counter()
+        replayed = 0
+        for _, record in self.wal.replay(after=self.snapshot_lsn):
+            apply(record)
+            replayed += 1
+        self.recovery = {
+            "snapshot_lsn": self.snapshot_lsn,
+            "snapshot_bytes": snapshot_bytes,
+            "snapshot_seconds": round(loaded - started, 3),
+            "wal_records": replayed,
+            "wal_seconds": round(time.perf_counter() - loaded, 3),
+            "lsn": self.wal.lsn,
+        }
+
+    def attach(self, capture: Callable[[], Callable[[], Any]]) -> None:
+        """Register the store's capture callback; snapshots are taken from then on."""
+        self.capture = capture
+        persisted_stores.append(self)
+
+    def log(self, record: Any) -> int:
+        """Append a mutation record; returns its LSN without waiting for disk."""
+        return self.wal.append(record)
+
+    def due(self) -> bool:
+        """Whether a snapshot should be taken now."""
+        pending = self.wal.lsn - self.snapshot_lsn
+        if not pending or self.capture is None or self._snapshot_lock.locked() or self.wal.error:
+            return False
+        return (pending >= self.snapshot_records
+                or time.monotonic() - self.snapshot_at >= self.snapshot_interval)
+
+    def _begin_snapshot(self) -> Tuple[int, Callable[[], Any]]:
+        # Runs on the mutating thread: every record up to `lsn` is in the captured view
+        if self.wal.error:
+            raise OSError(f"WAL writes are failing: {self.wal.error}")
+        lsn = self.wal.rotate()
+        return lsn, self.capture()
+
+    def _write_snapshot(self, lsn: int, dump: Callable[[], Any]) -> dict:
+        started = time.perf_counter()
+        data = _frame(msgpack.packb(dump()))
+        path = self._snapshot_path(lsn)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        if self.fsync:
+            _fsync_directory(self.directory)
+        if self.wal.error:
+            # Keep the older snapshot and segments until the WAL is healthy again
+            raise OSError(f"WAL writes are failing: {self.wal.error}")
+        for old_lsn, old_path in self._snapshots():
+            if old_lsn < lsn:
+                os.unlink(old_path)
+        segments_deleted = self.wal.truncate(lsn)
+        self.snapshot_lsn = lsn
+        self.snapshot_at = time.monotonic()
+        self.snapshots += 1
+        self.last_snapshot = {
+            "lsn": lsn,
+            "bytes": len(data),
+            "seconds": round(time.perf_counter() - started, 3),
+            "wal_segments_deleted": segments_deleted,
+        }
+        return self.last_snapshot
+
+    def snapshot(self) -> dict:
+        """Take a snapshot, blocking; call from the thread that mutates the store."""
+        with self._snapshot_lock:
+            return self._write_snapshot(*self._begin_snapshot())
+
+    async def snapshot_async(self) -> Optional[dict]:
+        """Take a snapshot: capture on the event loop, serialize and write in a thread."""
+        if not self._snapshot_lock.acquire(blocking=False):
+            return None  # one is already being written
+        try:
+            lsn, dump = self._begin_snapshot()
+            return await asyncio.to_thread(self._write_snapshot, lsn, dump)
+        finally:
+            self._snapshot_lock.release()
+
+    def stats(self) -> dict:
+        return {
+            "lsn": self.wal.lsn,
+            "committed": self.wal.committed,
+            "commits": self.wal.commits,
+            "wal_bytes": self.wal.bytes_written,
+            "wal_error": self.wal.error,
+            "snapshot_lsn": self.snapshot_lsn,
+            "snapshots": self.snapshots,
+            "last_snapshot": self.last_snapshot,
+            "recovery": self.recovery,
+        }
+
+    def close(self) -> None:
+        """Commit queued records and stop the WAL writer."""
+        self.wal.close()
+
+
+# Stores whose snapshots run_snapshots() takes
+persisted_stores: List[Persistence] = []
+
+
+async def run_snapshots(check_interval: float = 1.0) -> None:
+    """Take snapshots of the persisted stores when due (started with the app)."""
+    while True:
+        await asyncio.sleep(check_interval)
+        for persistence in list(persisted_stores):
+            if persistence.due():
+                try:
+                    await persistence.snapshot_async()
+                except Exception as e:
+                    print(f"[ERROR] Snapshot of {persistence.directory} failed: {e}")
+
+
+async def shutdown_persistence() -> None:
+    """Snapshot every persisted store that logged records since its last snapshot, then close the WALs."""
+    for persistence in list(persisted_stores):
+        if persistence.wal.lsn > persistence.snapshot_lsn:
+            try:
+                await persistence.snapshot_async()
+            except Exception as e:
+                print(f"[ERROR] Snapshot of {persistence.directory} failed: {e}")
+        persistence.close()
+
+
+def create_persistence(name: str, default: Optional[Callable[[Any], Any]] = None) -> Optional[Persistence]:
+    """
+    Persistence for the in-memory store `name`, in PERSISTENCE_DIR/<name>.
+
+    Returns None (no persistence) unless PERSISTENCE_DIR is set and the
+    stores are in memory. PERSISTENCE_SNAPSHOT_INTERVAL (seconds, default
+    300), PERSISTENCE_SNAPSHOT_RECORDS (default 100000) and
+    PERSISTENCE_FSYNC (default 1) tune it.
+    """
+    directory = os.getenv("PERSISTENCE_DIR")
+    if not directory or os.getenv("STORE_BACKEND", "memory").lower() != "memory":
+        return None
+    return Persistence(
+        os.path.join(directory, name),
+        snapshot_interval=float(os.getenv("PERSISTENCE_SNAPSHOT_INTERVAL", "300")),
+        snapshot_records=int(os.getenv("PERSISTENCE_SNAPSHOT_RECORDS", "100000")),
+        fsync=os.getenv("PERSISTENCE_FSYNC", "1") != "0",
+        default=default,
+    )
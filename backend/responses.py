@@ -0,0 +1,274 @@
+"""
+JSON responses encoded with orjson.
+
+FastAPI runs jsonable_encoder and then json.dumps on every dict a handler
+returns, which for the incident list is most of the request's CPU.
+ORJSONResponse, the app's default response class, encodes with orjson,
+which handles datetimes, enums, dataclasses and NumPy values natively. A
+handler that returns an ORJSONResponse itself also skips jsonable_encoder,
+and can embed pre-encoded JSON as orjson.Fragment values.
+
+IncidentViewCache keeps each incident's role-filtered view pre-encoded and
+drops it whenever the incident changes, so listing incidents is mostly
+copying cached bytes. It also keeps whole incident and incident list bodies
+as CachedBody records with a strong ETag and compressed variants, which
+conditional_response() serves as 304 Not Modified when the client's copy is
+current.
+"""
+import asyncio
+import gzip
+import hashlib
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from models import Incident, Role, UserContext
+from store import IncidentIndex, IncidentStore, incident_store
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 7
+
+# Every cached body depends on the requester's role
+CACHED_BODY_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Accept-Encoding, X-User-Role"}
+
+
+def _default(value: Any) -> Any:
+    """Types orjson does not encode natively."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    # Anything else (e.g. tool outputs of arbitrary types) as FastAPI would
+    return jsonable_encoder(value)
+
+
+def dumps(content: Any) -> bytes:
+    """Encode to JSON bytes; orjson.Fragment values are inserted as they are."""
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CachedBody:
+    """
+    An encoded JSON body with its ETag and compressed variants.
+
+    Compressed variants are made the first time a client accepts them and
+    kept for as long as the body is.
+
+    Args:
+        body: JSON bytes
+        etag: Strong entity tag, without quotes
+        version: What the body was built from, for the owner's staleness check
+    """
+
+    __slots__ = ("body", "etag", "version", "_encoded")
+
+    def __init__(self, body: bytes, etag: str, version: Any = None):
+        self.body = body
+        self.etag = etag
+        self.version = version
+        self._encoded: Dict[str, bytes] = {}
+
+    def is_encoded(self, coding: str) -> bool:
+        return coding == "identity" or coding in self._encoded
+
+    def encoded(self, coding: str) -> bytes:
+        """The body in a content coding ("identity", "gzip" or "br")."""
+        if coding == "identity":
+            return self.body
+        data = self._encoded.get(coding)
+        if data is None:
+            data = self._encoded[coding] = _compress(self.body, coding)
+        return data
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag from the values a body is derived from."""
+    return hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+
+
+def negotiate_encoding(accept_encoding: str, size: int) -> str:
+    """
+    Pick the content coding for a body from an Accept-Encoding header.
+
+    Prefers brotli, then gzip; codings with q=0 are refused.
+    """
+    if size < COMPRESS_MIN_BYTES or not accept_encoding:
+        return "identity"
+    accepted = set()
+    for entry in accept_encoding.lower().split(","):
+        coding, _, params = entry.partition(";")
+        name, _, value = params.strip().partition("=")
+        if name == "q":
+            try:
+                if float(value) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip())
+    for coding in ("br", "gzip"):
+        if coding in accepted or "*" in accepted:
+            if coding == "br" and brotli is None:
+                continue
+            return coding
+    return "identity"
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches `etag`.
+
+    Uses weak comparison, as RFC 9110 requires for If-None-Match, and
+    ignores the content coding suffix added to compressed variants.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip().removeprefix("W/").strip('"')
+        if candidate.split("-", 1)[0] == etag:
+            return True
+    return False
+
+
+async def conditional_response(request: Request, cached: CachedBody) -> Response:
+    """
+    Serve a cached body, or 304 Not Modified if the client already has it.
+
+    Compressed variants get their own ETag ("<etag>-gzip", "<etag>-br"), as
+    they are different representations, but a client holding any of them
+    has the current version. The first compression of a body runs in a
+    worker thread, as a large incident list takes ~100ms to compress.
+    """
+    coding = negotiate_encoding(request.headers.get("accept-encoding", ""), len(cached.body))
+    etag = cached.etag if coding == "identity" else f"{cached.etag}-{coding}"
+    headers = {**CACHED_BODY_HEADERS, "ETag": f'"{etag}"'}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    if coding != "identity":
+        headers["Content-Encoding"] = coding
+    if cached.is_encoded(coding):
+        content = cached.encoded(coding)
+    else:
+        content = await asyncio.to_thread(cached.encoded, coding)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+def _user(role: Role) -> dict:
+    # Display names are per role, so the user block is too
+    return {"role": role.value, "display_name": UserContext("", role, []).display_name}
+
+
+class IncidentViewCache(IncidentIndex):
+    """
+    Pre-encoded role-filtered incident views.
+
+    Views are encoded on first use and dropped on every change the store
+    reports, including changes synced from other workers.
+    """
+
+    def __init__(self, store: IncidentStore):
+        self.store = store
+        self._views: Dict[str, Dict[Role, orjson.Fragment]] = {}
+        self._details: Dict[Tuple[str, Role], CachedBody] = {}
+        self._lists: Dict[Role, CachedBody] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, incident: Incident) -> None:
+        pass  # encoded on first read
+
+    def add_many(self, incidents: List[Incident]) -> None:
+        pass
+
+    def update(self, old: Incident, new: Incident) -> None:
+        self._views.pop(new.incident_id, None)
+        for role in Role:
+            self._details.pop((new.incident_id, role), None)
+
+    def view(self, incident: Incident, role: Role) -> orjson.Fragment:
+        views = self._views.get(incident.incident_id)
+        if views is None:
+            views = self._views[incident.incident_id] = {}
+        fragment = views.get(role)
+        if fragment is None:
+            self.misses += 1
+            fragment = views[role] = orjson.Fragment(dumps(incident.get_filtered_view(role)))
+        else:
+            self.hits += 1
+        return fragment
+
+    def list(self, role: Role) -> List[orjson.Fragment]:
+        """Encoded views of all incidents, in store order."""
+        return [self.view(incident, role) for incident in list(self.store.incidents.values())]
+
+    def detail_body(self, incident_id: str, role: Role) -> Optional[CachedBody]:
+        """
+        The /api/incidents/{incident_id} body for a role, or None if the
+        incident does not exist. The ETag follows the incident's updated_at.
+        """
+        cached = self._details.get((incident_id, role))
+        if cached is None:
+            incident = self.store.get_incident(incident_id)
+            if not incident:
+                return None
+            body = dumps({"incident": self.view(incident, role), "user": _user(role)})
+            etag = make_etag(role.value, incident_id, incident.updated_at.isoformat())
+            cached = self._details[(incident_id, role)] = CachedBody(body, etag)
+        return cached
+
+    def list_body(self, role: Role) -> CachedBody:
+        """
+        The /api/incidents body for a role.
+
+        Rebuilt when the store's change sequence moves on, which every
+        create, update, bulk insert and backend sync does. The ETag also
+        covers the newest updated_at, so a restarted in-memory store (whose
+        sequence starts again at 0) does not reuse old tags.
+        """
+        version = (self.store.changes.seq, len(self.store.incidents))
+        cached = self._lists.get(role)
+        if cached is None or cached.version != version:
+            incidents = list(self.store.incidents.values())
+            body = dumps({
+                "incidents": [self.view(incident, role) for incident in incidents],
+                "user": _user(role),
+                "count": len(incidents),
+            })
+            newest = max((incident.updated_at for incident in incidents), default="")
+            etag = make_etag(role.value, *version, newest)
+            cached = self._lists[role] = CachedBody(body, etag, version)
+        return cached
+
+
+# Global incident view cache instance
+incident_views = IncidentViewCache(incident_store)
+incident_store.register_index(incident_views)
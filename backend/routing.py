@@ -0,0 +1,213 @@
+"""
+Model routing by role and intent.
+
+Each chat message is classified with a few keyword rules (microseconds, no
+model call) into an intent, and the (role, intent) pair picks a model tier:
+greetings and lookups like "what's the status of INC-001" go to the small
+model, reports to the medium one, and anything that changes state, needs
+reasoning or is not recognised goes to the large model. Every tier gets the
+same tools, so a misrouted message still works, only slower or less well.
+
+A short reply such as "yes", "ok" or "do it" classifies as help or
+general, but it may be confirming an action. So when the previous
+assistant turn proposed an action or ran a state-changing tool, such
+replies are routed as actions. `recent_turns` keeps the previous turn per
+chat thread for this.
+
+Configuration:
+    AGENT_MODEL_SMALL, AGENT_MODEL_MEDIUM, AGENT_MODEL_LARGE: model per tier
+        (defaults gpt-5-nano, gpt-5-mini, gpt-5). Setting only AGENT_MODEL
+        pins every tier to that model, e.g. AGENT_MODEL=stub:20.
+    MODEL_ROUTES: comma-separated overrides of the default routes, each
+        "intent=tier" or "ROLE:intent=tier", e.g.
+        "report=large,FINANCE:lookup=medium".
+    MODEL_ROUTE_LONG_CHARS: messages longer than this (default 500) are
+        routed as "general", since they usually ask several things at once.
+"""
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from audit import AUDITED_PERMISSIONS
+from models import Role
+
+TIERS = ["small", "medium", "large"]
+
+DEFAULT_TIER_MODELS = {"small": "gpt-5-nano", "medium": "gpt-5-mini", "large": "gpt-5"}
+
+# Checked in order; the first matching intent wins
+INTENT_RULES: List[Tuple[str, re.Pattern]] = [
+    ("action", re.compile(
+        r"\b(restart|reboot|set|change|raise|lower|escalate|downgrade|allocate|assign|approve|authori[sz]e"
+        r"|notify|inform|email|create|file|open (a|an|new)|spend|resolve|close)\b",
+        re.IGNORECASE)),
+    ("analysis", re.compile(
+        r"\b(why|root cause|caus(e|ed|ing)|analy[sz]e|investigate|diagnos\w*|correlat\w*|compare|recommend"
+        r"|should (we|i)|plan|strategy|explain|trend|predict|forecast|trade-?offs?|post-?mortem|what if)\b",
+        re.IGNORECASE)),
+    ("report", re.compile(
+        r"\b(summar\w*|stats|statistics|how many|totals?|breakdown|analytics|costs?|penalt\w*|spending"
+        r"|impact|affected customers|customers affected|audit|logs?)\b",
+        re.IGNORECASE)),
+    ("lookup", re.compile(
+        r"\b(status|priority|details?|show|list|get|what('s| is| are)|who|when|which|look ?up|find|search"
+        r"|INC-\d+)\b",
+        re.IGNORECASE)),
+    ("help", re.compile(
+        r"^\W*(hi|hello|hey|thanks|thank you|ok(ay)?|help|what can (i|you) do)\b",
+        re.IGNORECASE)),
+]
+INTENTS = [intent for intent, _ in INTENT_RULES] + ["general"]
+
+# Intent -> tier; MODEL_ROUTES may override per intent or per role and intent
+DEFAULT_ROUTES = {
+    "help": "small",
+    "lookup": "small",
+    "report": "medium",
+    "action": "large",
+    "analysis": "large",
+    "general": "large",
+}
+
+LONG_MESSAGE_CHARS = 500
+
+# Messages up to this long, classified as one of FOLLOW_UP_INTENTS, are
+# treated as replies to the previous turn
+FOLLOW_UP_CHARS = 80
+FOLLOW_UP_INTENTS = ("help", "lookup", "general")
+
+# Tools that change state; their names match the audited permissions
+ACTION_TOOLS = frozenset(AUDITED_PERMISSIONS)
+
+_ACTION_RULE = dict(INTENT_RULES)["action"]
+
+
+@dataclass
+class Route:
+    """Where a message was sent and why."""
+    intent: str
+    tier: str
+    model: str
+
+    def to_dict(self) -> dict:
+        """Convert to dictionary."""
+        return {"intent": self.intent, "tier": self.tier, "model": self.model}
+
+
+class ModelRouter:
+    """
+    Picks a model tier per (role, intent).
+
+    Args:
+        routes: Tier per "intent" or "ROLE:intent"; role-specific entries win
+        models: Model name per tier
+        long_message_chars: Messages longer than this are classified as "general"
+    """
+
+    def __init__(self, routes: Dict[str, str], models: Dict[str, str],
+                 long_message_chars: int = LONG_MESSAGE_CHARS):
+        self.routes = routes
+        self.models = models
+        self.long_message_chars = long_message_chars
+        self.counts: Dict[str, int] = {tier: 0 for tier in TIERS}
+
+    def classify(self, message: str) -> str:
+        """The intent of a message: the first rule that matches, else "general"."""
+        if len(message) > self.long_message_chars:
+            return "general"
+        for intent, pattern in INTENT_RULES:
+            if pattern.search(message):
+                return intent
+        return "general"
+
+    def route(self, role: Role, message: str, previous: Optional[str] = None, acted: bool = False) -> Route:
+        """
+        Classify a message and pick the tier for the role.
+
+        Args:
+            role: Caller's role
+            message: The user's message
+            previous: The assistant's previous reply in the conversation, if any
+            acted: Whether the previous turn ran a state-changing tool
+
+        Returns:
+            The route; a short follow-up to a turn that proposed or took an
+            action is routed as "action"
+        """
+        intent = self.classify(message)
+        if (intent in FOLLOW_UP_INTENTS and len(message) <= FOLLOW_UP_CHARS
+                and (acted or (previous and _ACTION_RULE.search(previous)))):
+            intent = "action"
+        tier = self.routes.get(f"{role.value}:{intent}") or self.routes.get(intent, "large")
+        self.counts[tier] += 1
+        return Route(intent=intent, tier=tier, model=self.models[tier])
+
+
+class RecentTurns:
+    """
+    The previous assistant turn per chat thread, for routing follow-ups.
+
+    Args:
+        max_threads: Least recently used threads are forgotten beyond this
+    """
+
+    def __init__(self, max_threads: int = 10_000):
+        self.max_threads = max_threads
+        self._turns: "OrderedDict[str, Tuple[str, bool]]" = OrderedDict()
+
+    def remember(self, thread_id: str, reply: str, tools: Iterable[str] = ()) -> None:
+        """Record a turn's reply and the names of the tools it ran."""
+        self._turns[thread_id] = (reply, any(tool in ACTION_TOOLS for tool in tools))
+        self._turns.move_to_end(thread_id)
+        while len(self._turns) > self.max_threads:
+            self._turns.popitem(last=False)
+
+    def last(self, thread_id: Optional[str]) -> Tuple[Optional[str], bool]:
+        """(reply, ran a state-changing tool) of the thread's previous turn, or (None, False)."""
+        turn = self._turns.get(thread_id) if thread_id else None
+        return turn if turn is not None else (None, False)
+
+
+def parse_routes(spec: str) -> Dict[str, str]:
+    """
+    Parse MODEL_ROUTES ("intent=tier,ROLE:intent=tier,...").
+
+    Raises:
+        ValueError: On an unknown role, intent or tier
+    """
+    routes: Dict[str, str] = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        key, _, tier = entry.partition("=")
+        key, tier = key.strip(), tier.strip().lower()
+        role, _, intent = key.rpartition(":")
+        if role and role.upper() not in Role.__members__:
+            raise ValueError(f"Unknown role in MODEL_ROUTES: {role}")
+        if intent.lower() not in INTENTS:
+            raise ValueError(f"Unknown intent in MODEL_ROUTES: {intent}. Must be one of: {', '.join(INTENTS)}")
+        if tier not in TIERS:
+            raise ValueError(f"Unknown tier in MODEL_ROUTES: {tier}. Must be one of: {', '.join(TIERS)}")
+        routes[f"{role.upper()}:{intent.lower()}" if role else intent.lower()] = tier
+    return routes
+
+
+def create_model_router() -> ModelRouter:
+    """Router configured from AGENT_MODEL*, MODEL_ROUTES and MODEL_ROUTE_LONG_CHARS."""
+    pinned: Optional[str] = os.getenv("AGENT_MODEL")
+    models = {
+        tier: os.getenv(f"AGENT_MODEL_{tier.upper()}") or pinned or DEFAULT_TIER_MODELS[tier]
+        for tier in TIERS
+    }
+    return ModelRouter(
+        routes={**DEFAULT_ROUTES, **parse_routes(os.getenv("MODEL_ROUTES", ""))},
+        models=models,
+        long_message_chars=int(os.getenv("MODEL_ROUTE_LONG_CHARS", str(LONG_MESSAGE_CHARS))),
+    )
+
+
+# Global model router and recent turns instances
+model_router = create_model_router()
+recent_turns = RecentTurns()
@@ -0,0 +1,179 @@
+"""
+Full-text search over incidents.
+
+An in-process inverted index over title, description and affected_systems,
+ranked with BM25 and kept up to date incrementally as IncidentStore creates
+and updates incidents. Searches only match fields the caller's role is
+allowed to see, so results never leak hidden fields.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models import Incident, Role, ROLE_INCIDENT_FIELDS
+from store import IncidentIndex, incident_store
+
+SEARCH_FIELDS = ("title", "description", "affected_systems")
+
+# Per-field boosts: a match in the title says more than one in the description
+FIELD_WEIGHTS = {"title": 2.0, "description": 1.0, "affected_systems": 1.5}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens."""
+    return _TOKEN.findall(text.lower())
+
+
+def _field_tokens(incident: Incident) -> Dict[str, List[str]]:
+    return {
+        "title": tokenize(incident.title),
+        "description": tokenize(incident.description),
+        "affected_systems": tokenize(" ".join(incident.affected_systems)),
+    }
+
+
+class IncidentSearchIndex(IncidentIndex):
+    """
+    Inverted index with BM25 ranking.
+
+    Postings are kept per field as term -> {doc number: term frequency} so
+    updates are cheap; incident IDs are mapped to small integers. Queries
+    score with NumPy over per-term posting arrays, which are built on first
+    use and dropped whenever the term's postings change.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, Dict[int, int]]] = {
+            field: defaultdict(dict) for field in SEARCH_FIELDS
+        }
+        self._arrays: Dict[str, Dict[str, Tuple[np.ndarray, np.ndarray]]] = {
+            field: {} for field in SEARCH_FIELDS
+        }
+        self.lengths: Dict[str, np.ndarray] = {
+            field: np.zeros(1024, dtype=np.int32) for field in SEARCH_FIELDS
+        }
+        self.total_lengths: Dict[str, int] = {field: 0 for field in SEARCH_FIELDS}
+        self.doc_numbers: Dict[str, int] = {}
+        self.incident_ids: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.doc_numbers)
+
+    def _doc_number(self, incident_id: str) -> int:
+        doc = self.doc_numbers.get(incident_id)
+        if doc is None:
+            doc = self.doc_numbers[incident_id] = len(self.incident_ids)
+            self.incident_ids.append(incident_id)
+            if doc >= len(self.lengths["title"]):
+                for field in SEARCH_FIELDS:
+                    grown = np.zeros(len(self.lengths[field]) * 2, dtype=np.int32)
+                    grown[:doc] = self.lengths[field][:doc]
+                    self.lengths[field] = grown
+        return doc
+
+    def _index_tokens(self, doc: int, tokens: Dict[str, List[str]]) -> None:
+        for field, field_tokens in tokens.items():
+            postings = self.postings[field]
+            arrays = self._arrays[field]
+            for term, tf in Counter(field_tokens).items():
+                postings[term][doc] = tf
+                arrays.pop(term, None)
+            self.lengths[field][doc] = len(field_tokens)
+            self.total_lengths[field] += len(field_tokens)
+
+    def _unindex_tokens(self, doc: int, tokens: Dict[str, List[str]]) -> None:
+        for field, field_tokens in tokens.items():
+            postings = self.postings[field]
+            arrays = self._arrays[field]
+            for term in set(field_tokens):
+                docs = postings.get(term)
+                if docs is not None:
+                    docs.pop(doc, None)
+                    arrays.pop(term, None)
+                    if not docs:
+                        del postings[term]
+            self.total_lengths[field] -= int(self.lengths[field][doc])
+            self.lengths[field][doc] = 0
+
+    def _posting_arrays(self, field: str, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        arrays = self._arrays[field].get(term)
+        if arrays is None:
+            docs = self.postings[field].get(term)
+            if not docs:
+                return None
+            arrays = self._arrays[field][term] = (
+                np.fromiter(docs.keys(), dtype=np.int64, count=len(docs)),
+                np.fromiter(docs.values(), dtype=np.float64, count=len(docs)),
+            )
+        return arrays
+
+    def add(self, incident: Incident) -> None:
+        """Index a new incident."""
+        doc = self._doc_number(incident.incident_id)
+        self._index_tokens(doc, _field_tokens(incident))
+
+    def update(self, old: Incident, new: Incident) -> None:
+        """Re-index an incident if any searchable field changed."""
+        if (old.title == new.title and old.description == new.description
+                and old.affected_systems == new.affected_systems):
+            return
+        doc = self._doc_number(new.incident_id)
+        self._unindex_tokens(doc, _field_tokens(old))
+        self._index_tokens(doc, _field_tokens(new))
+
+    def search(self, query: str, role: Optional[Role] = None, limit: int = 10) -> List[Tuple[str, float]]:
+        """
+        Rank incidents for a free-text query.
+
+        Args:
+            query: Search text
+            role: Only match fields visible to this role (all fields if None)
+            limit: Maximum number of results
+
+        Returns:
+            (incident_id, score) pairs, best first
+        """
+        terms = set(tokenize(query))
+        n_docs = len(self.incident_ids)
+        if not terms or not n_docs:
+            return []
+        fields = [f for f in SEARCH_FIELDS if role is None or f in ROLE_INCIDENT_FIELDS[role]]
+
+        k1, b = self.k1, self.b
+        scores = np.zeros(n_docs, dtype=np.float64)
+        matched = []
+        for field in fields:
+            lengths = self.lengths[field]
+            avg_length = self.total_lengths[field] / n_docs or 1.0
+            weight = FIELD_WEIGHTS[field]
+            for term in terms:
+                arrays = self._posting_arrays(field, term)
+                if arrays is None:
+                    continue
+                docs, tfs = arrays
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                norm = k1 * (1 - b + b * lengths[docs] / avg_length)
+                scores[docs] += weight * idf * tfs * (k1 + 1) / (tfs + norm)
+                matched.append(docs)
+
+        if not matched:
+            return []
+        # Every matching posting adds a positive score, so non-zero means matched
+        candidates = np.flatnonzero(scores) if len(matched) > 1 else matched[0]
+        if len(candidates) > limit:
+            top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            candidates = candidates[top]
+        best = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.incident_ids[doc], round(float(scores[doc]), 4)) for doc in best]
+
+
+# Global search index, kept in sync by incident_store
+incident_search = IncidentSearchIndex()
+incident_store.register_index(incident_search)
@@ -1,23 +1,86 @@
 """
-Data storage for incidents, threads, and messages.
+Data storage for incidents.
+
+Incidents are never modified in place: an update stores a new Incident with
+the next version, so readers (including other threads) always see a whole
+version of an incident without taking a lock. Updates can be made
+conditional on the version the caller read (compare-and-set), and callers
+that need to read, await something and then write hold that incident's lock.
+
+Chat threads and messages live in chat_store.py, which is only imported
+when the first chat request needs it.
 """
+import asyncio
+import inspect
+import weakref
+from dataclasses import replace
 from datetime import datetime
-from typing import Optional, List, Dict, Any
-from chatkit.server import Store, Thread, ThreadItem
-from chatkit.store import Attachment
-from chatkit.types import Page, ThreadMetadata
-from models import Incident, IncidentPriority, IncidentStatus, Role
+from typing import Optional, List, Dict, Any, Awaitable, Callable, Union
+from models import (
+    Incident, IncidentPriority, IncidentStatus, IncidentVersionConflict, Role, incident_number
+)
+from changefeed import IncidentChangeFeed
+from backends import IncidentBackend, create_incident_backend
+from persistence import Persistence, create_persistence
+
+
+class IncidentIndex:
+    """
+    Secondary index maintained by IncidentStore.
+
+    Register with IncidentStore.register_index(); the store calls add() for
+    new incidents, update() with the previous and current version on every
+    change, and add_many() for bulk inserts.
+    """
+
+    def add(self, incident: Incident) -> None:
+        raise NotImplementedError
+
+    def update(self, old: Incident, new: Incident) -> None:
+        raise NotImplementedError
+
+    def add_many(self, incidents: List[Incident]) -> None:
+        for incident in incidents:
+            self.add(incident)
 
 
 class IncidentStore:
     """
     In-memory storage for incidents.
-    Can be easily swapped with SQLite/Postgres for production.
+
+    With a shared backend (see backends.py) the in-memory dict becomes a
+    per-process cache: writes go through the backend and every process
+    follows the backend's change log to stay coherent. Without one, an
+    optional Persistence (see persistence.py) logs every change and
+    restores the incidents on startup.
     """
 
-    def __init__(self):
+    # Fields an update may not set
+    _IMMUTABLE_FIELDS = frozenset({"incident_id", "created_at", "created_by", "version"})
+    # modify_incident() attempts before giving up on a contended incident
+    MAX_MODIFY_ATTEMPTS = 16
+
+    def __init__(self, backend: Optional[IncidentBackend] = None,
+                 persistence: Optional[Persistence] = None):
         self.incidents: Dict[str, Incident] = {}
+        self.changes = IncidentChangeFeed()
+        self.indexes: List[IncidentIndex] = []
+        self.backend = backend
+        self.persistence = None if backend else persistence
+        # Created on demand and dropped once no one holds or waits on them
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._last_incident_number = 0
         self._init_sample_incident()
+        if self.backend:
+            for incident in self.backend.load_incidents():
+                self._put(incident)
+            self.changes.seq = self.backend.latest_seq()
+        elif self.persistence:
+            self.persistence.recover(self._restore, self._replay)
+            self.persistence.attach(self._capture)
+            if not self.persistence.wal.lsn:
+                # First start: keep the sample incident too
+                self._persist(list(self.incidents.values()))
 
     def _init_sample_incident(self):
         """Initialize with a sample incident for demo purposes."""
@@ -37,7 +100,69 @@ class IncidentStore:
             created_by="system",
             updated_at=datetime.now()
         )
-        self.incidents[sample_incident.incident_id] = sample_incident
+        if self.backend:
+            self.backend.insert_if_missing(sample_incident)
+            return
+        self._put(sample_incident)
+
+    def _put(self, incident: Incident) -> Optional[Incident]:
+        """Store an incident in the local dict and indexes; return the previous version."""
+        old = self.incidents.get(incident.incident_id)
+        self.incidents[incident.incident_id] = incident
+        self._last_incident_number = max(self._last_incident_number,
+                                         incident_number(incident.incident_id))
+        for index in self.indexes:
+            if old is None:
+                index.add(incident)
+            else:
+                index.update(old, incident)
+        return old
+
+    def _persist(self, incidents: List[Incident]) -> None:
+        """
+        Log new versions of incidents (encoded in the WAL writer thread),
+        with the change feed's seq once they were published, so that a
+        restart carries on numbering changes where it left off.
+        """
+        if self.persistence and incidents:
+            self.persistence.log(["put", incidents, self.changes.seq])
+
+    def _restore(self, snapshot: dict) -> None:
+        fields = snapshot["fields"]
+        for row in snapshot["rows"]:
+            self._put(Incident.from_dict(dict(zip(fields, row))))
+        # Snapshots written before the seq was persisted have none
+        self.changes.seq = snapshot.get("seq", 0)
+
+    def _replay(self, record: list) -> None:
+        op, incidents, *seq = record
+        if op == "put":
+            for data in incidents:
+                self._put(Incident.from_dict(data))
+        if seq:
+            self.changes.seq = max(self.changes.seq, seq[0])
+
+    def _capture(self):
+        # Incidents are replaced, never modified, so a shallow copy is a snapshot
+        incidents = list(self.incidents.values())
+        seq = self.changes.seq
+
+        def dump() -> dict:
+            # Rows under one list of field names: smaller and faster to load than dicts
+            rows = [list(incident.to_dict().values()) for incident in incidents]
+            fields = list(incidents[0].to_dict()) if incidents else []
+            return {"fields": fields, "rows": rows, "seq": seq}
+        return dump
+
+    def register_index(self, index: IncidentIndex) -> None:
+        """Register a secondary index and load the current incidents into it."""
+        index.add_many(list(self.incidents.values()))
+        self.indexes.append(index)
+
+    def next_incident_id(self) -> str:
+        """Allocate the next INC-nnn ID (in-memory store only)."""
+        self._last_incident_number += 1
+        return f"INC-{self._last_incident_number:03d}"
 
     def get_incident(self, incident_id: str) -> Optional[Incident]:
         """Get incident by ID."""
@@ -56,6 +181,16 @@ class IncidentStore:
             return [inc.get_filtered_view(role) for inc in self.incidents.values()]
         return [inc.to_dict() for inc in self.incidents.values()]
 
+    def snapshot(self, role: Optional[Role] = None) -> dict:
+        """
+        Get a compacted snapshot of all incidents with the sequence number it
+        reflects. Late joiners load this, then stream changes after `seq`.
+        """
+        return {
+            "seq": self.changes.seq,
+            "incidents": self.list_incidents(role=role),
+        }
+
     def create_incident(
         self,
         title: str,
@@ -64,210 +199,261 @@ class IncidentStore:
         created_by: str
     ) -> Incident:
         """Create a new incident."""
-        incident_id = f"INC-{len(self.incidents) + 1:03d}"
-        incident = Incident(
-            incident_id=incident_id,
-            title=title,
-            description=description,
-            priority=IncidentPriority.P3,
-            status=IncidentStatus.OPEN,
-            affected_systems=affected_systems,
-            affected_customers=0,
-            estimated_cost=0.0,
-            sla_penalty=0.0,
-            created_at=datetime.now(),
-            created_by=created_by,
-            updated_at=datetime.now()
-        )
-        self.incidents[incident_id] = incident
+        def build(incident_id: str) -> Incident:
+            return Incident(
+                incident_id=incident_id,
+                title=title,
+                description=description,
+                priority=IncidentPriority.P3,
+                status=IncidentStatus.OPEN,
+                affected_systems=affected_systems,
+                affected_customers=0,
+                estimated_cost=0.0,
+                sla_penalty=0.0,
+                created_at=datetime.now(),
+                created_by=created_by,
+                updated_at=datetime.now()
+            )
+
+        if self.backend:
+            incident = self.backend.create_incident(build)
+            self.sync()
+            return self.incidents.get(incident.incident_id, incident)
+
+        incident = build(self.next_incident_id())
+        self._put(incident)
+        self.changes.publish(incident.incident_id, "created", incident.to_dict())
+        self._persist([incident])
         return incident
 
-    def update_incident_priority(self, incident_id: str, priority: IncidentPriority) -> bool:
-        """Update incident priority."""
+    def update_incident_priority(self, incident_id: str, priority: IncidentPriority,
+                                 expected_version: Optional[int] = None) -> bool:
+        """Update incident priority (see update_incident for expected_version)."""
+        return self.update_incident(incident_id, expected_version, priority=priority) is not None
+
+    def update_incident_status(self, incident_id: str, status: IncidentStatus,
+                               expected_version: Optional[int] = None) -> bool:
+        """Update incident status (see update_incident for expected_version)."""
+        return self.update_incident(incident_id, expected_version, status=status) is not None
+
+    def update_incident(self, incident_id: str, expected_version: Optional[int] = None,
+                        **fields: Any) -> Optional[Incident]:
+        """
+        Update incident fields, bump version and updated_at and publish the change.
+
+        All fields change together: the new version replaces the old one in
+        a single step, so no reader sees a partial update.
+
+        Args:
+            incident_id: Incident ID
+            expected_version: Only update if the incident is still at this
+                version (compare-and-set); None updates unconditionally
+            **fields: Incident fields to set
+
+        Returns:
+            The updated incident, or None if it does not exist
+
+        Raises:
+            IncidentVersionConflict: If expected_version is stale
+            ValueError: If a field cannot be updated
+        """
+        immutable = self._IMMUTABLE_FIELDS.intersection(fields)
+        if immutable:
+            raise ValueError(f"Cannot update incident fields: {', '.join(sorted(immutable))}")
+        if self.backend and incident_id not in self.incidents:
+            # May have been created by another worker since our last sync
+            self.sync()
         incident = self.get_incident(incident_id)
         if not incident:
-            return False
-        incident.priority = priority
-        incident.updated_at = datetime.now()
-        return True
-
-    def update_incident_status(self, incident_id: str, status: IncidentStatus) -> bool:
-        """Update incident status."""
-        incident = self.get_incident(incident_id)
-        if not incident:
-            return False
-        incident.status = status
-        incident.updated_at = datetime.now()
-        return True
-
-
-class SimpleStore(Store):
-    """
-    Simple in-memory implementation of ChatKit Store interface.
-    """
-
-    def __init__(self):
-        self.threads: Dict[str, ThreadMetadata] = {}
-        self.thread_items: Dict[str, List[ThreadItem]] = {}
-        self.attachments: Dict[str, Attachment] = {}
+            return None
 
-    async def create_thread(self) -> Thread:
-        """Create a new thread."""
-        thread_id = f"thread_{len(self.threads) + 1}"
-        thread_metadata = ThreadMetadata(
-            id=thread_id,
-            created_at=datetime.now(),
-            metadata={}
-        )
-        self.threads[thread_id] = thread_metadata
-        self.thread_items[thread_id] = []
-        # Return Thread with empty items for API compatibility
-        return Thread(**thread_metadata.model_dump(), items=Page())
-
-    async def get_thread(self, thread_id: str) -> Optional[ThreadMetadata]:
-        """Get thread by ID."""
-        return self.threads.get(thread_id)
-
-    async def update_thread(self, thread_id: str, metadata: dict) -> Thread:
-        """Update thread metadata."""
-        thread = self.threads.get(thread_id)
-        if not thread:
-            raise ValueError(f"Thread {thread_id} not found")
-        thread.metadata.update(metadata)
-        # Return Thread with empty items for API compatibility
-        return Thread(**thread.model_dump(), items=Page())
-
-    async def delete_thread(self, thread_id: str, context: Any) -> None:
-        """Delete a thread."""
-        if thread_id in self.threads:
-            del self.threads[thread_id]
-            if thread_id in self.thread_items:
-                del self.thread_items[thread_id]
-
-    async def add_thread_item(self, thread_id: str, item: ThreadItem, context: Any) -> None:
-        """Add an item to a thread."""
-        if thread_id not in self.thread_items:
-            self.thread_items[thread_id] = []
-        self.thread_items[thread_id].append(item)
-
-    async def get_thread_items(self, thread_id: str) -> List[ThreadItem]:
-        """Get all items in a thread."""
-        return self.thread_items.get(thread_id, [])
-
-    async def create_attachment(self, attachment: Attachment) -> Attachment:
-        """Create an attachment."""
-        self.attachments[attachment.id] = attachment
-        return attachment
-
-    async def get_attachment(self, attachment_id: str) -> Optional[Attachment]:
-        """Get attachment by ID."""
-        return self.attachments.get(attachment_id)
-
-    # Required abstract methods from Store interface
-    async def save_thread(self, thread: ThreadMetadata, context: Any) -> None:
-        """Save a thread (create or update)."""
-        # Store ThreadMetadata directly
-        self.threads[thread.id] = thread
-        if thread.id not in self.thread_items:
-            self.thread_items[thread.id] = []
-
-    async def load_thread(self, thread_id: str, context: Any) -> ThreadMetadata:
-        """Load a thread by ID."""
-        thread = self.threads.get(thread_id)
-        if not thread:
-            from chatkit.store import NotFoundError
-            raise NotFoundError(f"Thread {thread_id} not found")
-        return thread
-
-    async def load_threads(self, limit: int, after: str | None, order: str, context: Any) -> Page[ThreadMetadata]:
-        """Load all threads with cursor-based pagination."""
-        # Get all threads (already ThreadMetadata)
-        threads = list(self.threads.values())
-
-        # Sort by thread ID (most recent threads have higher IDs)
-        threads.sort(key=lambda t: t.id, reverse=(order == "desc"))
-
-        # Apply cursor filter if 'after' is provided
-        if after:
-            if order == "desc":
-                threads = [t for t in threads if t.id < after]
-            else:
-                threads = [t for t in threads if t.id > after]
-
-        # Take limit + 1 to check if there are more pages
-        result_threads = threads[:limit]
-        has_more = len(threads) > limit
-
-        # Determine next cursor
-        next_cursor = result_threads[-1].id if has_more and result_threads else None
-
-        return Page(data=result_threads, has_more=has_more, after=next_cursor)
-
-    async def save_item(self, thread_id: str, item: ThreadItem, context: Any) -> None:
-        """Save a thread item."""
-        await self.add_thread_item(thread_id, item, context)
-
-    async def load_item(self, thread_id: str, item_id: str, context: Any) -> ThreadItem:
-        """Load a specific thread item by ID."""
-        items = await self.get_thread_items(thread_id)
-        for item in items:
-            if item.id == item_id:
-                return item
-        from chatkit.store import NotFoundError
-        raise NotFoundError(f"Thread item {item_id} not found in thread {thread_id}")
-
-    async def load_thread_items(self, thread_id: str, after: str | None, limit: int, order: str, context: Any) -> Page[ThreadItem]:
-        """Load thread items with cursor-based pagination."""
-        # Get all items for the thread
-        items = await self.get_thread_items(thread_id)
-
-        # Sort by item ID
-        items_sorted = sorted(items, key=lambda item: item.id, reverse=(order == "desc"))
-
-        # Apply cursor filter if 'after' is provided
-        if after:
-            if order == "desc":
-                items_sorted = [item for item in items_sorted if item.id < after]
+        fields["updated_at"] = datetime.now()
+        if self.backend:
+            # The backend checks and bumps the version in its own transaction
+            data = replace(incident, **fields).to_dict()
+            changes = {name: data[name] for name in fields}
+            try:
+                updated = self.backend.update_incident(incident_id, changes, expected_version)
+            finally:
+                # Catch up either way, so a retry after a conflict sees the winner
+                self.sync()
+            if not updated:
+                return None
+            return self.get_incident(incident_id)
+
+        if expected_version is not None and incident.version != expected_version:
+            raise IncidentVersionConflict(incident_id, expected_version, incident.version)
+        new = replace(incident, **fields, version=incident.version + 1)
+        data = new.to_dict()
+        changes = {name: data[name] for name in [*fields, "version"]}
+        self.incidents[incident_id] = new
+        for index in self.indexes:
+            index.update(incident, new)
+        self.changes.publish(incident_id, "updated", changes)
+        self._persist([new])
+        return new
+
+    def lock(self, incident_id: str) -> asyncio.Lock:
+        """
+        The lock for one incident, for read-modify-write sequences that await
+        between reading and writing. Plain reads never need it.
+        """
+        lock = self._locks.get(incident_id)
+        if lock is None:
+            lock = self._locks[incident_id] = asyncio.Lock()
+        return lock
+
+    async def modify_incident(
+        self,
+        incident_id: str,
+        update: Callable[[Incident], Union[Dict[str, Any], Awaitable[Dict[str, Any]]]],
+    ) -> Optional[Incident]:
+        """
+        Apply `update` to the current version of an incident.
+
+        `update` gets the incident and returns the fields to change (or an
+        awaitable of them, e.g. after looking something up). It runs under
+        the incident's lock, so concurrent modify_incident calls on the same
+        incident take turns while other incidents proceed in parallel. The
+        write is a compare-and-set against the version `update` saw; if an
+        unlocked writer (or another worker) got in first, `update` runs
+        again on the newer version.
+
+        Returns:
+            The updated incident (unchanged if `update` returned no fields),
+            or None if it does not exist
+
+        Raises:
+            IncidentVersionConflict: If every attempt lost a race
+        """
+        async with self.lock(incident_id):
+            for attempt in range(self.MAX_MODIFY_ATTEMPTS):
+                incident = self.get_incident(incident_id)
+                if incident is None:
+                    return None
+                fields = update(incident)
+                if inspect.isawaitable(fields):
+                    fields = await fields
+                if not fields:
+                    return incident
+                try:
+                    return self.update_incident(incident_id, incident.version, **fields)
+                except IncidentVersionConflict:
+                    if attempt == self.MAX_MODIFY_ATTEMPTS - 1:
+                        raise
+
+    def bulk_insert(self, incidents: List[Incident]) -> List[Incident]:
+        """
+        Insert a batch of incidents in one transaction.
+
+        Incidents with an empty incident_id are assigned the next free ID;
+        incidents whose ID already exists are skipped. Secondary indexes are
+        updated once for the whole batch and a single "bulk" change is
+        published instead of one per incident.
+
+        Returns:
+            The incidents that were inserted
+        """
+        if self.backend:
+            inserted_ids = self.backend.insert_incidents(incidents)
+            self.sync()
+            return [self.incidents[incident_id] for incident_id in inserted_ids
+                    if incident_id in self.incidents]
+
+        inserted = []
+        for incident in incidents:
+            if not incident.incident_id:
+                incident = replace(incident, incident_id=self.next_incident_id())
+            elif incident.incident_id in self.incidents:
+                continue
+            self.incidents[incident.incident_id] = incident
+            self._last_incident_number = max(self._last_incident_number,
+                                             incident_number(incident.incident_id))
+            inserted.append(incident)
+        self._index_many(inserted)
+        if inserted:
+            self.changes.publish("*", "bulk", {
+                "count": len(inserted),
+                "incident_ids": [incident.incident_id for incident in inserted],
+            })
+        self._persist(inserted)
+        return inserted
+
+    def _index_many(self, incidents: List[Incident]) -> None:
+        if incidents:
+            for index in self.indexes:
+                index.add_many(incidents)
+
+    def sync(self) -> None:
+        """
+        Apply changes committed to the shared backend since the last sync,
+        in sequence order, and republish them on the local change feed.
+        """
+        if not self.backend:
+            return
+        pending = self.backend.changes_since(self.changes.seq)
+        if pending is None:
+            self._resync()
+            return
+        for seq, incident_id, op, changes, incident in pending:
+            if op == "bulk":
+                inserted = [i for i in self.backend.get_incidents(changes["incident_ids"])
+                            if i.incident_id not in self.incidents]
+                for new in inserted:
+                    self.incidents[new.incident_id] = new
+                    self._last_incident_number = max(self._last_incident_number,
+                                                     incident_number(new.incident_id))
+                self._index_many(inserted)
             else:
-                items_sorted = [item for item in items_sorted if item.id > after]
-
-        # Take limit + 1 to check if there are more pages
-        result_items = items_sorted[:limit]
-        has_more = len(items_sorted) > limit
+                incident = self._version_at(incident_id, op, changes, incident)
+                if incident is not None:
+                    self._put(incident)
+            self.changes.publish(incident_id, op, changes, seq=seq)
+
+    def _resync(self) -> None:
+        """Reload every incident once the changes this process missed were compacted away."""
+        # Read the seq first: changes committed during the load are replayed
+        # by the next sync and skipped as already cached
+        seq = self.backend.latest_seq()
+        print(f"[WARN] Change log compacted past seq {self.changes.seq}; reloading incidents at seq {seq}")
+        for incident in self.backend.load_incidents():
+            old = self.incidents.get(incident.incident_id)
+            if old is None or old.version < incident.version:
+                self._put(incident)
+        self.changes.reset(seq)
+
+    def _version_at(self, incident_id: str, op: str, changes: dict,
+                    latest: Optional[Incident]) -> Optional[Incident]:
+        """
+        The version a synced change produced, or None if it is already cached.
+
+        The backend returns each change with the incident's current row, so
+        several changes to one incident would all carry its latest version.
+        Rebuilding each version from the previous one and the change gives the
+        indexes (e.g. timelines) every step instead of one jump followed by
+        repeats.
+        """
+        old = self.incidents.get(incident_id)
+        if op == "created" and old is None:
+            return Incident.from_dict(changes)
+        if op == "updated" and old is not None and changes.get("version") == old.version + 1:
+            return Incident.from_dict({**old.to_dict(), **changes})
+        if latest is None or (old is not None and old.version >= latest.version):
+            return None
+        return latest
 
-        # Determine next cursor
-        next_cursor = result_items[-1].id if has_more and result_items else None
+    async def follow_backend(self, interval: float = 0.1) -> None:
+        """Keep this process's cache coherent with writes from other workers."""
+        if not self.backend:
+            return
+        while True:
+            if self.backend.has_external_changes():
+                self.sync()
+            await asyncio.sleep(interval)
 
-        return Page(data=result_items, has_more=has_more, after=next_cursor)
 
-    async def delete_thread_item(self, thread_id: str, item_id: str, context: Any) -> None:
-        """Delete a thread item."""
-        if thread_id not in self.thread_items:
-            return
-        items = self.thread_items[thread_id]
-        for i, item in enumerate(items):
-            if item.id == item_id:
-                del items[i]
-                return
-
-    async def save_attachment(self, attachment: Attachment, context: Any) -> None:
-        """Save an attachment."""
-        await self.create_attachment(attachment)
-
-    async def load_attachment(self, attachment_id: str, context: Any) -> Attachment:
-        """Load an attachment by ID."""
-        attachment = await self.get_attachment(attachment_id)
-        if not attachment:
-            from chatkit.store import NotFoundError
-            raise NotFoundError(f"Attachment {attachment_id} not found")
-        return attachment
-
-    async def delete_attachment(self, attachment_id: str, context: Any) -> None:
-        """Delete an attachment."""
-        if attachment_id in self.attachments:
-            del self.attachments[attachment_id]
-
-
-# Global store instances
-incident_store = IncidentStore()
-chat_store = SimpleStore()
+# Global store instance
+incident_store = IncidentStore(
+    backend=create_incident_backend(),
+    persistence=create_persistence("incidents", default=Incident.to_dict),
+)
@@ -0,0 +1,76 @@
+"""
+Stub model for benchmarks and local runs without OpenAI access.
+
+Select it with AGENT_MODEL=stub (or stub:<latency_ms>, e.g. stub:250). It
+answers every turn with a canned message after a fixed delay and never calls
+tools, so the rest of the stack (ChatKit, stores, streaming) can be exercised
+end to end at predictable cost.
+"""
+import asyncio
+import time
+from typing import Any, AsyncIterator
+
+from agents import Model, ModelResponse, Usage
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseOutputMessage,
+    ResponseOutputText,
+)
+
+
+class StubModel(Model):
+    """Model that replies with a fixed message after `latency_ms`."""
+
+    def __init__(self, latency_ms: float = 0.0, name: str = "stub"):
+        self.latency_ms = latency_ms
+        self.name = name
+
+    def _output(self) -> list:
+        return [
+            ResponseOutputMessage(
+                id=f"msg_stub_{time.time_ns()}",
+                type="message",
+                role="assistant",
+                status="completed",
+                content=[
+                    ResponseOutputText(
+                        type="output_text",
+                        text=f"[{self.name}] Acknowledged.",
+                        annotations=[],
+                    )
+                ],
+            )
+        ]
+
+    async def get_response(self, *args: Any, **kwargs: Any) -> ModelResponse:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return ModelResponse(output=self._output(), usage=Usage(), response_id=None)
+
+    async def stream_response(self, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        response = Response.model_construct(
+            id=f"resp_stub_{time.time_ns()}",
+            object="response",
+            created_at=time.time(),
+            model=self.name,
+            output=self._output(),
+            parallel_tool_calls=False,
+            tool_choice="none",
+            tools=[],
+            usage=None,
+        )
+        yield ResponseCompletedEvent(type="response.completed", response=response, sequence_number=0)
+
+
+def resolve_model(name: str) -> Any:
+    """
+    Resolve a model setting to what Agent(model=...) accepts.
+
+    "stub" and "stub:<latency_ms>" return a StubModel; anything else is
+    passed through as an OpenAI model name.
+    """
+    if name == "stub" or name.startswith("stub:"):
+        latency = float(name.split(":", 1)[1]) if ":" in name else 0.0
+        return StubModel(latency_ms=latency, name=name)
+    return name
@@ -0,0 +1,188 @@
+"""
+Per-incident event timelines with point-in-time reconstruction.
+
+Every version the store reports becomes an event holding the fields that
+changed. Every CHECKPOINT_INTERVAL events the full incident is kept as a
+checkpoint; incidents are never modified in place, so a checkpoint is just
+a reference to that version. The state at a given time is found by binary
+search over the event timestamps and rebuilt from the checkpoint before it
+plus at most CHECKPOINT_INTERVAL - 1 events: O(log n + interval).
+
+Incidents that have never been updated have no timeline of their own; their
+only event is derived from the incident itself. History starts when this
+index is registered, so a restarted store (see persistence.py) begins each
+timeline at the version it recovered.
+"""
+from bisect import bisect_right
+from dataclasses import fields, replace
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+from models import Incident, Role, ROLE_INCIDENT_FIELDS
+from store import IncidentIndex, incident_store
+
+CHECKPOINT_INTERVAL = 64
+
+_FIELDS = [field.name for field in fields(Incident)]
+
+
+def _encode(value: Any) -> Any:
+    """Encode a field value the way Incident.to_dict does."""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class TimelineEvent:
+    """
+    One version of an incident.
+
+    `op` is "created" for the first version, "updated" for later ones, and
+    "recorded" for the first version seen of an incident that was already
+    updated before its history started.
+    """
+
+    __slots__ = ("seq", "timestamp", "version", "op", "changes")
+
+    def __init__(self, seq: int, timestamp: datetime, version: int, op: str, changes: Dict[str, Any]):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.version = version
+        self.op = op
+        self.changes = changes
+
+    def get_filtered_view(self, role: Role) -> dict:
+        """Get role-filtered view of the event."""
+        visible = ROLE_INCIDENT_FIELDS[role]
+        return {
+            "seq": self.seq,
+            "timestamp": self.timestamp.isoformat(),
+            "version": self.version,
+            "op": self.op,
+            "changes": {name: _encode(value) for name, value in self.changes.items() if name in visible},
+        }
+
+
+class Timeline:
+    """Events and checkpoints of one incident, oldest first."""
+
+    __slots__ = ("events", "times", "checkpoints")
+
+    def __init__(self, first: Incident):
+        created = first.version == 1
+        timestamp = first.created_at if created else first.updated_at
+        changes = {name: getattr(first, name) for name in _FIELDS}
+        self.events: List[TimelineEvent] = [
+            TimelineEvent(1, timestamp, first.version, "created" if created else "recorded", changes)
+        ]
+        # Epoch seconds for bisect; kept non-decreasing if the clock steps back
+        self.times: List[float] = [timestamp.timestamp()]
+        # checkpoints[k] is the incident after event k * CHECKPOINT_INTERVAL
+        self.checkpoints: List[Incident] = [first]
+
+    def append(self, old: Incident, new: Incident) -> None:
+        changes = {name: getattr(new, name) for name in _FIELDS if getattr(old, name) != getattr(new, name)}
+        index = len(self.events)
+        self.events.append(TimelineEvent(index + 1, new.updated_at, new.version, "updated", changes))
+        self.times.append(max(self.times[-1], new.updated_at.timestamp()))
+        if index % CHECKPOINT_INTERVAL == 0:
+            self.checkpoints.append(new)
+
+    def position(self, as_of: Optional[datetime]) -> int:
+        """Number of events at or before `as_of` (all of them for None)."""
+        if as_of is None:
+            return len(self.events)
+        return bisect_right(self.times, as_of.timestamp())
+
+    def state(self, count: int) -> Optional[Incident]:
+        """The incident after its first `count` events, or None for 0."""
+        if count <= 0:
+            return None
+        index = count - 1
+        start = index - index % CHECKPOINT_INTERVAL
+        merged: Dict[str, Any] = {}
+        for event in self.events[start + 1:count]:
+            merged.update(event.changes)
+        checkpoint = self.checkpoints[index // CHECKPOINT_INTERVAL]
+        return replace(checkpoint, **merged) if merged else checkpoint
+
+
+class IncidentTimelines(IncidentIndex):
+    """Timelines of all incidents, kept in sync by the store."""
+
+    def __init__(self, store):
+        self.store = store
+        self.timelines: Dict[str, Timeline] = {}
+
+    def add(self, incident: Incident) -> None:
+        pass  # the first event is derived from the incident until it changes
+
+    def add_many(self, incidents: List[Incident]) -> None:
+        pass
+
+    def update(self, old: Incident, new: Incident) -> None:
+        if new.version == old.version:
+            return  # the same version again, not a change
+        timeline = self.timelines.get(new.incident_id)
+        if timeline is None:
+            timeline = self.timelines[new.incident_id] = Timeline(old)
+        timeline.append(old, new)
+
+    def get(self, incident_id: str) -> Optional[Timeline]:
+        """The incident's timeline, or None if it does not exist."""
+        timeline = self.timelines.get(incident_id)
+        if timeline is None:
+            incident = self.store.get_incident(incident_id)
+            if incident is None:
+                return None
+            timeline = Timeline(incident)
+        return timeline
+
+    def state_at(self, incident_id: str, as_of: datetime) -> Optional[Incident]:
+        """The incident as it was at `as_of`, or None if it had no recorded state yet."""
+        timeline = self.get(incident_id)
+        if timeline is None:
+            return None
+        return timeline.state(timeline.position(as_of))
+
+    def page(self, incident_id: str, role: Role, after: int = 0, limit: int = 100,
+             as_of: Optional[datetime] = None) -> Optional[dict]:
+        """
+        A page of an incident's timeline for a role.
+
+        Args:
+            incident_id: Incident ID
+            role: Role whose visible fields are returned
+            after: Cursor; only events with a higher seq are returned
+            limit: Maximum events to return
+            as_of: Only events up to this time, and the incident as it was
+                then instead of its current version
+
+        Returns:
+            The incident view, events, and the cursor for the next page, or
+            None if the incident does not exist
+        """
+        timeline = self.get(incident_id)
+        if timeline is None:
+            return None
+        end = timeline.position(as_of)
+        start = max(0, after)
+        events = timeline.events[start:min(end, start + limit)]
+        incident = timeline.state(end)
+        return {
+            "incident_id": incident_id,
+            "as_of": as_of.isoformat() if as_of else None,
+            "incident": incident.get_filtered_view(role) if incident else None,
+            "events": [event.get_filtered_view(role) for event in events],
+            "total": end,
+            "has_more": start + len(events) < end,
+            "after": events[-1].seq if events else start,
+        }
+
+
+# Global incident timelines, kept in sync by incident_store
+incident_timelines = IncidentTimelines(incident_store)
+incident_store.register_index(incident_timelines)
@@ -2,27 +2,42 @@
 Role-based tools for incident management.
 Each tool checks permissions and propagates user identity.
 """
+import asyncio
 from typing import List, Dict, Any
 from datetime import datetime
 from auth import requires_permission, AuthenticationError
 from models import UserContext, IncidentPriority, IncidentStatus, Role, IncidentUserContext
 from store import incident_store
+from search import incident_search
+from analytics import incident_columns
+from logstore import log_store, incident_log_window
+from logsearch import log_search
+from diagnostics import diagnostics
+from metrics import metrics_store
+from customers import customer_impact
+from penalties import penalty_engine
+from audit import audit_log
+from idempotency import idempotent, approval_ids
+from notifications import notification_service
 from agents import Tool, FunctionTool, function_tool
 from agents.run_context import RunContextWrapper
 
 
-
 # IT Admin Tools
 
 @function_tool
 @requires_permission("view_technical_logs")
-async def view_technical_logs(ctx: RunContextWrapper[IncidentUserContext], incident_id: str):
+async def view_technical_logs(ctx: RunContextWrapper[IncidentUserContext], incident_id: str,
+                              level: str = "DEBUG", limit: int = 50):
     """
-    View technical logs for an incident.
+    View technical logs for an incident's affected systems around the time of
+    the incident.
 
     Args:
         context: User context with identity
         incident_id: Incident ID to view logs for
+        level: Lowest log level to include (DEBUG, INFO, WARN, ERROR)
+        limit: Maximum number of log entries (newest kept, up to 1000)
 
     Returns:
         Dictionary containing log entries
@@ -31,19 +46,73 @@ async def view_technical_logs(ctx: RunContextWrapper[IncidentUserContext], incid
     if not incident:
         return {"error": f"Incident {incident_id} not found"}
 
-    # Simulate log retrieval
-    logs = [
-        {"timestamp": "2025-01-09 14:23:11", "level": "ERROR", "service": "PostgreSQL",
-         "message": "Connection pool exhausted. Max connections: 100, Active: 100"},
-        {"timestamp": "2025-01-09 14:23:45", "level": "ERROR", "service": "Redis",
-         "message": "Cache service unresponsive. Timeout after 5000ms"},
-        {"timestamp": "2025-01-09 14:24:02", "level": "WARN", "service": "API Gateway",
-         "message": "High latency detected. P95: 3000ms (threshold: 500ms)"},
-    ]
+    start, end = incident_log_window(incident)
+    try:
+        result = log_store.query(
+            services=incident.affected_systems,
+            start=start.timestamp(),
+            end=end.timestamp(),
+            min_level=level,
+            limit=limit
+        )
+    except ValueError as e:
+        return {"error": str(e)}
+
+    return {
+        "incident_id": incident_id,
+        "window": {"start": start.isoformat(), "end": end.isoformat()},
+        "logs": [record.to_dict() for record in result["records"]],
+        "truncated": result["truncated"],
+        "accessed_by": ctx.context.user_context.display_name,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@function_tool
+@requires_permission("search_technical_logs")
+async def search_technical_logs(ctx: RunContextWrapper[IncidentUserContext], incident_id: str, pattern: str,
+                                regex: bool = False, all_services: bool = False, level: str = "DEBUG",
+                                limit: int = 50):
+    """
+    Search (grep) technical logs around an incident for a text pattern.
+    Only accessible by IT Admin.
+
+    Args:
+        context: User context with identity
+        incident_id: Incident whose time window to search
+        pattern: Text to find in log messages (case-insensitive)
+        regex: Treat the pattern as a regular expression
+        all_services: Search every service, not just the incident's affected systems
+        level: Lowest log level to include (DEBUG, INFO, WARN, ERROR)
+        limit: Maximum number of matches (earliest first, up to 1000)
+
+    Returns:
+        Matching log entries in time order and scan statistics
+    """
+    incident = incident_store.get_incident(incident_id)
+    if not incident:
+        return {"error": f"Incident {incident_id} not found"}
+
+    start, end = incident_log_window(incident)
+    try:
+        search = log_search.search(
+            pattern,
+            regex=regex,
+            services=None if all_services else incident.affected_systems,
+            start=start.timestamp(),
+            end=end.timestamp(),
+            min_level=level,
+            limit=limit
+        )
+    except ValueError as e:
+        return {"error": str(e)}
+    matches = [record.to_dict() async for record in search]
 
     return {
         "incident_id": incident_id,
-        "logs": logs,
+        "pattern": pattern,
+        "window": {"start": start.isoformat(), "end": end.isoformat()},
+        "matches": matches,
+        "stats": search.stats(),
         "accessed_by": ctx.context.user_context.display_name,
         "timestamp": datetime.now().isoformat()
     }
@@ -67,6 +136,7 @@ async def view_technical_logs(ctx: RunContextWrapper[IncidentUserContext], incid
 
 @function_tool
 @requires_permission("restart_service")
+@idempotent
 async def restart_service(ctx: RunContextWrapper[IncidentUserContext], service_name: str):
     """
     Restart a service. Only accessible by IT Admin.
@@ -108,41 +178,49 @@ async def restart_service(ctx: RunContextWrapper[IncidentUserContext], service_n
 @requires_permission("run_diagnostics")
 async def run_diagnostics(ctx: RunContextWrapper[IncidentUserContext], incident_id: str, diagnostic_type: str):
     """
-    Run diagnostic tests for an incident.
-    
+    Run diagnostic tests for an incident. Results are cached briefly, so
+    repeating a diagnostic is cheap; use "all" to run every diagnostic at once.
+
     Args:
         context: User context with identity
         incident_id: Incident ID
-        diagnostic_type: Type of diagnostic (network, database, cache)
+        diagnostic_type: Type of diagnostic (network, database, cache, or all)
 
     Returns:
         Diagnostic results
     """
-    results = {
-        "network": {
-            "latency_p50": "45ms",
-            "latency_p95": "120ms",
-            "packet_loss": "0.01%",
-            "status": "healthy"
-        },
-        "database": {
-            "connection_pool": "95/100 (95% utilization)",
-            "query_time_p95": "3000ms",
-            "active_connections": "95",
-            "status": "degraded"
-        },
-        "cache": {
-            "hit_rate": "45%",
-            "memory_usage": "98%",
-            "evictions_per_sec": "1500",
-            "status": "critical"
+    incident = incident_store.get_incident(incident_id)
+    if not incident:
+        return {"error": f"Incident {incident_id} not found"}
+
+    if diagnostic_type == "all":
+        # Probes run concurrently; ones that time out or fail are reported as such
+        outcomes = {outcome["probe"]: outcome async for outcome in diagnostics.run_all(incident)}
+        return {
+            "incident_id": incident_id,
+            "diagnostic_type": diagnostic_type,
+            "results": {name: outcomes[name] for name in diagnostics.probes},
+            "run_by": ctx.context.user_context.display_name,
+            "timestamp": datetime.now().isoformat()
         }
-    }
+
+    if diagnostic_type not in diagnostics.probes:
+        return {
+            "incident_id": incident_id,
+            "diagnostic_type": diagnostic_type,
+            "results": {"error": f"Unknown diagnostic type. Must be one of: {', '.join(diagnostics.probes)}, all"},
+            "run_by": ctx.context.user_context.display_name,
+            "timestamp": datetime.now().isoformat()
+        }
+    outcome = await diagnostics.run(incident, diagnostic_type)
 
     return {
         "incident_id": incident_id,
         "diagnostic_type": diagnostic_type,
-        "results": results.get(diagnostic_type, {"error": "Unknown diagnostic type"}),
+        "results": outcome.get("results", {"error": outcome.get("error")}),
+        "status": outcome["status"],
+        "cached": outcome["cached"],
+        "duration_ms": outcome["duration_ms"],
         "run_by": ctx.context.user_context.display_name,
         "timestamp": datetime.now().isoformat()
     }
@@ -189,14 +267,15 @@ async def set_incident_priority(ctx: RunContextWrapper[IncidentUserContext], inc
     except ValueError:
         return {"error": f"Invalid priority: {priority}. Must be P1, P2, P3, or P4"}
 
-    success = incident_store.update_incident_priority(incident_id, priority_enum)
+    incident = incident_store.update_incident(incident_id, priority=priority_enum)
 
-    if not success:
+    if not incident:
         return {"error": f"Incident {incident_id} not found"}
 
     return {
         "incident_id": incident_id,
         "priority": priority,
+        "version": incident.version,
         "updated_by": ctx.context.user_context.display_name,
         "user_id": ctx.context.user_context.user_id,
         "timestamp": datetime.now().isoformat(),
@@ -220,6 +299,23 @@ async def set_incident_priority(ctx: RunContextWrapper[IncidentUserContext], inc
 #     handler=set_incident_priority
 # )
 
+def _traffic_impact(incident, window: float = 300) -> Dict[str, Any]:
+    """Request and error rates of the affected systems over the last `window` seconds."""
+    traffic = {}
+    for system in incident.affected_systems:
+        requests = metrics_store.rate(system, "requests", window)
+        if not requests:
+            continue
+        errors = metrics_store.rate(system, "errors", window)
+        traffic[system] = {
+            "requests_per_sec": requests,
+            "errors_per_sec": errors,
+            "error_rate_pct": round(100 * errors / requests, 2),
+            "failed_requests": int(errors * window),
+        }
+    return {"window_sec": window, "systems": traffic}
+
+
 @function_tool
 @requires_permission("view_business_impact")
 async def view_business_impact(ctx: RunContextWrapper[IncidentUserContext], incident_id: str):
@@ -237,16 +333,17 @@ async def view_business_impact(ctx: RunContextWrapper[IncidentUserContext], inci
     if not incident:
         return {"error": f"Incident {incident_id} not found"}
 
+    impact = customer_impact.breakdown(incident)
+
     return {
         "incident_id": incident_id,
-        "affected_customers": incident.affected_customers,
-        "customer_segments": {
-            "enterprise": 50,
-            "smb": 200,
-            "free": 250
-        },
+        "affected_customers": impact["total"],
+        "customer_segments": impact["by_segment"],
+        "customers_by_sla": impact["by_sla"],
         "revenue_at_risk": f"${incident.estimated_cost:,.2f}",
-        "sla_violations": 12,
+        # Affected customers with a contractual SLA
+        "sla_violations": impact["total"] - impact["by_sla"]["none"],
+        "live_traffic": _traffic_impact(incident),
         "accessed_by": ctx.context.user_context.display_name,
         "timestamp": datetime.now().isoformat()
     }
@@ -269,6 +366,7 @@ async def view_business_impact(ctx: RunContextWrapper[IncidentUserContext], inci
 
 @function_tool
 @requires_permission("allocate_resources")
+@idempotent
 async def allocate_resources(ctx: RunContextWrapper[IncidentUserContext], incident_id: str, resource_type: str, amount: int):
     """
     Allocate additional resources to address incident.
@@ -321,6 +419,7 @@ async def allocate_resources(ctx: RunContextWrapper[IncidentUserContext], incide
 
 @function_tool
 @requires_permission("approve_emergency_spending")
+@idempotent
 async def approve_emergency_spending(ctx: RunContextWrapper[IncidentUserContext], incident_id: str, amount: float, justification: str):
     """
     Approve emergency spending for incident resolution.
@@ -340,7 +439,7 @@ async def approve_emergency_spending(ctx: RunContextWrapper[IncidentUserContext]
         "justification": justification,
         "approved_by": ctx.context.user_context.display_name,
         "user_id": ctx.context.user_context.user_id,
-        "approval_id": f"APR-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+        "approval_id": approval_ids.new_id(),
         "timestamp": datetime.now().isoformat(),
         "message": f"Emergency spending of ${amount:,.2f} approved for incident {incident_id}"
     }
@@ -381,21 +480,31 @@ async def view_cost_impact(ctx: RunContextWrapper[IncidentUserContext], incident
         incident_id: Incident ID
 
     Returns:
-        Cost impact data
+        Cost impact data: direct, labor and accrued SLA credit costs, with
+        projected penalty exposure if the incident stays unresolved
     """
     incident = incident_store.get_incident(incident_id)
     if not incident:
         return {"error": f"Incident {incident_id} not found"}
 
+    cost = penalty_engine.cost(incident)
+    penalties = cost["penalties"]
+
     return {
         "incident_id": incident_id,
-        "estimated_cost": f"${incident.estimated_cost:,.2f}",
-        "sla_penalty_exposure": f"${incident.sla_penalty:,.2f}",
-        "cost_breakdown": {
-            "infrastructure": f"${incident.estimated_cost * 0.4:,.2f}",
-            "labor": f"${incident.estimated_cost * 0.3:,.2f}",
-            "customer_credits": f"${incident.estimated_cost * 0.3:,.2f}"
+        "estimated_cost": f"${cost['total']:,.2f}",
+        "sla_penalty_exposure": f"${penalties['accrued']:,.2f}",
+        "cost_breakdown": {name: f"${amount:,.2f}" for name, amount in cost["breakdown"].items()},
+        "sla_penalties": {
+            "downtime_minutes": penalties["downtime_minutes"],
+            "customers_in_breach": penalties["customers_in_breach"],
+            "by_sla": penalties["by_sla"],
+            "next_threshold_at": penalties["next_threshold_at"]
         },
+        "projected_exposure": {
+            horizon: f"${amount:,.2f}" for horizon, amount in penalties["projected"].items()
+        },
+        "as_of": penalties["as_of"],
         "accessed_by": ctx.context.user_context.display_name,
         "timestamp": datetime.now().isoformat()
     }
@@ -420,6 +529,7 @@ async def view_cost_impact(ctx: RunContextWrapper[IncidentUserContext], incident
 
 @function_tool
 @requires_permission("notify_customers")
+@idempotent
 async def notify_customers(ctx: RunContextWrapper[IncidentUserContext], incident_id: str, message: str, customer_segment: str = "all"):
     """
     Send notification to affected customers for an incident.
@@ -437,25 +547,30 @@ async def notify_customers(ctx: RunContextWrapper[IncidentUserContext], incident
     if not incident:
         return {"error": f"Incident {incident_id} not found"}
 
-    segment_counts = {
-        "enterprise": 50,
-        "smb": 200,
-        "free": 250,
-        "all": incident.affected_customers
-    }
-
-    recipients = segment_counts.get(customer_segment, 0)
+    try:
+        notification = notification_service.submit(
+            incident, message, customer_segment,
+            sent_by=ctx.context.user_context.display_name
+        )
+    except ValueError as e:
+        return {"error": str(e)}
+    # Affected customers in the segment, before repeats are skipped
+    segment = None if customer_segment == "all" else customer_segment
+    estimated_recipients = len(customer_impact.query(incident, segment))
 
     return {
         "incident_id": incident_id,
-        "notification_id": f"NOTIF-{datetime.now().strftime('%Y%m%d%H%M%S')}",
-        "recipients": recipients,
+        "notification_id": notification.notification_id,
+        "estimated_recipients": estimated_recipients,
+        "channels": notification.channels,
         "customer_segment": customer_segment,
         "message": message,
         "sent_by": ctx.context.user_context.display_name,
         "user_id": ctx.context.user_context.user_id,
         "timestamp": datetime.now().isoformat(),
-        "status": "delivered"
+        "status": notification.status,
+        "note": "Recipients are resolved and notified in the background; "
+                "check recipients and progress with get_notification_status"
     }
 
 # notify_customers_tool = Tool(
@@ -483,9 +598,33 @@ async def notify_customers(ctx: RunContextWrapper[IncidentUserContext], incident
 #     handler=notify_customers
 # )
 
+@function_tool
+@requires_permission("notify_customers")
+async def get_notification_status(ctx: RunContextWrapper[IncidentUserContext], notification_id: str):
+    """
+    Check delivery progress of a customer notification.
+
+    Args:
+        context: User context with identity
+        notification_id: ID returned by notify_customers
+
+    Returns:
+        Delivered, failed and pending counts and overall status
+    """
+    notification = notification_service.get(notification_id)
+    if not notification:
+        return {"error": f"Notification {notification_id} not found"}
+
+    return {
+        **notification.to_dict(),
+        "accessed_by": ctx.context.user_context.display_name,
+        "timestamp": datetime.now().isoformat()
+    }
+
 @function_tool
 @requires_permission("view_affected_customers")
-async def view_affected_customers(ctx: RunContextWrapper[IncidentUserContext], incident_id: str):
+async def view_affected_customers(ctx: RunContextWrapper[IncidentUserContext], incident_id: str,
+                                  segment: str = "", sla: str = "", offset: int = 0, limit: int = 20):
     """
     View list of affected customers.
     Accessible by multiple roles with different levels of detail.
@@ -493,6 +632,10 @@ async def view_affected_customers(ctx: RunContextWrapper[IncidentUserContext], i
     Args:
         context: User context with identity
         incident_id: Incident ID
+        segment: Only customers in this segment (enterprise, smb, free; empty for all)
+        sla: Only customers on this SLA tier (99.99%, 99.9%, 99.5%, none; empty for all)
+        offset: Customers to skip, for paging through the list
+        limit: Maximum customers to list (CSM only)
 
     Returns:
         Customer impact data (filtered by role)
@@ -501,19 +644,27 @@ async def view_affected_customers(ctx: RunContextWrapper[IncidentUserContext], i
     if not incident:
         return {"error": f"Incident {incident_id} not found"}
 
+    try:
+        impact = customer_impact.breakdown(incident)
+        page = customer_impact.list(incident, segment or None, sla or None, offset, limit)
+    except ValueError as e:
+        return {"error": str(e)}
+
     base_data = {
         "incident_id": incident_id,
-        "total_affected": incident.affected_customers,
+        "total_affected": impact["total"],
+        "by_segment": impact["by_segment"],
+        "by_sla": impact["by_sla"],
+        "matching": page["total"],
         "accessed_by": ctx.context.user_context.display_name,
         "timestamp": datetime.now().isoformat()
     }
 
     # CSM sees detailed customer info
     if ctx.context.user_context.role == Role.CSM:
-        base_data["customer_details"] = [
-            {"name": "Acme Corp", "tier": "Enterprise", "sla": "99.9%", "impact": "High"},
-            {"name": "TechStart Inc", "tier": "SMB", "sla": "99.5%", "impact": "Medium"},
-        ]
+        base_data["customer_details"] = page["customers"]
+        base_data["offset"] = page["offset"]
+        base_data["has_more"] = page["offset"] + len(page["customers"]) < page["total"]
 
     return base_data
 
@@ -576,8 +727,96 @@ async def view_incident_details(ctx: RunContextWrapper[IncidentUserContext], inc
 #     handler=view_incident_details
 # )
 
+@function_tool
+@requires_permission("view_incident_details")
+async def search_incidents(ctx: RunContextWrapper[IncidentUserContext], query: str, limit: int = 5):
+    """
+    Search incidents by keywords in their title, description and affected systems.
+    Use this to find an incident ID when the user describes an incident instead of naming it.
+
+    Args:
+        context: User context with identity
+        query: Keywords to search for (e.g. "database latency", "Redis")
+        limit: Maximum number of results
+
+    Returns:
+        Matching incidents (filtered by role), best match first
+    """
+    role = ctx.context.user_context.role
+    results = []
+    for incident_id, score in incident_search.search(query, role=role, limit=min(limit, 20)):
+        incident = incident_store.get_incident_for_role(incident_id, role)
+        if incident:
+            results.append({**incident, "score": score})
+
+    return {
+        "query": query,
+        "results": results,
+        "accessed_by": ctx.context.user_context.display_name,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@function_tool
+@requires_permission("view_incident_analytics")
+async def view_incident_analytics(ctx: RunContextWrapper[IncidentUserContext], group_by: str = "priority", status: str = ""):
+    """
+    View aggregate metrics across all incidents, such as total cost, SLA penalty
+    exposure, affected customers and hours open, grouped by priority or status.
+
+    Args:
+        context: User context with identity
+        group_by: Group results by "priority", "status" or "none"
+        status: Optional comma-separated statuses to include (OPEN, INVESTIGATING, RESOLVED, CLOSED)
+
+    Returns:
+        Per-group and total counts, sums and means (filtered by role)
+    """
+    try:
+        statuses = [IncidentStatus(s.strip().upper()) for s in status.split(",")] if status else None
+        stats = incident_columns.stats_for_role(
+            ctx.context.user_context.role,
+            group_by=None if group_by == "none" else group_by,
+            status=statuses
+        )
+    except ValueError as e:
+        return {"error": str(e)}
+
+    return {
+        **stats,
+        "accessed_by": ctx.context.user_context.display_name,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@function_tool
+@requires_permission("view_audit_log")
+async def view_audit_log(ctx: RunContextWrapper[IncidentUserContext], incident_id: str = "", limit: int = 50):
+    """
+    View the audit trail of actions taken through tools: service restarts,
+    priority changes, resource allocations, spending approvals, customer
+    notifications and incident creation, including denied attempts.
+
+    Args:
+        context: User context with identity
+        incident_id: Only actions on this incident (empty for all)
+        limit: Maximum entries to return, newest first
+
+    Returns:
+        Audit entries with who acted, the tool, its arguments and outcome
+    """
+    # history() waits for the journal writer and reads segment files
+    entries = await asyncio.to_thread(audit_log.history, incident_id or None, limit)
+
+    return {
+        "incident_id": incident_id or None,
+        "entries": entries,
+        "count": len(entries),
+        "accessed_by": ctx.context.user_context.display_name,
+        "timestamp": datetime.now().isoformat()
+    }
+
 @function_tool
 @requires_permission("create_incident")
+@idempotent
 async def create_incident(ctx: RunContextWrapper[IncidentUserContext], title: str, description: str, affected_systems: str):
     """
     Create a new incident.
@@ -713,30 +952,40 @@ async def create_incident(ctx: RunContextWrapper[IncidentUserContext], title: st
 
 IT_TOOLS = [
     view_technical_logs,
+    search_technical_logs,
     allocate_resources,
     restart_service,
     run_diagnostics,
     view_incident_details,
+    search_incidents,
     create_incident,
+    view_audit_log,
 ]
 
 OPS_TOOLS = [
     set_incident_priority,
     view_business_impact,
     view_incident_details,
+    search_incidents,
     view_affected_customers,
+    view_incident_analytics,
+    view_audit_log,
 ]
 
 FINANCE_TOOLS = [
     approve_emergency_spending,
     view_cost_impact,
     view_incident_details,
+    search_incidents,
+    view_incident_analytics,
 ]
 
 CSM_TOOLS = [
     notify_customers,
+    get_notification_status,
     view_affected_customers,
     view_incident_details,
+    search_incidents,
 ]
 
 def get_tools_for_role(role: Role) -> List[Tool]:
@@ -0,0 +1,113 @@
+"""
+Attachment store benchmark.
+
+Streams large generated files into the content-addressed blob store in
+network-sized chunks, reads them back through windowed mmap and checks the
+SHA-256, and asserts that peak RSS grows by far less than the file size.
+Uploading the same content again must not add a blob, and deleting the
+thread that holds the attachments must let the background sweep remove
+them.
+
+Usage:
+    python benchmarks/bench_attachments.py --size-mb 1024 --files 2
+"""
+import argparse
+import asyncio
+import hashlib
+import resource
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from attachments import attachment_blobs, attachment_store  # noqa: E402
+from chat_store import SimpleStore  # noqa: E402
+from chatkit.types import AttachmentCreateParams, ThreadMetadata  # noqa: E402
+
+RECEIVE_CHUNK = 64 << 10
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def generated(size: int, seed: int, expected):
+    """Yield `size` pseudo-random bytes in RECEIVE_CHUNK pieces, hashing them into `expected`."""
+    block = hashlib.sha256(str(seed).encode()).digest() * (RECEIVE_CHUNK // 32)
+    sent = 0
+    while sent < size:
+        chunk = (sent.to_bytes(8, "little") + block[8:])[:size - sent]
+        expected.update(chunk)
+        sent += len(chunk)
+        yield chunk
+
+
+async def run(args) -> None:
+    store = SimpleStore()
+    size = args.size_mb << 20
+    attachment_blobs.grace = 0
+    attachment_blobs.collect_delay = 0.05
+    await store.save_thread(ThreadMetadata(id="thread_bench", created_at=datetime.now()), None)
+    baseline = peak_rss_mb()
+
+    print(f"{'file':<6} {'MB':>6} {'write MB/s':>11} {'read MB/s':>10}")
+    digests = []
+    for i in range(args.files):
+        attachment = await attachment_store.create_attachment(
+            AttachmentCreateParams(name=f"bundle-{i}.tar", size=size, mime_type="application/x-tar"), {})
+        expected = hashlib.sha256()
+        started = time.perf_counter()
+        digest, written = await attachment_blobs.write(generated(size, i, expected))
+        write_s = time.perf_counter() - started
+        assert written == size and digest == expected.hexdigest()
+        await store.save_attachment(attachment.model_copy(update={
+            "thread_id": "thread_bench", "upload_descriptor": None,
+            "metadata": {"sha256": digest, "size": written}}), None)
+
+        started = time.perf_counter()
+        actual = hashlib.sha256()
+        for chunk in attachment_blobs.iter_chunks(digest):
+            actual.update(chunk)
+        read_s = time.perf_counter() - started
+        assert actual.hexdigest() == digest
+        digests.append(digest)
+        print(f"{i:<6} {args.size_mb:>6} {args.size_mb / write_s:>11,.0f} {args.size_mb / read_s:>10,.0f}")
+
+    ranged = b"".join(attachment_blobs.iter_chunks(digests[0], start=size - 100_000, end=size - 5))
+    assert len(ranged) == 99_995
+
+    # Same content again: stored once
+    before = attachment_blobs.stats()["blobs"]
+    duplicate = await attachment_store.create_attachment(
+        AttachmentCreateParams(name="copy.tar", size=size, mime_type="application/x-tar"), {})
+    digest, _ = await attachment_blobs.write(generated(size, 0, hashlib.sha256()))
+    assert digest == digests[0] and attachment_blobs.stats()["blobs"] == before
+    await store.save_attachment(duplicate.model_copy(update={
+        "thread_id": "thread_other", "metadata": {"sha256": digest, "size": size}}), None)
+
+    growth = peak_rss_mb() - baseline
+    print(f"Peak RSS grew {growth:.0f}MB while moving {(args.files + 1) * args.size_mb:,}MB")
+    assert growth < args.max_rss_growth_mb, growth
+
+    # Deleting the thread orphans every blob except the one the copy shares
+    await store.delete_thread("thread_bench", None)
+    await asyncio.sleep(0.5)
+    assert attachment_blobs.stats()["blobs"] == 1, attachment_blobs.stats()
+    await store.delete_attachment(duplicate.id, None)
+    await asyncio.sleep(0.5)
+    assert attachment_blobs.stats()["blobs"] == 0
+    print("Dedup and orphan collection checked")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--files", type=int, default=2)
+    parser.add_argument("--max-rss-growth-mb", type=float, default=64)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
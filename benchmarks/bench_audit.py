@@ -0,0 +1,167 @@
+"""
+Audit journal benchmark.
+
+Appends audit entries for many incidents from several threads and compares
+the caller-side latency and throughput of the group-commit journal with
+writing and fsyncing each entry as it happens. Small segments force
+rotation; "history for INC-x" through the per-incident offset index is then
+timed against scanning every segment, and checked for the same entries in
+the same order, before and after reopening the journal from disk. Finally
+fsync is made to fail for a while: nothing may be reported committed until
+the writer's retry succeeds.
+
+Usage:
+    python benchmarks/bench_audit.py --entries 50000 --threads 8
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from journal import Journal  # noqa: E402
+
+
+def entry(i: int, incidents: int) -> dict:
+    return {
+        "timestamp": time.time(),
+        "incident_id": f"INC-{i % incidents:05d}",
+        "tool": "set_incident_priority",
+        "permission": "set_incident_priority",
+        "user_id": f"ops-{i % 7}",
+        "role": "OPS",
+        "arguments": {"incident_id": f"INC-{i % incidents:05d}", "priority": "P1"},
+        "outcome": "ok",
+    }
+
+
+def run_threads(count: int, threads: int, append) -> list:
+    """Call append(i) for i in range(count) across threads; per-call latencies in us."""
+    latencies = [[] for _ in range(threads)]
+
+    def worker(t):
+        for i in range(t, count, threads):
+            started = time.perf_counter()
+            append(i)
+            latencies[t].append((time.perf_counter() - started) * 1e6)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return sorted(latency for per_thread in latencies for latency in per_thread)
+
+
+def check_write_failure(directory: str) -> None:
+    journal = Journal(os.path.join(directory, "failing"), key_field="incident_id", retry_seconds=0.05)
+    real_fsync = os.fsync
+    failing = threading.Event()
+    failing.set()
+
+    def fsync(fd):
+        if failing.is_set():
+            raise OSError(28, "No space left on device")
+        real_fsync(fd)
+
+    os.fsync = fsync
+    try:
+        journal.append(entry(0, 1))
+        assert journal.flush(timeout=5.0) is False
+        stats = journal.stats()
+        assert stats["committed"] == 0 and stats["error"], stats
+        failing.clear()
+        deadline = time.monotonic() + 5.0
+        while not journal.flush(timeout=1.0):
+            assert time.monotonic() < deadline, journal.stats()
+            time.sleep(0.01)  # flush() returns at once until the writer's retry succeeds
+    finally:
+        os.fsync = real_fsync
+    stats = journal.stats()
+    assert stats["committed"] == 1 and stats["records"] == 1 and stats["error"] is None, stats
+    journal.close()
+    print("Failed fsync: flush() returned False and nothing was committed until the retry succeeded")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=50_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--incidents", type=int, default=1000)
+    parser.add_argument("--segment-kb", type=int, default=1024)
+    parser.add_argument("--naive-entries", type=int, default=2000, help="Entries for the fsync-per-entry baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        naive_path = os.path.join(directory, "naive.ndjson")
+        fd = os.open(naive_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        lock = threading.Lock()
+
+        def naive_append(i):
+            line = json.dumps(entry(i, args.incidents)).encode() + b"\n"
+            with lock:
+                os.write(fd, line)
+                os.fsync(fd)
+
+        started = time.perf_counter()
+        naive = run_threads(args.naive_entries, args.threads, naive_append)
+        naive_rate = args.naive_entries / (time.perf_counter() - started)
+        os.close(fd)
+
+        journal = Journal(os.path.join(directory, "journal"), key_field="incident_id",
+                          max_segment_bytes=args.segment_kb << 10)
+        started = time.perf_counter()
+        grouped = run_threads(args.entries, args.threads, lambda i: journal.append(entry(i, args.incidents)))
+        journal.flush()
+        grouped_rate = args.entries / (time.perf_counter() - started)
+        stats = journal.stats()
+        assert stats["records"] == args.entries and stats["committed"] == args.entries, stats
+
+        print(f"{'writer':<22} {'p50 us':>8} {'p99 us':>8} {'entries/s':>10}")
+        for label, latencies, rate in (("fsync per entry", naive, naive_rate),
+                                       ("group commit", grouped, grouped_rate)):
+            print(f"{label:<22} {statistics.median(latencies):>8.1f} "
+                  f"{latencies[int(len(latencies) * 0.99)]:>8.1f} {rate:>10,.0f}")
+        print(f"Group commit: {stats['commits']:,} fsyncs for {args.entries:,} entries "
+              f"({args.entries / stats['commits']:.0f} per commit), {stats['segments']} segments")
+
+        incident = "INC-00042"
+
+        def scan():
+            matches = []
+            for segment in journal.segments:
+                with open(segment.path, "rb") as f:
+                    for line in f:
+                        record = json.loads(line)
+                        if record["incident_id"] == incident:
+                            matches.append(record)
+            return matches[::-1][:50]
+
+        t0 = time.perf_counter()
+        expected = scan()
+        scan_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        history = journal.records(incident, 50)
+        index_ms = (time.perf_counter() - t0) * 1000
+        assert history == expected, (len(history), len(expected))
+        journal.close()
+
+        t0 = time.perf_counter()
+        reopened = Journal(os.path.join(directory, "journal"), key_field="incident_id",
+                           max_segment_bytes=args.segment_kb << 10)
+        open_ms = (time.perf_counter() - t0) * 1000
+        assert reopened.records(incident, 50) == expected
+        reopened.close()
+        print(f"History for {incident} (50 newest): index {index_ms:.2f}ms vs scanning all segments "
+              f"{scan_ms:.0f}ms; reopen from disk {open_ms:.0f}ms")
+        check_write_failure(directory)
+
+
+if __name__ == "__main__":
+    main()
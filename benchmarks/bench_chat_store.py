@@ -0,0 +1,120 @@
+"""
+Chat store soak benchmark.
+
+Simulates weeks of incident chat against SimpleStore: new threads keep
+opening, most traffic goes to recent threads and some to old ones. Every
+message round-trip appends a user and an assistant message and pages the
+thread like the ChatKit UI does. Samples RSS as the run goes on and asserts
+it stays flat once the hot tier is full (apart from the small metadata of
+newly opened threads), and that every thread, cold or hot, reads back with
+all its items in order.
+
+Usage:
+    python benchmarks/bench_chat_store.py --threads 20000 --messages 200000
+    python benchmarks/bench_chat_store.py --unbounded   # the old behaviour, for comparison
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from chat_store import SimpleStore, create_thread_item_cache  # noqa: E402
+from chatkit.types import (  # noqa: E402
+    AssistantMessageContent,
+    AssistantMessageItem,
+    InferenceOptions,
+    ThreadMetadata,
+    UserMessageItem,
+    UserMessageTextContent,
+)
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE / (1 << 20)
+
+
+WORDS = ["redis", "latency", "timeout", "pool", "restart", "P1", "customers",
+         "rollback", "deploy", "cache", "eviction", "ok"]
+TEXTS = [" ".join(random.Random(i).choice(WORDS) for _ in range(40)) for i in range(256)]
+
+
+def messages(thread_id: str, n: int, rng: random.Random):
+    now = datetime.now()
+    text = rng.choice(TEXTS)
+    yield UserMessageItem(id=f"msg_{n:08d}a", thread_id=thread_id, created_at=now,
+                          content=[UserMessageTextContent(text=text)], inference_options=InferenceOptions())
+    yield AssistantMessageItem(id=f"msg_{n:08d}b", thread_id=thread_id, created_at=now,
+                               content=[AssistantMessageContent(text=text * 3)])
+
+
+async def run(args) -> None:
+    cache = create_thread_item_cache()
+    if args.unbounded:
+        cache.max_items = cache.max_bytes = float("inf")
+    store = SimpleStore(cache)
+    rng = random.Random(7)
+    expected = {}
+    samples = []
+    opened = 0
+    started = time.perf_counter()
+    for n in range(args.messages):
+        if opened < args.threads and (opened == 0 or rng.random() < args.threads / args.messages):
+            thread_id = f"thread_{opened:06d}"
+            await store.save_thread(ThreadMetadata(id=thread_id, created_at=datetime.now()), None)
+            expected[thread_id] = 0
+            opened += 1
+        elif rng.random() < 0.9:
+            thread_id = f"thread_{max(0, opened - 1 - int(rng.expovariate(1 / 20))):06d}"
+        else:
+            thread_id = f"thread_{rng.randrange(opened):06d}"
+        for item in messages(thread_id, n, rng):
+            await store.add_thread_item(thread_id, item, None)
+        expected[thread_id] += 2
+        await store.load_thread_items(thread_id, None, 20, "desc", None)
+        if n % (args.messages // 20) == 0:
+            samples.append((n, rss_mb()))
+    elapsed = time.perf_counter() - started
+
+    print(f"{'messages':>9} {'RSS MB':>8}")
+    for n, rss in samples:
+        print(f"{n:>9,} {rss:>8.0f}")
+    stats = cache.stats()
+    print(f"{args.messages:,} round-trips over {opened:,} threads in {elapsed:.1f}s "
+          f"({elapsed / args.messages * 1e6:.0f} us each)")
+    print("Cache:", stats)
+
+    for thread_id in rng.sample(sorted(expected), min(2000, len(expected))):
+        items = (await store.load_thread_items(thread_id, None, 10_000, "asc", None)).data
+        assert len(items) == expected[thread_id], (thread_id, len(items), expected[thread_id])
+        assert [item.id for item in items] == sorted(item.id for item in items)
+
+    if not args.unbounded:
+        # Once the hot tier has filled (second half of the run) memory only
+        # grows by the thread metadata of newly opened threads
+        second_half = [rss for n, rss in samples if n >= args.messages // 2]
+        growth = max(second_half) - min(second_half)
+        print(f"RSS growth over the second half: {growth:.1f}MB")
+        assert growth < args.max_growth_mb, growth
+        assert stats["hot_items"] <= cache.max_items and stats["hot_bytes"] <= cache.max_bytes + (1 << 20)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=20_000)
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--max-growth-mb", type=float, default=16)
+    parser.add_argument("--unbounded", action="store_true", help="Disable eviction")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Thread item codec benchmark.
+
+For each ChatKit item type, times encoding and decoding with codec.py
+against pydantic's JSON round-trip (what the stores used before), reports
+encoded sizes, and checks that every item round-trips unchanged. Then times
+what the chat stores actually do: read one 20-item page from a 500-item
+cold thread (eager validation of every item vs. lazy envelopes), and build
+a Thread from its metadata.
+
+Usage:
+    python benchmarks/bench_codec.py --iterations 20000
+"""
+import argparse
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from chatkit.server import Thread, ThreadItem  # noqa: E402
+from chatkit.types import (  # noqa: E402
+    AssistantMessageContent,
+    AssistantMessageItem,
+    ClientToolCallItem,
+    HiddenContextItem,
+    InferenceOptions,
+    Page,
+    ThreadMetadata,
+    UserMessageItem,
+    UserMessageTextContent,
+)
+from pydantic import TypeAdapter  # noqa: E402
+
+from codec import (  # noqa: E402
+    LazyItem, decode_item, decode_items, decode_thread, encode_item, encode_items, encode_thread, lazy_item,
+    thread_with_items,
+)
+
+adapter = TypeAdapter(ThreadItem)
+TEXT = "Redis latency is above 800ms on the primary; connection pool exhausted after the 14:02 deploy. "
+
+
+def sample_items():
+    now = datetime.now()
+    return {
+        "user_message": UserMessageItem(
+            id="msg_0001", thread_id="thr_1", created_at=now,
+            content=[UserMessageTextContent(text=TEXT * 2)], inference_options=InferenceOptions()),
+        "assistant_message": AssistantMessageItem(
+            id="msg_0002", thread_id="thr_1", created_at=now,
+            content=[AssistantMessageContent(text=TEXT * 8)]),
+        "client_tool_call": ClientToolCallItem(
+            id="msg_0003", thread_id="thr_1", created_at=now, call_id="call_1", name="restart_service",
+            arguments={"incident_id": "INC-001", "service_name": "Redis Cache"},
+            output={"status": "restarted", "duration_ms": 4120}, status="completed"),
+        "hidden_context": HiddenContextItem(
+            id="msg_0004", thread_id="thr_1", created_at=now,
+            content={"role": "IT", "incident": "INC-001", "systems": ["Redis Cache", "API Gateway"]}),
+    }
+
+
+def us(func, iterations: int) -> float:
+    return timeit.timeit(func, number=iterations) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    print(f"{'item type':<18} {'json B':>7} {'codec B':>8} {'json enc':>9} {'codec enc':>10} "
+          f"{'json dec':>9} {'codec dec':>10} {'lazy dec':>9}   (us)")
+    for name, item in sample_items().items():
+        json_bytes = item.model_dump_json()
+        encoded = encode_item(item)
+        assert decode_item(encoded) == item and decode_item(json_bytes) == item
+        print(f"{name:<18} {len(json_bytes):>7} {len(encoded):>8} "
+              f"{us(item.model_dump_json, n):>9.2f} {us(lambda: encode_item(item), n):>10.2f} "
+              f"{us(lambda: adapter.validate_json(json_bytes), n):>9.2f} "
+              f"{us(lambda: decode_item(encoded), n):>10.2f} {us(lambda: lazy_item(encoded), n):>9.2f}")
+
+    # A 500-item cold thread, of which the UI reads the newest 20
+    items = list(sample_items().values())
+    thread = [type(items[i % 4]).model_validate({**items[i % 4].__dict__, "id": f"msg_{i:05d}"}) for i in range(500)]
+    blob = encode_items(LazyItem.from_item(item) for item in thread)
+    lines = b"\n".join(item.model_dump_json().encode() for item in thread)
+
+    def eager_page():
+        validated = [adapter.validate_json(line) for line in lines.split(b"\n")]
+        return sorted(validated, key=lambda item: item.id, reverse=True)[:20]
+
+    def lazy_page():
+        records = decode_items(blob)
+        return [record.item for record in sorted(records, key=lambda r: r.id, reverse=True)[:20]]
+
+    assert eager_page() == lazy_page()
+    runs = max(1, n // 100)
+    print(f"Newest 20 of a 500-item cold thread: eager {us(eager_page, runs):,.0f}us, "
+          f"lazy {us(lazy_page, runs):,.0f}us; thread {len(lines):,}B as JSON lines, {len(blob):,}B packed")
+
+    # Building a Thread for create_thread/update_thread
+    metadata = ThreadMetadata(id="thr_1", created_at=datetime.now(), metadata={"incident_id": "INC-001"})
+    assert thread_with_items(metadata) == Thread(**metadata.model_dump(), items=Page())
+    assert decode_thread(encode_thread(metadata)) == metadata
+    print(f"Thread from metadata: model_dump round-trip "
+          f"{us(lambda: Thread(**metadata.model_dump(), items=Page()), n):.2f}us, "
+          f"codec {us(lambda: thread_with_items(metadata), n):.2f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Incident store concurrency stress test.
+
+Runs thousands of concurrent read-modify-write updates against a few hot
+incidents. Each update awaits between reading and writing, like a tool that
+looks something up first. The updates go through:
+
+- unlocked: read, await, then write. This is what the tools did before and
+  shows the lost updates.
+- modify_incident: per-incident locks plus compare-and-set.
+- a single global lock: the same, with all incidents behind one lock. This
+  shows the throughput that per-incident locks keep.
+
+Meanwhile readers snapshot the store from the event loop and from a thread
+and check that no incident is ever seen half-updated. Each update changes
+affected_customers and estimated_cost together, so every version must have
+estimated_cost == 10 * affected_customers. Plain compare-and-set writers race
+the locked ones; they must see conflicts and lose nothing.
+
+Usage:
+    python benchmarks/bench_concurrency.py --updates 5000 --incidents 50
+    python benchmarks/bench_concurrency.py --backend sqlite
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from backends import SQLiteIncidentBackend  # noqa: E402
+from models import Incident, IncidentPriority, IncidentStatus, IncidentVersionConflict  # noqa: E402
+from store import IncidentStore  # noqa: E402
+
+
+def make_store(args) -> IncidentStore:
+    backend = None
+    if args.backend == "sqlite":
+        backend = SQLiteIncidentBackend(os.path.join(tempfile.mkdtemp(), "incidents.db"))
+    store = IncidentStore(backend=backend)
+    now = datetime.now()
+    store.bulk_insert([
+        Incident(incident_id=f"INC-{i + 100:03d}", title=f"Incident {i}", description="",
+                 priority=IncidentPriority.P3, status=IncidentStatus.OPEN, affected_systems=[],
+                 affected_customers=0, estimated_cost=0.0, sla_penalty=0.0,
+                 created_at=now, created_by="bench", updated_at=now)
+        for i in range(args.incidents)
+    ])
+    return store
+
+
+def check_consistent(incidents) -> None:
+    for incident in incidents:
+        if incident.created_by != "bench":  # the sample incident
+            continue
+        assert incident.estimated_cost == incident.affected_customers * 10, incident
+
+
+def add_customer(incident: Incident) -> dict:
+    return {"affected_customers": incident.affected_customers + 1,
+            "estimated_cost": (incident.affected_customers + 1) * 10.0}
+
+
+async def run_mode(args, mode: str) -> None:
+    store = make_store(args)
+    ids = [f"INC-{i + 100:03d}" for i in range(args.incidents)]
+    rng = random.Random(1)
+    targets = [rng.choice(ids) for _ in range(args.updates)]
+    if mode == "global lock":
+        # modify_incident with every incident behind the same lock
+        global_lock = asyncio.Lock()
+        store.lock = lambda incident_id: global_lock
+    conflicts = 0
+    cas_writes = 0
+
+    async def lookup():
+        await asyncio.sleep(args.io_ms / 1000)
+
+    async def unlocked(incident_id):
+        incident = store.get_incident(incident_id)
+        await lookup()
+        store.update_incident(incident_id, **add_customer(incident))
+
+    async def per_incident(incident_id):
+        async def update(incident):
+            await lookup()
+            return add_customer(incident)
+        await store.modify_incident(incident_id, update)
+
+    async def cas_writer(incident_id):
+        # Unlocked compare-and-set with retries, racing the locked updates
+        nonlocal conflicts, cas_writes
+        while True:
+            incident = store.get_incident(incident_id)
+            await asyncio.sleep(0)
+            try:
+                store.update_incident(incident_id, incident.version, **add_customer(incident))
+                cas_writes += 1
+                return
+            except IncidentVersionConflict:
+                conflicts += 1
+
+    stop = False
+    snapshots = 0
+
+    async def loop_reader():
+        nonlocal snapshots
+        while not stop:
+            check_consistent(store.incidents.values())
+            snapshots += 1
+            await asyncio.sleep(0)
+
+    def thread_reader():
+        nonlocal snapshots
+        while not stop:
+            check_consistent(list(store.incidents.values()))
+            snapshots += 1
+            time.sleep(0.0005)
+
+    worker = unlocked if mode == "unlocked" else per_incident
+    reader = threading.Thread(target=thread_reader)
+    reader.start()
+    reader_task = asyncio.create_task(loop_reader())
+    racers = [cas_writer(incident_id) for incident_id in targets[:args.updates // 10]] if mode != "unlocked" else []
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker(incident_id) for incident_id in targets), *racers)
+    finally:
+        elapsed = time.perf_counter() - started
+        stop = True
+        await reader_task
+        reader.join()
+
+    expected = len(targets) + cas_writes
+    total = sum(store.get_incident(incident_id).affected_customers for incident_id in ids)
+    versions = sum(store.get_incident(incident_id).version - 1 for incident_id in ids)
+    check_consistent(store.incidents.values())
+    print(f"{mode:<16} {len(targets) + len(racers):>8,} {elapsed:>8.2f} "
+          f"{(len(targets) + len(racers)) / elapsed:>10,.0f} {expected - total:>6,} {conflicts:>10,} {snapshots:>10,}")
+    if mode == "unlocked":
+        assert total < expected, "expected the unlocked run to lose updates"
+    else:
+        assert total == expected and versions == expected, (total, versions, expected)
+
+
+async def run(args) -> None:
+    print(f"{args.updates:,} updates over {args.incidents} incidents, {args.io_ms}ms await per update, "
+          f"{args.backend} store")
+    print(f"{'mode':<16} {'updates':>8} {'s':>8} {'updates/s':>10} {'lost':>6} {'conflicts':>10} {'snapshots':>10}")
+    for mode in ("unlocked", "modify_incident", "global lock"):
+        await run_mode(args, mode)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--incidents", type=int, default=50)
+    parser.add_argument("--io-ms", type=float, default=1.0)
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Conditional GET benchmark.
+
+Simulates dashboards polling /api/incidents and /api/incidents/{id} with
+If-None-Match. Reports latency and bytes on the wire for a full identity,
+gzip and brotli response and for a 304, and checks that a poll after a
+change gets the new body with a new ETag, that compressed bodies decode to
+the identity body, and that ETags differ per role.
+
+Usage:
+    python benchmarks/bench_conditional.py --incidents 10000
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import brotli  # noqa: E402
+from bench_responses import make_incident  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from main import app  # noqa: E402
+from models import IncidentStatus  # noqa: E402
+from store import incident_store  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--incidents", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    incident_store.bulk_insert([make_incident(i, rng) for i in range(args.incidents)])
+    headers = {"X-User-Role": "OPS", "X-User-Id": "bench"}
+    client = TestClient(app)
+
+    def get(path, encoding="identity", etag=None):
+        request_headers = {**headers, "Accept-Encoding": encoding}
+        if etag:
+            request_headers["If-None-Match"] = etag
+        # Raw bytes, so sizes are what is sent and bodies are not decoded for us
+        with client.stream("GET", path, headers=request_headers) as response:
+            raw = b"".join(response.iter_raw())
+        return response, raw
+
+    for path in ("/api/incidents", "/api/incidents/INC-001"):
+        identity, body = get(path)
+        assert identity.status_code == 200 and "ETag" in identity.headers
+        etag = identity.headers["ETag"]
+        print(f"{path} ({len(body):,} bytes)")
+        print(f"  {'response':<10} {'bytes':>10} {'ms':>8}")
+        for encoding, decode in (("identity", bytes), ("gzip", gzip.decompress), ("br", brotli.decompress)):
+            response, raw = get(path, encoding)
+            # Small bodies are always sent uncompressed
+            sent = response.headers.get("Content-Encoding", "identity")
+            assert sent == (encoding if len(body) >= 1024 else "identity")
+            assert (decode(raw) if sent != "identity" else raw) == body, encoding
+            elapsed = timeit.timeit(lambda: get(path, encoding), number=args.runs) / args.runs * 1000
+            print(f"  {encoding:<10} {len(raw):>10,} {elapsed:>8.2f}")
+
+        not_modified, raw = get(path, "gzip, br", etag)
+        assert not_modified.status_code == 304 and raw == b""
+        wire = sum(len(k) + len(v) + 4 for k, v in not_modified.headers.items())
+        elapsed = timeit.timeit(lambda: get(path, "gzip, br", etag), number=args.runs) / args.runs * 1000
+        print(f"  {'304':<10} {wire:>10,} {elapsed:>8.2f}   (headers only)")
+
+    # A change invalidates both the list and the incident's own ETag
+    list_etag = get("/api/incidents")[0].headers["ETag"]
+    detail_etag = get("/api/incidents/INC-001")[0].headers["ETag"]
+    incident_store.update_incident_status("INC-001", IncidentStatus.RESOLVED)
+    changed, body = get("/api/incidents", "identity", list_etag)
+    assert changed.status_code == 200 and changed.headers["ETag"] != list_etag
+    changed, body = get("/api/incidents/INC-001", "identity", detail_etag)
+    assert changed.status_code == 200 and json.loads(body)["incident"]["status"] == "RESOLVED"
+    # Other incidents keep their ETag
+    other = get("/api/incidents/INC-001000")[0].headers["ETag"]
+    assert get("/api/incidents/INC-001000", "identity", other)[0].status_code == 304
+    # Roles see different fields, so never share a tag
+    ops_etag = get("/api/incidents/INC-001")[0].headers["ETag"]
+    headers["X-User-Role"] = "FINANCE"
+    assert get("/api/incidents/INC-001", "identity", ops_etag)[0].status_code == 200
+    print("Invalidation and per-role ETags checked")
+
+
+if __name__ == "__main__":
+    main()
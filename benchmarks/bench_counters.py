@@ -0,0 +1,150 @@
+"""
+Dashboard counter benchmark and consistency check.
+
+Runs a random sequence of creates, priority and status changes, cost and
+customer updates and bulk inserts against an IncidentStore with the
+counters registered. Every few operations each role's summary is compared
+with a full recomputation from list_incidents(). Then, for each store
+size, times the summary against that recomputation.
+
+Usage:
+    python benchmarks/bench_counters.py --ops 10000 --sizes 10000 100000
+    python benchmarks/bench_counters.py --backend sqlite
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from backends import SQLiteIncidentBackend  # noqa: E402
+from bench_responses import make_incident  # noqa: E402
+from counters import OPEN_STATUSES, SUMMED_FIELDS, IncidentCounters  # noqa: E402
+from models import IncidentPriority, IncidentStatus, Role, ROLE_INCIDENT_FIELDS  # noqa: E402
+from store import IncidentStore  # noqa: E402
+
+OPEN_VALUES = {status.value for status in OPEN_STATUSES}
+
+
+def make_store(backend: str):
+    sqlite = None
+    if backend == "sqlite":
+        sqlite = SQLiteIncidentBackend(os.path.join(tempfile.mkdtemp(), "incidents.db"))
+    store = IncidentStore(backend=sqlite)
+    counters = IncidentCounters()
+    store.register_index(counters)
+    return store, counters
+
+
+def recompute(store: IncidentStore, role: Role) -> dict:
+    """The summary the slow way: walk every incident's dict."""
+    incidents = store.list_incidents()
+    by_status = {status.value: 0 for status in IncidentStatus}
+    by_priority = {priority.value: 0 for priority in IncidentPriority}
+    open_by_priority = {priority.value: 0 for priority in IncidentPriority}
+    sums = {name: 0 for name in SUMMED_FIELDS}
+    for incident in incidents:
+        by_status[incident["status"]] += 1
+        by_priority[incident["priority"]] += 1
+        if incident["status"] in OPEN_VALUES:
+            open_by_priority[incident["priority"]] += 1
+            for name in SUMMED_FIELDS:
+                sums[name] += incident[name]
+    open_incidents = {"count": sum(open_by_priority.values()), "by_priority": open_by_priority}
+    for name in SUMMED_FIELDS:
+        if name in ROLE_INCIDENT_FIELDS[role]:
+            open_incidents[name] = round(sums[name], 2)
+    return {"total": len(incidents), "by_status": by_status, "by_priority": by_priority,
+            "open": open_incidents}
+
+
+def check(store: IncidentStore, counters: IncidentCounters) -> None:
+    for role in Role:
+        summary, expected = counters.summary(role), recompute(store, role)
+        sums = {name: summary["open"].pop(name) for name in SUMMED_FIELDS if name in summary["open"]}
+        expected_sums = {name: expected["open"].pop(name) for name in SUMMED_FIELDS if name in expected["open"]}
+        assert summary == expected, (role, summary, expected)
+        assert sums.keys() == expected_sums.keys(), (role, sums, expected_sums)
+        for name, value in sums.items():
+            # Sums are added in a different order, so allow for float rounding
+            assert math.isclose(value, expected_sums[name], rel_tol=1e-9, abs_tol=0.011), (name, value)
+    assert "estimated_cost" not in counters.summary(Role.IT)["open"]
+    assert "estimated_cost" in counters.summary(Role.FINANCE)["open"]
+
+
+def random_ops(args) -> None:
+    store, counters = make_store(args.backend)
+    rng = random.Random(3)
+    next_bulk = 0
+    started = time.perf_counter()
+    for n in range(args.ops):
+        ids = list(store.incidents)
+        incident_id = rng.choice(ids)
+        op = rng.random()
+        if op < 0.1:
+            store.create_incident(f"Incident {n}", "random", [], "bench")
+        elif op < 0.4:
+            store.update_incident_priority(incident_id, rng.choice(list(IncidentPriority)))
+        elif op < 0.7:
+            store.update_incident_status(incident_id, rng.choice(list(IncidentStatus)))
+        elif op < 0.98:
+            store.update_incident(incident_id, affected_customers=rng.randint(0, 5000),
+                                  estimated_cost=round(rng.uniform(0, 250_000), 2),
+                                  sla_penalty=round(rng.uniform(0, 50_000), 2))
+        else:
+            batch = [make_incident(i, rng) for i in range(next_bulk, next_bulk + 20)]
+            for incident in batch:
+                incident.incident_id = ""
+            store.bulk_insert(batch)
+            next_bulk += 20
+        if n % args.check_every == 0:
+            check(store, counters)
+    check(store, counters)
+    print(f"{args.ops:,} random operations on the {args.backend} store, checked every "
+          f"{args.check_every} against recomputation in {time.perf_counter() - started:.1f}s: "
+          f"{len(store.incidents):,} incidents")
+
+
+def timing(size: int) -> None:
+    store, counters = make_store("memory")
+    rng = random.Random(size)
+    for start in range(0, size, 10_000):
+        store.bulk_insert([make_incident(i, rng) for i in range(start, min(size, start + 10_000))])
+    check(store, counters)
+    summary_s = []
+    for _ in range(1000):
+        started = time.perf_counter()
+        counters.summary(Role.FINANCE)
+        summary_s.append(time.perf_counter() - started)
+    recompute_s = []
+    for _ in range(5):
+        started = time.perf_counter()
+        recompute(store, Role.FINANCE)
+        recompute_s.append(time.perf_counter() - started)
+    summary_us = statistics.median(summary_s) * 1e6
+    recompute_ms = statistics.median(recompute_s) * 1000
+    print(f"{size:>10,} {summary_us:>12.1f} {recompute_ms:>14.1f} {recompute_ms * 1000 / summary_us:>9,.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=10_000)
+    parser.add_argument("--check-every", type=int, default=100)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    args = parser.parse_args()
+    random_ops(args)
+    print(f"{'incidents':>10} {'summary us':>12} {'recompute ms':>14} {'speedup':>10}")
+    for size in args.sizes:
+        timing(size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Customer impact bitmap benchmark.
+
+Builds a full-size customer directory and incidents affecting from a
+hundred to a million customers, then times "affected enterprise customers
+on a 99.9% SLA" (count plus the first page of records) with bitmaps against
+a columnar scan over the whole directory, and checks both agree.
+
+Usage:
+    python benchmarks/bench_customers.py --customers 2000000 --repeat 50
+"""
+import argparse
+import statistics
+import sys
+import time
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from customers import CustomerDirectory, CustomerImpactIndex  # noqa: E402
+from store import incident_store  # noqa: E402
+
+
+def timed(fn, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        latencies.append((time.perf_counter() - started) * 1e6)
+    return result, statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=2_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    directory = CustomerDirectory.generate(args.customers)
+    index = CustomerImpactIndex(directory)
+    bitmap_bytes = sum(b.nbytes for b in [*directory.segments.values(), *directory.sla_tiers.values()])
+    print(f"Directory of {args.customers:,} customers built in {time.perf_counter() - started:.2f}s; "
+          f"segment/SLA bitmaps {bitmap_bytes / 2**20:.1f} MB")
+
+    base = incident_store.get_incident("INC-001")
+    print(f"\n{'affected':>10} {'bitmap KB':>10} {'matches':>8} {'bitmap us':>10} {'scan us':>10} {'speedup':>8}")
+    for affected in (100, 500, 10_000, 100_000, 1_000_000):
+        incident = replace(base, incident_id=f"INC-BENCH-{affected}", affected_customers=affected)
+        bitmap = index.affected(incident)
+        affected_mask = np.zeros(directory.size, dtype=bool)
+        affected_mask[bitmap.page(0, len(bitmap))] = True
+
+        def with_bitmaps():
+            matches = index.query(incident, "enterprise", "99.9%")
+            return len(matches), matches.page(0, 50)
+
+        def with_scan():
+            mask = affected_mask & (directory.segment == 0) & (directory.sla == 1)
+            rows = np.flatnonzero(mask)
+            return len(rows), rows[:50]
+
+        (count, page), bitmap_us = timed(with_bitmaps, args.repeat)
+        (expected_count, expected_page), scan_us = timed(with_scan, args.repeat)
+        assert count == expected_count and np.array_equal(page, expected_page), (affected, count, expected_count)
+        print(f"{affected:>10,} {bitmap.nbytes / 1024:>10,.0f} {count:>8,} {bitmap_us:>10,.0f} "
+              f"{scan_us:>10,.0f} {scan_us / bitmap_us:>7.1f}x")
+
+    incident = replace(base, incident_id="INC-BENCH-500", affected_customers=500)
+    breakdown, breakdown_us = timed(lambda: index.breakdown(incident), args.repeat)
+    deep_page, page_us = timed(lambda: index.list(incident, "free", offset=200, limit=50), args.repeat)
+    segments = directory.segments
+    union, union_us = timed(lambda: len(segments["enterprise"] | segments["smb"]), args.repeat)
+    assert union == int((directory.segment <= 1).sum())
+    print(f"\nBreakdown by segment and SLA: {breakdown_us:,.0f} us; page of 50 records: {page_us:,.0f} us; "
+          f"enterprise|smb over {args.customers:,} customers: {union_us:,.0f} us")
+
+
+if __name__ == "__main__":
+    main()
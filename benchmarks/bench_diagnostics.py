@@ -0,0 +1,82 @@
+"""
+Diagnostics runner benchmark.
+
+Uses fake probes with a fixed latency to compare:
+
+- the old pattern of calling each diagnostic in turn vs "all" concurrently
+- repeated calls within the cache TTL
+- many concurrent identical calls (single-flight: the probe runs once)
+- a probe that exceeds its timeout (partial results still arrive on time)
+
+Usage:
+    python benchmarks/bench_diagnostics.py --latency-ms 300 --concurrency 100
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from diagnostics import DiagnosticsRunner, FakeProbe  # noqa: E402
+from store import incident_store  # noqa: E402
+
+PROBES = ["network", "database", "cache"]
+
+
+def make_runner(latency: float, ttl: float = 30.0) -> DiagnosticsRunner:
+    runner = DiagnosticsRunner(ttl=ttl)
+    for name in PROBES:
+        runner.register_probe(FakeProbe(name, {"status": "healthy"}, latency=latency))
+    return runner
+
+
+async def main(args):
+    incident = incident_store.get_incident("INC-001")
+    latency = args.latency_ms / 1000
+
+    runner = make_runner(latency, ttl=0)
+    started = time.perf_counter()
+    for name in PROBES:
+        await runner.run(incident, name)
+    sequential = time.perf_counter() - started
+
+    runner = make_runner(latency)
+    started = time.perf_counter()
+    async for _ in runner.run_all(incident):
+        pass
+    concurrent = time.perf_counter() - started
+    print(f"3 probes @ {args.latency_ms}ms: sequential {sequential * 1000:.0f}ms, "
+          f"all concurrently {concurrent * 1000:.0f}ms")
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        for name in PROBES:
+            outcome = await runner.run(incident, name)
+            assert outcome["cached"]
+    print(f"Cached repeat: {(time.perf_counter() - started) / 3000 * 1e6:.1f} us per call")
+
+    runner = make_runner(latency)
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*[runner.run(incident, "database") for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - started
+    calls = runner.probes["database"].calls
+    assert calls == 1 and all(o["status"] == "ok" for o in outcomes), calls
+    print(f"{args.concurrency} concurrent identical calls: {elapsed * 1000:.0f}ms, probe ran {calls} time(s)")
+
+    runner = make_runner(latency)
+    runner.register_probe(FakeProbe("slow", {}, latency=latency * 10, timeout=latency * 2))
+    started = time.perf_counter()
+    arrivals = []
+    async for outcome in runner.run_all(incident):
+        arrivals.append(f"{outcome['probe']}={outcome['status']}@{(time.perf_counter() - started) * 1000:.0f}ms")
+    assert arrivals[-1].startswith("slow=timeout"), arrivals
+    print(f"With a hanging probe (timeout {latency * 2 * 1000:.0f}ms): {', '.join(arrivals)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--concurrency", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
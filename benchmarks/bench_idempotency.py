@@ -0,0 +1,164 @@
+"""
+Idempotent tool call benchmark.
+
+Fires bursts of identical concurrent calls at an @idempotent coroutine and
+checks the side effect runs once per (thread, arguments) with every other
+caller getting a replay; that different threads or arguments run
+separately; that error results are not cached; and that results expire
+after the TTL. Then checks IdGenerator issues unique IDs across threads and
+forked processes, and times the decorator's overhead per call.
+
+Usage:
+    python benchmarks/bench_idempotency.py --calls 2000 --duplicates 8
+"""
+import argparse
+import asyncio
+import multiprocessing
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from idempotency import IdGenerator, idempotency_cache, idempotent  # noqa: E402
+from models import IncidentUserContext, PERMISSIONS, Role, UserContext  # noqa: E402
+
+
+def context(thread_id):
+    return IncidentUserContext(
+        user_context=UserContext(user_id="ops-1", role=Role.OPS, permissions=PERMISSIONS[Role.OPS]),
+        thread_id=thread_id,
+    )
+
+
+effects = []
+
+
+@idempotent
+async def allocate(ctx, incident_id: str, amount: float, fail: bool = False) -> dict:
+    effects.append((ctx.thread_id, incident_id, amount))
+    await asyncio.sleep(0.001)
+    if fail:
+        return {"error": "allocation failed"}
+    return {"incident_id": incident_id, "amount": amount, "allocation": len(effects)}
+
+
+async def passthrough(ctx, incident_id: str, amount: float, fail: bool = False) -> dict:
+    return {"incident_id": incident_id, "amount": amount}
+
+
+@idempotent
+async def cheap(ctx, incident_id: str, amount: float, fail: bool = False) -> dict:
+    return {"incident_id": incident_id, "amount": amount}
+
+
+async def check_dedup(calls: int, duplicates: int) -> None:
+    effects.clear()
+    idempotency_cache.clear()
+    tasks = [
+        allocate(context(f"thread-{i % 4}"), f"INC-{i:05d}", 5000 if d % 2 else 5000.0)
+        for i in range(calls) for d in range(duplicates)
+    ]
+    results = await asyncio.gather(*tasks)
+    assert len(effects) == calls, (len(effects), calls)
+    replays = sum(1 for r in results if r.get("idempotent_replay"))
+    assert replays == calls * (duplicates - 1), replays
+    for i in range(calls):
+        group = results[i * duplicates:(i + 1) * duplicates]
+        assert len({r["allocation"] for r in group}) == 1
+
+    # Same arguments in another thread, or different arguments: new side effects
+    before = len(effects)
+    await allocate(context("other-thread"), "INC-00000", 5000)
+    await allocate(context("thread-0"), "INC-00000", 7500)
+    assert len(effects) == before + 2
+
+    # Without a thread ID nothing is deduplicated
+    await allocate(context(None), "INC-00000", 5000)
+    await allocate(context(None), "INC-00000", 5000)
+    assert len(effects) == before + 4
+
+    # Error results are retried, not replayed
+    first = await allocate(context("thread-e"), "INC-99999", 1, fail=True)
+    second = await allocate(context("thread-e"), "INC-99999", 1, fail=True)
+    assert "error" in first and "idempotent_replay" not in second
+    assert len(effects) == before + 6
+
+    # Expiry
+    ttl = idempotency_cache.ttl
+    idempotency_cache.ttl = 0.05
+    try:
+        await allocate(context("thread-t"), "INC-88888", 1)
+        assert (await allocate(context("thread-t"), "INC-88888", 1)).get("idempotent_replay")
+        await asyncio.sleep(0.1)
+        assert "idempotent_replay" not in await allocate(context("thread-t"), "INC-88888", 1)
+    finally:
+        idempotency_cache.ttl = ttl
+    print(f"Dedup: {calls * duplicates:,} concurrent calls ran {calls:,} side effects, "
+          f"{replays:,} replays; threads, arguments, errors and expiry checked")
+
+
+def issue_ids(generator, count, queue):
+    queue.put([generator.new_id() for _ in range(count)])
+
+
+def check_ids(ids_per_worker: int, workers: int) -> None:
+    generator = IdGenerator("APR")
+    per_thread = [[] for _ in range(workers)]
+    threads = [
+        threading.Thread(target=lambda out: out.extend(generator.new_id() for _ in range(ids_per_worker)),
+                         args=(per_thread[t],))
+        for t in range(workers)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    thread_ids = [i for ids in per_thread for i in ids]
+    assert len(set(thread_ids)) == len(thread_ids)
+
+    generator.new_id()  # parent has issued IDs before forking
+    fork = multiprocessing.get_context("fork")
+    queue = fork.Queue()
+    processes = [fork.Process(target=issue_ids, args=(generator, ids_per_worker, queue)) for _ in range(workers)]
+    for p in processes:
+        p.start()
+    process_ids = [i for _ in processes for i in queue.get()]
+    for p in processes:
+        p.join()
+    all_ids = thread_ids + process_ids
+    assert len(set(all_ids)) == len(all_ids)
+    print(f"IDs: {len(all_ids):,} unique across {workers} threads and {workers} forked processes "
+          f"(e.g. {all_ids[-1]})")
+
+
+async def time_overhead(calls: int) -> None:
+    ctx = context("thread-bench")
+    for label, func, fresh in (("undecorated", passthrough, True),
+                               ("@idempotent, first call", cheap, True),
+                               ("@idempotent, replay", cheap, False)):
+        idempotency_cache.clear()
+        if not fresh:
+            await func(ctx, "INC-00001", 1)
+        started = time.perf_counter()
+        for i in range(calls):
+            await func(ctx, f"INC-{i if fresh else 1:05d}", 1)
+        print(f"{label:<26} {(time.perf_counter() - started) / calls * 1e6:>7.2f} us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000, help="Distinct calls per burst")
+    parser.add_argument("--duplicates", type=int, default=8, help="Concurrent copies of each call")
+    parser.add_argument("--ids", type=int, default=20_000, help="IDs per thread and per process")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    asyncio.run(check_dedup(args.calls, args.duplicates))
+    check_ids(args.ids, args.workers)
+    asyncio.run(time_overhead(20_000))
+
+
+if __name__ == "__main__":
+    main()
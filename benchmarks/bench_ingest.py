@@ -0,0 +1,188 @@
+"""
+Bulk incident ingestion benchmark and edge-case checks.
+
+Streams generated NDJSON and CSV through IncidentIngestor in 64KB chunks and
+reports rows/s and peak traced memory, and the longest the event loop is
+blocked while ingest_stream imports the same rows, compared with feeding
+them on the loop. Then checks the edge cases:
+- a row whose timestamps carry a UTC offset goes through POST
+  /api/incidents/bulk, and GET /api/incidents still works afterwards;
+- an NDJSON line with no newline, or a CSV record with an unbalanced quote,
+  is rejected without buffering the rest of the upload, and the rows after
+  it are still ingested;
+- the CLI refuses to ingest into an in-memory store that would be thrown
+  away when it exits.
+
+Usage:
+    python benchmarks/bench_ingest.py --rows 100000
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND))
+
+from ingest import MAX_RECORD_CHARS, IncidentIngestor, ingest_stream  # noqa: E402
+from store import IncidentStore  # noqa: E402
+
+CHUNK = 64 << 10
+FIELDS = ["title", "description", "priority", "status", "affected_systems",
+          "affected_customers", "estimated_cost", "created_at"]
+
+
+def row(i: int) -> dict:
+    return {"title": f"Incident {i}", "description": f"Imported incident number {i}",
+            "priority": f"P{i % 4 + 1}", "status": "RESOLVED", "affected_systems": "API Gateway;Redis",
+            "affected_customers": i % 500, "estimated_cost": i * 1.5, "created_at": "2024-03-01T12:00:00"}
+
+
+def ndjson(rows: int) -> bytes:
+    return b"".join(json.dumps(row(i)).encode() + b"\n" for i in range(rows))
+
+
+def csv_body(rows: int) -> bytes:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, FIELDS)
+    writer.writeheader()
+    for i in range(rows):
+        writer.writerow(row(i))
+    return out.getvalue().encode()
+
+
+def ingest(body: bytes, fmt: str, store=None) -> dict:
+    ingestor = IncidentIngestor(store or IncidentStore(), fmt=fmt)
+    for start in range(0, len(body), CHUNK):
+        ingestor.feed(body[start:start + CHUNK])
+    return ingestor.finish()
+
+
+def throughput(rows: int) -> None:
+    print(f"{'format':<8} {'rows':>9} {'rows/s':>10} {'peak MB':>9}")
+    for fmt, body in (("ndjson", ndjson(rows)), ("csv", csv_body(rows))):
+        tracemalloc.start()
+        started = time.perf_counter()
+        report = ingest(body, fmt)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert report["inserted"] == rows and report["rejected"] == 0, report
+        print(f"{fmt:<8} {rows:>9,} {rows / elapsed:>10,.0f} {peak / (1 << 20):>9.1f}")
+
+
+async def max_stall(work) -> tuple:
+    """(work's result, longest gap in ms between ticks of a 1ms ticker meanwhile)."""
+    longest = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal longest
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            longest = max(longest, now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    result = await work
+    done = True
+    await task
+    return result, longest * 1000
+
+
+def loop_stalls(rows: int) -> None:
+    body = ndjson(rows)
+
+    async def chunks():
+        for start in range(0, len(body), CHUNK):
+            yield body[start:start + CHUNK]
+
+    async def on_loop():
+        ingestor = IncidentIngestor(IncidentStore())
+        async for chunk in chunks():
+            ingestor.feed(chunk)
+        return ingestor.finish()
+
+    async def measure():
+        _, blocking = await max_stall(on_loop())
+        report, streamed = await max_stall(ingest_stream(chunks(), IncidentStore()))
+        return report, blocking, streamed
+
+    report, blocking, streamed = asyncio.run(measure())
+    assert report["inserted"] == rows, report
+    print(f"Longest event loop stall: {blocking:.0f}ms feeding on the loop, {streamed:.0f}ms with ingest_stream")
+    assert streamed < blocking, (streamed, blocking)
+
+
+def check_offset_timestamps() -> None:
+    from fastapi.testclient import TestClient
+    import main
+
+    client = TestClient(main.app)
+    headers = {"X-User-Role": "IT", "X-User-Id": "bench"}
+    body = json.dumps({**row(0), "created_at": "2024-01-01T00:00:00+00:00",
+                       "updated_at": "2024-01-01T01:30:00-05:00"}) + "\n"
+    response = client.post("/api/incidents/bulk?format=ndjson", content=body, headers=headers)
+    assert response.status_code == 200 and response.json()["inserted"] == 1, response.text
+    response = client.get("/api/incidents", headers=headers)
+    assert response.status_code == 200, response.text
+    assert all(incident.created_at.tzinfo is None and incident.updated_at.tzinfo is None
+               for incident in main.incident_store.incidents.values())
+    print("Offset timestamps stored as local time; GET /api/incidents still works")
+
+
+def check_oversized_records() -> None:
+    huge = b"x" * (MAX_RECORD_CHARS * 3)
+    cases = {
+        "ndjson": b'{"title": "' + huge + b'"\n' + ndjson(10),
+        "csv": csv_body(5) + b'"unbalanced,' + huge + b"\n" + csv_body(10).split(b"\n", 1)[1],
+    }
+    for fmt, body in cases.items():
+        ingestor = IncidentIngestor(IncidentStore(), fmt=fmt)
+        largest = 0
+        for start in range(0, len(body), CHUNK):
+            ingestor.feed(body[start:start + CHUNK])
+            parser = ingestor.parser
+            largest = max(largest, len(parser._buffer) + len(getattr(parser, "_record", "")))
+        report = ingestor.finish()
+        assert largest <= MAX_RECORD_CHARS + CHUNK, (fmt, largest)
+        assert report["rejected"] == 1 and report["inserted"] == (10 if fmt == "ndjson" else 15), (fmt, report)
+    print(f"Oversized NDJSON line and unbalanced CSV quote rejected; buffers stayed under "
+          f"{(MAX_RECORD_CHARS + CHUNK) >> 20}MB and later rows were ingested")
+
+
+def check_cli_needs_a_store() -> None:
+    path = os.path.join(os.environ.get("TMPDIR", "/tmp"), "bench-ingest.ndjson")
+    with open(path, "wb") as f:
+        f.write(ndjson(3))
+    env = {k: v for k, v in os.environ.items() if k not in ("STORE_BACKEND", "PERSISTENCE_DIR")}
+    result = subprocess.run([sys.executable, "ingest.py", path], cwd=BACKEND, env=env,
+                            capture_output=True, text=True)
+    os.unlink(path)
+    assert result.returncode != 0 and "STORE_BACKEND" in result.stderr, result
+    print("CLI refuses to ingest into a throwaway in-memory store")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+    throughput(args.rows)
+    loop_stalls(min(args.rows, 20_000))
+    check_offset_timestamps()
+    check_oversized_records()
+    check_cli_needs_a_store()
+
+
+if __name__ == "__main__":
+    main()
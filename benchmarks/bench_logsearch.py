@@ -0,0 +1,116 @@
+"""
+Parallel log search benchmark.
+
+Fills a LogStore in a temporary directory with synthetic logs (~500 MB by
+default) and, for each worker count, reports:
+
+- full-scan throughput for a pattern that never matches (every byte is read)
+- time to first match and total time for a common pattern with a limit
+
+and checks the parallel results against a single-process reference scan,
+also for patterns anchored to the start or end of the message.
+
+Usage:
+    python benchmarks/bench_logsearch.py --records 5000000 --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from logsearch import LogSearchEngine  # noqa: E402
+from logstore import LEVELS, LogRecord, LogStore  # noqa: E402
+
+SERVICES = [f"service-{i:03d}" for i in range(50)] + ["PostgreSQL Primary", "Redis Cache", "API Gateway"]
+MESSAGES = ["request {} completed in {}ms", "cache miss for key user:{} after {}ms",
+            "retrying upstream call {} ({} attempts)", "connection {} reset by peer after {}ms",
+            "slow query {} detected: {}ms"]
+
+
+def fill(store: LogStore, records: int, batch_size: int = 20_000) -> None:
+    rng = random.Random(11)
+    start = time.time() - 3600
+    step = 3600 / records
+    batch = []
+    for i in range(records):
+        batch.append(LogRecord(start + i * step, rng.choices(LEVELS, [40, 50, 8, 2])[0], rng.choice(SERVICES),
+                               rng.choice(MESSAGES).format(rng.randrange(1_000_000), rng.randrange(10_000))))
+        if len(batch) >= batch_size:
+            store.append(batch)
+            batch = []
+    store.append(batch)
+
+
+def reference(store: LogStore, pattern: str, limit: int) -> list:
+    regex = re.compile(pattern.encode(), re.IGNORECASE)
+    found = []
+    for segment in store.segments:
+        with open(segment.path, "rb") as f:
+            for line in f:
+                ts, _, _, message = line.rstrip(b"\n").split(b"\t", 3)
+                if regex.search(message):
+                    found.append(int(ts))
+    return sorted(found)[:limit]
+
+
+async def run(engine: LogSearchEngine, pattern: str, limit: int):
+    search = engine.search(pattern, regex=True, limit=limit, timeout=600)
+    records = [record async for record in search]
+    return records, search.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=5_000_000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--chunk-mb", type=int, default=8)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench-logsearch-")
+    try:
+        store = LogStore(directory)
+        started = time.perf_counter()
+        fill(store, args.records)
+        stats = store.stats()
+        print(f"Wrote {args.records:,} records, {stats['bytes'] / 2**20:,.0f} MB in {stats['segments']} segments "
+              f"({time.perf_counter() - started:.1f}s); {os.cpu_count()} CPU(s) available")
+
+        rare, common = r"no such thing \d+", r"connection \d+ reset"
+        expected = reference(store, common, 100)
+
+        print(f"\n{'workers':>7} {'full scan s':>11} {'MB/s':>8} {'MB/s/worker':>11} "
+              f"{'first match ms':>14} {'limit 100 ms':>12}")
+        for workers in args.workers:
+            engine = LogSearchEngine(store, max_workers=workers, chunk_bytes=args.chunk_mb << 20)
+            asyncio.run(run(engine, "warm up the pool", 1))
+
+            _, full = asyncio.run(run(engine, rare, 100))
+            assert full["matches"] == 0 and full["bytes_scanned"] == stats["bytes"], full
+            records, first = asyncio.run(run(engine, common, 100))
+            assert [int(r.timestamp * 1000) for r in records] == expected, "results differ from reference scan"
+            engine.shutdown()
+
+            print(f"{workers:>7} {full['seconds']:>11.2f} {full['mb_per_sec']:>8,.0f} "
+                  f"{full['mb_per_sec'] / workers:>11,.0f} {first['first_match_seconds'] * 1000:>14.1f} "
+                  f"{first['seconds'] * 1000:>12.1f}")
+        engine = LogSearchEngine(store, max_workers=max(args.workers), chunk_bytes=args.chunk_mb << 20)
+        for anchored in (r"^cache miss", r"\d+ms$", r"^slow query \d+ detected: \d+ms$", r"^reset"):
+            records, _ = asyncio.run(run(engine, anchored, 100))
+            assert [int(r.timestamp * 1000) for r in records] == reference(store, anchored, 100), anchored
+        engine.shutdown()
+        print("\nResults match the single-process reference scan, including anchored patterns")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
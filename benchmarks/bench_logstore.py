@@ -0,0 +1,114 @@
+"""
+Technical log store benchmark.
+
+Appends synthetic logs (1 hour of traffic per step across many services) to
+a LogStore in a temporary directory and, after each step, times the query
+view_technical_logs makes: a few services over a 15 minute window at WARN and
+above. Latency should stay roughly flat as total volume grows because the
+sparse indexes skip everything outside the slice. Also reports ingest
+throughput and checks results against a brute-force scan.
+
+Usage:
+    python benchmarks/bench_logstore.py --steps 4 --records-per-step 1000000
+"""
+import argparse
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from logstore import LEVELS, LogRecord, LogStore  # noqa: E402
+
+SERVICES = [f"service-{i:03d}" for i in range(200)] + [
+    "PostgreSQL Primary", "Redis Cache", "API Gateway"]
+LEVEL_WEIGHTS = [40, 50, 8, 2]
+MESSAGES = ["request completed in {}ms", "cache miss for key user:{}", "retrying upstream call ({} attempts)",
+            "connection reset by peer after {}ms", "slow query detected: {}ms"]
+
+
+def generate(rng: random.Random, start: float, seconds: float, count: int):
+    step = seconds / count
+    for i in range(count):
+        # Slight jitter so segments are not perfectly time-ordered
+        ts = start + i * step + rng.uniform(-0.5, 0.5)
+        yield LogRecord(ts, rng.choices(LEVELS, LEVEL_WEIGHTS)[0], rng.choice(SERVICES),
+                        rng.choice(MESSAGES).format(rng.randrange(10_000)))
+
+
+def brute_force(store: LogStore, services, start, end, min_rank) -> int:
+    wanted = {s.lower() for s in services}
+    count = 0
+    for segment in store.segments:
+        with open(segment.path, "rb") as f:
+            for line in f:
+                record = LogRecord.decode(line.rstrip(b"\n"))
+                if (start <= record.timestamp <= end and record.service.lower() in wanted
+                        and LEVELS.index(record.level) >= min_rank):
+                    count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=4, help="Hours of logs to append, one per step")
+    parser.add_argument("--records-per-step", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--verify", action="store_true", help="Check the last query against a full scan")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    directory = tempfile.mkdtemp(prefix="bench-logstore-")
+    store = LogStore(directory)
+    services = ["PostgreSQL Primary", "Redis Cache", "API Gateway"]
+    origin = time.time() - args.steps * 3600
+
+    print(f"{'hours':>5} {'records':>11} {'MB':>8} {'ingest rec/s':>13} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'blocks':>7} {'hits':>5}")
+    try:
+        for step in range(args.steps):
+            hour_start = origin + step * 3600
+            records = generate(rng, hour_start, 3600, args.records_per_step)
+            started = time.perf_counter()
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) >= args.batch_size:
+                    store.append(batch)
+                    batch = []
+            store.append(batch)
+            ingest_rate = args.records_per_step / (time.perf_counter() - started)
+
+            # A 15 minute window inside the newest hour, like an incident's
+            window_start = hour_start + rng.uniform(0, 2700)
+            latencies = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                result = store.query(services=services, start=window_start, end=window_start + 900,
+                                     min_level="WARN", limit=200)
+                latencies.append((time.perf_counter() - t0) * 1000)
+            latencies.sort()
+            stats = store.stats()
+            print(f"{step + 1:>5} {(step + 1) * args.records_per_step:>11,} {stats['bytes'] / 2**20:>8.0f} "
+                  f"{ingest_rate:>13,.0f} {statistics.median(latencies):>8.2f} "
+                  f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:>8.2f} "
+                  f"{result['blocks_scanned']:>7} {len(result['records']):>5}")
+
+        if args.verify:
+            full = store.query(services=services, start=window_start, end=window_start + 900,
+                               min_level="WARN", limit=1000)
+            expected = brute_force(store, services, window_start, window_start + 900, LEVELS.index("WARN"))
+            assert len(full["records"]) == min(expected, 1000), (len(full["records"]), expected)
+            print(f"\nVerified against full scan: {expected} matching records")
+    finally:
+        store.close()
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Metrics store benchmark.
+
+Ingests synthetic per-second samples for many series through
+MetricsStore.ingest (the POST /api/metrics path) and reports ingest
+throughput, fixed memory per series, and summary/percentile latency for
+windows from one minute to 30 days. Checks that every resolution agrees
+with the raw samples on count and sum, and that timestamps far in the
+future (e.g. milliseconds sent as seconds) or older than 30 days are
+rejected rather than pushing current samples out of the rings.
+
+Usage:
+    python benchmarks/bench_metrics.py --series 200 --hours 6
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from metrics import MetricsStore  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", type=int, default=200)
+    parser.add_argument("--hours", type=float, default=6)
+    parser.add_argument("--batch-seconds", type=int, default=10, help="Seconds of samples per ingest request")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    store = MetricsStore()
+    rng = np.random.default_rng(3)
+    seconds = int(args.hours * 3600)
+    now = time.time()
+    origin = now - seconds
+    systems = [f"system-{i:04d}" for i in range(args.series)]
+    probe_values = []
+
+    started = time.perf_counter()
+    samples_total = 0
+    for offset in range(0, seconds, args.batch_seconds):
+        span = min(args.batch_seconds, seconds - offset)
+        timestamps = origin + offset + np.arange(span)
+        values = rng.lognormal(5, 0.5, (len(systems), span))
+        probe_values.append(values[0])
+        samples = [
+            {"system": system, "metric": "latency_ms", "value": float(v), "timestamp": float(t)}
+            for system, row in zip(systems, values) for t, v in zip(timestamps, row)
+        ]
+        store.ingest(samples)
+        samples_total += len(samples)
+    elapsed = time.perf_counter() - started
+    per_series = sum(
+        ring.slot_ids.nbytes + ring.count.nbytes + ring.sum.nbytes + ring.min.nbytes + ring.max.nbytes
+        for ring in store.series[(systems[0], "latency_ms")].rings
+    )
+    print(f"Ingested {samples_total:,} samples into {args.series} series in {elapsed:.1f}s "
+          f"({samples_total / elapsed:,.0f} samples/s); {per_series / 1024:.0f} KB per series, "
+          f"{per_series * args.series / 2**20:.0f} MB total (fixed)")
+
+    raw = np.concatenate(probe_values)
+    for window in (60, 3600, 86400):
+        covered = raw[-min(window, len(raw)):]
+        summary = store.summary(systems[0], "latency_ms", window=window, now=now - 1)
+        assert summary["count"] == len(covered), (window, summary["count"], len(covered))
+        assert abs(summary["mean"] - covered.mean()) < 1e-2 * covered.mean(), (window, summary, covered.mean())
+
+    print(f"\n{'window':<8} {'resolution':>10} {'p50 us':>8} {'p99 us':>8}")
+    for label, window in (("1m", 60), ("15m", 900), ("1h", 3600), ("1d", 86400), ("30d", 30 * 86400)):
+        latencies = []
+        for i in range(args.repeat):
+            t0 = time.perf_counter()
+            summary = store.summary(systems[i % len(systems)], "latency_ms", window=window)
+            latencies.append((time.perf_counter() - t0) * 1e6)
+        latencies.sort()
+        print(f"{label:<8} {str(summary['resolution_sec']) + 's':>10} {statistics.median(latencies):>8.0f} "
+              f"{latencies[int(len(latencies) * 0.99)]:>8.0f}")
+
+    check_out_of_range()
+
+
+def check_out_of_range() -> None:
+    store = MetricsStore()
+    now = time.time()
+    result = store.ingest([
+        {"system": "Redis Cache", "metric": "hit_rate_pct", "value": 1.0, "timestamp": now * 1000},
+        {"system": "Redis Cache", "metric": "hit_rate_pct", "value": 2.0, "timestamp": now - 31 * 86400},
+        {"system": "Redis Cache", "metric": "hit_rate_pct", "value": 3.0, "timestamp": float("nan")},
+    ])
+    assert result["accepted"] == 0 and result["rejected"] == 3, result
+    result = store.ingest([{"system": "Redis Cache", "metric": "hit_rate_pct", "value": 45.0, "timestamp": now}])
+    assert result["accepted"] == 1, result
+    summary = store.summary("Redis Cache", "hit_rate_pct", window=60, now=now)
+    assert summary["count"] == 1 and summary["last"] == 45.0, summary
+    print("\nFuture, expired and NaN timestamps rejected; current samples still recorded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Notification pipeline benchmark.
+
+Against local stub SMTP and webhook servers, measures:
+
+- how long notify_customers' submit takes (the tool's latency) for a large
+  incident, compared with the time the background delivery takes
+- delivery throughput per channel
+- that a per-channel rate limit holds the observed rate to the limit
+- that retries with backoff deliver everyone when the webhook fails a
+  share of requests
+- that resending the same message deduplicates every recipient
+- that an SMTP server dropping connections mid-batch gets every message
+  exactly once
+- that two services sharing a SQLite ledger, as workers do with
+  STORE_BACKEND=sqlite, skip each other's repeats and report each other's
+  jobs
+
+Usage:
+    python benchmarks/bench_notifications.py --customers 10000 --rate 2000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from notifications import (  # noqa: E402
+    LogChannel, NotificationService, SMTPChannel, SQLiteNotificationLedger, WebhookChannel,
+)
+from store import incident_store  # noqa: E402
+from stub_servers import StubSMTPServer, StubWebhookServer  # noqa: E402
+
+
+async def deliver(service: NotificationService, incident, message: str, channels=None):
+    started = time.perf_counter()
+    notification = service.submit(incident, message, channels=channels)
+    submitted = time.perf_counter() - started
+    await service.wait(notification)
+    return notification, submitted, time.perf_counter() - started
+
+
+async def main(args):
+    incident = replace(incident_store.get_incident("INC-001"), affected_customers=args.customers)
+    smtp = StubSMTPServer()
+    webhook = StubWebhookServer()
+    smtp_port = await smtp.start()
+    webhook_port = await webhook.start()
+    url = f"http://127.0.0.1:{webhook_port}/notify"
+
+    print(f"{'channel':<10} {'recipients':>10} {'submit ms':>10} {'deliver s':>10} {'msgs/s':>10}")
+    for channel in (LogChannel(batch_size=500), WebhookChannel(url), SMTPChannel("127.0.0.1", smtp_port)):
+        service = NotificationService([channel], workers=args.workers)
+        if isinstance(channel, LogChannel):
+            channel.send = _quiet_send  # keep stdout readable
+        notification, submitted, elapsed = await deliver(service, incident, f"Bench via {channel.name}")
+        assert notification.status == "completed" and notification.delivered == notification.recipients, \
+            notification.to_dict()
+        print(f"{channel.name:<10} {notification.recipients:>10,} {submitted * 1000:>10.1f} "
+              f"{elapsed:>10.2f} {notification.delivered / elapsed:>10,.0f}")
+        await service.shutdown()
+    assert smtp.messages == args.customers and webhook.recipients == args.customers, \
+        (smtp.messages, webhook.recipients)
+
+    limited = WebhookChannel(url, rate=args.rate)
+    service = NotificationService([limited], workers=args.workers)
+    notification, _, elapsed = await deliver(service, incident, "Rate limited")
+    # The bucket starts full, so the first burst goes out immediately
+    expected = (notification.delivered - limited.limiter.burst) / args.rate
+    print(f"\nRate limit {args.rate:,}/s: {notification.delivered:,} delivered in {elapsed:.2f}s "
+          f"({notification.delivered / elapsed:,.0f}/s; expected >= {expected:.2f}s)")
+    assert elapsed >= expected * 0.95, (elapsed, expected)
+    await service.shutdown()
+
+    flaky = StubWebhookServer(failure_rate=args.failure_rate)
+    flaky_port = await flaky.start()
+    service = NotificationService([WebhookChannel(f"http://127.0.0.1:{flaky_port}/notify")],
+                                  workers=args.workers, max_attempts=8, backoff=0.05)
+    notification, _, elapsed = await deliver(service, incident, "Flaky webhook")
+    print(f"Webhook failing {args.failure_rate:.0%} of requests: {notification.delivered:,} delivered, "
+          f"{notification.failed} failed, {notification.retries:,} retried recipients in {elapsed:.2f}s")
+    assert notification.delivered == args.customers and notification.retries > 0, notification.to_dict()
+
+    again, _, _ = await deliver(service, incident, "Flaky webhook")
+    print(f"Same message again: {again.deduplicated:,} of {again.recipients:,} deduplicated")
+    assert again.deduplicated == again.recipients and again.status == "completed"
+    await service.shutdown()
+
+    dropping = StubSMTPServer(drop_after=7)
+    dropping_port = await dropping.start()
+    service = NotificationService([SMTPChannel("127.0.0.1", dropping_port)], workers=args.workers,
+                                  max_attempts=20, backoff=0.01)
+    notification, _, elapsed = await deliver(service, incident, "Dropping SMTP")
+    print(f"SMTP dropping connections every 7 messages: {dropping.messages:,} messages for "
+          f"{notification.recipients:,} recipients, {dropping.dropped:,} drops in {elapsed:.2f}s")
+    assert notification.delivered == dropping.messages == notification.recipients, \
+        (notification.to_dict(), dropping.messages)
+    await service.shutdown()
+
+    for server in (smtp, webhook, flaky, dropping):
+        await server.stop()
+    await check_shared_ledger(incident, args.workers)
+
+
+async def check_shared_ledger(incident, workers: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "notifications.db")
+        first, second = (
+            NotificationService([LogChannel(batch_size=500)], workers=workers,
+                                ledger=SQLiteNotificationLedger(path))
+            for _ in range(2)
+        )
+        for service in (first, second):
+            service.channels["log"].send = _quiet_send
+        sent, _, _ = await deliver(first, incident, "Shared ledger")
+        again, _, _ = await deliver(second, incident, "Shared ledger")
+        assert again.deduplicated == again.recipients == sent.delivered, (sent.to_dict(), again.to_dict())
+        seen = second.get(sent.notification_id)
+        assert seen is not None and seen.to_dict() == sent.to_dict(), (seen, sent.to_dict())
+        for service in (first, second):
+            await service.shutdown()
+    print(f"Shared SQLite ledger: second worker skipped all {again.recipients:,} recipients "
+          f"and reports the first worker's job")
+
+
+async def _quiet_send(notification, recipients):
+    return []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=5000, help="Webhook rate limit (messages/s)")
+    parser.add_argument("--failure-rate", type=float, default=0.3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,77 @@
+"""
+SLA penalty engine benchmark.
+
+Tracks an incident affecting 100k customers over two days of downtime,
+ticking every 15 seconds as the background task does, and compares the
+incremental tick (only customers whose next threshold has passed) with
+recomputing every customer's credit from scratch each tick. Checks that the
+incremental total matches a full recomputation every few ticks, and times
+a full exposure read (breakdown by tier plus projections).
+
+Usage:
+    python benchmarks/bench_penalties.py --affected 100000 --hours 48
+"""
+import argparse
+import statistics
+import sys
+import time
+from dataclasses import replace
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from customers import customer_directory  # noqa: E402
+from penalties import PenaltyEngine, customer_impact  # noqa: E402
+from store import incident_store  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--affected", type=int, default=100_000)
+    parser.add_argument("--hours", type=float, default=48)
+    parser.add_argument("--interval", type=float, default=15)
+    parser.add_argument("--check-every", type=int, default=20, help="Ticks between full recomputations")
+    args = parser.parse_args()
+
+    incident = replace(incident_store.get_incident("INC-001"), incident_id="INC-PENALTY",
+                       affected_customers=args.affected)
+    engine = PenaltyEngine(customer_directory, customer_impact, interval=args.interval)
+    started = incident.created_at.timestamp()
+
+    exposure = engine.exposure(incident, now=started)
+    state = engine.states[incident.incident_id]
+    print(f"Tracking {exposure['customers']:,} affected customers: "
+          + ", ".join(f"{tier} {row['customers']:,}" for tier, row in exposure["by_sla"].items()))
+
+    incremental, full, recomputed = [], [], 0
+    ticks = int(args.hours * 3600 / args.interval)
+    for i in range(1, ticks + 1):
+        now = started + i * args.interval
+        t0 = time.perf_counter()
+        engine._tick(incident, state, now)
+        incremental.append(time.perf_counter() - t0)
+        recomputed += state.recomputed
+        if i % args.check_every:
+            continue
+
+        t0 = time.perf_counter()
+        expected = engine.project(incident, state, 0, now)
+        full.append(time.perf_counter() - t0)
+        assert abs(state.total - expected) <= 1e-6 * max(1.0, expected), (i, state.total, expected)
+
+    print(f"{ticks:,} ticks over {args.hours:g}h: incremental {sum(incremental) * 1000:,.0f}ms total "
+          f"(median {statistics.median(incremental) * 1e6:.1f} us, max {max(incremental) * 1000:.1f} ms), "
+          f"full recompute median {statistics.median(full) * 1e6:,.0f} us per tick")
+    print(f"Customers recomputed: {recomputed:,} incremental vs {ticks * len(state.tier):,} full")
+
+    reads = []
+    for _ in range(50):
+        t0 = time.perf_counter()
+        exposure = engine.exposure(incident, now=started + args.hours * 3600)
+        reads.append(time.perf_counter() - t0)
+    print(f"Exposure read (by tier + 3 projections): {statistics.median(reads) * 1000:.1f} ms; "
+          f"accrued ${exposure['accrued']:,.2f} across {exposure['customers_in_breach']:,} customers in breach")
+
+
+if __name__ == "__main__":
+    main()
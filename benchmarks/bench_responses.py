@@ -0,0 +1,116 @@
+"""
+JSON response benchmark.
+
+Times encoding the /api/incidents body for 1, 100 and 10k incidents the way
+FastAPI did before (jsonable_encoder, then json.dumps) against
+ORJSONResponse, both encoding the role views afresh and from the
+pre-encoded view cache. Every body must parse to the same JSON as the old
+path. Also times the endpoint end to end through the ASGI app, and checks
+that changing an incident drops its cached views.
+
+Usage:
+    python benchmarks/bench_responses.py --sizes 1 100 10000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from main import app  # noqa: E402
+from models import Incident, IncidentPriority, IncidentStatus, Role  # noqa: E402
+from responses import IncidentViewCache, dumps  # noqa: E402
+from store import IncidentStore, incident_store  # noqa: E402
+
+SYSTEMS = ["PostgreSQL Primary", "Redis Cache", "API Gateway", "Kafka", "Billing Service", "CDN"]
+WORDS = "latency timeout error outage degraded connection pool exhausted failover deploy rollback".split()
+USER = {"role": "IT", "display_name": "IT Department"}
+
+
+def make_incident(i: int, rng: random.Random) -> Incident:
+    now = datetime.now()
+    return Incident(
+        incident_id=f"INC-{i + 1000:06d}",
+        title=" ".join(rng.choices(WORDS, k=4)),
+        description=" ".join(rng.choices(WORDS, k=30)),
+        priority=rng.choice(list(IncidentPriority)),
+        status=rng.choice(list(IncidentStatus)),
+        affected_systems=rng.sample(SYSTEMS, k=2),
+        affected_customers=rng.randrange(1000),
+        estimated_cost=rng.random() * 1e5,
+        sla_penalty=rng.random() * 1e5,
+        created_at=now,
+        created_by="bench",
+        updated_at=now,
+    )
+
+
+def ms(func, runs: int) -> float:
+    return timeit.timeit(func, number=runs) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10_000])
+    parser.add_argument("--role", default="IT", choices=[role.value for role in Role])
+    args = parser.parse_args()
+    role = Role(args.role)
+    rng = random.Random(7)
+
+    print(f"{'incidents':>9} {'json KB':>8} {'stdlib ms':>10} {'orjson ms':>10} {'cached ms':>10} {'speedup':>8}")
+    for size in args.sizes:
+        store = IncidentStore()
+        store.incidents.clear()
+        store.bulk_insert([make_incident(i, rng) for i in range(size)])
+        views = IncidentViewCache(store)
+        store.register_index(views)
+
+        def stdlib():
+            incidents = store.list_incidents(role=role)
+            return json.dumps(jsonable_encoder({"incidents": incidents, "user": USER, "count": len(incidents)}),
+                              ensure_ascii=False, separators=(",", ":")).encode()
+
+        def fresh():
+            incidents = store.list_incidents(role=role)
+            return dumps({"incidents": incidents, "user": USER, "count": len(incidents)})
+
+        def cached():
+            incidents = views.list(role)
+            return dumps({"incidents": incidents, "user": USER, "count": len(incidents)})
+
+        expected = stdlib()
+        assert json.loads(fresh()) == json.loads(cached()) == json.loads(expected)
+        runs = max(3, 20_000 // size)
+        old, new, hot = ms(stdlib, runs), ms(fresh, runs), ms(cached, runs)
+        print(f"{size:>9,} {len(expected) / 1024:>8,.1f} {old:>10.3f} {new:>10.3f} {hot:>10.3f} {old / hot:>7.1f}x")
+
+        # A change must drop the cached views of that incident only
+        changed = next(iter(store.incidents))
+        store.update_incident_status(changed, IncidentStatus.RESOLVED)
+        assert json.loads(cached()) == json.loads(stdlib())
+
+    # End to end through the app, against the global store
+    incident_store.bulk_insert([make_incident(i, rng) for i in range(max(args.sizes))])
+    headers = {"X-User-Role": role.value, "X-User-Id": "bench"}
+    with TestClient(app) as client:
+        body = client.get("/api/incidents", headers=headers).json()
+        assert body["incidents"] == incident_store.list_incidents(role=role)
+        assert body["count"] == len(incident_store.incidents)
+        one = client.get("/api/incidents/INC-001", headers=headers).json()
+        assert one["incident"] == incident_store.get_incident_for_role("INC-001", role)
+        runs = 20
+        print(f"GET /api/incidents ({body['count']:,} incidents) end to end: "
+              f"{ms(lambda: client.get('/api/incidents', headers=headers), runs):.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Model routing benchmark with the stub model.
+
+Each tier is a stub model with its own latency (by default 40ms small,
+150ms medium and 600ms large, roughly the ratio between nano, mini and
+flagship models on short answers). A labelled set of chat messages from
+every role is run through the Agents SDK twice:
+- routed: ModelRouter picks the tier per (role, intent);
+- large only: every message goes to the large model, as before routing.
+
+Reports classifier accuracy and cost, and latency per tier and overall.
+Every reply must come from the model of the tier the message was routed to.
+Finally checks follow-ups through /api/simple-chat: "yes" or "thanks" after
+a turn that proposed or ran an action must go to the large tier, and after
+any other turn to the small one.
+
+Usage:
+    python benchmarks/bench_routing.py --latency-ms 40 150 600
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+MESSAGES = [
+    ("IT", "hi", "help"),
+    ("OPS", "Thanks!", "help"),
+    ("CSM", "What can you do for me?", "help"),
+    ("FINANCE", "help", "help"),
+    ("IT", "What's the status of INC-001?", "lookup"),
+    ("OPS", "What is the priority of INC-001", "lookup"),
+    ("CSM", "Show me INC-001", "lookup"),
+    ("FINANCE", "Get the details for INC-001", "lookup"),
+    ("IT", "Which systems are affected by INC-001?", "lookup"),
+    ("OPS", "List open incidents", "lookup"),
+    ("CSM", "Find incidents about checkout errors", "lookup"),
+    ("IT", "INC-001?", "lookup"),
+    ("OPS", "Who created INC-001 and when?", "lookup"),
+    ("FINANCE", "Search for payment gateway incidents", "lookup"),
+    ("FINANCE", "What's the cost impact of INC-001?", "report"),
+    ("FINANCE", "Summarize SLA penalties by priority", "report"),
+    ("OPS", "How many customers are affected by INC-001?", "report"),
+    ("OPS", "Give me incident analytics grouped by status", "report"),
+    ("CSM", "Summary of affected customers for INC-001", "report"),
+    ("IT", "Show the error logs for INC-001", "report"),
+    ("OPS", "Show the audit trail for INC-001", "report"),
+    ("FINANCE", "Total spending exposure across open incidents", "report"),
+    ("IT", "Restart the Redis Cache service", "action"),
+    ("OPS", "Set INC-001 to P1", "action"),
+    ("OPS", "Allocate 5 engineers to INC-001", "action"),
+    ("FINANCE", "Approve $20,000 emergency spending for INC-001", "action"),
+    ("CSM", "Notify enterprise customers about INC-001", "action"),
+    ("IT", "Create an incident for the API gateway timeouts", "action"),
+    ("OPS", "Escalate INC-001", "action"),
+    ("IT", "Why is the database slow? Find the root cause", "analysis"),
+    ("IT", "Diagnose INC-001", "analysis"),
+    ("OPS", "Should we fail over to the replica?", "analysis"),
+    ("FINANCE", "Compare this quarter's incident trend with last quarter", "analysis"),
+    ("CSM", "Explain to me what happened with INC-001", "analysis"),
+    ("IT", "Correlate the latency spike with the deploy at 14:00", "analysis"),
+    ("OPS", "Draft a remediation plan for INC-001", "analysis"),
+    ("CSM", "The customer is upset", "general"),
+    ("IT", "Redis", "general"),
+    ("OPS", "PostgreSQL primary at 95% CPU, replicas fine, " * 12, "general"),
+]
+
+
+def configure(latencies) -> None:
+    os.environ.pop("AGENT_MODEL", None)
+    os.environ.pop("MODEL_ROUTES", None)
+    for tier, latency in zip(["SMALL", "MEDIUM", "LARGE"], latencies):
+        os.environ[f"AGENT_MODEL_{tier}"] = f"stub:{latency:g}"
+
+
+async def run_all(args, routed: bool):
+    from agents import Runner
+    from agent import get_incident_agent
+    from models import IncidentUserContext, PERMISSIONS, Role, UserContext
+    from routing import model_router
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(role_name: str, message: str):
+        role = Role(role_name)
+        route = model_router.route(role, message)
+        tier = route.tier if routed else "large"
+        context = IncidentUserContext(UserContext(f"{role_name.lower()}-1", role, PERMISSIONS[role]))
+        agent = get_incident_agent(role, tier)
+        async with semaphore:
+            started = time.perf_counter()
+            result = await Runner.run(agent, message, context=context)
+            elapsed = time.perf_counter() - started
+        assert f"[{model_router.models[tier]}]" in result.final_output, (tier, result.final_output)
+        return tier, elapsed
+
+    return await asyncio.gather(*(one(role, message) for role, message, _ in MESSAGES * args.rounds))
+
+
+def report(label: str, results) -> float:
+    by_tier = {}
+    for tier, elapsed in results:
+        by_tier.setdefault(tier, []).append(elapsed * 1000)
+    for tier in ("small", "medium", "large"):
+        if tier in by_tier:
+            latencies = sorted(by_tier[tier])
+            print(f"{label:<12} {tier:<8} {len(latencies):>6} {statistics.mean(latencies):>9.1f} "
+                  f"{latencies[int(len(latencies) * 0.95)]:>9.1f}")
+    overall = sorted(elapsed * 1000 for _, elapsed in results)
+    mean = statistics.mean(overall)
+    print(f"{label:<12} {'all':<8} {len(overall):>6} {mean:>9.1f} {overall[int(len(overall) * 0.95)]:>9.1f}")
+    return mean
+
+
+FOLLOW_UPS = [
+    # (previous reply, tools it ran, follow-up, expected tier)
+    ("Shall I restart the Redis Cache service?", [], "yes", "large"),
+    ("I can set INC-001 to P1 if you confirm.", [], "ok, do it", "large"),
+    ("[stub] Done.", ["restart_service"], "thanks", "large"),
+    ("[stub] Done.", ["approve_emergency_spending"], "Great, and INC-002?", "large"),
+    ("INC-001 is INVESTIGATING at P2.", ["view_incident_details"], "thanks", "small"),
+    ("INC-001 is INVESTIGATING at P2.", [], "ok", "small"),
+    ("Shall I restart the Redis Cache service?", [], "What's the cost impact of INC-001?", "medium"),
+]
+
+
+def check_follow_ups() -> None:
+    os.environ.setdefault("OPENAI_API_KEY", "unused-with-stub-models")
+    from fastapi.testclient import TestClient
+    import main
+    from models import Role
+    from routing import model_router, recent_turns
+
+    client = TestClient(main.app)
+    headers = {"X-User-Role": "OPS", "X-User-Id": "ops-1"}
+    for i, (previous, tools, message, tier) in enumerate(FOLLOW_UPS):
+        thread_id = f"bench-follow-up-{i}"
+        recent_turns.remember(thread_id, previous, tools)
+        body = client.post("/api/simple-chat", json={"message": message, "thread_id": thread_id},
+                           headers=headers).json()
+        assert body["route"]["tier"] == tier, (previous, tools, message, body["route"])
+        # The reply becomes the previous turn of the next message
+        assert recent_turns.last(thread_id) == (body["response"], False), recent_turns.last(thread_id)
+    # Without a thread the message is routed on its own
+    body = client.post("/api/simple-chat", json={"message": "yes"}, headers=headers).json()
+    assert body["route"]["tier"] == model_router.route(Role.OPS, "yes").tier, body["route"]
+    print(f"Follow-ups: {len(FOLLOW_UPS)} replies routed by the previous turn as expected")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, nargs=3, default=[40, 150, 600],
+                        metavar=("SMALL", "MEDIUM", "LARGE"))
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    configure(args.latency_ms)
+
+    from agents import set_tracing_disabled
+    from models import Role
+    from routing import model_router
+
+    set_tracing_disabled(True)
+    correct = sum(model_router.classify(message) == intent for _, message, intent in MESSAGES)
+    misses = [(message[:40], model_router.classify(message), intent)
+              for _, message, intent in MESSAGES if model_router.classify(message) != intent]
+    started = time.perf_counter()
+    for _ in range(200):
+        for role, message, _ in MESSAGES:
+            model_router.route(Role(role), message)
+    classify_us = (time.perf_counter() - started) / (200 * len(MESSAGES)) * 1e6
+    print(f"Classifier: {correct}/{len(MESSAGES)} intents as labelled, {classify_us:.1f}us per message")
+    for miss in misses:
+        print(f"  {miss[0]!r}: {miss[1]}, labelled {miss[2]}")
+
+    print(f"{'run':<12} {'tier':<8} {'msgs':>6} {'mean ms':>9} {'p95 ms':>9}")
+    routed = report("routed", asyncio.run(run_all(args, routed=True)))
+    baseline = report("large only", asyncio.run(run_all(args, routed=False)))
+    print(f"Mean latency {baseline:.0f}ms -> {routed:.0f}ms ({baseline / routed:.1f}x)")
+    check_follow_ups()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Incident search index benchmark.
+
+Builds an IncidentSearchIndex over synthetic incidents (1M by default) and
+reports build rate, peak RSS, query latency for rare, common and multi-term
+queries per role, and incremental update latency.
+
+Usage:
+    python benchmarks/bench_search.py --incidents 1000000
+"""
+import argparse
+import random
+import resource
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from models import Incident, IncidentPriority, IncidentStatus, Role  # noqa: E402
+from search import IncidentSearchIndex  # noqa: E402
+
+SYSTEMS = ["PostgreSQL Primary", "PostgreSQL Replica", "Redis Cache", "API Gateway", "Kafka",
+           "Auth Service", "Billing Service", "Search Cluster", "CDN", "Object Storage"]
+WORDS = ("latency timeout error outage degraded connection pool exhausted memory disk cpu "
+         "spike failover replication lag certificate expired deploy rollback queue backlog "
+         "packet loss dns throttling quota crash restart leak saturation").split()
+
+
+def make_incident(i: int, rng: random.Random) -> Incident:
+    now = datetime.now()
+    # A long tail of rare tokens (e.g. customer or host names) like real data
+    rare = f"host{rng.randrange(100_000)}"
+    return Incident(
+        incident_id=f"INC-{i:07d}",
+        title=" ".join(rng.choices(WORDS, k=4)),
+        description=" ".join(rng.choices(WORDS, k=20)) + f" on {rare}",
+        priority=rng.choice(list(IncidentPriority)),
+        status=rng.choice(list(IncidentStatus)),
+        affected_systems=rng.sample(SYSTEMS, k=2),
+        affected_customers=rng.randrange(1000),
+        estimated_cost=0.0,
+        sla_penalty=0.0,
+        created_at=now,
+        created_by="bench",
+        updated_at=now,
+    )
+
+
+def time_queries(index: IncidentSearchIndex, queries, role, repeat: int) -> list:
+    latencies = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, role=role, limit=10)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--incidents", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    index = IncidentSearchIndex()
+    start = time.perf_counter()
+    for i in range(args.incidents):
+        index.add(make_incident(i, rng))
+    build = time.perf_counter() - start
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Indexed {args.incidents:,} incidents in {build:.1f}s "
+          f"({args.incidents / build:,.0f}/s), peak RSS {rss_mb:,.0f} MB")
+
+    query_sets = {
+        "rare (1 token)": [f"host{rng.randrange(100_000)}" for _ in range(20)],
+        "system name": ["redis", "kafka", "billing"],
+        "common (2 tokens)": ["connection timeout", "memory leak", "replication lag"],
+        "multi-term (5 tokens)": ["postgresql connection pool exhausted latency"],
+    }
+    print(f"\n{'query':<24} {'role':<8} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, queries in query_sets.items():
+        for role in (Role.IT, Role.FINANCE):
+            latencies = sorted(time_queries(index, queries, role, args.repeat))
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f"{name:<24} {role.value:<8} {statistics.median(latencies):>8.2f} {p99:>8.2f}")
+
+    updates = []
+    for i in range(args.incidents, args.incidents + 1000):
+        old = make_incident(i, rng)
+        new = make_incident(i, rng)
+        index.add(old)
+        start = time.perf_counter()
+        index.update(old, new)
+        updates.append((time.perf_counter() - start) * 1e6)
+    print(f"\nIncremental update: median {statistics.median(updates):.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Cold-start benchmark for the backend.
+
+Imports `main` in fresh interpreters under `python -X importtime`, reports the
+median import time and the slowest modules, and fails if the median exceeds
+the import-time budget. Optionally also measures time until /ready flips.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 1000
+    python benchmarks/bench_startup.py --ready --log importtime.txt
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+
+def import_time(env: dict) -> tuple:
+    """Import main once; return (total microseconds, {module: cumulative us}, raw log)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules["main"], modules, result.stderr
+
+
+def time_to_ready(env: dict, port: int) -> float:
+    """Seconds from process start until GET /ready returns 200."""
+    import httpx
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < 60:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/ready").status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            time.sleep(0.02)
+        raise RuntimeError("Server did not become ready within 60s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1000.0,
+                        help="Fail if the median import time of main exceeds this")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to list")
+    parser.add_argument("--log", help="Write the raw -X importtime output of the last run here")
+    parser.add_argument("--ready", action="store_true", help="Also measure time until /ready")
+    parser.add_argument("--port", type=int, default=8810)
+    args = parser.parse_args()
+
+    env = dict(os.environ, OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "sk-bench"))
+    totals = []
+    for _ in range(args.runs):
+        total, modules, raw = import_time(env)
+        totals.append(total / 1000)
+
+    median = statistics.median(totals)
+    print(f"import main: median {median:.0f} ms over {args.runs} runs "
+          f"(min {min(totals):.0f}, max {max(totals):.0f}, budget {args.budget_ms:.0f})")
+    print("\nSlowest top-level imports (cumulative, last run):")
+    top_level = {name: us for name, us in modules.items() if "." not in name and name != "main"}
+    for name, us in sorted(top_level.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+    deferred = [name for name in ("agents", "chatkit", "openai", "tools", "agent") if name in modules]
+    print(f"\nDeferred modules loaded at import: {', '.join(deferred) or 'none'}")
+
+    if args.log:
+        Path(args.log).write_text(raw)
+        print(f"Raw importtime log written to {args.log}")
+
+    if args.ready:
+        print(f"\nTime to /ready: {time_to_ready(env, args.port) * 1000:.0f} ms")
+
+    if median > args.budget_ms:
+        print(f"\nFAIL: import time {median:.0f} ms exceeds budget {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
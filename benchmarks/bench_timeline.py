@@ -0,0 +1,170 @@
+"""
+Incident timeline benchmark: point-in-time queries on long histories.
+
+For each history length, applies that many updates to one incident and
+reports:
+- the update rate with and without the timeline index;
+- memory per event;
+- point-in-time reconstruction (checkpoint + events) against replaying the
+  whole history from the first event;
+- paging through the whole timeline with the cursor.
+
+Every reconstructed state is checked against the version the store held at
+that time. Two stores sharing one SQLite file (two workers) then update the
+same incident in turn; each worker's timeline must hold every version once,
+in order.
+
+Usage:
+    python benchmarks/bench_timeline.py --events 1000 10000 100000
+"""
+import argparse
+import random
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import replace
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from backends import SQLiteIncidentBackend  # noqa: E402
+from models import Incident, IncidentPriority, IncidentStatus, Role  # noqa: E402
+from store import IncidentStore  # noqa: E402
+from timeline import IncidentTimelines, Timeline  # noqa: E402
+
+QUERIES = 2000
+
+
+def random_update(rng: random.Random, incident: Incident) -> dict:
+    fields = {"status": rng.choice(list(IncidentStatus))}
+    if rng.random() < 0.5:
+        fields["priority"] = rng.choice(list(IncidentPriority))
+    if rng.random() < 0.3:
+        fields["affected_customers"] = incident.affected_customers + rng.randint(1, 50)
+        fields["estimated_cost"] = fields["affected_customers"] * 12.5
+    return fields
+
+
+def run_updates(store: IncidentStore, count: int, seed: int):
+    """Apply `count` updates to INC-001; returns the versions and elapsed seconds."""
+    rng = random.Random(seed)
+    versions = [store.get_incident("INC-001")]
+    started = time.perf_counter()
+    for _ in range(count):
+        versions.append(store.update_incident("INC-001", **random_update(rng, versions[-1])))
+    return versions, time.perf_counter() - started
+
+
+def replay(timeline: Timeline, count: int) -> Incident:
+    """Rebuild by applying every event from the first: the no-checkpoint baseline."""
+    merged = {}
+    for event in timeline.events[:count]:
+        merged.update(event.changes)
+    return replace(timeline.checkpoints[0], **merged)
+
+
+def traced_bytes(store: IncidentStore, count: int) -> int:
+    """Memory still allocated after the updates, including the versions list."""
+    tracemalloc.start()
+    versions, _ = run_updates(store, count, seed=count)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+
+def with_timelines():
+    store = IncidentStore()
+    timelines = IncidentTimelines(store)
+    store.register_index(timelines)
+    return store, timelines
+
+
+def bench(count: int) -> None:
+    # The timeline's own memory: events, change dicts and checkpoint references
+    per_event = (traced_bytes(with_timelines()[0], count) - traced_bytes(IncidentStore(), count)) / count
+
+    _, plain_s = run_updates(IncidentStore(), count, seed=count)
+    store, timelines = with_timelines()
+    versions, indexed_s = run_updates(store, count, seed=count)
+    timeline = timelines.get("INC-001")
+    assert len(timeline.events) == count + 1
+
+    rng = random.Random(7)
+    picks = [rng.randrange(len(versions)) for _ in range(QUERIES)]
+    indexed, replayed = [], []
+    for pick in picks:
+        expected = versions[pick]
+        # The last version written at that instant wins
+        while pick + 1 < len(versions) and versions[pick + 1].updated_at == expected.updated_at:
+            pick += 1
+            expected = versions[pick]
+        started = time.perf_counter()
+        state = timelines.state_at("INC-001", expected.updated_at)
+        indexed.append(time.perf_counter() - started)
+        assert state == expected, (state, expected)
+        if len(replayed) < 200:
+            started = time.perf_counter()
+            baseline = replay(timeline, timeline.position(expected.updated_at))
+            replayed.append(time.perf_counter() - started)
+            assert baseline == expected
+
+    started = time.perf_counter()
+    after, pages, seen = 0, 0, 0
+    while True:
+        page = timelines.page("INC-001", Role.FINANCE, after=after, limit=1000)
+        assert not page["events"] or page["events"][0]["seq"] == after + 1
+        seen += len(page["events"])
+        pages += 1
+        after = page["after"]
+        if not page["has_more"]:
+            break
+    page_s = (time.perf_counter() - started) / pages
+    assert seen == count + 1
+
+    median_us = statistics.median(indexed) * 1e6
+    replay_us = statistics.median(replayed) * 1e6
+    print(f"{count:>8,} {count / plain_s:>10,.0f} {count / indexed_s:>10,.0f} {per_event:>8.0f} "
+          f"{median_us:>10.1f} {sorted(indexed)[int(len(indexed) * 0.99)] * 1e6:>9.1f} {replay_us:>11.1f} {page_s * 1000:>9.2f}")
+
+
+def check_workers(updates: int = 200) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "incidents.db")
+    workers = []
+    for _ in range(2):
+        store = IncidentStore(backend=SQLiteIncidentBackend(path))
+        timelines = IncidentTimelines(store)
+        store.register_index(timelines)
+        workers.append((store, timelines))
+    rng = random.Random(11)
+    versions = {1: workers[0][0].get_incident("INC-001")}
+    for n in range(updates):
+        # Bursts from one worker, so the other syncs several changes at once
+        store = workers[(n // 7) % 2][0]
+        new = store.update_incident("INC-001", **random_update(rng, store.get_incident("INC-001")))
+        versions[new.version] = new
+    for store, timelines in workers:
+        store.sync()
+        timeline = timelines.get("INC-001")
+        assert [event.version for event in timeline.events] == list(range(1, updates + 2)), \
+            [event.version for event in timeline.events][:20]
+        for count, event in enumerate(timeline.events, 1):
+            assert timeline.state(count) == versions[event.version], event.version
+    print(f"Two SQLite workers: each timeline holds all {updates + 1} versions of INC-001 in order")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    args = parser.parse_args()
+    print(f"{'events':>8} {'plain/s':>10} {'indexed/s':>10} {'B/event':>8} "
+          f"{'as_of us':>10} {'p99 us':>9} {'replay us':>11} {'page ms':>9}")
+    for count in args.events:
+        bench(count)
+    check_workers()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Throughput scaling benchmark for multi-worker deployments.
+
+Starts the server in production mode with 1..N workers against a fresh
+SQLite/WAL store and the stub model, then drives GET /api/incidents and
+POST /api/simple-chat from several client processes.
+
+First checks, in process, that the SQLite change log is compacted and that a
+worker that fell behind the compacted log reloads the incidents and makes
+its stream clients start from a snapshot.
+
+Usage:
+    python benchmarks/bench_workers.py --max-workers 4 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+HEADERS = {"X-User-Role": "OPS", "X-User-Id": "bench"}
+
+
+async def _drive(url: str, method: str, duration: float, concurrency: int) -> int:
+    """Send requests from `concurrency` tasks for `duration` seconds."""
+    deadline = time.perf_counter() + duration
+    completed = 0
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal completed
+        while time.perf_counter() < deadline:
+            if method == "GET":
+                response = await client.get(url, headers=HEADERS)
+            else:
+                response = await client.post(url, headers=HEADERS, json={"message": "status of INC-001?"})
+            response.raise_for_status()
+            completed += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return completed
+
+
+def _client_process(args) -> int:
+    return asyncio.run(_drive(*args))
+
+
+def measure(url: str, method: str, duration: float, clients: int, concurrency: int) -> float:
+    """Requests per second across `clients` load-generator processes."""
+    with multiprocessing.Pool(clients) as pool:
+        counts = pool.map(_client_process, [(url, method, duration, concurrency)] * clients)
+    return sum(counts) / duration
+
+
+def start_server(workers: int, port: int, db_path: str, model: str) -> subprocess.Popen:
+    env = dict(os.environ,
+               STORE_BACKEND="sqlite",
+               STORE_DB_PATH=db_path,
+               AGENT_MODEL=model,
+               OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "sk-bench"))
+    process = subprocess.Popen(
+        [sys.executable, "main.py", "--production", "--workers", str(workers), "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(200):
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return process
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Server with {workers} workers did not start")
+
+
+def check_compaction(max_changes: int = 50, updates: int = 200) -> None:
+    from backends import SQLiteIncidentBackend
+    from store import IncidentStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "incidents.db")
+        writer, behind = (IncidentStore(backend=SQLiteIncidentBackend(path, max_changes=max_changes))
+                          for _ in range(2))
+        cursor = behind.changes.seq
+        subscription = behind.changes.subscribe()
+        for n in range(updates):
+            writer.update_incident("INC-001", affected_customers=n)
+        backend = writer.backend
+        rows = backend._conn.execute("SELECT COUNT(*) FROM incident_changes").fetchone()[0]
+        assert rows == max_changes, rows
+        assert backend.changes_since(cursor) is None
+        assert len(backend.changes_since(backend.latest_seq() - 10)) == 10
+
+        behind.sync()
+        assert behind.get_incident("INC-001") == writer.get_incident("INC-001")
+        assert behind.changes.seq == backend.latest_seq()
+        assert behind.changes.changes_since(cursor) is None and subscription.lagged
+        writer.update_incident("INC-001", affected_customers=-1)
+        behind.sync()
+        assert [change.changes["affected_customers"] for change in behind.changes.changes_since(cursor + updates)] == [-1]
+    print(f"Change log kept at {max_changes} rows over {updates} updates; "
+          f"a worker behind it reloaded and reset its stream clients")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=4, help="Load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="In-flight requests per client")
+    parser.add_argument("--model", default="stub:20", help="AGENT_MODEL for the chat endpoint")
+    parser.add_argument("--port", type=int, default=8800)
+    args = parser.parse_args()
+
+    check_compaction()
+    print(f"{'workers':>7} {'/api/incidents req/s':>22} {'/api/simple-chat req/s':>24}")
+    counts = sorted({1 << i for i in range(args.max_workers.bit_length())} | {args.max_workers})
+    baseline = None
+    for workers in counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            server = start_server(workers, args.port, os.path.join(tmp, "bench.db"), args.model)
+            try:
+                base = f"http://127.0.0.1:{args.port}"
+                incidents = measure(f"{base}/api/incidents", "GET", args.duration,
+                                    args.clients, args.concurrency)
+                chat = measure(f"{base}/api/simple-chat", "POST", args.duration,
+                               args.clients, args.concurrency)
+            finally:
+                server.terminate()
+                server.wait()
+        baseline = baseline or incidents
+        print(f"{workers:>7} {incidents:>22.0f} {chat:>24.0f}   ({incidents / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
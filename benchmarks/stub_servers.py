@@ -0,0 +1,173 @@
+"""
+Local stub SMTP and webhook servers for exercising notification channels.
+
+Both count what they receive and can fail a share of requests to test
+retries. Run standalone to point a dev server at them:
+
+    python benchmarks/stub_servers.py --smtp-port 1025 --webhook-port 8025
+    NOTIFY_CHANNELS=smtp,webhook NOTIFY_SMTP_HOST=127.0.0.1:1025 \\
+        NOTIFY_WEBHOOK_URL=http://127.0.0.1:8025/notify python backend/main.py
+"""
+import argparse
+import asyncio
+import json
+import random
+from typing import Optional
+
+
+class StubSMTPServer:
+    """
+    Minimal SMTP server: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT.
+
+    Args:
+        failure_rate: Share of RCPT commands refused with 550
+        latency: Seconds to wait before acknowledging each message
+        drop_after: Close each connection after this many messages (0 never)
+    """
+
+    def __init__(self, failure_rate: float = 0.0, latency: float = 0.0, drop_after: int = 0):
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.drop_after = drop_after
+        self.messages = 0
+        self.dropped = 0
+        self.refused = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        def reply(line: str) -> None:
+            writer.write(line.encode() + b"\r\n")
+
+        reply("220 stub ESMTP")
+        recipients = 0
+        accepted = 0
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line[:4].decode(errors="replace").upper()
+                if command in ("EHLO", "HELO"):
+                    reply("250 stub")
+                elif command == "MAIL":
+                    if self.drop_after and accepted >= self.drop_after:
+                        self.dropped += 1
+                        break
+                    recipients = 0
+                    reply("250 OK")
+                elif command == "RCPT":
+                    if random.random() < self.failure_rate:
+                        self.refused += 1
+                        reply("550 Mailbox unavailable")
+                    else:
+                        recipients += 1
+                        reply("250 OK")
+                elif command == "DATA":
+                    reply("354 End data with <CR><LF>.<CR><LF>")
+                    await writer.drain()
+                    while await reader.readline() not in (b".\r\n", b""):
+                        pass
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    self.messages += recipients
+                    accepted += 1
+                    reply("250 Queued")
+                elif command == "RSET":
+                    recipients = 0
+                    reply("250 OK")
+                elif command == "NOOP":
+                    reply("250 OK")
+                elif command == "QUIT":
+                    reply("221 Bye")
+                    await writer.drain()
+                    break
+                else:
+                    reply("502 Command not implemented")
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+class StubWebhookServer:
+    """
+    Minimal keep-alive HTTP server accepting JSON POSTs of recipient batches.
+
+    Args:
+        failure_rate: Share of requests answered with 503
+        latency: Seconds to wait before responding
+    """
+
+    def __init__(self, failure_rate: float = 0.0, latency: float = 0.0):
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.requests = 0
+        self.failures = 0
+        self.recipients = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+                body = await reader.readexactly(length) if length else b""
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                self.requests += 1
+                if random.random() < self.failure_rate:
+                    self.failures += 1
+                    status = b"503 Service Unavailable"
+                else:
+                    self.recipients += len(json.loads(body).get("recipients", []))
+                    status = b"200 OK"
+                writer.write(b"HTTP/1.1 " + status + b"\r\nContent-Length: 0\r\n\r\n")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+async def main(args):
+    smtp = StubSMTPServer(args.failure_rate)
+    webhook = StubWebhookServer(args.failure_rate)
+    await smtp.start(port=args.smtp_port)
+    await webhook.start(port=args.webhook_port)
+    print(f"SMTP on 127.0.0.1:{args.smtp_port}, webhook on http://127.0.0.1:{args.webhook_port}/notify")
+    while True:
+        await asyncio.sleep(10)
+        print(f"smtp: {smtp.messages} delivered, {smtp.refused} refused; "
+              f"webhook: {webhook.recipients} recipients in {webhook.requests} requests, {webhook.failures} failed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--smtp-port", type=int, default=1025)
+    parser.add_argument("--webhook-port", type=int, default=8025)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    asyncio.run(main(parser.parse_args()))